@@ -244,6 +244,10 @@ OSCAR_DASHBOARD_NAVIGATION.append(  # NOQA
                 "label": _("Pre-Qualification Requests"),
                 "url_name": "wfrs-prequal-list",
             },
+            {
+                "label": _("Exports"),
+                "url_name": "wfrs-export-list",
+            },
         ],
     }
 )
@@ -274,3 +278,8 @@ WFRS_SECURITY = {
         "key": b"U3Nyi57e55H2weKVmEPzrGdv18b0bGt3e542rg1J1N8=",
     },
 }
+
+# Run background tasks inline, so that tests are deterministic
+WFRS_TASK_RUNNER = {
+    "task_runner": "wellsfargo.tasks.runners.SynchronousTaskRunner",
+}
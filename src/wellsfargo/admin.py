@@ -82,3 +82,17 @@ class AccountInquiryResultAdmin(ReadOnlyAdmin):
         "created_datetime",
         "modified_datetime",
     )
+
+
+@admin.register(models.ExportJob)
+class ExportJobAdmin(ReadOnlyAdmin):
+    list_display = [
+        "id",
+        "export_type",
+        "status",
+        "rows_written",
+        "total_rows",
+        "requesting_user",
+        "created_datetime",
+    ]
+    list_filter = ["export_type", "status", "created_datetime"]
@@ -0,0 +1,58 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from rest_framework import generics
+
+
+class AsyncAPIView(generics.GenericAPIView):
+    """
+    A DRF view whose handlers are coroutines, for use under ASGI.
+
+    DRF only dispatches to synchronous handlers, so this runs DRF's usual request processing (authentication,
+    permission and throttle checks, and exception handling) in a worker thread, and then awaits the handler.
+    Handlers must do any database queries of their own with ``sync_to_async`` (or Django's async ORM
+    methods), and may use ``self.serialize`` to build response data.
+
+    Django can't wrap async views in a transaction, so these views are exempt from ``ATOMIC_REQUESTS``.
+    """
+
+    @transaction.non_atomic_requests
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = await sync_to_async(self.handle_exception)(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Load the session now, so that handlers can read and write it without querying the session store
+        # from the event loop.
+        session = getattr(request, "session", None)
+        if session is not None:
+            session.keys()
+
+    async def options(self, request, *args, **kwargs):
+        return await sync_to_async(super().options)(request, *args, **kwargs)
+
+    async def serialize(self, serializer_class, instance):
+        """Serialize the given instance (which may query related objects) for a response"""
+
+        def get_data():
+            return serializer_class(
+                instance=instance, context={"request": self.request}
+            ).data
+
+        return await sync_to_async(get_data)()
@@ -9,10 +9,16 @@ class WFRSAPIConfig(OscarConfig):
     default = True
 
     def get_urls(self):
+        from ..settings import WFRS_API_ASYNCIO_VIEWS
         from .views import (
+            AsyncCreditApplicationView,
+            AsyncPreQualificationRequestView,
+            AsyncSubmitAccountInquiryView,
+            AsyncUpdateAccountInquiryView,
             CreditApplicationView,
             FinancingPlanView,
             EstimatedPaymentView,
+            BatchEstimatedPaymentView,
             UpdateAccountInquiryView,
             SubmitAccountInquiryView,
             PreQualificationSDKMerchantNumView,
@@ -23,13 +29,23 @@ class WFRSAPIConfig(OscarConfig):
             PreQualificationSDKApplicationResultView,
         )
 
+        # Optionally serve the views which call Wells Fargo with their asyncio versions
+        if WFRS_API_ASYNCIO_VIEWS:
+            apply_view = AsyncCreditApplicationView
+            update_inquiry_view = AsyncUpdateAccountInquiryView
+            inquiry_view = AsyncSubmitAccountInquiryView
+            prequal_view = AsyncPreQualificationRequestView
+        else:
+            apply_view = CreditApplicationView
+            update_inquiry_view = UpdateAccountInquiryView
+            inquiry_view = SubmitAccountInquiryView
+            prequal_view = PreQualificationRequestView
+
         urlpatterns = [
-            re_path(
-                r"^apply/$", CreditApplicationView.as_view(), name="wfrs-api-apply"
-            ),
+            re_path(r"^apply/$", apply_view.as_view(), name="wfrs-api-apply"),
             re_path(
                 r"^apply/update-inquiry/$",
-                UpdateAccountInquiryView.as_view(),
+                update_inquiry_view.as_view(),
                 name="wfrs-api-update-inquiry",
             ),
             re_path(
@@ -40,14 +56,19 @@ class WFRSAPIConfig(OscarConfig):
                 EstimatedPaymentView.as_view(),
                 name="wfrs-api-estimated-payment",
             ),
+            re_path(
+                r"^estimated-payments/$",
+                BatchEstimatedPaymentView.as_view(),
+                name="wfrs-api-estimated-payments",
+            ),
             re_path(
                 r"^inquiry/$",
-                SubmitAccountInquiryView.as_view(),
+                inquiry_view.as_view(),
                 name="wfrs-api-acct-inquiry",
             ),
             re_path(
                 r"^prequal/$",
-                PreQualificationRequestView.as_view(),
+                prequal_view.as_view(),
                 name="wfrs-api-prequal",
             ),
             re_path(
@@ -0,0 +1,59 @@
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from ..settings import WFRS_ESTIMATED_PAYMENT_HTTP_CACHE
+import hashlib
+
+
+def make_etag(catalog, request, *parts):
+    """
+    Build a strong ETag for a response which is fully determined by the given plan catalog, the request's
+    negotiated media type, and ``parts`` (the normalized query).
+    """
+    key = "\n".join(
+        str(part)
+        for part in (catalog.version, request.accepted_media_type) + tuple(parts)
+    )
+    return quote_etag(hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+
+def etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return "*" in etags or etag in etags
+
+
+class PlanCatalogConditionalGetMixin(object):
+    """
+    Conditional GET support for API views whose responses are a pure function of the plan catalog and the
+    query. See ``WFRS_ESTIMATED_PAYMENT_HTTP_CACHE``.
+    """
+
+    def conditional_response(self, request, etag, build_response, by_product=False):
+        """
+        Return ``304 Not Modified`` if the client already has the representation identified by ``etag``,
+        otherwise the response returned by calling ``build_response``. Either way, successful responses get
+        the ETag and caching headers.
+        """
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = build_response()
+        if response.status_code < 400:
+            response["ETag"] = etag
+            self.patch_caching_headers(response, by_product=by_product)
+        return response
+
+    def patch_caching_headers(self, response, by_product=False):
+        config = WFRS_ESTIMATED_PAYMENT_HTTP_CACHE
+        cache_control = config["cache_control"]
+        vary = list(config["vary"] or [])
+        if by_product:
+            cache_control = config["product_cache_control"]
+            vary += config["product_vary"] or []
+        if cache_control:
+            patch_cache_control(response, **cache_control)
+        if vary:
+            patch_vary_headers(response, vary)
@@ -1,4 +1,7 @@
+from asgiref.sync import sync_to_async
+from contextlib import contextmanager
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError as DRFValidationError
 from ipware import get_client_ip
@@ -24,6 +27,7 @@ from ..models import (
     PreQualificationSDKApplicationResult,
 )
 from . import exceptions as api_exceptions
+from .tasks import enqueue_credit_app_submission, enqueue_prescreen_check
 
 Basket = get_model("basket", "Basket")
 BillingAddress = get_model("order", "BillingAddress")
@@ -36,6 +40,31 @@ SourceType = get_model("payment", "SourceType")
 Transaction = get_model("payment", "Transaction")
 
 
+@contextmanager
+def translate_gateway_errors(field_name="non_field_errors"):
+    """Convert the errors raised by the Wells Fargo API clients into REST API errors"""
+    try:
+        yield
+    except core_exceptions.CreditApplicationPending as e:
+        pending = api_exceptions.CreditApplicationPending()
+        pending.inquiry = e.inquiry
+        raise pending
+    except core_exceptions.CreditApplicationDenied:
+        raise api_exceptions.CreditApplicationDenied()
+    except DjangoValidationError as e:
+        raise DRFValidationError(
+            {
+                field_name: [str(m) for m in e.messages],
+            }
+        )
+
+
+def _get_request_user(request):
+    if request.user and request.user.is_authenticated:
+        return request.user
+    return None
+
+
 class CreditApplicationAddressSerializer(serializers.ModelSerializer):
     class Meta:
         model = CreditApplicationAddress
@@ -148,12 +177,34 @@ class CreditApplicationSerializer(serializers.ModelSerializer):
             },
         }
 
-    def save(self):
+    def save(self, run_async=False):
         request = self.context["request"]
-        request_user = None
-        if request.user and request.user.is_authenticated:
-            request_user = request.user
+        request_user = _get_request_user(request)
+        app = self._create_application(request, request_user)
+
+        # Optionally leave the submission to a background task
+        if run_async:
+            enqueue_credit_app_submission(app, user=request_user)
+            return app
+
+        # Submit application to to Wells
+        client = CreditApplicationsAPIClient(current_user=request_user)
+        with translate_gateway_errors():
+            return client.submit_credit_application(app)
+
+    async def asave(self):
+        """Like ``save``, but awaits the Wells Fargo API call instead of blocking on it"""
+        from ..connector.aio import AsyncCreditApplicationsAPIClient
 
+        request = self.context["request"]
+        request_user = _get_request_user(request)
+        app = await sync_to_async(self._create_application)(request, request_user)
+        client = AsyncCreditApplicationsAPIClient(current_user=request_user)
+        with translate_gateway_errors():
+            return await client.submit_credit_application(app)
+
+    @transaction.atomic()
+    def _create_application(self, request, request_user):
         # Build the main applicant object
         self.validated_data["main_applicant"]["address"] = (
             CreditApplicationAddress.objects.create(
@@ -187,24 +238,7 @@ class CreditApplicationSerializer(serializers.ModelSerializer):
         app.user = request_user
         app.submitting_user = request_user
         app.save()
-
-        # Submit application to to Wells
-        client = CreditApplicationsAPIClient(current_user=request_user)
-        try:
-            result = client.submit_credit_application(app)
-        except core_exceptions.CreditApplicationPending as e:
-            pending = api_exceptions.CreditApplicationPending()
-            pending.inquiry = e.inquiry
-            raise pending
-        except core_exceptions.CreditApplicationDenied:
-            raise api_exceptions.CreditApplicationDenied()
-        except DjangoValidationError as e:
-            raise DRFValidationError(
-                {
-                    "non_field_errors": [str(m) for m in e.messages],
-                }
-            )
-        return result
+        return app
 
 
 class FinancingPlanSerializer(serializers.ModelSerializer):
@@ -250,24 +284,21 @@ class AccountInquirySerializer(serializers.ModelSerializer):
 
     def save(self):
         request = self.context["request"]
-
-        request_user = None
-        if request.user and request.user.is_authenticated:
-            request_user = request.user
-
         # Submit inquiry to Wells
         account_number = self.validated_data["account_number"]
-        client = AccountsAPIClient(current_user=request_user)
-        try:
-            result = client.lookup_account_by_account_number(account_number)
-        except DjangoValidationError as e:
-            raise DRFValidationError(
-                {
-                    "account_number": [str(m) for m in e.messages],
-                }
-            )
+        client = AccountsAPIClient(current_user=_get_request_user(request))
+        with translate_gateway_errors("account_number"):
+            return client.lookup_account_by_account_number(account_number)
 
-        return result
+    async def asave(self):
+        """Like ``save``, but awaits the Wells Fargo API call instead of blocking on it"""
+        from ..connector.aio import AsyncAccountsAPIClient
+
+        request = self.context["request"]
+        account_number = self.validated_data["account_number"]
+        client = AsyncAccountsAPIClient(current_user=_get_request_user(request))
+        with translate_gateway_errors("account_number"):
+            return await client.lookup_account_by_account_number(account_number)
 
 
 class PreQualificationRequestSerializer(serializers.ModelSerializer):
@@ -283,26 +314,36 @@ class PreQualificationRequestSerializer(serializers.ModelSerializer):
         )
         fields = "__all__"
 
-    def save(self):
+    def save(self, run_async=False):
         request = self.context["request"]
-        # Save IPAdress of the user
-        user_ipaddress, _ = get_client_ip(request)
-        self.validated_data["ip_address"] = user_ipaddress
-        prequal_request = super().save()
-        request_user = None
-        if request.user and request.user.is_authenticated:
-            request_user = request.user
+        prequal_request = self._create_prequal_request(request)
+        request_user = _get_request_user(request)
+        # Optionally leave the Wells Fargo API call to a background task
+        if run_async:
+            enqueue_prescreen_check(prequal_request, user=request_user)
+            return prequal_request
         client = PrequalAPIClient(current_user=request_user)
-        try:
+        with translate_gateway_errors():
             client.check_prescreen_status(prequal_request)
-        except DjangoValidationError as e:
-            raise DRFValidationError(
-                {
-                    "non_field_errors": [str(m) for m in e.messages],
-                }
-            )
         return prequal_request
 
+    async def asave(self):
+        """Like ``save``, but awaits the Wells Fargo API call instead of blocking on it"""
+        from ..connector.aio import AsyncPrequalAPIClient
+
+        request = self.context["request"]
+        prequal_request = await sync_to_async(self._create_prequal_request)(request)
+        client = AsyncPrequalAPIClient(current_user=_get_request_user(request))
+        with translate_gateway_errors():
+            await client.check_prescreen_status(prequal_request)
+        return prequal_request
+
+    def _create_prequal_request(self, request):
+        # Save IPAdress of the user
+        user_ipaddress, _ = get_client_ip(request)
+        self.validated_data["ip_address"] = user_ipaddress
+        return super().save()
+
 
 class PreQualificationSDKApplicationResultSerializer(serializers.ModelSerializer):
     class Meta:
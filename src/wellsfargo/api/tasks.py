@@ -0,0 +1,201 @@
+"""
+Background versions of the API's Wells Fargo calls, for use with ``WFRS_API_ASYNC``.
+
+The outcome of a successful task is the model instance it saves, which the polling view looks for. While a
+task is queued or running, and if it fails, its status is kept in the Django cache (which must therefore be
+shared between the web and task worker processes).
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.translation import gettext as _
+from ..connector import CreditApplicationsAPIClient, PrequalAPIClient
+from ..connector.metrics import OP_APPLICATION, get_gateway_metrics
+from ..core import exceptions as core_exceptions
+from ..models import CreditApplication, PreQualificationRequest
+from ..settings import WFRS_API_ASYNC
+from ..tasks import enqueue_task
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+import logging
+import requests
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+TASK_STATUS_PENDING = "pending"
+TASK_STATUS_FAILED = "failed"
+
+TASK_PREQUAL = "prequal"
+TASK_CREDIT_APP = "credit-app"
+
+# Gateway responses meaning the request never reached Wells Fargo. A 504 isn't one of them: the gateway
+# timed out waiting for Wells Fargo, which may still have processed the request.
+RETRYABLE_STATUS_CODES = (502, 503)
+
+
+def _get_status_key(task_name, object_id):
+    return "wfrs-api-task-%s-%s" % (task_name, object_id)
+
+
+def get_task_status(task_name, object_id):
+    """Return the ``{"status": ..., "errors": [...]}`` dict of a task, or ``None`` if it isn't known"""
+    return cache.get(_get_status_key(task_name, object_id))
+
+
+def set_task_status(task_name, object_id, status, errors=None):
+    cache.set(
+        _get_status_key(task_name, object_id),
+        {
+            "status": status,
+            "errors": errors or [],
+        },
+        WFRS_API_ASYNC["status_timeout"],
+    )
+
+
+def clear_task_status(task_name, object_id):
+    cache.delete(_get_status_key(task_name, object_id))
+
+
+def _get_user(user_id):
+    if user_id is None:
+        return None
+    return get_user_model().objects.filter(pk=user_id).first()
+
+
+def enqueue_prescreen_check(prequal_request, user=None):
+    """Check the pre-qualification status of the given request in the background"""
+    set_task_status(TASK_PREQUAL, prequal_request.pk, TASK_STATUS_PENDING)
+    enqueue_task(
+        "wellsfargo.api.tasks.check_prescreen_status",
+        prequal_request.pk,
+        user_id=user.pk if user is not None else None,
+    )
+
+
+def check_prescreen_status(prequal_request_id, user_id=None):
+    prequal_request = PreQualificationRequest.objects.get(pk=prequal_request_id)
+    client = PrequalAPIClient(current_user=_get_user(user_id))
+    try:
+        client.check_prescreen_status(prequal_request)
+    except DjangoValidationError as e:
+        set_task_status(
+            TASK_PREQUAL,
+            prequal_request_id,
+            TASK_STATUS_FAILED,
+            errors=[str(m) for m in e.messages],
+        )
+        return
+    except Exception:
+        logger.exception(
+            "Failed to check status of PreQualificationRequest[%s]", prequal_request_id
+        )
+        set_task_status(
+            TASK_PREQUAL,
+            prequal_request_id,
+            TASK_STATUS_FAILED,
+            errors=[_("Unable to check pre-qualification status. Please try again.")],
+        )
+        return
+    clear_task_status(TASK_PREQUAL, prequal_request_id)
+
+
+def enqueue_credit_app_submission(credit_app, user=None):
+    """Submit the given (saved) credit application to Wells Fargo in the background"""
+    set_task_status(TASK_CREDIT_APP, credit_app.pk, TASK_STATUS_PENDING)
+    enqueue_task(
+        "wellsfargo.api.tasks.submit_credit_application",
+        credit_app.pk,
+        user_id=user.pk if user is not None else None,
+    )
+
+
+def _is_connect_error(exc):
+    """Return ``True`` if the given exception was raised before a connection was made (so before sending)"""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.exceptions.ConnectionError) and exc.args:
+        reason = exc.args[0]
+        if isinstance(reason, MaxRetryError):
+            reason = reason.reason
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+def _is_retryable(exc):
+    # Only retry failures where the gateway can't have received (or processed) the application, since
+    # submitting it twice could open two accounts. That rules out read timeouts, connections dropped after
+    # the request was sent, and gateway timeouts.
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return _is_connect_error(exc)
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return exc.response is not None and (
+            exc.response.status_code in RETRYABLE_STATUS_CODES
+        )
+    return False
+
+
+def _get_retry_reason(exc):
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return exc.response.status_code
+    return exc.__class__.__name__
+
+
+def submit_credit_application(credit_app_id, user_id=None):
+    """
+    Submit a credit application, retrying failures to reach the gateway. Every attempt is sent with the same
+    ``client-request-id``. The outcome is saved by the client: the application's status, and (unless it was
+    denied) an ``AccountInquiryResult``.
+    """
+    credit_app = CreditApplication.objects.get(pk=credit_app_id)
+    client = CreditApplicationsAPIClient(current_user=_get_user(user_id))
+    client_request_id = uuid.uuid4()
+    max_attempts = WFRS_API_ASYNC["credit_app_max_attempts"]
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            client.submit_credit_application(
+                credit_app, client_request_id=client_request_id
+            )
+        except (
+            core_exceptions.CreditApplicationPending,
+            core_exceptions.CreditApplicationDenied,
+        ):
+            # Not errors: these outcomes are saved on the application
+            break
+        except DjangoValidationError as e:
+            set_task_status(
+                TASK_CREDIT_APP,
+                credit_app_id,
+                TASK_STATUS_FAILED,
+                errors=[str(m) for m in e.messages],
+            )
+            return
+        except Exception as e:
+            if _is_retryable(e) and attempt < max_attempts:
+                logger.warning(
+                    "Failed to submit CreditApplication[%s] (attempt %s of %s). Retrying. Reason: %s",
+                    credit_app_id,
+                    attempt,
+                    max_attempts,
+                    e,
+                )
+                get_gateway_metrics().observe_retry(
+                    OP_APPLICATION, _get_retry_reason(e)
+                )
+                time.sleep(WFRS_API_ASYNC["credit_app_retry_delay"] * attempt)
+                continue
+            logger.exception("Failed to submit CreditApplication[%s]", credit_app_id)
+            set_task_status(
+                TASK_CREDIT_APP,
+                credit_app_id,
+                TASK_STATUS_FAILED,
+                errors=[_("Unable to submit credit application. Please try again.")],
+            )
+            return
+        else:
+            break
+    clear_task_status(TASK_CREDIT_APP, credit_app_id)
@@ -1,23 +1,33 @@
+from asgiref.sync import sync_to_async
 from django.core import signing, exceptions
 from django.db import transaction
 from django.shortcuts import redirect
+from django.urls import reverse
 from django.utils.decorators import method_decorator
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.utils.translation import gettext_lazy as _
 from rest_framework.response import Response
 from rest_framework import views, generics, status, serializers
-from oscarapi.basket import operations
+from oscar.core.loading import get_model
+from ..catalog import get_plan_catalog
 from ..core.signals import wfrs_sdk_app_approved
+from ..core.constants import CREDIT_APP_APPROVED, CREDIT_APP_PENDING
 from ..models import (
     APIMerchantNum,
+    CreditApplication,
     SDKMerchantNum,
     PreQualificationRequest,
     PreQualificationResponse,
-    FinancingPlan,
     PreQualificationSDKApplicationResult,
     AccountInquiryResult,
 )
-from ..utils import list_plans_for_basket, calculate_monthly_payments
+from ..settings import WFRS_API_ASYNC, WFRS_ESTIMATED_PAYMENT_BATCH_LIMIT
+from ..utils import (
+    estimate_payment,
+    estimate_payments,
+    get_product_price,
+    list_plans_for_request,
+)
 from .serializers import (
     CreditApplicationSerializer,
     FinancingPlanSerializer,
@@ -28,13 +38,55 @@ from .serializers import (
     PreQualificationSDKResponseSerializer,
     PreQualificationSDKApplicationResultSerializer,
 )
-from .exceptions import CreditApplicationPending
+from .aio import AsyncAPIView
+from .caching import PlanCatalogConditionalGetMixin, make_etag
+from .exceptions import CreditApplicationDenied, CreditApplicationPending
+from .tasks import (
+    TASK_CREDIT_APP,
+    TASK_PREQUAL,
+    TASK_STATUS_FAILED,
+    TASK_STATUS_PENDING,
+    get_task_status,
+)
 import decimal
 
 INQUIRY_SESSION_KEY = "wfrs-acct-inquiry-id"
+CREDIT_APP_SESSION_KEY = "wfrs-credit-app-id"
 PREQUAL_SESSION_KEY = "wfrs-prequal-request-id"
 SDK_APP_RESULT_SESSION_KEY = "wfrs-sdk-app-result-id"
 
+Product = get_model("catalogue", "Product")
+
+
+def _task_pending_response(request, poll_url_name):
+    poll_url = request.build_absolute_uri(reverse(poll_url_name))
+    response = Response(
+        {
+            "status": TASK_STATUS_PENDING,
+            "poll_url": poll_url,
+        },
+        status=status.HTTP_202_ACCEPTED,
+    )
+    response["Location"] = poll_url
+    response["Retry-After"] = str(WFRS_API_ASYNC["poll_interval"])
+    return response
+
+
+def _task_status_response(request, task_name, object_id, poll_url_name):
+    """
+    Respond with the status of a background task which hasn't saved its outcome, or return ``None`` if no
+    such task is known.
+    """
+    task_status = get_task_status(task_name, object_id)
+    if task_status is None:
+        return None
+    if task_status["status"] == TASK_STATUS_FAILED:
+        return Response(
+            {"non_field_errors": task_status["errors"]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return _task_pending_response(request, poll_url_name)
+
 
 # This (non-atomic request) is needed because we use exceptions to bubble up the application pending / declined
 # status, but when that happens we still want to save the application data (rather than rollback).
@@ -42,11 +94,47 @@ SDK_APP_RESULT_SESSION_KEY = "wfrs-sdk-app-result-id"
 class CreditApplicationView(generics.GenericAPIView):
     serializer_class = CreditApplicationSerializer
 
+    def get(self, request):
+        """Poll for the outcome of a credit application submitted in the background"""
+        credit_app_id = request.session.get(CREDIT_APP_SESSION_KEY)
+        if not credit_app_id:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        response = _task_status_response(
+            request, TASK_CREDIT_APP, credit_app_id, "wfrs-api-apply"
+        )
+        if response is not None:
+            return response
+        credit_app = CreditApplication.objects.filter(pk=credit_app_id).first()
+        if credit_app is None or not credit_app.status:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        if credit_app.status not in (CREDIT_APP_APPROVED, CREDIT_APP_PENDING):
+            raise CreditApplicationDenied()
+        result = (
+            AccountInquiryResult.objects.filter(credit_app_source=credit_app)
+            .order_by("-created_datetime", "-id")
+            .first()
+        )
+        if result is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        request.session[INQUIRY_SESSION_KEY] = result.pk
+        if credit_app.status == CREDIT_APP_PENDING:
+            pending = CreditApplicationPending()
+            pending.inquiry = result
+            raise pending
+        response_ser = AccountInquirySerializer(
+            instance=result, context={"request": request}
+        )
+        return Response(response_ser.data)
+
     def post(self, request):
         request_ser = self.get_serializer_class()(
             data=request.data, context={"request": request}
         )
         request_ser.is_valid(raise_exception=True)
+        if WFRS_API_ASYNC["credit_app"]:
+            credit_app = request_ser.save(run_async=True)
+            request.session[CREDIT_APP_SESSION_KEY] = credit_app.pk
+            return _task_pending_response(request, "wfrs-api-apply")
         try:
             result = request_ser.save()
         except CreditApplicationPending as e:
@@ -61,54 +149,160 @@ class CreditApplicationView(generics.GenericAPIView):
 
 class FinancingPlanView(views.APIView):
     def get(self, request):
-        basket = operations.get_basket(request)
-        plans = list_plans_for_basket(basket)
+        plans = list_plans_for_request(request)
         ser = FinancingPlanSerializer(plans, many=True)
         return Response(ser.data)
 
 
-class EstimatedPaymentView(views.APIView):
+def _parse_price(value):
+    try:
+        price = decimal.Decimal(value).quantize(decimal.Decimal("0.00"))
+    except (TypeError, decimal.InvalidOperation):
+        return None
+    if not price.is_finite() or price <= 0:
+        return None
+    return price
+
+
+def _format_optional(value):
+    return None if value is None else str(value)
+
+
+def _get_list_param(request, name):
+    # Accept both repeated (``?price=1&price=2``) and comma separated (``?price=1,2``) values
+    values = []
+    for value in request.GET.getlist(name):
+        values += [v.strip() for v in value.split(",") if v.strip()]
+    return values
+
+
+class EstimatedPaymentView(PlanCatalogConditionalGetMixin, views.APIView):
     def get(self, request):
         # Validate the price input
-        try:
-            principal_price = request.GET.get("price", "")
-            principal_price = decimal.Decimal(principal_price).quantize(
-                decimal.Decimal("0.00")
-            )
-        except decimal.InvalidOperation:
-            principal_price = decimal.Decimal("0.00")
-
-        if not principal_price or principal_price <= 0:
+        principal_price = _parse_price(request.GET.get("price", ""))
+        if principal_price is None:
             data = {
                 "price": _("Submitted price parameter was not valid."),
             }
             return Response(data, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get the best matching Financing Plan object for the price
-        plan = FinancingPlan.get_advertisable_plan_by_price(principal_price)
-        if not plan:
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        catalog = get_plan_catalog()
 
-        # Calculate the monthly payment
-        monthly_payment = calculate_monthly_payments(
-            principal_price, plan.term_months, plan.apr
-        )
+        def build_response():
+            # Get the best matching Financing Plan object for the price
+            plan = catalog.get_advertisable_plan_by_price(principal_price)
+            if not plan:
+                return Response(status=status.HTTP_204_NO_CONTENT)
+
+            # Calculate the monthly payment and total loan cost and return the payment data
+            ser = EstimatedPaymentSerializer(
+                instance=estimate_payment(principal_price, plan)
+            )
+            return Response(ser.data)
+
+        etag = make_etag(catalog, request, principal_price)
+        return self.conditional_response(request, etag, build_response)
+
+
+class BatchEstimatedPaymentView(PlanCatalogConditionalGetMixin, views.APIView):
+    """
+    Estimate payments for many prices and / or products at once (for example, every product on a
+    category page). Prices and product IDs are given by the ``price`` and ``product`` query parameters,
+    which may be repeated or comma separated. Product prices are found using the request's pricing
+    strategy. Each result's ``estimate`` is ``null`` when no plan is advertised for its price.
+    """
+
+    def get(self, request):
+        raw_prices = _get_list_param(request, "price")
+        raw_product_ids = _get_list_param(request, "product")
+
+        # Validate the input
+        errors = {}
+        prices = [_parse_price(value) for value in raw_prices]
+        if None in prices:
+            errors["price"] = _("Submitted price parameter was not valid.")
+        try:
+            product_ids = [int(value) for value in raw_product_ids]
+        except ValueError:
+            errors["product"] = _("Submitted product parameter was not valid.")
+        if not raw_prices and not raw_product_ids:
+            errors["non_field_errors"] = [
+                _("Submit at least one price or product parameter.")
+            ]
+        elif (
+            len(raw_prices) + len(raw_product_ids) > WFRS_ESTIMATED_PAYMENT_BATCH_LIMIT
+        ):
+            errors["non_field_errors"] = [
+                _("At most %(limit)s prices and products may be estimated at once.")
+                % {"limit": WFRS_ESTIMATED_PAYMENT_BATCH_LIMIT}
+            ]
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Look up the price of each product
+        product_prices = {}
+        if product_ids:
+            products = (
+                Product.objects.filter(pk__in=set(product_ids))
+                .select_related("product_class", "parent__product_class")
+                .prefetch_related("stockrecords")
+            )
+            for product in products:
+                price = get_product_price(request.strategy, product)
+                if price is not None and price > 0:
+                    price = price.quantize(decimal.Decimal("0.00"))
+                    product_prices[product.pk] = price
+
+        catalog = get_plan_catalog()
+
+        def build_response():
+            # Select a plan and calculate the payments for every distinct price in one pass
+            estimates = estimate_payments(
+                prices + list(product_prices.values()), catalog=catalog
+            )
+            serialized = {}
+
+            def serialize(price):
+                if price is None or estimates[price] is None:
+                    return None
+                if price not in serialized:
+                    serialized[price] = EstimatedPaymentSerializer(
+                        instance=estimates[price]
+                    ).data
+                return serialized[price]
 
-        # Calculate the total loan cost
-        loan_cost = (monthly_payment * plan.term_months) - principal_price
-        loan_cost = max(decimal.Decimal("0.00"), loan_cost)
-        loan_cost = loan_cost.quantize(principal_price, rounding=decimal.ROUND_UP)
-
-        # Return the payment data
-        ser = EstimatedPaymentSerializer(
-            instance={
-                "plan": plan,
-                "principal": principal_price,
-                "monthly_payment": monthly_payment,
-                "loan_cost": loan_cost,
+            data = {
+                "prices": [
+                    {
+                        "price": str(price),
+                        "estimate": serialize(price),
+                    }
+                    for price in prices
+                ],
+                "products": [
+                    {
+                        "product": product_id,
+                        "price": _format_optional(product_prices.get(product_id)),
+                        "estimate": serialize(product_prices.get(product_id)),
+                    }
+                    for product_id in product_ids
+                ],
             }
+            return Response(data)
+
+        # Product prices are part of the ETag, since they depend on the strategy rather than the catalog
+        etag = make_etag(
+            catalog,
+            request,
+            ",".join(str(price) for price in prices),
+            ",".join(
+                "%s:%s" % (pk, _format_optional(product_prices.get(pk)))
+                for pk in product_ids
+            ),
+        )
+        return self.conditional_response(
+            request, etag, build_response, by_product=bool(product_ids)
         )
-        return Response(ser.data)
 
 
 class UpdateAccountInquiryView(views.APIView):
@@ -118,17 +312,8 @@ class UpdateAccountInquiryView(views.APIView):
     """
 
     def post(self, request):
-        # Check for ID of last account inquiry in session (from the credit app view)
-        inquiry_id = request.session.get(INQUIRY_SESSION_KEY)
-        if not inquiry_id:
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        try:
-            inquiry = AccountInquiryResult.objects.get(pk=inquiry_id)
-        except AccountInquiryResult.DoesNotExist:
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        # Make sure we have an account number to work with
-        account_number = inquiry.account_number
-        if not account_number or account_number.startswith("xxxx"):
+        inquiry, account_number = self.get_previous_inquiry(request)
+        if inquiry is None:
             return Response(status=status.HTTP_204_NO_CONTENT)
         # Perform another inquiry on the account
         request_ser = AccountInquirySerializer(
@@ -138,17 +323,38 @@ class UpdateAccountInquiryView(views.APIView):
         result = request_ser.save()
         if result is None:
             return Response(status=status.HTTP_204_NO_CONTENT)
+        self.record_inquiry(request, inquiry, result)
+        # Return the results
+        response_ser = AccountInquirySerializer(
+            instance=result, context={"request": request}
+        )
+        return Response(response_ser.data)
+
+    def get_previous_inquiry(self, request):
+        """
+        Return the last account inquiry in the session (from the credit app view) and its account number, or
+        ``(None, None)`` if there isn't one to update.
+        """
+        inquiry_id = request.session.get(INQUIRY_SESSION_KEY)
+        if not inquiry_id:
+            return None, None
+        try:
+            inquiry = AccountInquiryResult.objects.get(pk=inquiry_id)
+        except AccountInquiryResult.DoesNotExist:
+            return None, None
+        # Make sure we have an account number to work with
+        account_number = inquiry.account_number
+        if not account_number or account_number.startswith("xxxx"):
+            return None, None
+        return inquiry, account_number
+
+    def record_inquiry(self, request, inquiry, result):
         # Update the inquiry source to match the original inquiry
         result.credit_app_source = inquiry.credit_app_source
         result.prequal_response_source = inquiry.prequal_response_source
         result.save()
         # Update the session to have the new inquiry ID
         request.session[INQUIRY_SESSION_KEY] = result.pk
-        # Return the results
-        response_ser = AccountInquirySerializer(
-            instance=result, context={"request": request}
-        )
-        return Response(response_ser.data)
 
 
 class SubmitAccountInquiryView(generics.GenericAPIView):
@@ -222,6 +428,8 @@ class PreQualificationResumeView(generics.GenericAPIView):
 
 class PreQualificationRequestView(generics.GenericAPIView):
     serializer_class = PreQualificationRequestSerializer
+    # Whether the serializer can leave the Wells Fargo API call to a background task
+    supports_async = True
 
     def get(self, request):
         prequal_request_id = request.session.get(PREQUAL_SESSION_KEY)
@@ -232,6 +440,12 @@ class PreQualificationRequestView(generics.GenericAPIView):
                 request__id=prequal_request_id
             )
         except PreQualificationResponse.DoesNotExist:
+            # Check for a background pre-qualification check which hasn't finished (or has failed)
+            response = _task_status_response(
+                request, TASK_PREQUAL, prequal_request_id, "wfrs-api-prequal"
+            )
+            if response is not None:
+                return response
             return Response(status=status.HTTP_204_NO_CONTENT)
         response_ser = PreQualificationResponseSerializer(
             instance=prequal_response, context={"request": request}
@@ -243,6 +457,10 @@ class PreQualificationRequestView(generics.GenericAPIView):
             data=request.data, context={"request": request}
         )
         request_ser.is_valid(raise_exception=True)
+        if self.supports_async and WFRS_API_ASYNC["prequal"]:
+            prequal_request = request_ser.save(run_async=True)
+            request.session[PREQUAL_SESSION_KEY] = prequal_request.pk
+            return _task_pending_response(request, "wfrs-api-prequal")
         prequal_request = request_ser.save()
         try:
             prequal_response = prequal_request.response
@@ -257,6 +475,7 @@ class PreQualificationRequestView(generics.GenericAPIView):
 
 class PreQualificationSDKResponseView(PreQualificationRequestView):
     serializer_class = PreQualificationSDKResponseSerializer
+    supports_async = False
 
 
 class PreQualificationSDKApplicationResultView(generics.GenericAPIView):
@@ -347,3 +566,83 @@ class PreQualificationCustomerResponseView(views.APIView):
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data)
+
+
+# Asyncio versions of the views which call Wells Fargo, used instead of them when WFRS_API_ASYNCIO_VIEWS is
+# enabled. They await the gateway instead of blocking a thread on it, and otherwise behave the same.
+
+
+class AsyncCreditApplicationView(AsyncAPIView, CreditApplicationView):
+    async def get(self, request):
+        return await sync_to_async(super().get)(request)
+
+    async def post(self, request):
+        if WFRS_API_ASYNC["credit_app"]:
+            # The submission is left to a background task, so there's nothing to await
+            return await sync_to_async(super().post)(request)
+        request_ser = self.get_serializer_class()(
+            data=request.data, context={"request": request}
+        )
+        await sync_to_async(request_ser.is_valid)(raise_exception=True)
+        try:
+            result = await request_ser.asave()
+        except CreditApplicationPending as e:
+            request.session[INQUIRY_SESSION_KEY] = e.inquiry.pk
+            raise e
+        request.session[INQUIRY_SESSION_KEY] = result.pk
+        return Response(await self.serialize(AccountInquirySerializer, result))
+
+
+class AsyncUpdateAccountInquiryView(AsyncAPIView, UpdateAccountInquiryView):
+    async def post(self, request):
+        inquiry, account_number = await sync_to_async(self.get_previous_inquiry)(
+            request
+        )
+        if inquiry is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        request_ser = AccountInquirySerializer(
+            data={"account_number": account_number}, context={"request": request}
+        )
+        await sync_to_async(request_ser.is_valid)(raise_exception=True)
+        result = await request_ser.asave()
+        if result is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        await sync_to_async(self.record_inquiry)(request, inquiry, result)
+        return Response(await self.serialize(AccountInquirySerializer, result))
+
+
+class AsyncSubmitAccountInquiryView(AsyncAPIView, SubmitAccountInquiryView):
+    async def post(self, request):
+        request_ser = self.get_serializer_class()(
+            data=request.data, context={"request": request}
+        )
+        await sync_to_async(request_ser.is_valid)(raise_exception=True)
+        result = await request_ser.asave()
+        if result is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        request.session[INQUIRY_SESSION_KEY] = result.pk
+        return Response(await self.serialize(self.get_serializer_class(), result))
+
+
+class AsyncPreQualificationRequestView(AsyncAPIView, PreQualificationRequestView):
+    async def get(self, request):
+        return await sync_to_async(super().get)(request)
+
+    async def post(self, request):
+        if WFRS_API_ASYNC["prequal"]:
+            # The status check is left to a background task, so there's nothing to await
+            return await sync_to_async(super().post)(request)
+        request_ser = self.get_serializer_class()(
+            data=request.data, context={"request": request}
+        )
+        await sync_to_async(request_ser.is_valid)(raise_exception=True)
+        prequal_request = await request_ser.asave()
+        prequal_response = await PreQualificationResponse.objects.filter(
+            request=prequal_request
+        ).afirst()
+        if prequal_response is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        request.session[PREQUAL_SESSION_KEY] = prequal_request.pk
+        return Response(
+            await self.serialize(PreQualificationResponseSerializer, prequal_response)
+        )
@@ -0,0 +1,313 @@
+"""
+Building blocks for bulk jobs which call the WFRS Gateway for many rows at once.
+
+Jobs stream their input, and work through it one batch of rows at a time: the batch's gateway requests are
+sent from a pool of threads (which don't touch the database), at a limited rate, and then the outcomes are
+saved with a few bulk queries from the calling thread. Jobs subclass ``BatchJob``, which handles all of that
+but the work of each batch.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from django.core.exceptions import ValidationError
+from ..settings import WFRS_BATCH
+import abc
+import csv
+import itertools
+import json
+import os
+import threading
+import time
+
+
+class RateLimiter(object):
+    """
+    Spaces out calls of ``acquire`` (across all threads) so that no more than ``rate`` happen per second. A
+    ``rate`` of ``None`` doesn't limit anything.
+    """
+
+    def __init__(self, rate):
+        self.interval = (1.0 / rate) if rate else 0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(self._next, now) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def submit_concurrently(fn, items, concurrency=None, rate_limiter=None):
+    """
+    Call ``fn`` with each of the given items, from up to ``concurrency`` threads at once. Returns a list of
+    ``(result, exception)`` pairs, in the same order as the items.
+    """
+    if concurrency is None:
+        concurrency = WFRS_BATCH["concurrency"]
+
+    def call(item):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            return fn(item), None
+        except Exception as e:
+            return None, e
+
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(concurrency, len(items))),
+        thread_name_prefix="wfrs-batch",
+    ) as executor:
+        return list(executor.map(call, items))
+
+
+def iter_chunks(iterable, size):
+    """Yield lists of up to ``size`` items from the given iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_file_format(path, file_format=None):
+    """Return the format (``csv`` or ``jsonl``) of the given file, judging by its extension if not given"""
+    if file_format:
+        return file_format
+    if path.endswith(".csv"):
+        return "csv"
+    return "jsonl"
+
+
+def read_rows(path, file_format=None):
+    """
+    Stream the rows of a CSV (with a header row) or JSON-lines file, as dicts. Blank CSV cells are omitted,
+    so that they're treated as missing rather than as empty strings.
+    """
+    with open(path, newline="", encoding="utf-8") as infile:
+        if get_file_format(path, file_format) == "csv":
+            for row in csv.DictReader(infile):
+                yield {
+                    key: value for key, value in row.items() if value not in ("", None)
+                }
+        else:
+            for line in infile:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class ResultsWriter(object):
+    """
+    Appends result rows to a CSV or JSON-lines file. A CSV file's header row is only written if the file is
+    new, so that resumed jobs can append to the results of their earlier runs.
+    """
+
+    def __init__(self, path, fieldnames, file_format=None):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.file_format = get_file_format(path, file_format)
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        if self.file_format == "csv":
+            self._writer = csv.DictWriter(
+                self._file, fieldnames=fieldnames, extrasaction="ignore"
+            )
+            if is_new:
+                self._writer.writeheader()
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self.file_format == "csv":
+                self._writer.writerow(row)
+            else:
+                self._file.write(json.dumps(row, default=str, sort_keys=True) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Checkpoint(object):
+    """The progress of a job, saved as a JSON file. Saves replace the file atomically."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as infile:
+                return json.load(infile)
+        except FileNotFoundError:
+            return None
+
+    def save(self, state):
+        tmp_path = "%s.tmp" % self.path
+        with open(tmp_path, "w", encoding="utf-8") as outfile:
+            json.dump(state, outfile, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class BatchStats(object):
+    """Counts of a job's outcomes, and its throughput"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.counts = {}
+        self.rows = 0
+
+    def add(self, outcome, count=1):
+        self.counts[outcome] = self.counts.get(outcome, 0) + count
+        self.rows += count
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed
+        return (self.rows / elapsed) if elapsed else 0
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "counts": dict(sorted(self.counts.items())),
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 3),
+        }
+
+    def __str__(self):
+        counts = ", ".join("%s=%s" % item for item in sorted(self.counts.items()))
+        return "%s row(s) in %.1fs (%.1f/s): %s" % (
+            self.rows,
+            self.elapsed,
+            self.rows_per_second,
+            counts or "none",
+        )
+
+
+class BatchJob(abc.ABC):
+    """
+    Base class of the bulk jobs. Subclasses implement ``get_chunks``, which yields the job's rows a batch at a
+    time, and ``process_chunk``, which handles one batch and returns a result dict for each row. ``run``
+    writes the results to the results file (if there is one), and counts their outcomes.
+
+    Jobs are safe to resume by just running them again. Rows which are handled are either not selected again
+    (see ``iter_pages``), or are recognized from what was saved for them. Each row's gateway request is sent
+    with a ``client-request-id`` derived from the row, so a request which was sent but not saved by an
+    interrupted run is sent with the same ID again, and Wells Fargo can recognize it as a duplicate.
+    """
+
+    #: The gateway API client class, which is built with the job's user
+    client_class = None
+
+    #: The fields of the job's results, in the order they're written to a CSV results file
+    result_fields = ()
+
+    def __init__(
+        self,
+        user=None,
+        results_path=None,
+        results_format=None,
+        concurrency=None,
+        rate_limit=None,
+        batch_size=None,
+    ):
+        self.user = user
+        self.results_path = results_path
+        self.results_format = results_format
+        self.concurrency = concurrency or WFRS_BATCH["concurrency"]
+        self.rate_limiter = RateLimiter(
+            rate_limit if rate_limit is not None else WFRS_BATCH["rate_limit"]
+        )
+        self.batch_size = batch_size or WFRS_BATCH["batch_size"]
+        self.client = self.client_class(current_user=user)
+
+    def run(self, *args, on_results=None, progress=None):
+        """
+        Process each batch yielded by ``get_chunks(*args)``, and return the run's ``BatchStats``.
+        ``on_results`` is called with the results of each batch, and ``progress`` with the stats after each
+        batch.
+        """
+        self.prepare()
+        stats = BatchStats()
+        results = None
+        if self.results_path:
+            results = ResultsWriter(
+                self.results_path, self.result_fields, self.results_format
+            )
+        try:
+            for chunk in self.get_chunks(*args):
+                chunk_results = self.process_chunk(chunk)
+                if results is not None:
+                    results.write_rows(chunk_results)
+                if on_results is not None:
+                    on_results(chunk_results)
+                for result in chunk_results:
+                    stats.add(self.get_outcome(result))
+                if progress is not None:
+                    progress(stats)
+        finally:
+            if results is not None:
+                results.close()
+        return stats
+
+    def prepare(self):
+        """Called before the first batch is processed"""
+        # Get an API key up front, rather than having every thread try to at once
+        self.client.get_api_key()
+
+    @abc.abstractmethod
+    def get_chunks(self, *args):
+        pass
+
+    @abc.abstractmethod
+    def process_chunk(self, chunk):
+        pass
+
+    def iter_pages(self, queryset):
+        """
+        Yield the rows of the given queryset, a batch at a time. Pages are selected by ID, so that rows which
+        are still selected after being handled (like ones which failed) aren't selected again.
+        """
+        last_id = 0
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id)[: self.batch_size])
+            if not chunk:
+                return
+            last_id = chunk[-1].id
+            yield chunk
+
+    def submit(self, fn, items):
+        """Call ``fn`` with each of the given items, from the job's threads (see ``submit_concurrently``)"""
+        return submit_concurrently(
+            fn, items, concurrency=self.concurrency, rate_limiter=self.rate_limiter
+        )
+
+    def get_outcome(self, result):
+        """Return the outcome a result is counted as"""
+        return result["result"]
+
+    def get_error_message(self, error):
+        if isinstance(error, ValidationError):
+            return "; ".join(error.messages)
+        return "%s: %s" % (error.__class__.__name__, error)
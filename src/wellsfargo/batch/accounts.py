@@ -0,0 +1,136 @@
+"""
+Bulk account refreshes, for keeping the credit limits shown for credit applications (see
+``CreditApplication.get_credit_limit``) up to date.
+
+Each credit application's latest ``AccountInquiryResult`` which is older than a given age is looked up again
+by account number, and the new inquiry (and its addresses) are saved alongside it. Run it with the
+``wfrs_refresh_accounts`` management command.
+
+Refreshed accounts have a new inquiry, so they aren't selected again.
+"""
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from ..connector import AccountsAPIClient
+from ..models import APIMerchantNum, AccountInquiryResult, CreditApplicationAddress
+from ..security import decrypt_account_numbers
+from . import BatchJob
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESULT_REFRESHED = "refreshed"
+RESULT_NOT_FOUND = "not_found"
+RESULT_UNREADABLE = "unreadable"
+RESULT_ERROR = "error"
+
+RESULT_FIELDS = (
+    "inquiry_id",
+    "credit_app_id",
+    "result",
+    "message",
+)
+
+
+class AccountRefreshBatch(BatchJob):
+    client_class = AccountsAPIClient
+    result_fields = RESULT_FIELDS
+
+    def __init__(self, max_age, **kwargs):
+        super().__init__(**kwargs)
+        self.max_age = max_age
+
+    def get_queryset(self):
+        """Return each credit application's latest inquiry, if it's older than ``max_age``"""
+        newer = AccountInquiryResult.objects.filter(
+            Q(created_datetime__gt=OuterRef("created_datetime"))
+            | Q(created_datetime=OuterRef("created_datetime"), id__gt=OuterRef("id")),
+            credit_app_source=OuterRef("credit_app_source"),
+        )
+        return (
+            AccountInquiryResult.objects.filter(
+                credit_app_source__isnull=False,
+                encrypted_account_number__isnull=False,
+                created_datetime__lt=timezone.now() - self.max_age,
+            )
+            .filter(~Exists(newer))
+            .only(
+                "id",
+                "credit_app_source",
+                "prequal_response_source",
+                "encrypted_account_number",
+            )
+            .order_by("id")
+        )
+
+    def prepare(self):
+        self.creds = APIMerchantNum.get_for_user(self.user)
+        super().prepare()
+
+    def get_chunks(self):
+        return self.iter_pages(self.get_queryset())
+
+    def process_chunk(self, inquiries):
+        """Refresh the accounts of the given inquiries, and return a result for each of them"""
+        results = {}
+        pending = []
+        account_numbers = decrypt_account_numbers(
+            [inquiry.encrypted_account_number for inquiry in inquiries]
+        )
+        for inquiry, account_number in zip(inquiries, account_numbers):
+            if not account_number:
+                results[inquiry.id] = self.build_result(inquiry, RESULT_UNREADABLE)
+                continue
+            pending.append((inquiry, account_number))
+
+        lookups = self.submit(lambda item: self.lookup_account(item[1]), pending)
+        refreshed = []
+        for (inquiry, _), (result, error) in zip(pending, lookups):
+            if error is not None:
+                logger.warning(
+                    "Refresh of account inquiry %s failed: %s", inquiry.id, error
+                )
+                results[inquiry.id] = self.build_result(
+                    inquiry, RESULT_ERROR, message=self.get_error_message(error)
+                )
+                continue
+            if result is None:
+                results[inquiry.id] = self.build_result(inquiry, RESULT_NOT_FOUND)
+                continue
+            result.credit_app_source_id = inquiry.credit_app_source_id
+            result.prequal_response_source_id = inquiry.prequal_response_source_id
+            refreshed.append(result)
+            results[inquiry.id] = self.build_result(inquiry, RESULT_REFRESHED)
+        self.save_results(refreshed)
+        return [results[inquiry.id] for inquiry in inquiries]
+
+    def lookup_account(self, account_number):
+        """Look up an account, without touching the database. Returns an unsaved inquiry result, or ``None``."""
+        resp_data = self.client.send_account_lookup_request(
+            self.creds, transaction_code="C4", account_number=account_number
+        )
+        return self.client.build_account_lookup_response(resp_data)
+
+    def save_results(self, results):
+        addresses = [
+            address
+            for result in results
+            for address in (
+                result.main_applicant_address,
+                result.joint_applicant_address,
+            )
+            if address is not None
+        ]
+        with transaction.atomic():
+            CreditApplicationAddress.objects.bulk_create(addresses)
+            AccountInquiryResult.objects.bulk_create(results)
+
+    def build_result(self, inquiry, result, **fields):
+        return dict(
+            {field: None for field in RESULT_FIELDS},
+            inquiry_id=inquiry.pk,
+            credit_app_id=inquiry.credit_app_source_id,
+            result=result,
+            **fields
+        )
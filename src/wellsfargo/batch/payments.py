@@ -0,0 +1,105 @@
+"""
+Helpers shared by the bulk jobs which follow up authorizations with more transactions (charges and returns).
+
+Follow-up transfers share their authorization's merchant reference (which is also the reference of the
+authorization's Oscar payment transaction), and are sent with the merchant number of the authorization.
+"""
+
+from django.db import transaction
+from oscar.core.loading import get_model
+from ..models import APIMerchantNum, FinancingPlan, TransferMetadata
+
+Source = get_model("payment", "Source")
+Transaction = get_model("payment", "Transaction")
+
+
+def get_payment_sources(references):
+    """
+    Return the Oscar payment source of each of the given authorization references, using one query.
+    Authorizations of the same source share one instance of it, so that they share its balance.
+    """
+    transactions = Transaction.objects.filter(
+        reference__in=set(references),
+        txn_type=Transaction.AUTHORISE,
+        source__source_type__name="Wells Fargo",
+    ).select_related("source")
+    sources_by_id = {}
+    sources = {}
+    for txn in transactions:
+        source = sources_by_id.setdefault(txn.source_id, txn.source)
+        sources.setdefault(txn.reference, source)
+    return sources
+
+
+def get_merchant_credentials(auths):
+    """
+    Return the credentials for each of the given authorizations' merchant numbers, using one query.
+    Merchant numbers which are no longer configured get unsaved credentials, using the name they were
+    authorized with.
+    """
+    creds = {}
+    for merchant_creds in APIMerchantNum.objects.filter(
+        merchant_num__in={auth.merchant_num for auth in auths}
+    ):
+        creds.setdefault(merchant_creds.merchant_num, merchant_creds)
+    for auth in auths:
+        if auth.merchant_num not in creds:
+            creds[auth.merchant_num] = APIMerchantNum(
+                name=auth.merchant_name, merchant_num=auth.merchant_num
+            )
+    return creds
+
+
+def send_follow_up(client, creds, auth, trans_request, client_request_id):
+    """
+    Send a transaction following up the given authorization, without touching the database. Returns an
+    unsaved transfer for it, and the plan number it was made with. The transfer is recorded as made by the
+    request's user, or, without one, by the authorization's user.
+    """
+    resp_data = client.send_transaction_request(creds, trans_request, client_request_id)
+    plan_number = resp_data.get("plan_number", trans_request.plan_number)
+    plan = auth.financing_plan
+    if str(plan_number) != str(plan.plan_number):
+        # Found (or created) when the transfer is saved
+        plan = None
+    transfer = client.build_transfer(
+        creds, trans_request, client_request_id, resp_data, plan
+    )
+    transfer.merchant_reference = auth.merchant_reference
+    if trans_request.user is None:
+        transfer.user_id = auth.user_id
+    return transfer, plan_number
+
+
+def save_follow_ups(transfers, payments, txn_type, amount_field):
+    """
+    Save the given ``(transfer, plan number)`` pairs, and record each of the given ``(source, transfer)``
+    pairs as an Oscar payment transaction of the given type, adding its amount to the source's
+    ``amount_field``. Runs a few bulk queries, no matter how many transfers are given.
+    """
+    plans = {}
+    for transfer, plan_number in transfers:
+        if transfer.financing_plan is None:
+            if plan_number not in plans:
+                plans[plan_number], _ = FinancingPlan.objects.get_or_create(
+                    plan_number=plan_number
+                )
+            transfer.financing_plan = plans[plan_number]
+    sources = {}
+    payment_transactions = []
+    for source, transfer in payments:
+        setattr(source, amount_field, getattr(source, amount_field) + transfer.amount)
+        sources[source.pk] = source
+        payment_transactions.append(
+            Transaction(
+                source=source,
+                txn_type=txn_type,
+                amount=transfer.amount,
+                reference=transfer.merchant_reference,
+                status=transfer.status,
+            )
+        )
+    with transaction.atomic():
+        TransferMetadata.objects.bulk_create([transfer for transfer, _ in transfers])
+        Transaction.objects.bulk_create(payment_transactions)
+        Source.objects.bulk_update(sources.values(), [amount_field])
@@ -0,0 +1,181 @@
+"""
+Bulk merchant-initiated prescreens, for checking a marketing list of customers for pre-qualified offers.
+
+Customers are read from a CSV or JSON-lines file, with the same fields (and validation) as the
+pre-qualification API endpoint. Each valid row is prescreened with Wells Fargo, its ``PreQualificationRequest``
+and ``PreQualificationResponse`` are saved, and its outcome is appended to a results file. Run it with the
+``wfrs_prescreen_batch`` management command.
+
+Each row's request UUID (which is also its ``client-request-id``) is derived from the run's ID (kept in the
+checkpoint file) and the row's number, and rows which were already saved are skipped.
+
+Rows whose request failed (their result is ``error``) are saved without a response. Resuming the run reports
+them again, but doesn't retry them. To retry them, prescreen the rows with those row numbers again as a new
+run, with a new input file and results file.
+"""
+
+from django.db import transaction
+from ..api.serializers import PreQualificationRequestSerializer
+from ..connector import PrequalAPIClient
+from ..models import APIMerchantNum, PreQualificationRequest, PreQualificationResponse
+from . import BatchJob, Checkpoint, iter_chunks, read_rows
+import itertools
+import json
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+RESULT_PRESCREENED = "prescreened"
+RESULT_INVALID = "invalid"
+RESULT_ERROR = "error"
+
+RESULT_FIELDS = (
+    "row",
+    "uuid",
+    "result",
+    "status",
+    "credit_limit",
+    "response_id",
+    "application_url",
+    "message",
+)
+
+
+class PrescreenBatch(BatchJob):
+    client_class = PrequalAPIClient
+    result_fields = RESULT_FIELDS
+
+    def __init__(
+        self,
+        input_path,
+        results_path,
+        checkpoint_path=None,
+        input_format=None,
+        **kwargs
+    ):
+        super().__init__(results_path=results_path, **kwargs)
+        self.input_path = input_path
+        self.input_format = input_format
+        self.checkpoint = Checkpoint(checkpoint_path or "%s.checkpoint" % results_path)
+
+    def prepare(self):
+        self.state = self.checkpoint.load()
+        if self.state is None:
+            # Save the new run's ID before sending anything, so that if it's interrupted, its requests are
+            # sent again with the same IDs
+            self.state = {"run_id": uuid.uuid4().hex, "rows_done": 0}
+            self.checkpoint.save(self.state)
+        self.run_id = uuid.UUID(self.state["run_id"])
+        self.creds = APIMerchantNum.get_for_user(self.user)
+        super().prepare()
+
+    def get_chunks(self):
+        """
+        Yield the ``(row number, row)`` pairs of the input file not already handled by an earlier run, a batch
+        at a time. The run's progress is saved to the checkpoint file after each batch.
+        """
+        rows = enumerate(read_rows(self.input_path, self.input_format), start=1)
+        rows = itertools.islice(rows, self.state["rows_done"], None)
+        for chunk in iter_chunks(rows, self.batch_size):
+            yield chunk
+            self.state["rows_done"] = chunk[-1][0]
+            self.checkpoint.save(self.state)
+        self.state["complete"] = True
+        self.checkpoint.save(self.state)
+
+    def get_outcome(self, result):
+        return result["status"] or result["result"]
+
+    def get_request_uuid(self, row_number):
+        return uuid.uuid5(self.run_id, str(row_number))
+
+    def process_chunk(self, chunk):
+        """Prescreen the given ``(row number, row)`` pairs, and return a result for each of them"""
+        results = {}
+        pending = []
+        for row_number, row in chunk:
+            prequal_request, errors = self.build_prequal_request(row_number, row)
+            if errors:
+                results[row_number] = self.build_result(
+                    row_number, None, RESULT_INVALID, message=json.dumps(errors)
+                )
+                continue
+            request_data = self.client.build_prescreen_request_data(
+                self.creds, prequal_request
+            )
+            pending.append((row_number, prequal_request, request_data))
+
+        # Skip rows which were saved by an interrupted run
+        saved = {
+            r.uuid: r
+            for r in PreQualificationRequest.objects.filter(
+                uuid__in=[r.uuid for _, r, _ in pending]
+            ).select_related("response")
+        }
+        for row_number, prequal_request, _ in pending:
+            if prequal_request.uuid in saved:
+                results[row_number] = self.build_request_result(
+                    row_number, saved[prequal_request.uuid]
+                )
+        pending = [p for p in pending if p[1].uuid not in saved]
+
+        outcomes = self.submit(
+            lambda item: self.client.send_prescreen_request(item[1], item[2]), pending
+        )
+        responses = []
+        for (row_number, prequal_request, _), (resp_data, error) in zip(
+            pending, outcomes
+        ):
+            if error is not None:
+                logger.warning("Prescreen of row %s failed: %s", row_number, error)
+                results[row_number] = self.build_result(
+                    row_number,
+                    prequal_request,
+                    RESULT_ERROR,
+                    message=self.get_error_message(error),
+                )
+                continue
+            response = self.client.build_prescreen_response(prequal_request, resp_data)
+            responses.append(response)
+            results[row_number] = self.build_response_result(row_number, response)
+        with transaction.atomic():
+            PreQualificationRequest.objects.bulk_create([r for _, r, _ in pending])
+            PreQualificationResponse.objects.bulk_create(responses)
+        return [results[row_number] for row_number, _ in chunk]
+
+    def build_prequal_request(self, row_number, row):
+        """Validate a row, and return an (unsaved) request for it and any validation errors"""
+        serializer = PreQualificationRequestSerializer(data=row)
+        if not serializer.is_valid():
+            return None, serializer.errors
+        prequal_request = PreQualificationRequest(**serializer.validated_data)
+        prequal_request.uuid = self.get_request_uuid(row_number)
+        return prequal_request, None
+
+    def build_request_result(self, row_number, prequal_request):
+        response = getattr(prequal_request, "response", None)
+        if response is None:
+            return self.build_result(row_number, prequal_request, RESULT_ERROR)
+        return self.build_response_result(row_number, response)
+
+    def build_response_result(self, row_number, response):
+        return self.build_result(
+            row_number,
+            response.request,
+            RESULT_PRESCREENED,
+            status=response.status,
+            credit_limit=response.credit_limit,
+            response_id=response.response_id,
+            application_url=response.application_url,
+            message=response.message,
+        )
+
+    def build_result(self, row_number, prequal_request, result, **fields):
+        return dict(
+            {field: None for field in RESULT_FIELDS},
+            row=row_number,
+            uuid=str(prequal_request.uuid) if prequal_request else None,
+            result=result,
+            **fields
+        )
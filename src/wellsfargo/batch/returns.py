@@ -0,0 +1,303 @@
+"""
+Bulk returns (refunds) of orders paid for with Wells Fargo financing.
+
+Each item names an order (by its number) or an authorization (by its merchant reference), and optionally the
+amount to return. Without an amount, whatever hasn't been returned yet is. An order's amount is returned from
+each of its approved authorizations in turn. Each return is saved as a ``TransferMetadata`` with the return's
+type code and the authorization's merchant reference, and as made by the job's user (or, without one, by the
+authorization's user). Approved returns are also recorded as refunds of the order's payment source, which
+share the transfer's reference. Run it with the ``wfrs_bulk_return`` management command, or from the dashboard.
+
+Each return's ``client-request-id`` is derived from its authorization, the number of returns already saved
+for it, and the amount.
+"""
+
+from decimal import Decimal, InvalidOperation
+from django.db.models import Count, DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from oscar.core.loading import get_model
+from ..connector import TransactionsAPIClient
+from ..core.constants import TRANS_APPROVED, TRANS_TYPE_AUTH, TRANS_TYPE_RETURN_CREDIT
+from ..core.structures import TransactionRequest
+from ..models import TransferMetadata
+from ..security import decrypt_account_numbers
+from . import BatchJob, iter_chunks
+from .payments import (
+    get_merchant_credentials,
+    get_payment_sources,
+    save_follow_ups,
+    send_follow_up,
+)
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+Transaction = get_model("payment", "Transaction")
+
+# Namespace of the (UUID5) client request IDs of returns, which are named after their authorization
+RETURNS_NAMESPACE = uuid.UUID("0e6f3b9d-2c4a-4f15-8d7e-6a2b9c1e5f38")
+
+RESULT_RETURNED = "returned"
+RESULT_DECLINED = "declined"
+RESULT_NOT_FOUND = "not_found"
+RESULT_NOTHING_TO_RETURN = "nothing_to_return"
+RESULT_INVALID = "invalid"
+RESULT_UNREADABLE = "unreadable"
+RESULT_ERROR = "error"
+
+RESULT_FIELDS = (
+    "order",
+    "order_number",
+    "transfer_id",
+    "merchant_reference",
+    "amount",
+    "client_request_id",
+    "result",
+    "status",
+    "message",
+)
+
+
+def parse_amount(amount):
+    """
+    Return the given amount to return, as a Decimal rounded to cents, or ``None`` if it's blank. Raises
+    ``ValueError`` if it isn't a positive number.
+    """
+    if amount in (None, ""):
+        return None
+    try:
+        value = Decimal(str(amount)).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError("Invalid amount: %s" % amount)
+    # Check for NaN first, since comparing it raises InvalidOperation
+    if not value.is_finite() or value <= 0:
+        raise ValueError("Invalid amount: %s" % amount)
+    return value
+
+
+class ReturnBatch(BatchJob):
+    client_class = TransactionsAPIClient
+    result_fields = RESULT_FIELDS
+
+    def get_chunks(self, items):
+        """
+        Yield the given items (dicts with an ``order``, and optionally an ``amount``) a batch at a time. Items
+        can be any iterable, and are only read a batch at a time.
+        """
+        return iter_chunks(items, self.batch_size)
+
+    def get_authorizations(self, identifiers):
+        """
+        Return the approved authorizations of the given order numbers and merchant references, annotated with
+        their order's number, and the returns already saved for them, using one query.
+        """
+        authorized = Transaction.objects.filter(
+            txn_type=Transaction.AUTHORISE,
+            source__source_type__name="Wells Fargo",
+        )
+        returns = (
+            TransferMetadata.objects.filter(
+                merchant_reference=OuterRef("merchant_reference"),
+                type_code=TRANS_TYPE_RETURN_CREDIT,
+            )
+            .order_by()
+            .values("merchant_reference")
+        )
+        return (
+            TransferMetadata.objects.filter(
+                Q(merchant_reference__in=identifiers)
+                | Q(
+                    merchant_reference__in=authorized.filter(
+                        source__order__number__in=identifiers
+                    ).values("reference")
+                ),
+                type_code=TRANS_TYPE_AUTH,
+                status=TRANS_APPROVED,
+                financing_plan__isnull=False,
+            )
+            .annotate(
+                order_number=Subquery(
+                    authorized.filter(reference=OuterRef("merchant_reference")).values(
+                        "source__order__number"
+                    )[:1]
+                ),
+                amount_returned=Coalesce(
+                    Subquery(
+                        returns.filter(status=TRANS_APPROVED)
+                        .annotate(total=Sum("amount"))
+                        .values("total")
+                    ),
+                    Value(Decimal("0.00")),
+                    output_field=DecimalField(),
+                ),
+                returns_saved=Coalesce(
+                    Subquery(returns.annotate(count=Count("id")).values("count")),
+                    Value(0),
+                ),
+            )
+            .select_related("financing_plan")
+            .order_by("id")
+        )
+
+    def process_chunk(self, items):
+        """Return the given items, and return a list of results (one or more for each item)"""
+        identifiers = {str(item.get("order", "")).strip() for item in items}
+        auths = list(self.get_authorizations(identifiers - {""}))
+        auths_by_identifier = {}
+        for auth in auths:
+            auths_by_identifier.setdefault(auth.merchant_reference, []).append(auth)
+            if auth.order_number and auth.order_number != auth.merchant_reference:
+                auths_by_identifier.setdefault(auth.order_number, []).append(auth)
+        account_numbers = dict(
+            zip(
+                [auth.pk for auth in auths],
+                decrypt_account_numbers(
+                    [auth.encrypted_account_number for auth in auths]
+                ),
+            )
+        )
+
+        # Work out what to return from each authorization
+        results = [[] for item in items]
+        returnable = {auth.pk: auth.amount - auth.amount_returned for auth in auths}
+        returns_saved = {auth.pk: auth.returns_saved for auth in auths}
+        pending = []
+        for i, item in enumerate(items):
+            identifier = str(item.get("order", "")).strip()
+            try:
+                amount = self.get_amount(item)
+            except ValueError as e:
+                results[i].append(
+                    self.build_result(item, None, RESULT_INVALID, message=str(e))
+                )
+                continue
+            item_auths = auths_by_identifier.get(identifier)
+            if not item_auths:
+                results[i].append(
+                    self.build_result(
+                        item,
+                        None,
+                        RESULT_NOT_FOUND,
+                        message="No approved authorization found",
+                    )
+                )
+                continue
+            queued = False
+            for auth in item_auths:
+                portion = returnable[auth.pk]
+                if amount is not None:
+                    portion = min(portion, amount)
+                if portion <= 0:
+                    continue
+                if not account_numbers[auth.pk]:
+                    results[i].append(
+                        self.build_result(item, auth, RESULT_UNREADABLE, amount=portion)
+                    )
+                    continue
+                client_request_id = self.get_client_request_id(
+                    auth, returns_saved[auth.pk], portion
+                )
+                returnable[auth.pk] -= portion
+                returns_saved[auth.pk] += 1
+                if amount is not None:
+                    amount -= portion
+                trans_request = self.build_trans_request(
+                    auth, account_numbers[auth.pk], portion
+                )
+                pending.append((i, item, auth, trans_request, client_request_id))
+                queued = True
+            if not results[i] and not queued:
+                results[i].append(
+                    self.build_result(
+                        item,
+                        None,
+                        RESULT_NOTHING_TO_RETURN,
+                        message="Nothing left to return",
+                    )
+                )
+
+        creds = get_merchant_credentials([p[2] for p in pending])
+        outcomes = self.submit(
+            lambda p: send_follow_up(
+                self.client, creds[p[2].merchant_num], p[2], p[3], p[4]
+            ),
+            pending,
+        )
+        sources = get_payment_sources(p[2].merchant_reference for p in pending)
+        transfers = []
+        refunds = []
+        for (i, item, auth, trans_request, client_request_id), (outcome, error) in zip(
+            pending, outcomes
+        ):
+            fields = {
+                "amount": trans_request.amount,
+                "client_request_id": client_request_id,
+            }
+            if error is not None:
+                logger.warning("Return of transfer %s failed: %s", auth.pk, error)
+                results[i].append(
+                    self.build_result(
+                        item,
+                        auth,
+                        RESULT_ERROR,
+                        message=self.get_error_message(error),
+                        **fields
+                    )
+                )
+                continue
+            transfer, plan_number = outcome
+            transfers.append((transfer, plan_number))
+            if transfer.status == TRANS_APPROVED:
+                result = RESULT_RETURNED
+                source = sources.get(auth.merchant_reference)
+                if source is not None:
+                    refunds.append((source, transfer))
+            else:
+                result = RESULT_DECLINED
+            results[i].append(
+                self.build_result(
+                    item,
+                    auth,
+                    result,
+                    status=transfer.status,
+                    message=transfer.message,
+                    **fields
+                )
+            )
+        save_follow_ups(transfers, refunds, Transaction.REFUND, "amount_refunded")
+        return [result for item_results in results for result in item_results]
+
+    def get_amount(self, item):
+        return parse_amount(item.get("amount"))
+
+    def get_client_request_id(self, auth, returns_saved, amount):
+        return uuid.uuid5(
+            RETURNS_NAMESPACE,
+            "%s:%s:%s:%s" % (auth.merchant_reference, auth.pk, returns_saved, amount),
+        )
+
+    def build_trans_request(self, auth, account_number, amount):
+        trans_request = TransactionRequest()
+        trans_request.type_code = TRANS_TYPE_RETURN_CREDIT
+        trans_request.user = self.user
+        trans_request.account_number = account_number
+        trans_request.plan_number = auth.financing_plan.plan_number
+        trans_request.amount = amount
+        trans_request.ticket_number = auth.ticket_number
+        return trans_request
+
+    def build_result(self, item, auth, result, **fields):
+        fields = {
+            key: (str(value) if value is not None else None)
+            for key, value in fields.items()
+        }
+        return dict(
+            {field: None for field in RESULT_FIELDS},
+            order=item.get("order"),
+            order_number=auth.order_number if auth else None,
+            transfer_id=auth.pk if auth else None,
+            merchant_reference=auth.merchant_reference if auth else None,
+            result=result,
+            **fields
+        )
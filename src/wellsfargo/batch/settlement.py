@@ -0,0 +1,197 @@
+"""
+Bulk settlement, which charges (captures) approved authorizations.
+
+An authorization is due for capture once it's older than a given age, if it hasn't been charged yet, and if
+its Oscar payment source still has the amount allocated (so that voided payments aren't charged). Each one is
+charged with the merchant number it was authorized with, and the outcome is saved as a ``TransferMetadata``
+with the charge's type code and the authorization's merchant reference. Approved charges are also recorded as
+debits of the order's payment source. Run it with the ``wfrs_settle_transfers`` management command.
+
+Charged (or declined) authorizations aren't selected again, and each charge's ``client-request-id`` is
+derived from its authorization.
+"""
+
+from datetime import timedelta
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from oscar.core.loading import get_model
+from ..connector import TransactionsAPIClient
+from ..core.constants import TRANS_APPROVED, TRANS_TYPE_AUTH, TRANS_TYPE_CHARGE
+from ..core.structures import TransactionRequest
+from ..models import TransferMetadata
+from ..security import decrypt_account_numbers
+from ..settings import WFRS_BATCH
+from . import BatchJob
+from .payments import (
+    get_merchant_credentials,
+    get_payment_sources,
+    save_follow_ups,
+    send_follow_up,
+)
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+Transaction = get_model("payment", "Transaction")
+
+# Namespace of the (UUID5) client request IDs of charges, which are named after their authorization
+SETTLEMENT_NAMESPACE = uuid.UUID("5b0e3c2a-8f0d-4b7e-9a61-3f1d2c7e4a90")
+
+RESULT_CHARGED = "charged"
+RESULT_DECLINED = "declined"
+RESULT_DRY_RUN = "would_charge"
+RESULT_SKIPPED = "skipped"
+RESULT_UNREADABLE = "unreadable"
+RESULT_ERROR = "error"
+
+RESULT_FIELDS = (
+    "transfer_id",
+    "merchant_reference",
+    "merchant_num",
+    "amount",
+    "client_request_id",
+    "result",
+    "status",
+    "message",
+)
+
+
+class SettlementBatch(BatchJob):
+    client_class = TransactionsAPIClient
+    result_fields = RESULT_FIELDS
+
+    def __init__(self, min_age=None, dry_run=False, **kwargs):
+        super().__init__(**kwargs)
+        if min_age is None:
+            min_age = timedelta(hours=WFRS_BATCH["settle_after_hours"])
+        self.min_age = min_age
+        self.dry_run = dry_run
+
+    def get_queryset(self):
+        """Return the approved authorizations which are old enough, and haven't been charged"""
+        charges = TransferMetadata.objects.filter(
+            merchant_reference=OuterRef("merchant_reference"),
+            type_code=TRANS_TYPE_CHARGE,
+        )
+        return (
+            TransferMetadata.objects.filter(
+                type_code=TRANS_TYPE_AUTH,
+                status=TRANS_APPROVED,
+                merchant_reference__isnull=False,
+                financing_plan__isnull=False,
+                encrypted_account_number__isnull=False,
+                created_datetime__lt=timezone.now() - self.min_age,
+            )
+            .filter(~Exists(charges))
+            .select_related("financing_plan")
+            .order_by("id")
+        )
+
+    def prepare(self):
+        # Dry runs don't call the gateway
+        if not self.dry_run:
+            super().prepare()
+
+    def get_chunks(self):
+        return self.iter_pages(self.get_queryset())
+
+    def get_client_request_id(self, auth):
+        return uuid.uuid5(
+            SETTLEMENT_NAMESPACE, "%s:%s" % (auth.merchant_reference, auth.pk)
+        )
+
+    def process_chunk(self, auths):
+        """Charge the given authorizations, and return a result for each of them"""
+        results = {}
+        sources = get_payment_sources(auth.merchant_reference for auth in auths)
+        available = {source.pk: source.balance for source in sources.values()}
+        charges = []
+        for auth, account_number in zip(
+            auths,
+            decrypt_account_numbers([auth.encrypted_account_number for auth in auths]),
+        ):
+            source = sources.get(auth.merchant_reference)
+            if source is None or available[source.pk] < auth.amount:
+                results[auth.pk] = self.build_result(
+                    auth,
+                    RESULT_SKIPPED,
+                    message="No payment source with the amount allocated",
+                )
+                continue
+            if not account_number:
+                results[auth.pk] = self.build_result(auth, RESULT_UNREADABLE)
+                continue
+            available[source.pk] -= auth.amount
+            charges.append(
+                (auth, source, self.build_trans_request(auth, account_number))
+            )
+
+        if self.dry_run:
+            for auth, _, _ in charges:
+                results[auth.pk] = self.build_result(auth, RESULT_DRY_RUN)
+            return [results[auth.pk] for auth in auths]
+
+        creds = get_merchant_credentials(auths)
+        outcomes = self.submit(
+            lambda item: self.charge(creds[item[0].merchant_num], item[0], item[2]),
+            charges,
+        )
+        transfers = []
+        debits = []
+        for (auth, source, _), (outcome, error) in zip(charges, outcomes):
+            if error is not None:
+                logger.warning("Charge of transfer %s failed: %s", auth.pk, error)
+                results[auth.pk] = self.build_result(
+                    auth,
+                    RESULT_ERROR,
+                    message=self.get_error_message(error),
+                )
+                continue
+            transfer, plan_number = outcome
+            transfers.append((transfer, plan_number))
+            if transfer.status == TRANS_APPROVED:
+                debits.append((source, transfer))
+                result = RESULT_CHARGED
+            else:
+                result = RESULT_DECLINED
+            results[auth.pk] = self.build_result(
+                auth, result, status=transfer.status, message=transfer.message
+            )
+        save_follow_ups(transfers, debits, Transaction.DEBIT, "amount_debited")
+        return [results[auth.pk] for auth in auths]
+
+    def build_trans_request(self, auth, account_number):
+        trans_request = TransactionRequest()
+        trans_request.type_code = TRANS_TYPE_CHARGE
+        trans_request.auth_number = auth.auth_number
+        trans_request.account_number = account_number
+        trans_request.plan_number = auth.financing_plan.plan_number
+        trans_request.amount = auth.amount
+        trans_request.ticket_number = auth.ticket_number
+        return trans_request
+
+    def charge(self, creds, auth, trans_request):
+        """
+        Send a charge, without touching the database. Returns an unsaved transfer for it, and the plan number
+        it was made with.
+        """
+        return send_follow_up(
+            self.client,
+            creds,
+            auth,
+            trans_request,
+            self.get_client_request_id(auth),
+        )
+
+    def build_result(self, auth, result, **fields):
+        return dict(
+            {field: None for field in RESULT_FIELDS},
+            transfer_id=auth.pk,
+            merchant_reference=auth.merchant_reference,
+            merchant_num=auth.merchant_num,
+            amount=str(auth.amount),
+            client_request_id=str(self.get_client_request_id(auth)),
+            result=result,
+            **fields
+        )
@@ -0,0 +1,434 @@
+"""
+An end-to-end benchmark of checking out with the Wells Fargo payment method.
+
+Each checkout runs ``WellsFargo.record_payment`` for a freshly placed order: the fraud screen, payment source
+creation, the authorization request to the gateway, ``TransferMetadata`` persistence (including encryption of
+the account number), and the payment events. The gateway is a local stand-in (see :mod:`wellsfargo.standin`),
+and the fraud screen is the dummy screen, optionally slowed down, so results only reflect this code and the
+database. Run it with the ``wfrs_benchmark_checkout`` management command.
+"""
+
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from oscar.core.loading import get_model
+from .connector.client import WFRSGatewayAPIClient
+from .fraud.dummy import DummyFraudProtection
+from .methods import WellsFargo
+from .models import APIMerchantNum, FinancingPlan
+from .querybudgets import QUERY_BUDGETS
+from .settings import WFRS_FRAUD_PROTECTION
+from .standin import (
+    LatencyDistribution,
+    StandInConfig,
+    build_ssl_context,
+    generate_self_signed_cert,
+    start_standin,
+)
+import django
+import os
+import platform
+import queue
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+
+Order = get_model("order", "Order")
+Line = get_model("order", "Line")
+
+# Metrics which regress when they grow, and those which regress when they shrink
+LOWER_IS_BETTER = (
+    ("latency_ms", "p50"),
+    ("latency_ms", "p95"),
+    ("latency_ms", "p99"),
+    ("allocations", "peak_kib"),
+)
+HIGHER_IS_BETTER = (("throughput", "checkouts_per_second"),)
+
+# Query budget (in ``wellsfargo.querybudgets``) of a checkout
+QUERY_BUDGET_NAME = "payment-method:record-payment"
+
+# Account numbers which the stand-in approves and declines
+APPROVED_ACCOUNT_NUMBER = "9999999999991234"
+DECLINED_ACCOUNT_NUMBER = "9999999999990000"
+
+
+class BenchmarkFraudProtection(DummyFraudProtection):
+    """
+    The dummy fraud screen, with an optional simulated round trip to the fraud backend. A screener is built for
+    every checkout, so latencies are drawn from ``rng``, which the benchmark shares between all of them.
+    """
+
+    SCREEN_TYPE_NAME = "Benchmark"
+
+    # Checkouts run in several threads at once
+    _rng_lock = threading.Lock()
+
+    def __init__(self, latency=None, rng=None, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = LatencyDistribution.parse(latency) if latency else None
+        self.rng = rng if rng is not None else random
+
+    def screen_transaction(self, request, order):
+        if self.latency is not None:
+            with self._rng_lock:
+                latency = self.latency.sample(self.rng)
+            time.sleep(latency)
+        return super().screen_transaction(request, order)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class CheckoutBenchmark:
+    def __init__(
+        self,
+        checkouts=200,
+        concurrency=8,
+        warmup=10,
+        allocation_samples=20,
+        gateway_latency=None,
+        fraud_latency=None,
+        decline_rate=0,
+        gateway_host=None,
+        seed=0,
+    ):
+        self.checkouts = checkouts
+        self.concurrency = concurrency
+        self.warmup = warmup
+        self.allocation_samples = allocation_samples
+        self.gateway_latency = gateway_latency
+        self.fraud_latency = fraud_latency
+        self.decline_rate = decline_rate
+        self.gateway_host = gateway_host
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    @property
+    def config(self):
+        return {
+            "checkouts": self.checkouts,
+            "concurrency": self.concurrency,
+            "warmup": self.warmup,
+            "allocation_samples": self.allocation_samples,
+            "gateway_latency": self.gateway_latency,
+            "fraud_latency": self.fraud_latency,
+            "decline_rate": self.decline_rate,
+            "seed": self.seed,
+        }
+
+    def run(self):
+        """Run the benchmark against the default database, and return its results"""
+        self.user, self.plan = self._create_fixtures()
+        orders = self._place_orders(
+            self.warmup + self.checkouts + self.allocation_samples
+        )
+        warmup_orders = orders[: self.warmup]
+        timed_orders = orders[self.warmup : self.warmup + self.checkouts]
+        allocation_orders = orders[self.warmup + self.checkouts :]
+        with self._gateway(), self._fraud_protection():
+            for order in warmup_orders:
+                self.checkout(order)
+            started = time.perf_counter()
+            samples = self._run_concurrently(timed_orders)
+            elapsed = time.perf_counter() - started
+            allocations = self._measure_allocations(allocation_orders)
+        return self._summarize(samples, elapsed, allocations)
+
+    def checkout(self, order):
+        """Record a Wells Fargo payment for the given order, and return the resulting payment state"""
+        request = RequestFactory().post("/api/checkout/")
+        request.user = self.user
+        return WellsFargo().record_payment(
+            request,
+            order,
+            WellsFargo.code,
+            amount=order.total_incl_tax,
+            account_number=order._benchmark_account_number,
+            financing_plan=self.plan,
+        )
+
+    def _create_fixtures(self):
+        user = get_user_model().objects.create_user(
+            username="wfrs-benchmark-%s" % uuid.uuid4().hex[:8]
+        )
+        plan, _ = FinancingPlan.objects.get_or_create(
+            plan_number=1001,
+            defaults={
+                "description": "Benchmark plan",
+                "apr": Decimal("9.99"),
+                "term_months": 24,
+            },
+        )
+        if not APIMerchantNum.objects.filter(user_group=None).exists():
+            APIMerchantNum.objects.create(
+                name="Benchmark", merchant_num="1111111111111111"
+            )
+        return user, plan
+
+    def _place_orders(self, count):
+        # Orders are bulk created, since placing them isn't what's being measured. This also skips the
+        # ``post_save`` signal handlers of other apps, which could otherwise queue work for every order.
+        prefix = uuid.uuid4().hex[:8]
+        totals = [Decimal(self.rng.randint(10000, 500000)) / 100 for i in range(count)]
+        orders = Order.objects.bulk_create(
+            Order(
+                number="BENCH-%s-%06d" % (prefix, i),
+                user=self.user,
+                currency="USD",
+                total_incl_tax=total,
+                total_excl_tax=total,
+                status="Pending",
+                date_placed=timezone.now(),
+            )
+            for i, total in enumerate(totals)
+        )
+        Line.objects.bulk_create(
+            Line(
+                order=order,
+                partner_name="Benchmark",
+                partner_sku="BENCH-%06d" % i,
+                title="Benchmark product",
+                quantity=1,
+                line_price_incl_tax=order.total_incl_tax,
+                line_price_excl_tax=order.total_excl_tax,
+                line_price_before_discounts_incl_tax=order.total_incl_tax,
+                line_price_before_discounts_excl_tax=order.total_excl_tax,
+            )
+            for i, order in enumerate(orders)
+        )
+        for order in orders:
+            declined = self.rng.random() < self.decline_rate
+            order._benchmark_account_number = (
+                DECLINED_ACCOUNT_NUMBER if declined else APPROVED_ACCOUNT_NUMBER
+            )
+        return orders
+
+    def _run_concurrently(self, orders):
+        pending = queue.Queue()
+        for order in orders:
+            pending.put(order)
+        samples = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            connection = connections[DEFAULT_DB_ALIAS]
+            try:
+                while True:
+                    try:
+                        order = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        state = self.checkout(order)
+                        duration = time.perf_counter() - started
+                    with lock:
+                        samples.append(
+                            (duration, len(queries), state.__class__.__name__)
+                        )
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, name="wfrs-benchmark-%s" % i)
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return samples
+
+    def _measure_allocations(self, orders):
+        # Allocations are traced separately (and serially), since tracing slows everything down and is process-wide.
+        peaks = []
+        retained = []
+        tracemalloc.start()
+        try:
+            for order in orders:
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                self.checkout(order)
+                after, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(after - before)
+        finally:
+            tracemalloc.stop()
+        return peaks, retained
+
+    def _summarize(self, samples, elapsed, allocations):
+        durations = sorted(duration * 1000 for duration, _, _ in samples)
+        query_counts = [count for _, count, _ in samples]
+        outcomes = {}
+        for _, _, outcome in samples:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        peaks, retained = allocations
+        results = {
+            "benchmark": "checkout",
+            "config": self.config,
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connections[DEFAULT_DB_ALIAS].vendor,
+            },
+            "throughput": {
+                "checkouts_per_second": round(len(samples) / elapsed, 2),
+            },
+            "latency_ms": {
+                "mean": round(statistics.mean(durations), 2),
+                "p50": round(percentile(durations, 50), 2),
+                "p95": round(percentile(durations, 95), 2),
+                "p99": round(percentile(durations, 99), 2),
+                "max": round(durations[-1], 2),
+            },
+            "queries": {
+                "mean": round(statistics.mean(query_counts), 2),
+                "max": max(query_counts),
+            },
+            "outcomes": outcomes,
+        }
+        if peaks:
+            results["allocations"] = {
+                "peak_kib": round(statistics.median(peaks) / 1024, 1),
+                "retained_kib": round(statistics.median(retained) / 1024, 1),
+            }
+        return results
+
+    def _gateway(self):
+        return _StandInGateway(self.gateway_host, self.gateway_latency, self.seed)
+
+    def _fraud_protection(self):
+        return _FraudProtectionOverride(self.fraud_latency, self.seed)
+
+
+class _StandInGateway:
+    """Point the gateway clients at a stand-in, starting one in this process if no host is given"""
+
+    def __init__(self, host, latency, seed):
+        self.host = host
+        self.latency = latency
+        self.seed = seed
+        self.server = None
+        self.cert_dir = None
+
+    def __enter__(self):
+        self.original_host = WFRSGatewayAPIClient.__dict__["api_host"]
+        self.original_ca_bundle = os.environ.get("REQUESTS_CA_BUNDLE")
+        host = self.host
+        if host is None:
+            self.cert_dir = tempfile.mkdtemp(prefix="wfrs-benchmark-")
+            cert_path, key_path = generate_self_signed_cert(self.cert_dir)
+            config = StandInConfig(
+                latency=(
+                    LatencyDistribution.parse(self.latency) if self.latency else None
+                ),
+                seed=self.seed,
+            )
+            self.server = start_standin(
+                config=config, ssl_context=build_ssl_context(cert_path, key_path)
+            )
+            os.environ["REQUESTS_CA_BUNDLE"] = cert_path
+            host = self.server.url
+        WFRSGatewayAPIClient.api_host = host
+        return self
+
+    def __exit__(self, *args):
+        WFRSGatewayAPIClient.api_host = self.original_host
+        if self.server is not None:
+            if self.original_ca_bundle is None:
+                os.environ.pop("REQUESTS_CA_BUNDLE", None)
+            else:
+                os.environ["REQUESTS_CA_BUNDLE"] = self.original_ca_bundle
+            self.server.shutdown()
+            self.server.server_close()
+            shutil.rmtree(self.cert_dir)
+
+
+class _FraudProtectionOverride:
+    def __init__(self, latency, seed):
+        # One RNG for the whole run, so that every checkout gets the next draw from the latency distribution
+        self.kwargs = {"latency": latency, "rng": random.Random(seed)}
+
+    def __enter__(self):
+        self.original = dict(WFRS_FRAUD_PROTECTION)
+        WFRS_FRAUD_PROTECTION.update(
+            fraud_protection="wellsfargo.benchmark.BenchmarkFraudProtection",
+            fraud_protection_kwargs=self.kwargs,
+        )
+        return self
+
+    def __exit__(self, *args):
+        WFRS_FRAUD_PROTECTION.clear()
+        WFRS_FRAUD_PROTECTION.update(self.original)
+
+
+def get_query_budget():
+    """Return the number of queries a checkout may run: the payment method's query budget"""
+    return QUERY_BUDGETS[QUERY_BUDGET_NAME]
+
+
+def compare_to_baseline(results, baseline):
+    """Return a list of descriptions of how the timings and allocations of the results differ from a baseline"""
+    changes = []
+    for section, metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+        old = baseline.get(section, {}).get(metric)
+        new = results.get(section, {}).get(metric)
+        if old and new is not None:
+            changes.append(
+                "%s.%s: %s -> %s (%+.1f%%)"
+                % (section, metric, old, new, (new - old) * 100 / old)
+            )
+    return changes
+
+
+def find_regressions(results, baseline=None, tolerance=None):
+    """
+    Return a list of descriptions of the regressions in the given benchmark results. Query counts are
+    deterministic, so a checkout which runs more queries than its budget (see ``get_query_budget``) is a
+    regression. Timings and allocations depend on the machine the benchmark runs on, so they're only compared
+    to the baseline when a ``tolerance`` (a fraction of the baseline value) is given. Only do that with a
+    baseline recorded on the same machine.
+    """
+    regressions = []
+    budget = get_query_budget()
+    if results["queries"]["max"] > budget:
+        regressions.append(
+            "queries.max of %s exceeds the budget of %s"
+            % (results["queries"]["max"], budget)
+        )
+    if baseline is None or tolerance is None:
+        return regressions
+    if results["config"] != baseline["config"]:
+        raise ValueError(
+            "The baseline was recorded with a different benchmark configuration: %s"
+            % baseline["config"]
+        )
+    for section, metric in LOWER_IS_BETTER:
+        old = baseline.get(section, {}).get(metric)
+        new = results.get(section, {}).get(metric)
+        if old is not None and new is not None and new > old * (1 + tolerance):
+            regressions.append("%s.%s rose from %s to %s" % (section, metric, old, new))
+    for section, metric in HIGHER_IS_BETTER:
+        old = baseline[section][metric]
+        new = results[section][metric]
+        if new < old * (1 - tolerance):
+            regressions.append("%s.%s fell from %s to %s" % (section, metric, old, new))
+    return regressions
@@ -0,0 +1,138 @@
+"""
+Process-local, read-only snapshot of the financing plan table.
+
+Financing plans are read on nearly every page (price advertising, estimated payments, checkout) but
+change only a few times a year, so each process keeps every plan in memory and answers lookups from
+sorted arrays. A version token stored in the shared cache is replaced whenever a plan or plan benefit
+is changed (see ``wellsfargo.handlers``). Every process compares its snapshot to the token once per
+lookup, so all workers reload together without ever querying the plan table in between.
+"""
+
+from bisect import bisect_right
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from .models import FinancingPlan, FinancingPlanBenefit
+import threading
+import uuid
+
+CATALOG_VERSION_CACHE_KEY = "wfrs-plan-catalog-version"
+
+
+class FinancingPlanCatalog(object):
+    """
+    Immutable index of all financing plans. Plan instances are shared between threads and requests, so
+    treat them as read-only.
+    """
+
+    def __init__(self, version, plans, benefit_plan_ids):
+        self.version = version
+        self.plans = {plan.pk: plan for plan in plans}
+        self.benefit_plans = {
+            benefit_id: sorted(
+                (self.plans[pk] for pk in plan_ids if pk in self.plans),
+                key=lambda plan: plan.plan_number,
+            )
+            for benefit_id, plan_ids in benefit_plan_ids.items()
+        }
+        advertised = sorted(
+            (
+                plan
+                for plan in self.plans.values()
+                if plan.advertising_enabled
+                and plan.product_price_threshold >= Decimal("0.00")
+            ),
+            key=lambda plan: (plan.product_price_threshold, plan.apr),
+        )
+        # Plans with a zero month term can't be used to advertise a monthly payment
+        self._advertised_plans = advertised
+        self._advertised_thresholds = [p.product_price_threshold for p in advertised]
+        self._payment_plans = [plan for plan in advertised if plan.term_months != 0]
+        self._payment_thresholds = [
+            p.product_price_threshold for p in self._payment_plans
+        ]
+        defaults = sorted(
+            (
+                plan
+                for plan in self.plans.values()
+                if plan.advertising_enabled and plan.is_default_plan
+            ),
+            key=lambda plan: plan.plan_number,
+        )
+        self.default_plan = defaults[0] if defaults else None
+
+    @classmethod
+    def load(cls, version):
+        plans = list(FinancingPlan.objects.all())
+        benefit_plan_ids = {}
+        links = FinancingPlanBenefit.plans.through.objects.values_list(
+            "financingplanbenefit_id", "financingplan_id"
+        )
+        for benefit_id, plan_id in links:
+            benefit_plan_ids.setdefault(benefit_id, []).append(plan_id)
+        return cls(version, plans, benefit_plan_ids)
+
+    @staticmethod
+    def _find(plans, thresholds, price):
+        # Plans are sorted by (threshold, APR), so the last plan at or below the price has the highest
+        # threshold the price qualifies for, and the highest APR among plans with that threshold.
+        idx = bisect_right(thresholds, price)
+        if idx == 0:
+            return None
+        return plans[idx - 1]
+
+    def get_advertisable_plan_by_price(self, price):
+        """Best plan to advertise a monthly payment for a product with the given price"""
+        return self._find(self._payment_plans, self._payment_thresholds, price)
+
+    def get_plan_for_price(self, price):
+        """Best plan to advertise for a product with the given price, including zero-term plans"""
+        return self._find(self._advertised_plans, self._advertised_thresholds, price)
+
+    def get_plans_for_benefit(self, benefit_id):
+        """
+        Plans made available by the ``FinancingPlanBenefit`` with the given ID, or ``None`` if the ID
+        isn't a financing plan benefit.
+        """
+        return self.benefit_plans.get(benefit_id)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_CACHE_KEY)
+    if version is None:
+        # Nobody has published a version yet (or the cache was flushed). If several processes race to
+        # do this, ``add`` makes sure they all agree on the winner.
+        cache.add(CATALOG_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(CATALOG_VERSION_CACHE_KEY)
+    return version
+
+
+def get_plan_catalog():
+    """Return the current ``FinancingPlanCatalog``, reloading it if it's out of date"""
+    global _catalog
+    version = get_catalog_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+    with _catalog_lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = FinancingPlanCatalog.load(version)
+        return _catalog
+
+
+def _publish_new_version():
+    cache.set(CATALOG_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate_plan_catalog():
+    """
+    Make every process reload the plan catalog. The version is replaced immediately (so this process
+    sees its own writes) and again once the current transaction commits, so that a process which
+    reloaded in between, and so couldn't yet see the new rows, doesn't keep a stale catalog.
+    """
+    _publish_new_version()
+    transaction.on_commit(_publish_new_version)
@@ -79,8 +79,24 @@ class AccountsAPIClient(WFRSGatewayAPIClient):
         return self._do_account_lookup(**request_data)
 
     def _do_account_lookup(self, **kwargs):
-        # Assemble request data
         creds = APIMerchantNum.get_for_user(self.current_user)
+        resp_data = self.send_account_lookup_request(creds, **kwargs)
+        return self.record_account_lookup_response(resp_data)
+
+    def send_account_lookup_request(self, creds, **kwargs):
+        """Send an account lookup to WF, without touching the database. Returns the response data."""
+        request_data = self.build_account_lookup_request_data(creds, **kwargs)
+        # Send the request to WF
+        resp = self.api_post(
+            "/credit-cards/private-label/new-accounts/v2/details",
+            client_request_id=uuid.uuid4(),
+            json=request_data,
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    def build_account_lookup_request_data(self, creds, **kwargs):
+        # Assemble request data
         request_data = {
             "locale": "en_US",
             "merchant_number": creds.merchant_num,
@@ -96,41 +112,25 @@ class AccountsAPIClient(WFRSGatewayAPIClient):
         if "home_phone" in request_data:
             # Phone number be 10 digits, no groupings, no country code
             request_data["home_phone"] = str(request_data["home_phone"].national_number)
-        # Send the request to WF
-        resp = self.api_post(
-            "/credit-cards/private-label/new-accounts/v2/details",
-            client_request_id=uuid.uuid4(),
-            json=request_data,
-        )
-        resp.raise_for_status()
-        resp_data = resp.json()
-        # Save main address from response
-        main_applicant_address = None
-        if resp_data.get("applicant", {}).get("address"):
-            main_applicant_address = CreditApplicationAddress.objects.create(
-                address_line_1=resp_data["applicant"]["address"].get("address_1", ""),
-                address_line_2=resp_data["applicant"]["address"].get("address_2", ""),
-                city=resp_data["applicant"]["address"].get("city", ""),
-                state_code=resp_data["applicant"]["address"].get("state", ""),
-                postal_code=resp_data["applicant"]["address"].get("postal_code", ""),
-            )
-        # Save joint address from response
-        joint_applicant_address = None
-        if resp_data.get("joint_applicant", {}).get("address"):
-            joint_applicant_address = CreditApplicationAddress.objects.create(
-                address_line_1=resp_data["joint_applicant"]["address"].get(
-                    "address_1", ""
-                ),
-                address_line_2=resp_data["joint_applicant"]["address"].get(
-                    "address_2", ""
-                ),
-                city=resp_data["joint_applicant"]["address"].get("city", ""),
-                state_code=resp_data["joint_applicant"]["address"].get("state", ""),
-                postal_code=resp_data["joint_applicant"]["address"].get(
-                    "postal_code", ""
-                ),
-            )
-        # Build response
+        return request_data
+
+    def record_account_lookup_response(self, resp_data):
+        result = self.build_account_lookup_response(resp_data)
+        if result is None:
+            return None
+        # Save the addresses from the response
+        if result.main_applicant_address is not None:
+            result.main_applicant_address.save()
+        if result.joint_applicant_address is not None:
+            result.joint_applicant_address.save()
+        result.save()
+        return result
+
+    def build_account_lookup_response(self, resp_data):
+        """
+        Build an (unsaved) ``AccountInquiryResult``, and its (unsaved) addresses, from the response data. Returns
+        ``None`` if the response doesn't include an account.
+        """
         if not resp_data.get("account_number"):
             return None
         result = AccountInquiryResult()
@@ -139,9 +139,23 @@ class AccountsAPIClient(WFRSGatewayAPIClient):
         result.joint_applicant_full_name = resp_data.get("joint_applicant", {}).get(
             "name"
         )
-        result.main_applicant_address = main_applicant_address
-        result.joint_applicant_address = joint_applicant_address
+        result.main_applicant_address = self.build_address(
+            resp_data.get("applicant", {}).get("address")
+        )
+        result.joint_applicant_address = self.build_address(
+            resp_data.get("joint_applicant", {}).get("address")
+        )
         result.credit_limit = as_decimal(resp_data["credit_limit"])
         result.available_credit = as_decimal(resp_data["available_credit"])
-        result.save()
         return result
+
+    def build_address(self, address_data):
+        if not address_data:
+            return None
+        return CreditApplicationAddress(
+            address_line_1=address_data.get("address_1", ""),
+            address_line_2=address_data.get("address_2", ""),
+            city=address_data.get("city", ""),
+            state_code=address_data.get("state", ""),
+            postal_code=address_data.get("postal_code", ""),
+        )
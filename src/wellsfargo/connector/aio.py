@@ -0,0 +1,281 @@
+"""
+Asyncio versions of the WFRS Gateway API clients, for use under ASGI. Requires httpx.
+
+Each client builds its requests and records the gateway's responses exactly as its blocking counterpart
+does, but awaits the HTTP round trip, and the ORM and cache calls around it, instead of blocking on them.
+Requests share a connection pool per event loop (configured by ``WFRS_GATEWAY_ASYNC_CLIENT``), so one
+worker can have many gateway calls in flight at once.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from ..models import APIMerchantNum
+from ..security import encrypt_pickle
+from ..settings import WFRS_GATEWAY_ASYNC_CLIENT
+from ..tracing import SPAN_GENERATE_API_KEY, SPAN_GET_API_KEY, trace_span
+from .accounts import AccountsAPIClient
+from .applications import CreditApplicationsAPIClient
+from .client import WFRSGatewayAPIClient
+from .health import HealthCheckAPIClient
+from .metrics import OP_TOKEN, get_gateway_metrics, get_operation
+from .prequal import PrequalAPIClient
+from .traffic import get_gateway_recorder, get_replay_transport
+from .transactions import TransactionsAPIClient
+import asyncio
+import httpx
+import logging
+import ssl
+import time
+import uuid
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# Per event loop: the HTTP clients (keyed by client certificate), and the API key generation locks (keyed
+# by cache key).
+_http_clients = weakref.WeakKeyDictionary()
+_api_key_locks = weakref.WeakKeyDictionary()
+
+
+def _build_http_client(cert):
+    verify = True
+    if cert is not None:
+        # Present the client certificate for mutual TLS
+        verify = ssl.create_default_context()
+        verify.load_cert_chain(*cert)
+    limits = httpx.Limits(
+        max_connections=WFRS_GATEWAY_ASYNC_CLIENT["max_connections"],
+        max_keepalive_connections=WFRS_GATEWAY_ASYNC_CLIENT[
+            "max_keepalive_connections"
+        ],
+        keepalive_expiry=WFRS_GATEWAY_ASYNC_CLIENT["keepalive_expiry"],
+    )
+    return httpx.AsyncClient(
+        verify=verify,
+        limits=limits,
+        timeout=WFRS_GATEWAY_ASYNC_CLIENT["timeout"],
+    )
+
+
+def get_http_client(cert=None):
+    """Return the pooled ``httpx.AsyncClient`` for the running event loop and given client certificate"""
+    clients = _http_clients.setdefault(asyncio.get_running_loop(), {})
+    if cert not in clients:
+        clients[cert] = _build_http_client(cert)
+    return clients[cert]
+
+
+async def aclose_http_clients():
+    """Close the running event loop's pooled connections (for example, on ASGI lifespan shutdown)"""
+    clients = _http_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+def _get_api_key_lock(cache_key):
+    locks = _api_key_locks.setdefault(asyncio.get_running_loop(), {})
+    if cache_key not in locks:
+        locks[cache_key] = asyncio.Lock()
+    return locks[cache_key]
+
+
+class AsyncWFRSGatewayAPIClient(WFRSGatewayAPIClient):
+    async def api_get(self, path, **kwargs):
+        return await self.make_api_request("get", path, **kwargs)
+
+    async def api_post(self, path, **kwargs):
+        return await self.make_api_request("post", path, **kwargs)
+
+    async def make_api_request(self, method, path, client_request_id=None, **kwargs):
+        operation = get_operation(path)
+        with self.trace_api_request(method, operation) as span:
+            url = self.get_api_url(path)
+            key_obj = await self.get_api_key()
+            # Build headers
+            request_id, headers = self.get_request_headers(client_request_id)
+            headers["Authorization"] = "Bearer %s" % key_obj.api_key
+            # Send request
+            logger.info(
+                "Sending WFRS Gateway API request. URL=[%s], RequestID=[%s]",
+                url,
+                request_id,
+            )
+            started = time.perf_counter()
+            resp = await self.send_observed_request(
+                operation,
+                self.get_async_request_fn(),
+                method.upper(),
+                url,
+                headers=headers,
+                **kwargs
+            )
+            await self.arecord_exchange(
+                operation, method, path, kwargs, resp, time.perf_counter() - started
+            )
+            span.set_attribute("http.response.status_code", resp.status_code)
+            logger.info(
+                "WFRS Gateway API request returned. URL=[%s], RequestID=[%s], Status=[%s]",
+                url,
+                request_id,
+                resp.status_code,
+            )
+            # Check response for errors
+            self.check_response(resp)
+            return resp
+
+    async def arecord_exchange(
+        self, operation, method, path, request_kwargs, resp, duration
+    ):
+        """Hand a request and its response to the gateway traffic recorder, without blocking the event loop"""
+        await get_gateway_recorder().arecord(
+            operation, method, path, request_kwargs.get("json"), resp, duration
+        )
+
+    def get_async_request_fn(self):
+        """Return the coroutine function which sends requests (replaying recorded traffic, if enabled)"""
+        transport = get_replay_transport()
+        if transport is not None:
+            return transport.asend
+        return get_http_client(self.get_client_cert()).request
+
+    async def send_observed_request(self, operation, request_fn, *args, **kwargs):
+        """Await a request with the given function, and report it to the gateway metrics backend"""
+        metrics = get_gateway_metrics()
+        started = time.perf_counter()
+        try:
+            resp = await request_fn(*args, **kwargs)
+        except httpx.HTTPError as e:
+            metrics.observe_error(operation, e, time.perf_counter() - started)
+            raise
+        metrics.observe_response(operation, resp, time.perf_counter() - started)
+        return resp
+
+    async def get_api_key(self):
+        with trace_span(SPAN_GET_API_KEY) as span:
+            key_obj = await self.get_cached_api_key()
+            span.set_attribute("wfrs.cached", key_obj is not None)
+            if key_obj is not None:
+                return key_obj
+            # Only let one coroutine (per event loop) generate a key, rather than every request which arrives
+            # while the key is missing or expired.
+            async with _get_api_key_lock(self.cache_key):
+                key_obj = await self.get_cached_api_key()
+                if key_obj is None:
+                    key_obj = await self.generate_api_key()
+                    await self.store_cached_api_key(key_obj)
+            return key_obj
+
+    async def get_cached_api_key(self):
+        encrypted_obj = await cache.aget(self.cache_key, version=self.cache_version)
+        if encrypted_obj is None:
+            return None
+        # Decryption may call out to a key management service
+        return await sync_to_async(self.load_cached_api_key, thread_sensitive=False)(
+            encrypted_obj
+        )
+
+    async def store_cached_api_key(self, key_obj):
+        encrypted_obj = await sync_to_async(encrypt_pickle, thread_sensitive=False)(
+            key_obj
+        )
+        await cache.aset(
+            self.cache_key, encrypted_obj, key_obj.ttl, version=self.cache_version
+        )
+
+    async def generate_api_key(self):
+        with trace_span(SPAN_GENERATE_API_KEY):
+            resp = await self.send_observed_request(
+                OP_TOKEN,
+                self.get_async_request_fn(),
+                "POST",
+                self.get_api_url("/oauth2/v1/token"),
+                auth=(self.consumer_key, self.consumer_secret),
+                data=self.get_token_request_data(),
+            )
+            resp.raise_for_status()
+            return self.build_api_key(resp.json())
+
+
+class AsyncHealthCheckAPIClient(AsyncWFRSGatewayAPIClient, HealthCheckAPIClient):
+    async def check_credentials(self):
+        resp = await self.api_get("/utilities/v1/hello-wellsfargo")
+        resp.raise_for_status()
+        return resp.json()["response"]
+
+
+class AsyncPrequalAPIClient(AsyncWFRSGatewayAPIClient, PrequalAPIClient):
+    async def check_prescreen_status(self, prequal_request):
+        creds = await sync_to_async(APIMerchantNum.get_for_user)(self.current_user)
+        request_data = self.build_prescreen_request_data(creds, prequal_request)
+        # Save the credentials used to make the request
+        await prequal_request.asave()
+        # Send the request to WF
+        resp = await self.api_post(
+            "/credit-cards/private-label/new-accounts/v2/prequalifications",
+            client_request_id=prequal_request.uuid,
+            json=request_data,
+        )
+        resp.raise_for_status()
+        return await sync_to_async(self.record_prescreen_response)(
+            prequal_request, resp.json()
+        )
+
+
+class AsyncCreditApplicationsAPIClient(
+    AsyncWFRSGatewayAPIClient, CreditApplicationsAPIClient
+):
+    async def submit_credit_application(self, credit_app, client_request_id=None):
+        creds = await sync_to_async(APIMerchantNum.get_for_user)(self.current_user)
+        request_data = await sync_to_async(self.build_application_request_data)(
+            creds, credit_app
+        )
+        # Submit application
+        resp = await self.api_post(
+            "/credit-cards/private-label/new-accounts/v2/applications",
+            client_request_id=client_request_id or uuid.uuid4(),
+            json=request_data,
+        )
+        resp.raise_for_status()
+        # Recording the outcome takes several queries (and may send wfrs_app_approved), so do it all in
+        # one trip to the ORM's thread.
+        return await sync_to_async(self.record_application_response)(
+            creds, credit_app, resp.json()
+        )
+
+
+class AsyncAccountsAPIClient(AsyncWFRSGatewayAPIClient, AccountsAPIClient):
+    """
+    The inherited ``lookup_account_by_*`` methods return coroutines, so they must be awaited.
+    """
+
+    async def _do_account_lookup(self, **kwargs):
+        creds = await sync_to_async(APIMerchantNum.get_for_user)(self.current_user)
+        request_data = self.build_account_lookup_request_data(creds, **kwargs)
+        # Send the request to WF
+        resp = await self.api_post(
+            "/credit-cards/private-label/new-accounts/v2/details",
+            client_request_id=uuid.uuid4(),
+            json=request_data,
+        )
+        resp.raise_for_status()
+        return await sync_to_async(self.record_account_lookup_response)(resp.json())
+
+
+class AsyncTransactionsAPIClient(AsyncWFRSGatewayAPIClient, TransactionsAPIClient):
+    async def submit_transaction(
+        self, trans_request, transaction_uuid=None, persist=True
+    ):
+        api_path = self.get_api_path(trans_request)
+        creds = await sync_to_async(APIMerchantNum.get_for_user)(self.current_user)
+        if transaction_uuid is None:
+            transaction_uuid = uuid.uuid4()
+        # Submit transaction to WFRS
+        resp = await self.api_post(
+            api_path,
+            client_request_id=transaction_uuid,
+            json=self.build_transaction_request_data(creds, trans_request),
+        )
+        resp.raise_for_status()
+        return await sync_to_async(self.record_transaction_response)(
+            creds, trans_request, transaction_uuid, resp.json(), persist=persist
+        )
@@ -27,9 +27,20 @@ class CreditApplicationsAPIClient(WFRSGatewayAPIClient):
     def __init__(self, current_user=None):
         self.current_user = current_user
 
-    def submit_credit_application(self, credit_app):
+    def submit_credit_application(self, credit_app, client_request_id=None):
         creds = APIMerchantNum.get_for_user(self.current_user)
-        # Submit transaction to WFRS
+        request_data = self.build_application_request_data(creds, credit_app)
+        # Submit application. Resubmissions of the same application must reuse its client_request_id, so
+        # that the gateway can recognize them as duplicates.
+        resp = self.api_post(
+            "/credit-cards/private-label/new-accounts/v2/applications",
+            client_request_id=client_request_id or uuid.uuid4(),
+            json=request_data,
+        )
+        resp.raise_for_status()
+        return self.record_application_response(creds, credit_app, resp.json())
+
+    def build_application_request_data(self, creds, credit_app):
         main_applicant = {
             "first_name": credit_app.main_applicant.first_name,
             "last_name": credit_app.main_applicant.last_name,
@@ -84,15 +95,9 @@ class CreditApplicationsAPIClient(WFRSGatewayAPIClient):
                 },
             }
         # Filter out null keys
-        request_data = remove_null_dict_keys(request_data)
-        # Submit application
-        resp = self.api_post(
-            "/credit-cards/private-label/new-accounts/v2/applications",
-            client_request_id=uuid.uuid4(),
-            json=request_data,
-        )
-        resp.raise_for_status()
-        resp_data = resp.json()
+        return remove_null_dict_keys(request_data)
+
+    def record_application_response(self, creds, credit_app, resp_data):
         credit_app.merchant_name = creds.name
         credit_app.merchant_num = creds.merchant_num
         credit_app.status = resp_data["application_status"]
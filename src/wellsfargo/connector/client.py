@@ -13,8 +13,19 @@ from ..settings import (
     WFRS_GATEWAY_PRIV_KEY_PATH,
 )
 from ..security import encrypt_pickle, decrypt_pickle
+from ..tracing import (
+    SPAN_API_REQUEST,
+    SPAN_GENERATE_API_KEY,
+    SPAN_GET_API_KEY,
+    trace_span,
+    traced,
+)
+from .metrics import OP_TOKEN, get_gateway_metrics, get_operation
+from .traffic import get_gateway_recorder, get_replay_transport
+import functools
 import requests
 import logging
+import time
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -88,13 +99,85 @@ class WFRSGatewayAPIClient:
         return self.make_api_request("post", path, **kwargs)
 
     def make_api_request(self, method, path, client_request_id=None, **kwargs):
-        url = "https://{host}{path}".format(host=self.api_host, path=path)
-        # Setup authentication
-        auth = BearerTokenAuth(self.get_api_key().api_key)
-        cert = None
+        operation = get_operation(path)
+        with self.trace_api_request(method, operation) as span:
+            url = self.get_api_url(path)
+            # Setup authentication
+            auth = BearerTokenAuth(self.get_api_key().api_key)
+            # Build headers
+            request_id, headers = self.get_request_headers(client_request_id)
+            # Send request
+            logger.info(
+                "Sending WFRS Gateway API request. URL=[%s], RequestID=[%s]",
+                url,
+                request_id,
+            )
+            request_fn = self.get_request_fn(method)
+            started = time.perf_counter()
+            resp = self.send_observed_request(
+                operation,
+                request_fn,
+                url,
+                auth=auth,
+                cert=self.get_client_cert(),
+                headers=headers,
+                **kwargs
+            )
+            self.record_exchange(
+                operation, method, path, kwargs, resp, time.perf_counter() - started
+            )
+            span.set_attribute("http.response.status_code", resp.status_code)
+            logger.info(
+                "WFRS Gateway API request returned. URL=[%s], RequestID=[%s], Status=[%s]",
+                url,
+                request_id,
+                resp.status_code,
+            )
+            # Check response for errors
+            self.check_response(resp)
+            # Return response
+            return resp
+
+    def trace_api_request(self, method, operation):
+        return trace_span(
+            SPAN_API_REQUEST,
+            **{"http.request.method": method.upper(), "wfrs.operation": operation}
+        )
+
+    def get_request_fn(self, method):
+        """Return the function which sends requests with the given method (replaying recorded traffic, if enabled)"""
+        transport = get_replay_transport()
+        if transport is not None:
+            return functools.partial(transport.send, method)
+        return getattr(requests, method)
+
+    def record_exchange(self, operation, method, path, request_kwargs, resp, duration):
+        """Hand a request and its response to the gateway traffic recorder"""
+        get_gateway_recorder().record(
+            operation, method, path, request_kwargs.get("json"), resp, duration
+        )
+
+    def send_observed_request(self, operation, request_fn, url, **kwargs):
+        """Send a request with the given function, and report it to the gateway metrics backend"""
+        metrics = get_gateway_metrics()
+        started = time.perf_counter()
+        try:
+            resp = request_fn(url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            metrics.observe_error(operation, e, time.perf_counter() - started)
+            raise
+        metrics.observe_response(operation, resp, time.perf_counter() - started)
+        return resp
+
+    def get_api_url(self, path):
+        return "https://{host}{path}".format(host=self.api_host, path=path)
+
+    def get_client_cert(self):
         if self.client_cert_path and self.priv_key_path:
-            cert = (self.client_cert_path, self.priv_key_path)
-        # Build headers
+            return (self.client_cert_path, self.priv_key_path)
+        return None
+
+    def get_request_headers(self, client_request_id=None):
         request_id = (
             str(uuid.uuid4()) if client_request_id is None else str(client_request_id)
         )
@@ -105,21 +188,9 @@ class WFRSGatewayAPIClient:
         }
         if client_request_id is not None:
             headers["client-request-id"] = str(client_request_id)
-        # Send request
-        logger.info(
-            "Sending WFRS Gateway API request. URL=[%s], RequestID=[%s]",
-            url,
-            request_id,
-        )
-        request_fn = getattr(requests, method)
-        resp = request_fn(url, auth=auth, cert=cert, headers=headers, **kwargs)
-        logger.info(
-            "WFRS Gateway API request returned. URL=[%s], RequestID=[%s], Status=[%s]",
-            url,
-            request_id,
-            resp.status_code,
-        )
-        # Check response for errors
+        return request_id, headers
+
+    def check_response(self, resp):
         if resp.status_code == 400:
             resp_data = resp.json()
             errors = []
@@ -127,20 +198,23 @@ class WFRSGatewayAPIClient:
                 exc = ValidationError(err["description"], code=err["error_code"])
                 errors.append(exc)
             raise ValidationError(errors)
-        # Return response
-        return resp
 
     def get_api_key(self):
-        # Check for a cached key
-        key_obj = self.get_cached_api_key()
-        if key_obj is None:
-            key_obj = self.generate_api_key()
-            self.store_cached_api_key(key_obj)
-        return key_obj
+        with trace_span(SPAN_GET_API_KEY) as span:
+            # Check for a cached key
+            key_obj = self.get_cached_api_key()
+            span.set_attribute("wfrs.cached", key_obj is not None)
+            if key_obj is None:
+                key_obj = self.generate_api_key()
+                self.store_cached_api_key(key_obj)
+            return key_obj
 
     def get_cached_api_key(self):
         # Try to get an API key from cache
         encrypted_obj = cache.get(self.cache_key, version=self.cache_version)
+        return self.load_cached_api_key(encrypted_obj)
+
+    def load_cached_api_key(self, encrypted_obj):
         if encrypted_obj is None:
             return None
         # Try to decrypt the object we got from cache
@@ -163,17 +237,29 @@ class WFRSGatewayAPIClient:
             self.cache_key, encrypted_obj, key_obj.ttl, version=self.cache_version
         )
 
-    def generate_api_key(self):
-        url = "https://{host}/oauth2/v1/token".format(host=self.api_host)
-        auth = HTTPBasicAuth(self.consumer_key, self.consumer_secret)
-        cert = (self.client_cert_path, self.priv_key_path)
-        req_data = {
+    def get_token_request_data(self):
+        return {
             "grant_type": "client_credentials",
             "scope": " ".join(self.scopes),
         }
-        resp = requests.post(url, auth=auth, cert=cert, data=req_data)
+
+    @traced(SPAN_GENERATE_API_KEY)
+    def generate_api_key(self):
+        url = self.get_api_url("/oauth2/v1/token")
+        auth = HTTPBasicAuth(self.consumer_key, self.consumer_secret)
+        cert = (self.client_cert_path, self.priv_key_path)
+        resp = self.send_observed_request(
+            OP_TOKEN,
+            self.get_request_fn("post"),
+            url,
+            auth=auth,
+            cert=cert,
+            data=self.get_token_request_data(),
+        )
         resp.raise_for_status()
-        resp_data = resp.json()
+        return self.build_api_key(resp.json())
+
+    def build_api_key(self, resp_data):
         expires_on = timezone.now() + timedelta(seconds=resp_data["expires_in"])
         logger.info("Generated new WFRS API Key. ExpiresIn=[%s]", expires_on)
         key_obj = WFRSAPIKey(api_key=resp_data["access_token"], expires_on=expires_on)
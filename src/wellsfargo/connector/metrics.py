@@ -0,0 +1,309 @@
+"""
+Metrics about WFRS Gateway API requests.
+
+The gateway clients report every request they make (including API token requests) to the configured metrics
+backend, labelled by logical operation: ``token``, ``health``, ``prequal``, ``application``, ``account-details``,
+or the transaction action (``authorization``, ``return``, etc.). Each request reports its duration (excluding
+the time taken to get an API token), its status (the HTTP status code, or the exception class name if no
+response was received), and the sizes of the request and response bodies. Retries are reported too.
+
+Usage::
+
+    WFRS_GATEWAY_METRICS = {
+        'metrics': 'wellsfargo.connector.metrics.PrometheusGatewayMetrics',
+        'metrics_kwargs': {},
+    }
+"""
+
+from django.http import Http404, HttpResponse
+from ..core.loading import get_configured_instance
+from ..settings import WFRS_GATEWAY_METRICS
+import logging
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+OP_TOKEN = "token"
+OP_HEALTH = "health"
+OP_PREQUAL = "prequal"
+OP_APPLICATION = "application"
+OP_ACCOUNT_DETAILS = "account-details"
+
+OPERATION_PATHS = {
+    "/oauth2/v1/token": OP_TOKEN,
+    "/utilities/v1/hello-wellsfargo": OP_HEALTH,
+    "/credit-cards/private-label/new-accounts/v2/prequalifications": OP_PREQUAL,
+    "/credit-cards/private-label/new-accounts/v2/applications": OP_APPLICATION,
+    "/credit-cards/private-label/new-accounts/v2/details": OP_ACCOUNT_DETAILS,
+}
+TRANSACTIONS_PATH = "/credit-cards/private-label/new-accounts/v2/payment/transactions/"
+
+DEFAULT_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DEFAULT_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536)
+
+
+def get_operation(path):
+    """Return the name of the logical operation performed by a request to the given API path"""
+    if path in OPERATION_PATHS:
+        return OPERATION_PATHS[path]
+    if path.startswith(TRANSACTIONS_PATH):
+        return path[len(TRANSACTIONS_PATH) :]
+    return path
+
+
+def get_body_size(body):
+    """Return the size, in bytes, of a request or response body"""
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    try:
+        return len(body)
+    except TypeError:
+        # A streamed body, of unknown size
+        return 0
+
+
+def get_request_body(response):
+    """Return the body of the request which got the given ``requests`` or ``httpx`` response (or error)"""
+    request = response.request
+    if hasattr(request, "body"):
+        return request.body
+    return request.content
+
+
+class NoOpGatewayMetrics(object):
+    """
+    Discards all metrics. This is the default, and the interface for other metrics backends.
+    """
+
+    def observe_request(self, operation, status, duration, request_size, response_size):
+        """
+        Record a request to the gateway. ``status`` is the HTTP status code, or the name of the exception raised
+        if no response was received. ``duration`` is in seconds, and the sizes are in bytes.
+        """
+        pass
+
+    def observe_retry(self, operation, reason):
+        """Record that an operation is being retried, and why (the HTTP status code or exception class name)"""
+        pass
+
+    def observe_response(self, operation, response, duration):
+        self.observe_request(
+            operation,
+            response.status_code,
+            duration,
+            request_size=get_body_size(get_request_body(response)),
+            response_size=len(response.content),
+        )
+
+    def observe_error(self, operation, exc, duration):
+        try:
+            request_size = get_body_size(get_request_body(exc))
+        except (AttributeError, RuntimeError):
+            # The request was never built
+            request_size = 0
+        self.observe_request(
+            operation,
+            exc.__class__.__name__,
+            duration,
+            request_size=request_size,
+            response_size=0,
+        )
+
+
+class _Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class PrometheusGatewayMetrics(NoOpGatewayMetrics):
+    """
+    Keeps metrics in memory, and renders them in the Prometheus text exposition format. Serve them with
+    ``prometheus_metrics_view``, e.g. ``path('metrics/wfrs/', prometheus_metrics_view)``.
+
+    Metrics are kept per process, so when running multiple worker processes, each must be scraped separately.
+    """
+
+    def __init__(
+        self,
+        namespace="wfrs_gateway",
+        duration_buckets=DEFAULT_DURATION_BUCKETS,
+        size_buckets=DEFAULT_SIZE_BUCKETS,
+    ):
+        self.namespace = namespace
+        self.duration_buckets = duration_buckets
+        self.size_buckets = size_buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.durations = {}
+            self.request_sizes = {}
+            self.response_sizes = {}
+            self.requests = {}
+            self.retries = {}
+
+    def observe_request(self, operation, status, duration, request_size, response_size):
+        with self._lock:
+            for histograms, buckets, value in (
+                (self.durations, self.duration_buckets, duration),
+                (self.request_sizes, self.size_buckets, request_size),
+                (self.response_sizes, self.size_buckets, response_size),
+            ):
+                if operation not in histograms:
+                    histograms[operation] = _Histogram(buckets)
+                histograms[operation].observe(value)
+            key = (operation, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def observe_retry(self, operation, reason):
+        with self._lock:
+            key = (operation, str(reason))
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            self._render_histograms(
+                lines,
+                "request_duration_seconds",
+                "Duration of WFRS Gateway API requests.",
+                self.durations,
+            )
+            self._render_histograms(
+                lines,
+                "request_size_bytes",
+                "Size of WFRS Gateway API request bodies.",
+                self.request_sizes,
+            )
+            self._render_histograms(
+                lines,
+                "response_size_bytes",
+                "Size of WFRS Gateway API response bodies.",
+                self.response_sizes,
+            )
+            self._render_counters(
+                lines,
+                "requests_total",
+                "WFRS Gateway API requests, by status.",
+                ("operation", "status"),
+                self.requests,
+            )
+            self._render_counters(
+                lines,
+                "retries_total",
+                "Retried WFRS Gateway API operations, by reason.",
+                ("operation", "reason"),
+                self.retries,
+            )
+        return "".join(line + "\n" for line in lines)
+
+    def _render_histograms(self, lines, name, help_text, histograms):
+        name = "%s_%s" % (self.namespace, name)
+        lines.append("# HELP %s %s" % (name, help_text))
+        lines.append("# TYPE %s histogram" % name)
+        for operation, histogram in sorted(histograms.items()):
+            labels = self._format_labels(operation=operation)
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                le_labels = self._format_labels(
+                    operation=operation, le=repr(float(bound))
+                )
+                lines.append("%s_bucket%s %s" % (name, le_labels, count))
+            inf_labels = self._format_labels(operation=operation, le="+Inf")
+            lines.append("%s_bucket%s %s" % (name, inf_labels, histogram.count))
+            lines.append("%s_sum%s %s" % (name, labels, float(histogram.sum)))
+            lines.append("%s_count%s %s" % (name, labels, histogram.count))
+
+    def _render_counters(self, lines, name, help_text, label_names, counters):
+        name = "%s_%s" % (self.namespace, name)
+        lines.append("# HELP %s %s" % (name, help_text))
+        lines.append("# TYPE %s counter" % name)
+        for label_values, count in sorted(counters.items()):
+            labels = self._format_labels(**dict(zip(label_names, label_values)))
+            lines.append("%s%s %s" % (name, labels, count))
+
+    def _format_labels(self, **labels):
+        return "{%s}" % ",".join(
+            '%s="%s"' % (key, self._escape(value)) for key, value in labels.items()
+        )
+
+    def _escape(self, value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class StatsDGatewayMetrics(NoOpGatewayMetrics):
+    """
+    Sends metrics to a StatsD server over UDP. Durations are sent as timers, payload sizes as histograms, and
+    requests and retries as counters. By default, the operation and status are part of each metric name (e.g.
+    ``wfrs.gateway.prequal.status.200``). With ``tags=True``, they're sent as DogStatsD tags instead.
+    """
+
+    def __init__(self, host="localhost", port=8125, prefix="wfrs.gateway", tags=False):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.tags = tags
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def observe_request(self, operation, status, duration, request_size, response_size):
+        status = str(status)
+        self._send(
+            [
+                self._format("duration", duration * 1000, "ms", operation),
+                self._format("request_size", request_size, "h", operation),
+                self._format("response_size", response_size, "h", operation),
+                self._format("requests", 1, "c", operation, status=status),
+            ]
+        )
+
+    def observe_retry(self, operation, reason):
+        self._send([self._format("retries", 1, "c", operation, reason=str(reason))])
+
+    def _format(self, name, value, metric_type, operation, **labels):
+        if isinstance(value, float):
+            value = "%.3f" % value
+        if self.tags:
+            tags = ",".join(
+                "%s:%s" % (key, val)
+                for key, val in [("operation", operation)] + sorted(labels.items())
+            )
+            return "%s.%s:%s|%s|#%s" % (self.prefix, name, value, metric_type, tags)
+        metric = "%s.%s.%s" % (self.prefix, operation, name)
+        for key, val in sorted(labels.items()):
+            metric = "%s.%s.%s" % (metric, key, val)
+        return "%s:%s|%s" % (metric, value, metric_type)
+
+    def _send(self, lines):
+        try:
+            self._socket.sendto("\n".join(lines).encode("utf-8"), self.address)
+        except OSError as e:
+            # Metrics must never break a request
+            logger.warning("Failed to send metrics to StatsD: %s", e)
+
+
+def get_gateway_metrics():
+    """Return the configured metrics backend. It's built once, so that in-memory metrics accumulate."""
+    return get_configured_instance(WFRS_GATEWAY_METRICS, "metrics", "metrics_kwargs")
+
+
+def prometheus_metrics_view(request):
+    """Serve the gateway metrics, if using ``PrometheusGatewayMetrics``"""
+    metrics = get_gateway_metrics()
+    if not hasattr(metrics, "render"):
+        raise Http404()
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
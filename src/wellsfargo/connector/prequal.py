@@ -18,7 +18,24 @@ class PrequalAPIClient(WFRSGatewayAPIClient):
 
     def check_prescreen_status(self, prequal_request):
         creds = APIMerchantNum.get_for_user(self.current_user)
-        # Build request data
+        request_data = self.build_prescreen_request_data(creds, prequal_request)
+        # Save the credentials used to make the request
+        prequal_request.save()
+        # Send the request to WF
+        resp_data = self.send_prescreen_request(prequal_request, request_data)
+        return self.record_prescreen_response(prequal_request, resp_data)
+
+    def send_prescreen_request(self, prequal_request, request_data):
+        """Send a prescreen request to WF, without touching the database. Returns the response data."""
+        resp = self.api_post(
+            "/credit-cards/private-label/new-accounts/v2/prequalifications",
+            client_request_id=prequal_request.uuid,
+            json=request_data,
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    def build_prescreen_request_data(self, creds, prequal_request):
         request_data = {
             "merchant_number": creds.merchant_num,
             "transaction_code": PREQUAL_TRANS_CODE_MERCHANT_INITIATED_PRESCREEN,
@@ -41,20 +58,17 @@ class PrequalAPIClient(WFRSGatewayAPIClient):
             "entry_point": prequal_request.entry_point,
             "requested_credit_limit": None,
         }
-        request_data = remove_null_dict_keys(request_data)
-        # Save the credentials used to make the request
         prequal_request.merchant_name = creds.name
         prequal_request.merchant_num = creds.merchant_num
-        prequal_request.save()
-        # Send the request to WF
-        resp = self.api_post(
-            "/credit-cards/private-label/new-accounts/v2/prequalifications",
-            client_request_id=prequal_request.uuid,
-            json=request_data,
-        )
-        resp.raise_for_status()
-        resp_data = resp.json()
+        return remove_null_dict_keys(request_data)
+
+    def record_prescreen_response(self, prequal_request, resp_data):
         # Save the pre-qualification response data
+        response = self.build_prescreen_response(prequal_request, resp_data)
+        response.save()
+        return response
+
+    def build_prescreen_response(self, prequal_request, resp_data):
         response = PreQualificationResponse()
         response.request = prequal_request
         response.status = resp_data.get("decision_status", PREQUAL_TRANS_STATUS_ERROR)
@@ -64,5 +78,4 @@ class PrequalAPIClient(WFRSGatewayAPIClient):
         response.response_id = resp_data.get("application_id", "")
         response.application_url = urllib.parse.unquote(resp_data.get("URL", ""))
         response.customer_response = PREQUAL_CUSTOMER_RESP_NONE
-        response.save()
         return response
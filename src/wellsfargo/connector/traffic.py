@@ -0,0 +1,305 @@
+"""
+Recording and replay of WFRS Gateway API traffic.
+
+The gateway clients hand every response they get from ``make_api_request`` (but not API token requests) to the
+configured recorder. The asyncio clients await its ``arecord`` method instead, so that it doesn't block the
+event loop. ``JSONLinesGatewayRecorder`` appends each request / response pair to a JSON-lines
+archive (gzipped if the path ends in ``.gz``), along with the operation, status code, and duration. Personal
+information (names, addresses, phone numbers, email addresses, SSNs, dates of birth, and incomes) is replaced
+with placeholders of the same size, and account numbers with a test number ending in the same four digits, so
+that an archive of production traffic is safe to share, but still realistic.
+
+Usage::
+
+    WFRS_GATEWAY_RECORDER = {
+        'recorder': 'wellsfargo.connector.traffic.JSONLinesGatewayRecorder',
+        'recorder_kwargs': {'path': '/var/log/wfrs/traffic-{pid}.jsonl.gz'},
+    }
+
+An archive can then be replayed, instead of calling the gateway::
+
+    WFRS_GATEWAY_REPLAY = {
+        'archive': '/var/log/wfrs/traffic-1234.jsonl.gz',
+        'latency': True,
+    }
+
+Each request is answered with the next recorded response for the same method and path, cycling back to the
+first once they've all been used, so a replay is deterministic. API token requests are answered with a
+made up token. With ``latency`` enabled, each response is delayed by its recorded duration (multiplied by
+``latency_scale``).
+"""
+
+from asgiref.sync import sync_to_async
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from ..core.loading import get_configured_instance
+from ..settings import WFRS_GATEWAY_RECORDER, WFRS_GATEWAY_REPLAY
+from .metrics import OP_TOKEN, get_operation
+import asyncio
+import gzip
+import json
+import logging
+import os
+import requests
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMAT_VERSION = 1
+
+# Fields which hold personal information, in both requests and responses
+PII_FIELDS = frozenset(
+    (
+        "first_name",
+        "last_name",
+        "middle_initial",
+        "name",
+        "date_of_birth",
+        "ssn",
+        "last_four_ssn",
+        "annual_income",
+        "email",
+        "email_address",
+        "phone_number",
+        "mobile_phone",
+        "home_phone",
+        "work_phone",
+        "employer_name",
+        "address",
+        "address_line_1",
+        "address_line_2",
+        "address_1",
+        "address_2",
+        "city",
+        "postal_code",
+    )
+)
+
+# Fields which hold full account numbers
+ACCOUNT_NUMBER_FIELDS = frozenset(("account_number", "credit_card_number"))
+
+REPLAY_TOKEN = {
+    "access_token": "replayed-api-token",
+    "token_type": "Bearer",
+    "expires_in": 86400,
+}
+
+
+def scrub(data):
+    """
+    Return a copy of the given JSON data, with personal information and account numbers replaced by
+    placeholders of the same size and type.
+    """
+    if isinstance(data, dict):
+        return {key: _scrub_field(key, value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [scrub(item) for item in data]
+    return data
+
+
+def _scrub_field(key, value):
+    if isinstance(value, (dict, list)):
+        return scrub(value)
+    if value is None or isinstance(value, bool):
+        return value
+    if key in ACCOUNT_NUMBER_FIELDS:
+        value = str(value)
+        return "9" * max(len(value) - 4, 0) + value[-4:]
+    if key in PII_FIELDS:
+        if isinstance(value, (int, float)):
+            return 0
+        return "X" * len(str(value))
+    return value
+
+
+def get_response_data(response):
+    """Return the decoded JSON body of a ``requests`` or ``httpx`` response, or ``None`` if it isn't JSON"""
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+class NoOpGatewayRecorder(object):
+    """
+    Doesn't record anything. This is the default, and the interface for other recorders.
+    """
+
+    def record(self, operation, method, path, request_data, response, duration):
+        """
+        Record a request to the gateway. ``request_data`` is the JSON body of the request (or ``None``),
+        ``response`` is the ``requests`` or ``httpx`` response, and ``duration`` is in seconds.
+        """
+        pass
+
+    async def arecord(self, operation, method, path, request_data, response, duration):
+        """Record a request made by an asyncio client. This must not block the event loop."""
+        pass
+
+
+class JSONLinesGatewayRecorder(NoOpGatewayRecorder):
+    """
+    Appends scrubbed request / response pairs to a JSON-lines archive. ``path`` may contain ``{pid}``, so that
+    each worker process writes its own archive. Paths ending in ``.gz`` are gzipped (and each process must then
+    write its own archive).
+    """
+
+    def __init__(self, path):
+        self.path = path.format(pid=os.getpid())
+        self._lock = threading.Lock()
+        self._file = None
+
+    def record(self, operation, method, path, request_data, response, duration):
+        entry = {
+            "v": ARCHIVE_FORMAT_VERSION,
+            "recorded": datetime.now(timezone.utc).isoformat(),
+            "operation": operation,
+            "method": method.upper(),
+            "path": path,
+            "status": response.status_code,
+            "duration": round(duration, 6),
+            "request": scrub(request_data),
+        }
+        response_data = get_response_data(response)
+        if response_data is None:
+            entry["response_text"] = "X" * len(response.text)
+        else:
+            entry["response"] = scrub(response_data)
+        line = json.dumps(entry, separators=(",", ":"), sort_keys=True) + "\n"
+        try:
+            with self._lock:
+                if self._file is None:
+                    self._file = self._open()
+                self._file.write(line)
+                self._file.flush()
+        except OSError as e:
+            # Recording must never break a request
+            logger.warning("Failed to record WFRS Gateway API traffic: %s", e)
+
+    async def arecord(self, operation, method, path, request_data, response, duration):
+        # Writing (and gzipping) the archive blocks, so do it in a worker thread
+        await sync_to_async(self.record, thread_sensitive=False)(
+            operation, method, path, request_data, response, duration
+        )
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open(self):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, "at", encoding="utf-8")
+        return open(self.path, "a", encoding="utf-8")
+
+
+def read_archive(path):
+    """Yield the entries of a recorded traffic archive"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as archive:
+        for line in archive:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ReplayMissError(requests.exceptions.ConnectionError):
+    """Raised when a replayed archive has no response for a request"""
+
+    pass
+
+
+class ReplayTransport(object):
+    """
+    Answers gateway requests with the responses in a recorded traffic archive. Use ``send`` in place of a
+    ``requests`` function, and ``asend`` in place of ``httpx.AsyncClient.request``.
+    """
+
+    def __init__(self, archive, latency=False, latency_scale=1.0):
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.entries = {}
+        for entry in read_archive(archive):
+            self.entries.setdefault((entry["method"], entry["path"]), []).append(entry)
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def next_entry(self, method, url):
+        """Return the next recorded exchange for the given request, or ``None`` for API token requests"""
+        path = urlsplit(url).path
+        if get_operation(path) == OP_TOKEN:
+            return None
+        key = (method.upper(), path)
+        entries = self.entries.get(key)
+        if not entries:
+            raise ReplayMissError("No recorded response for %s %s" % key)
+        with self._lock:
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+        return entries[position % len(entries)]
+
+    def get_delay(self, entry):
+        if entry is None or not self.latency:
+            return 0
+        return entry["duration"] * self.latency_scale
+
+    def get_body(self, entry):
+        if entry is None:
+            return json.dumps(REPLAY_TOKEN)
+        if "response" in entry:
+            return json.dumps(entry["response"])
+        return entry["response_text"]
+
+    def send(self, method, url, json=None, data=None, headers=None, **kwargs):
+        entry = self.next_entry(method, url)
+        time.sleep(self.get_delay(entry))
+        response = requests.Response()
+        response.status_code = 200 if entry is None else entry["status"]
+        response.headers["Content-Type"] = "application/json"
+        response._content = self.get_body(entry).encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = url
+        response.request = requests.Request(
+            method.upper(), url, json=json, data=data, headers=headers
+        ).prepare()
+        return response
+
+    async def asend(self, method, url, json=None, data=None, headers=None, **kwargs):
+        import httpx
+
+        entry = self.next_entry(method, url)
+        await asyncio.sleep(self.get_delay(entry))
+        return httpx.Response(
+            200 if entry is None else entry["status"],
+            headers={"Content-Type": "application/json"},
+            content=self.get_body(entry).encode("utf-8"),
+            request=httpx.Request(
+                method.upper(), url, json=json, data=data, headers=headers
+            ),
+        )
+
+
+_replay_transports = {}
+_lock = threading.Lock()
+
+
+def get_gateway_recorder():
+    """Return the configured recorder. It's built once, so that it can keep its archive open."""
+    return get_configured_instance(WFRS_GATEWAY_RECORDER, "recorder", "recorder_kwargs")
+
+
+def get_replay_transport():
+    """Return the transport replaying the configured archive, or ``None`` if replay isn't enabled"""
+    archive = WFRS_GATEWAY_REPLAY.get("archive")
+    if not archive:
+        return None
+    key = (
+        archive,
+        WFRS_GATEWAY_REPLAY.get("latency", False),
+        WFRS_GATEWAY_REPLAY.get("latency_scale", 1.0),
+    )
+    with _lock:
+        if key not in _replay_transports:
+            _replay_transports[key] = ReplayTransport(*key)
+        return _replay_transports[key]
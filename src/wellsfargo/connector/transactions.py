@@ -2,8 +2,8 @@ from ..core.constants import (
     TRANS_APPROVED,
     TRANS_TYPE_AUTH,
     TRANS_TYPE_CANCEL_AUTH,
-    # TRANS_TYPE_CHARGE,
-    # TRANS_TYPE_AUTH_AND_CHARGE,
+    TRANS_TYPE_CHARGE,
+    TRANS_TYPE_AUTH_AND_CHARGE,
     TRANS_TYPE_AUTH_AND_CHARGE_TIMEOUT_REVERSAL,
     TRANS_TYPE_RETURN_CREDIT,
     TRANS_TYPE_VOID_SALE,
@@ -11,6 +11,7 @@ from ..core.constants import (
 )
 from wellsfargo.core.exceptions import TransactionDenied
 from ..models import APIMerchantNum, FinancingPlan, TransferMetadata
+from ..tracing import SPAN_RECORD_TRANSACTION, traced
 from ..utils import as_decimal
 from .client import WFRSGatewayAPIClient
 import uuid
@@ -21,10 +22,28 @@ class TransactionsAPIClient(WFRSGatewayAPIClient):
         self.current_user = current_user
 
     def submit_transaction(self, trans_request, transaction_uuid=None, persist=True):
-        api_path = self.get_api_path(trans_request)
         creds = APIMerchantNum.get_for_user(self.current_user)
-        # Submit transaction to WFRS
-        trans_request_data = {
+        if transaction_uuid is None:
+            transaction_uuid = uuid.uuid4()
+        resp_data = self.send_transaction_request(
+            creds, trans_request, transaction_uuid
+        )
+        return self.record_transaction_response(
+            creds, trans_request, transaction_uuid, resp_data, persist=persist
+        )
+
+    def send_transaction_request(self, creds, trans_request, transaction_uuid):
+        """Submit a transaction to WFRS, without touching the database. Returns the response data."""
+        resp = self.api_post(
+            self.get_api_path(trans_request),
+            client_request_id=transaction_uuid,
+            json=self.build_transaction_request_data(creds, trans_request),
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    def build_transaction_request_data(self, creds, trans_request):
+        return {
             "locale": trans_request.locale,
             "authorization_number": trans_request.auth_number,
             "account_number": trans_request.account_number,
@@ -33,17 +52,30 @@ class TransactionsAPIClient(WFRSGatewayAPIClient):
             "ticket_number": trans_request.ticket_number,
             "merchant_number": creds.merchant_num,
         }
-        if transaction_uuid is None:
-            transaction_uuid = uuid.uuid4()
-        resp = self.api_post(
-            api_path, client_request_id=transaction_uuid, json=trans_request_data
-        )
-        resp.raise_for_status()
-        resp_data = resp.json()
+
+    @traced(SPAN_RECORD_TRANSACTION)
+    def record_transaction_response(
+        self, creds, trans_request, transaction_uuid, resp_data, persist=True
+    ):
         # Find the related plan
         plan_number = resp_data.get("plan_number", trans_request.plan_number)
         plan, _ = FinancingPlan.objects.get_or_create(plan_number=plan_number)
         # Persist transaction data and WF specific metadata
+        transfer = self.build_transfer(
+            creds, trans_request, transaction_uuid, resp_data, plan
+        )
+        if persist:
+            transfer.save()
+        # Check for approval
+        if transfer.status != TRANS_APPROVED:
+            exc = TransactionDenied("%s: %s" % (transfer.status, transfer.message))
+            exc.status = transfer.status
+            raise exc
+        # Return the transfer metadata
+        return transfer
+
+    def build_transfer(self, creds, trans_request, transaction_uuid, resp_data, plan):
+        """Build an (unsaved) ``TransferMetadata`` from the response data"""
         transfer = TransferMetadata()
         transfer.user = trans_request.user
         transfer.merchant_name = creds.name
@@ -64,22 +96,14 @@ class TransactionsAPIClient(WFRSGatewayAPIClient):
         transfer.status = resp_data["transaction_status"]
         transfer.message = resp_data.get("status_message", "")
         transfer.disclosure = resp_data.get("disclosure", "")
-        if persist:
-            transfer.save()
-        # Check for approval
-        if transfer.status != TRANS_APPROVED:
-            exc = TransactionDenied("%s: %s" % (transfer.status, transfer.message))
-            exc.status = transfer.status
-            raise exc
-        # Return the transfer metadata
         return transfer
 
     def get_api_path(self, trans_request):
         actions = {
             TRANS_TYPE_AUTH: "authorization",
             TRANS_TYPE_CANCEL_AUTH: "cancel-authorization",
-            # TRANS_TYPE_CHARGE: 'charge',
-            # TRANS_TYPE_AUTH_AND_CHARGE: 'authorization-charge',
+            TRANS_TYPE_CHARGE: "charge",
+            TRANS_TYPE_AUTH_AND_CHARGE: "authorization-charge",
             TRANS_TYPE_AUTH_AND_CHARGE_TIMEOUT_REVERSAL: "timeout-authorization-charge",
             TRANS_TYPE_RETURN_CREDIT: "return",
             TRANS_TYPE_VOID_SALE: "void-sale",
@@ -220,3 +220,29 @@ PREQUAL_REDIRECT_APP_APPROVED = "41"
 PREQUAL_REDIRECT_APP_PENDING = "42"
 PREQUAL_REDIRECT_APP_ERROR = "43"
 PREQUAL_REDIRECT_APP_DENIED = "44"
+
+EXPORT_TYPE_CREDIT_APPS = "credit-applications"
+EXPORT_TYPE_PREQUAL_REQUESTS = "prequal-requests"
+EXPORT_TYPE_SDK_APPS = "sdk-applications"
+EXPORT_TYPES = (
+    (EXPORT_TYPE_CREDIT_APPS, _("Credit Applications")),
+    (EXPORT_TYPE_PREQUAL_REQUESTS, _("Pre-Qualification Requests")),
+    (EXPORT_TYPE_SDK_APPS, _("SDK Credit Applications")),
+)
+
+EXPORT_STATUS_PENDING = "PENDING"
+EXPORT_STATUS_RUNNING = "RUNNING"
+EXPORT_STATUS_COMPLETE = "COMPLETE"
+EXPORT_STATUS_FAILED = "FAILED"
+EXPORT_STATUSES = (
+    (EXPORT_STATUS_PENDING, _("Pending")),
+    (EXPORT_STATUS_RUNNING, _("Running")),
+    (EXPORT_STATUS_COMPLETE, _("Complete")),
+    (EXPORT_STATUS_FAILED, _("Failed")),
+)
+
+# Weight labels used to tell apart the different kinds of data stored in a single full-text search vector
+SEARCH_WEIGHT_NAME = "A"
+SEARCH_WEIGHT_EMAIL = "B"
+SEARCH_WEIGHT_ADDRESS = "C"
+SEARCH_WEIGHT_PHONE = "D"
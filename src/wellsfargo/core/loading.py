@@ -0,0 +1,31 @@
+from django.core.exceptions import ImproperlyConfigured
+import importlib
+import threading
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def load_class(path):
+    """Import and return the class (or function) at the given dotted path"""
+    pkgname, fnname = path.rsplit(".", 1)
+    try:
+        pkg = importlib.import_module(pkgname)
+        return getattr(pkg, fnname)
+    except (ImportError, AttributeError):
+        raise ImproperlyConfigured("Could not import class at path {}".format(path))
+
+
+def get_configured_instance(settings, class_key, kwargs_key):
+    """
+    Return an instance of the class named by ``settings[class_key]``, built with the keyword arguments in
+    ``settings[kwargs_key]``. Each class is built once per set of arguments, so that its instance can keep
+    state (like open files, or accumulated metrics) between calls.
+    """
+    klass = settings[class_key]
+    kwargs = settings.get(kwargs_key, {})
+    key = (klass, repr(sorted(kwargs.items())))
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = load_class(klass)(**kwargs)
+        return _instances[key]
@@ -26,9 +26,14 @@ class WFRSDashboardConfig(OscarDashboardConfig):
             CreditApplicationDetailView,
             TransferMetadataListView,
             TransferMetadataDetailView,
+            BulkReturnView,
+            BulkReturnResultsView,
             PreQualificationListView,
             PreQualificationDetailView,
             SDKApplicationListView,
+            ExportJobListView,
+            ExportJobCreateView,
+            ExportJobDownloadView,
         )
 
         urlpatterns = [
@@ -90,6 +95,16 @@ class WFRSDashboardConfig(OscarDashboardConfig):
                 TransferMetadataDetailView.as_view(),
                 name="wfrs-transfer-detail",
             ),
+            re_path(
+                r"^bulk-returns/$",
+                BulkReturnView.as_view(),
+                name="wfrs-bulk-return",
+            ),
+            re_path(
+                r"^bulk-returns/(?P<token>[0-9a-f\-]+)/$",
+                BulkReturnResultsView.as_view(),
+                name="wfrs-bulk-return-results",
+            ),
             re_path(
                 r"^prequal-requests/$",
                 PreQualificationListView.as_view(),
@@ -105,5 +120,20 @@ class WFRSDashboardConfig(OscarDashboardConfig):
                 SDKApplicationListView.as_view(),
                 name="wfrs-sdk-application-list",
             ),
+            re_path(
+                r"^exports/$",
+                ExportJobListView.as_view(),
+                name="wfrs-export-list",
+            ),
+            re_path(
+                r"^exports/new/$",
+                ExportJobCreateView.as_view(),
+                name="wfrs-export-create",
+            ),
+            re_path(
+                r"^exports/(?P<pk>[0-9]+)/download/$",
+                ExportJobDownloadView.as_view(),
+                name="wfrs-export-download",
+            ),
         ]
         return self.post_process_urls(urlpatterns)
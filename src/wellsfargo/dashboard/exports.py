@@ -0,0 +1,168 @@
+from datetime import timedelta
+from urllib.parse import urlencode
+from django.core.files import File
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from django.utils.html import strip_tags
+from oscar.core.compat import UnicodeCSVWriter
+from ..core.constants import (
+    EXPORT_TYPE_CREDIT_APPS,
+    EXPORT_TYPE_PREQUAL_REQUESTS,
+    EXPORT_TYPE_SDK_APPS,
+    EXPORT_STATUS_PENDING,
+    EXPORT_STATUS_RUNNING,
+    EXPORT_STATUS_COMPLETE,
+    EXPORT_STATUS_FAILED,
+)
+from ..models import ExportJob
+from ..settings import WFRS_EXPORT_CHUNK_SIZE, WFRS_EXPORT_RETENTION_DAYS
+from ..tasks import enqueue_task
+import gzip
+import io
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Query string parameters which control how a list is displayed, rather than which rows are in it.
+IGNORED_QUERY_PARAMS = ("page", "per_page", "response_format", "after", "before")
+
+
+def format_csv_cell(str_in):
+    if not str_in:
+        return "–"
+    return strip_tags(str_in).replace("\n", "").strip()
+
+
+def iter_table_csv_rows(table):
+    """
+    Loop through each row in the table (starting with the header row), strip out any HTML, and
+    yield it as a CSV row, excluding the last column (actions).
+    """
+    for row_raw in table.as_values():
+        row_values = tuple(format_csv_cell(value) for value in row_raw)
+        yield row_values[:-1]
+
+
+def iter_queryset_chunks(queryset, chunk_size):
+    """Yield lists of up to ``chunk_size`` objects, streaming them from the database with a cursor"""
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def get_export_view_class(export_type):
+    from . import views
+
+    view_classes = {
+        EXPORT_TYPE_CREDIT_APPS: views.CreditApplicationListView,
+        EXPORT_TYPE_PREQUAL_REQUESTS: views.PreQualificationListView,
+        EXPORT_TYPE_SDK_APPS: views.SDKApplicationListView,
+    }
+    return view_classes[export_type]
+
+
+def clean_export_query(query_dict):
+    """Given a QueryDict, return the filter and sort parameters to save on an ExportJob"""
+    return {
+        key: values
+        for key, values in query_dict.lists()
+        if key not in IGNORED_QUERY_PARAMS
+    }
+
+
+def create_export_job(export_type, query, user=None, compress=False):
+    job = ExportJob.objects.create(
+        export_type=export_type,
+        query=query,
+        compress=compress,
+        requesting_user=user,
+    )
+    enqueue_task("wellsfargo.dashboard.exports.run_export_job", job.pk)
+    return job
+
+
+def run_export_job(job_id, chunk_size=None):
+    """Task entry point: render the list view described by the given ExportJob into a file"""
+    # Claim the job, making sure that it doesn't run twice
+    claimed = ExportJob.objects.filter(pk=job_id, status=EXPORT_STATUS_PENDING).update(
+        status=EXPORT_STATUS_RUNNING
+    )
+    if not claimed:
+        logger.warning("ExportJob[%s] is not pending. Skipping it.", job_id)
+        return
+    job = ExportJob.objects.get(pk=job_id)
+    try:
+        write_export_file(job, chunk_size=chunk_size or WFRS_EXPORT_CHUNK_SIZE)
+    except Exception as e:
+        logger.exception("ExportJob[%s] failed.", job.pk)
+        job.status = EXPORT_STATUS_FAILED
+        job.error_message = str(e)
+        job.completed_datetime = timezone.now()
+        job.save()
+        return
+    job.status = EXPORT_STATUS_COMPLETE
+    job.completed_datetime = timezone.now()
+    job.save()
+
+
+def write_export_file(job, chunk_size):
+    # Rebuild the list view exactly as the requesting user saw it
+    request = HttpRequest()
+    request.GET = QueryDict(urlencode(job.query, doseq=True))
+    request.user = job.requesting_user
+    view = get_export_view_class(job.export_type)()
+    view.setup(request)
+    queryset = view.get_queryset()
+    table_class = view.get_table_class()
+    # Apply the same sorting as the table would, so that the file's rows match the page
+    table = table_class(
+        queryset, order_by=request.GET.get(table_class._meta.order_by_field)
+    )
+    queryset = table.data.data
+
+    job.total_rows = queryset.count()
+    job.save(update_fields=["total_rows", "modified_datetime"])
+
+    filename = view.get_download_filename(request)
+    with tempfile.TemporaryFile() as tmp:
+        raw = gzip.GzipFile(fileobj=tmp, mode="wb") if job.compress else tmp
+        stream = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        writer = UnicodeCSVWriter(open_file=stream)
+        # Header row
+        writer.writerow(next(iter_table_csv_rows(table_class([]))))
+        # Data rows, rendered one chunk at a time to keep memory use flat
+        rows_written = 0
+        for chunk in iter_queryset_chunks(queryset, chunk_size):
+            rows = iter_table_csv_rows(table_class(chunk))
+            next(rows)  # Skip the header row
+            writer.writerows(rows)
+            rows_written += len(chunk)
+            ExportJob.objects.filter(pk=job.pk).update(
+                rows_written=rows_written, modified_datetime=timezone.now()
+            )
+        stream.flush()
+        stream.detach()
+        if job.compress:
+            raw.close()
+            filename += ".gz"
+        tmp.seek(0)
+        job.rows_written = rows_written
+        job.file.save(filename, File(tmp), save=False)
+
+
+def purge_expired_exports(retention_days=WFRS_EXPORT_RETENTION_DAYS):
+    """Delete export jobs (and their files) which are older than the retention period"""
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    purged = 0
+    for job in ExportJob.objects.filter(created_datetime__lt=cutoff).iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        purged += 1
+    return purged
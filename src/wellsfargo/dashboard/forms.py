@@ -1,14 +1,20 @@
 from django import forms
+from django.http import QueryDict
 from django.utils.translation import gettext_lazy as _
 from oscar.forms.widgets import DateTimePickerInput
+from ..batch.returns import parse_amount
 from ..core.constants import (
     CREDIT_APP_STATUSES,
+    EXPORT_TYPES,
     PREQUAL_TRANS_STATUS_CHOICES,
 )
 from ..models import (
     FinancingPlan,
     FinancingPlanBenefit,
 )
+from ..settings import WFRS_BATCH
+import re
+import uuid
 
 
 class FinancingPlanForm(forms.ModelForm):
@@ -70,6 +76,7 @@ class PreQualSearchForm(forms.Form):
     )
     first_name = forms.CharField(required=False, label=_("First Name"))
     last_name = forms.CharField(required=False, label=_("Last Name"))
+    phone = forms.CharField(required=False, label=_("Phone Number"))
     status = forms.ChoiceField(
         required=False,
         label=_("Status"),
@@ -82,6 +89,10 @@ class PreQualSearchForm(forms.Form):
         required=False, label=_("Submitted Before"), widget=DateTimePickerInput
     )
 
+    def clean_phone(self):
+        # Phone numbers are stored in E.164 format, so only search by the digits
+        return re.sub(r"[^0-9]", "", self.cleaned_data.get("phone") or "")
+
 
 class SDKApplicationSearchForm(forms.Form):
     # Basic Search
@@ -94,3 +105,50 @@ class SDKApplicationSearchForm(forms.Form):
     created_date_to = forms.DateTimeField(
         required=False, label=_("Submitted Before"), widget=DateTimePickerInput
     )
+
+
+class ExportJobForm(forms.Form):
+    export_type = forms.ChoiceField(choices=EXPORT_TYPES, widget=forms.HiddenInput())
+    query = forms.CharField(required=False, widget=forms.HiddenInput())
+    compress = forms.BooleanField(required=False, label=_("Compress (gzip)"))
+
+    def clean_query(self):
+        return QueryDict(self.cleaned_data.get("query", ""))
+
+
+class BulkReturnForm(forms.Form):
+    token = forms.UUIDField(widget=forms.HiddenInput, initial=uuid.uuid4)
+    orders = forms.CharField(
+        label=_("Orders"),
+        widget=forms.Textarea(attrs={"rows": 10}),
+        help_text=_(
+            "One order number (or transfer merchant reference) per line. To return part of an order, follow "
+            "it with a comma and the amount to return."
+        ),
+    )
+
+    def clean_orders(self):
+        items = []
+        for line in self.cleaned_data["orders"].splitlines():
+            if not line.strip():
+                continue
+            order, _sep, amount = line.partition(",")
+            try:
+                parse_amount(amount.strip())
+            except ValueError:
+                raise forms.ValidationError(
+                    _("Invalid amount for order %(order)s: %(amount)s")
+                    % {"order": order.strip(), "amount": amount.strip()}
+                )
+            items.append({"order": order.strip(), "amount": amount.strip()})
+        if not items:
+            raise forms.ValidationError(_("Enter at least one order."))
+        max_items = WFRS_BATCH["dashboard_return_limit"]
+        if len(items) > max_items:
+            raise forms.ValidationError(
+                _(
+                    "Enter at most %(max_items)s orders at a time. Use the wfrs_bulk_return command for more."
+                )
+                % {"max_items": max_items}
+            )
+        return items
@@ -0,0 +1,209 @@
+from datetime import datetime, timedelta, timezone
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from django_tables2.paginators import LazyPaginator
+from ..settings import WFRS_DASHBOARD_PAGINATION
+import hashlib
+import json
+
+PAGINATION_MODE_OFFSET = "offset"
+PAGINATION_MODE_KEYSET = "keyset"
+
+COUNT_MODE_EXACT = "exact"
+COUNT_MODE_CACHED = "cached"
+COUNT_MODE_ESTIMATED = "estimated"
+
+# Query string parameters holding keyset pagination cursors
+CURSOR_AFTER_PARAM = "after"
+CURSOR_BEFORE_PARAM = "before"
+
+# Keyset pagination only works with the default (newest first) ordering of the list views.
+KEYSET_ORDERING = ("-created_datetime", "-id")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(record):
+    micros = (record.created_datetime - _EPOCH) // timedelta(microseconds=1)
+    return "%s-%s" % (micros, record.pk)
+
+
+def decode_cursor(value):
+    """Return a ``(created_datetime, pk)`` tuple, or ``None`` if the cursor is invalid"""
+    try:
+        micros, pk = (int(part) for part in value.split("-"))
+    except (AttributeError, ValueError):
+        return None
+    return (_EPOCH + timedelta(microseconds=micros), pk)
+
+
+def _get_queryset(object_list):
+    # Paginators are given the table's BoundRows. Dig the underlying queryset out of it.
+    data = getattr(getattr(object_list, "data", None), "data", None)
+    if isinstance(data, QuerySet):
+        return data.order_by()
+    return None
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Offset paginator which caches the total row count of each distinct query, so that paging
+    through a list (or reloading it) doesn't re-count the whole table every time.
+    """
+
+    @cached_property
+    def count(self):
+        qs = _get_queryset(self.object_list)
+        if qs is None:
+            return super().count
+        query = str(qs.query).encode("utf-8")
+        key = "wfrs-dashboard-count-%s" % hashlib.sha256(query).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = qs.count()
+            cache.set(key, count, WFRS_DASHBOARD_PAGINATION["count_cache_timeout"])
+        return count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Offset paginator which uses the query planner's row estimate as the total row count, instead of
+    running ``COUNT(*)``. Small results (per ``estimated_count_threshold``) are still counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        qs = _get_queryset(self.object_list)
+        if qs is None:
+            return super().count
+        sql, params = qs.query.sql_with_params()
+        with connections[qs.db].cursor() as cursor:
+            cursor.execute("EXPLAIN (FORMAT JSON) %s" % sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]["Plan"]["Plan Rows"])
+        if estimate < WFRS_DASHBOARD_PAGINATION["estimated_count_threshold"]:
+            return qs.count()
+        return estimate
+
+
+class KeysetPaginator(LazyPaginator):
+    """
+    Paginator for a queryset which has already been filtered to start at a keyset cursor (see
+    ``DashboardPaginationMixin``). Always serves the first page of what it's given, never counts, and
+    provides the cursors of the neighboring pages.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, per_page, has_previous=False, **kwargs):
+        self.has_previous = has_previous
+        super().__init__(object_list, per_page, **kwargs)
+
+    def page(self, number):
+        self._page = super().page(1)
+        return self._page
+
+    @property
+    def next_cursor(self):
+        if not self._page.has_next():
+            return None
+        return encode_cursor(self._page.object_list[-1].record)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous or not self._page.object_list:
+            return None
+        return encode_cursor(self._page.object_list[0].record)
+
+
+class DashboardPaginationMixin(object):
+    """
+    Configures the pagination of a dashboard ``SingleTableView`` per ``WFRS_DASHBOARD_PAGINATION``.
+
+    In keyset mode, pages of the default ordering are found by seeking to a ``(created_datetime,
+    id)`` cursor with the ``(-created_datetime, -id)`` index, so the deepest page costs the same as
+    the first. Lists sorted by a column fall back to offset pagination.
+    """
+
+    count_paginator_classes = {
+        COUNT_MODE_EXACT: Paginator,
+        COUNT_MODE_CACHED: CachedCountPaginator,
+        COUNT_MODE_ESTIMATED: EstimatedCountPaginator,
+    }
+
+    _keyset_has_previous = False
+
+    def is_keyset_paginated(self):
+        if WFRS_DASHBOARD_PAGINATION["mode"] != PAGINATION_MODE_KEYSET:
+            return False
+        if self.request.GET.get("sort"):
+            return False
+        if getattr(self, "is_csv_download", None) and self.is_csv_download():
+            return False
+        return True
+
+    def get_keyset_per_page(self):
+        try:
+            return int(self.request.GET["per_page"])
+        except (KeyError, ValueError):
+            return self.paginate_by or self.get_table_class()._meta.per_page
+
+    def get_table_data(self):
+        data = super().get_table_data()
+        if self.is_keyset_paginated():
+            data = self.apply_keyset_cursor(data.order_by(*KEYSET_ORDERING))
+        return data
+
+    def apply_keyset_cursor(self, qs):
+        after = decode_cursor(self.request.GET.get(CURSOR_AFTER_PARAM))
+        if after:
+            self._keyset_has_previous = True
+            return self._filter_older(qs, after, inclusive=False)
+        before = decode_cursor(self.request.GET.get(CURSOR_BEFORE_PARAM))
+        if before:
+            # Find where the page of rows just newer than the cursor starts, reading only the index
+            per_page = self.get_keyset_per_page()
+            newer = list(
+                self._filter_newer(qs, before)
+                .order_by("created_datetime", "id")
+                .values_list("created_datetime", "id")[: per_page + 1]
+            )
+            if len(newer) > per_page:
+                self._keyset_has_previous = True
+                return self._filter_older(qs, newer[per_page - 1], inclusive=True)
+        return qs
+
+    def _filter_older(self, qs, cursor, inclusive):
+        created, pk = cursor
+        id_lookup = "id__lte" if inclusive else "id__lt"
+        # The redundant ``created_datetime__lte`` bound lets Postgres start the index scan at the cursor.
+        return qs.filter(created_datetime__lte=created).filter(
+            Q(created_datetime__lt=created)
+            | Q(created_datetime=created, **{id_lookup: pk})
+        )
+
+    def _filter_newer(self, qs, cursor):
+        created, pk = cursor
+        return qs.filter(created_datetime__gte=created).filter(
+            Q(created_datetime__gt=created) | Q(created_datetime=created, id__gt=pk)
+        )
+
+    def get_table_pagination(self, table):
+        paginate = super().get_table_pagination(table)
+        if paginate is False:
+            return paginate
+        if paginate is True:
+            paginate = {}
+        if self.is_keyset_paginated():
+            paginate["paginator_class"] = KeysetPaginator
+            paginate["has_previous"] = self._keyset_has_previous
+        else:
+            paginate["paginator_class"] = self.count_paginator_classes[
+                WFRS_DASHBOARD_PAGINATION["count"]
+            ]
+        return paginate
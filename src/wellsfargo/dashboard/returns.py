@@ -0,0 +1,83 @@
+"""
+Bulk returns started from the dashboard.
+
+Each submission of the bulk return form has its own token. Returns are made by a background task (see
+``WFRS_TASK_RUNNER``), and its progress and results are kept in the Django cache under the token, for the
+results page to show. A token can only be used once, so submitting the same form again (say, by refreshing
+the page or going back to it) shows the results of the first submission, instead of returning the orders
+again.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from ..batch.returns import ReturnBatch
+from ..settings import WFRS_BATCH
+from ..tasks import enqueue_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+BULK_RETURN_STATUS_PENDING = "pending"
+BULK_RETURN_STATUS_COMPLETE = "complete"
+BULK_RETURN_STATUS_FAILED = "failed"
+
+
+def _get_key(token):
+    return "wfrs-bulk-return-%s" % token
+
+
+def get_bulk_return(token):
+    """
+    Return the ``{"status": ..., "results": [...], "counts": {...}}`` dict of the bulk return with the given
+    token, or ``None`` if it isn't known
+    """
+    return cache.get(_get_key(token))
+
+
+def _set_bulk_return(token, status, results=None, counts=None):
+    cache.set(
+        _get_key(token),
+        {
+            "status": status,
+            "results": results or [],
+            "counts": counts or {},
+        },
+        WFRS_BATCH["dashboard_results_timeout"],
+    )
+
+
+def start_bulk_return(token, items, user=None):
+    """
+    Return the given items in the background, unless the token has already been used. Returns whether the
+    return was started.
+    """
+    started = cache.add(
+        _get_key(token),
+        {"status": BULK_RETURN_STATUS_PENDING, "results": [], "counts": {}},
+        WFRS_BATCH["dashboard_results_timeout"],
+    )
+    if not started:
+        return False
+    enqueue_task(
+        "wellsfargo.dashboard.returns.run_bulk_return",
+        str(token),
+        items,
+        user_id=user.pk if user is not None else None,
+    )
+    return True
+
+
+def run_bulk_return(token, items, user_id=None):
+    user = None
+    if user_id is not None:
+        user = get_user_model().objects.filter(pk=user_id).first()
+    results = []
+    try:
+        stats = ReturnBatch(user=user).run(items, on_results=results.extend)
+    except Exception:
+        logger.exception("Bulk return %s failed.", token)
+        _set_bulk_return(token, BULK_RETURN_STATUS_FAILED, results=results)
+        return
+    _set_bulk_return(
+        token, BULK_RETURN_STATUS_COMPLETE, results=results, counts=stats.counts
+    )
@@ -2,6 +2,7 @@ from zoneinfo import ZoneInfo
 from django.utils.translation import gettext_lazy as _
 from django_tables2 import Column, TemplateColumn, DateTimeColumn, LinkColumn, A
 from oscar.apps.dashboard.tables import DashboardTable as BaseDashboardTable
+from ..models import CreditApplication, PreQualificationRequest, TransferMetadata
 
 
 class TZAwareDateTimeColumn(DateTimeColumn):
@@ -12,6 +13,27 @@ class TZAwareDateTimeColumn(DateTimeColumn):
 
 
 class DashboardTable(BaseDashboardTable):
+    def get_caption_display(self):
+        # Only count the rows when the caption actually displays the count
+        if "%" not in str(self.caption):
+            return self.caption
+        return super().get_caption_display()
+
+    def prefetch_records(self, records):
+        """
+        Load whatever the table's columns need from the given records in bulk, so that rendering them
+        doesn't run queries for every row.
+        """
+        pass
+
+    def paginate(self, *args, **kwargs):
+        super().paginate(*args, **kwargs)
+        self.prefetch_records([row.record for row in self.page.object_list])
+
+    def as_values(self, *args, **kwargs):
+        self.prefetch_records(list(self.data))
+        return super().as_values(*args, **kwargs)
+
     class Meta(BaseDashboardTable.Meta):
         template_name = "wfrs/dashboard/responsive-table.html"
 
@@ -93,6 +115,9 @@ class CreditApplicationTable(DashboardTable):
         orderable=False,
     )
 
+    def prefetch_records(self, records):
+        CreditApplication.prefetch_table_data(records)
+
     class Meta(DashboardTable.Meta):
         sequence = (
             "main_applicant_name",
@@ -143,6 +168,9 @@ class TransferMetadataTable(DashboardTable):
         verbose_name=_("Created On"), order_by="created_datetime", format="D, N j Y, P"
     )
 
+    def prefetch_records(self, records):
+        TransferMetadata.prefetch_orders(records)
+
     class Meta(DashboardTable.Meta):
         sequence = (
             "merchant_reference",
@@ -204,6 +232,9 @@ class PreQualificationTable(DashboardTable):
         format="D, N j Y, P",
     )
 
+    def prefetch_records(self, records):
+        PreQualificationRequest.prefetch_table_data(records)
+
     class Meta(DashboardTable.Meta):
         sequence = (
             "uuid",
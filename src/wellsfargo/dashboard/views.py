@@ -1,28 +1,43 @@
 from urllib.parse import urlencode
 from django.contrib.auth import get_user_model
-from django.contrib.postgres.search import SearchVector
+from django.contrib.postgres.search import SearchQuery, SearchVector
 from django.urls import reverse_lazy
 from django.db.models import Q
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.contrib import messages
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.utils.translation import gettext_lazy as _
-from django.utils.html import strip_tags
 from django.views import generic
 from django_tables2 import SingleTableView
 from oscar.core.compat import UnicodeCSVWriter
 from ..core.constants import (
+    EXPORT_TYPE_CREDIT_APPS,
+    EXPORT_TYPE_PREQUAL_REQUESTS,
+    EXPORT_TYPE_SDK_APPS,
     get_prequal_trans_status_name,
     PREQUAL_TRANS_STATUS_REJECTED,
+    SEARCH_WEIGHT_NAME,
+    SEARCH_WEIGHT_EMAIL,
+    SEARCH_WEIGHT_ADDRESS,
+    SEARCH_WEIGHT_PHONE,
 )
 from ..models import (
     FinancingPlan,
     FinancingPlanBenefit,
     CreditApplication,
+    ExportJob,
     TransferMetadata,
     PreQualificationRequest,
     PreQualificationSDKApplicationResult,
 )
+from ..models.prequal import PREQUAL_SEARCH_CONFIG
+from ..utils import build_weighted_search_query
+from .exports import clean_export_query, create_export_job, iter_table_csv_rows
+from .pagination import DashboardPaginationMixin
+from .returns import get_bulk_return, start_bulk_return
 from .forms import (
+    BulkReturnForm,
+    ExportJobForm,
     FinancingPlanForm,
     FinancingPlanBenefitForm,
     ApplicationSearchForm,
@@ -38,11 +53,17 @@ from .tables import (
 
 
 class CSVDownloadableTableMixin(object):
+    export_type = None
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         download_params = {k: v for k, v in self.request.GET.items()}
         download_params["response_format"] = "csv"
         context["download_querystring"] = urlencode(download_params)
+        context["export_type"] = self.export_type
+        context["export_querystring"] = urlencode(
+            clean_export_query(self.request.GET), doseq=True
+        )
         return context
 
     def is_csv_download(self):
@@ -64,17 +85,7 @@ class CSVDownloadableTableMixin(object):
             "attachment; filename=%s" % self.get_download_filename(request)
         )
         writer = UnicodeCSVWriter(open_file=response)
-
-        def format_csv_cell(str_in):
-            if not str_in:
-                return "–"
-            return strip_tags(str_in).replace("\n", "").strip()
-
-        # Loop through each row in the table, strip out any HTMl, and write it to a CSV excluding the last column (actions).
-        for row_raw in table.as_values():
-            row_values = tuple(format_csv_cell(value) for value in row_raw)
-            writer.writerow(row_values[:-1])
-
+        writer.writerows(iter_table_csv_rows(table))
         return response
 
 
@@ -112,6 +123,9 @@ class FinancingPlanBenefitListView(generic.ListView):
     template_name = "wfrs/dashboard/benefit_list.html"
     context_object_name = "benefits"
 
+    def get_queryset(self):
+        return super().get_queryset().prefetch_related("plans")
+
 
 class FinancingPlanBenefitCreateView(generic.CreateView):
     model = FinancingPlanBenefit
@@ -136,11 +150,14 @@ class FinancingPlanBenefitDeleteView(generic.DeleteView):
     context_object_name = "benefit"
 
 
-class CreditApplicationListView(CSVDownloadableTableMixin, SingleTableView):
+class CreditApplicationListView(
+    DashboardPaginationMixin, CSVDownloadableTableMixin, SingleTableView
+):
     template_name = "wfrs/dashboard/application_list.html"
     form_class = ApplicationSearchForm
     table_class = CreditApplicationTable
     context_table_name = "applications"
+    export_type = EXPORT_TYPE_CREDIT_APPS
     filter_descrs = []
 
     def get_context_data(self, **kwargs):
@@ -160,10 +177,12 @@ class CreditApplicationListView(CSVDownloadableTableMixin, SingleTableView):
         return table
 
     def get_queryset(self):
-        qs = CreditApplication.objects.get_queryset()
+        qs = CreditApplication.objects.select_related(
+            "main_applicant", "joint_applicant", "user", "submitting_user"
+        )
         # Default ordering
         if not self.request.GET.get("sort"):
-            qs = qs.order_by("-created_datetime")
+            qs = qs.order_by("-created_datetime", "-id")
         # Apply search filters
         qs = self.apply_search(qs)
         return qs
@@ -178,32 +197,7 @@ class CreditApplicationListView(CSVDownloadableTableMixin, SingleTableView):
         # Basic search
         search_text = data.get("search_text")
         if search_text:
-            qs = qs.annotate(
-                text=SearchVector(
-                    "main_applicant__first_name",
-                    "main_applicant__last_name",
-                    "joint_applicant__first_name",
-                    "joint_applicant__last_name",
-                    "main_applicant__email_address",
-                    "joint_applicant__email_address",
-                    "main_applicant__address__address_line_1",
-                    "main_applicant__address__address_line_2",
-                    "main_applicant__address__city",
-                    "main_applicant__address__state_code",
-                    "main_applicant__address__postal_code",
-                    "joint_applicant__address__address_line_1",
-                    "joint_applicant__address__address_line_2",
-                    "joint_applicant__address__city",
-                    "joint_applicant__address__state_code",
-                    "joint_applicant__address__postal_code",
-                    "main_applicant__home_phone",
-                    "main_applicant__mobile_phone",
-                    "main_applicant__work_phone",
-                    "joint_applicant__home_phone",
-                    "joint_applicant__mobile_phone",
-                    "joint_applicant__work_phone",
-                ),
-            ).filter(text=search_text)
+            qs = qs.filter(search_vector=search_text)
             self.filter_descrs.append(
                 _("Application contains “%(text)s”") % dict(text=search_text)
             )
@@ -216,62 +210,38 @@ class CreditApplicationListView(CSVDownloadableTableMixin, SingleTableView):
 
         name = data.get("name")
         if name:
-            qs = qs.annotate(
-                name=SearchVector(
-                    "main_applicant__first_name",
-                    "main_applicant__last_name",
-                    "joint_applicant__first_name",
-                    "joint_applicant__last_name",
-                ),
-            ).filter(name=name)
+            qs = qs.filter(
+                search_vector=build_weighted_search_query(name, SEARCH_WEIGHT_NAME)
+            )
             self.filter_descrs.append(
                 _("Applicant name contains “%(name)s”") % dict(name=name)
             )
 
         email = data.get("email")
         if email:
-            qs = qs.annotate(
-                email=SearchVector(
-                    "main_applicant__email_address",
-                    "joint_applicant__email_address",
-                ),
-            ).filter(email=email)
+            qs = qs.filter(
+                search_vector=build_weighted_search_query(email, SEARCH_WEIGHT_EMAIL)
+            )
             self.filter_descrs.append(
                 _("Applicant email contains “%(email)s”") % dict(email=email)
             )
 
         address = data.get("address")
         if address:
-            qs = qs.annotate(
-                addr=SearchVector(
-                    "main_applicant__address__address_line_1",
-                    "main_applicant__address__address_line_2",
-                    "main_applicant__address__city",
-                    "main_applicant__address__state_code",
-                    "main_applicant__address__postal_code",
-                    "joint_applicant__address__address_line_1",
-                    "joint_applicant__address__address_line_2",
-                    "joint_applicant__address__city",
-                    "joint_applicant__address__state_code",
-                    "joint_applicant__address__postal_code",
-                ),
-            ).filter(addr=address)
+            qs = qs.filter(
+                search_vector=build_weighted_search_query(
+                    address, SEARCH_WEIGHT_ADDRESS
+                )
+            )
             self.filter_descrs.append(
                 _("Applicant address contains “%(address)s”") % dict(address=address)
             )
 
         phone = data.get("phone")
         if phone:
-            qs = qs.annotate(
-                phone=SearchVector(
-                    "main_applicant__home_phone",
-                    "main_applicant__mobile_phone",
-                    "main_applicant__work_phone",
-                    "joint_applicant__home_phone",
-                    "joint_applicant__mobile_phone",
-                    "joint_applicant__work_phone",
-                ),
-            ).filter(phone=phone)
+            qs = qs.filter(
+                search_vector=build_weighted_search_query(phone, SEARCH_WEIGHT_PHONE)
+            )
             self.filter_descrs.append(
                 _("Phone number contains “%(phone)s”") % dict(phone=phone)
             )
@@ -328,10 +298,12 @@ class CreditApplicationListView(CSVDownloadableTableMixin, SingleTableView):
 
 class CreditApplicationDetailView(generic.DetailView):
     template_name = "wfrs/dashboard/application_detail.html"
-    queryset = CreditApplication.objects.all()
+    queryset = CreditApplication.objects.select_related(
+        "main_applicant", "joint_applicant", "user", "submitting_user"
+    )
 
 
-class TransferMetadataListView(SingleTableView):
+class TransferMetadataListView(DashboardPaginationMixin, SingleTableView):
     template_name = "wfrs/dashboard/transfer_list.html"
     table_class = TransferMetadataTable
     context_table_name = "transfers"
@@ -342,10 +314,10 @@ class TransferMetadataListView(SingleTableView):
         return table
 
     def get_queryset(self):
-        qs = TransferMetadata.objects.get_queryset()
+        qs = TransferMetadata.objects.select_related("user", "financing_plan")
         # Default ordering
         if not self.request.GET.get("sort"):
-            qs = qs.order_by("-created_datetime")
+            qs = qs.order_by("-created_datetime", "-id")
         return qs
 
 
@@ -355,14 +327,56 @@ class TransferMetadataDetailView(generic.DetailView):
     slug_url_kwarg = "merchant_reference"
 
     def get_queryset(self):
-        return TransferMetadata.objects.all()
+        return TransferMetadata.objects.select_related("user", "financing_plan")
+
+
+class BulkReturnView(generic.FormView):
+    """
+    Return several orders at once. Returns are made in the background, and the form redirects to a page
+    showing their outcome. For more orders than ``WFRS_BATCH["dashboard_return_limit"]``, use the
+    ``wfrs_bulk_return`` management command.
+    """
+
+    template_name = "wfrs/dashboard/bulk_return.html"
+    form_class = BulkReturnForm
+
+    def form_valid(self, form):
+        token = form.cleaned_data["token"]
+        if start_bulk_return(
+            token, form.cleaned_data["orders"], user=self.request.user
+        ):
+            messages.info(self.request, _("Your returns have been started."))
+        return redirect("wfrs-bulk-return-results", token=token)
+
+
+class BulkReturnResultsView(generic.TemplateView):
+    """Show the progress and outcome of a bulk return, along with the form to start another"""
+
+    template_name = "wfrs/dashboard/bulk_return.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        bulk_return = get_bulk_return(self.kwargs["token"])
+        if bulk_return is None:
+            raise Http404(_("These returns are no longer available."))
+        context["form"] = BulkReturnForm()
+        context["bulk_return"] = bulk_return
+        context["results"] = bulk_return["results"]
+        context["counts"] = ", ".join(
+            "%s=%s" % item for item in sorted(bulk_return["counts"].items())
+        )
+        context["all_returned"] = set(bulk_return["counts"]) <= {"returned"}
+        return context
 
 
-class PreQualificationListView(CSVDownloadableTableMixin, SingleTableView):
+class PreQualificationListView(
+    DashboardPaginationMixin, CSVDownloadableTableMixin, SingleTableView
+):
     template_name = "wfrs/dashboard/prequal_list.html"
     form_class = PreQualSearchForm
     table_class = PreQualificationTable
     context_table_name = "prequal_requests"
+    export_type = EXPORT_TYPE_PREQUAL_REQUESTS
     filter_descrs = []
 
     def get_context_data(self, **kwargs):
@@ -382,7 +396,9 @@ class PreQualificationListView(CSVDownloadableTableMixin, SingleTableView):
         return table
 
     def get_queryset(self):
-        qs = PreQualificationRequest.objects.get_queryset()
+        qs = PreQualificationRequest.objects.select_related(
+            "response__customer_order", "response__sdk_application_result"
+        )
         # Default ordering
         if not self.request.GET.get("sort"):
             qs = qs.order_by("-created_datetime", "-id")
@@ -400,18 +416,9 @@ class PreQualificationListView(CSVDownloadableTableMixin, SingleTableView):
         # Basic search
         search_text = data.get("search_text")
         if search_text:
-            qs = qs.annotate(
-                text=SearchVector(
-                    "first_name",
-                    "last_name",
-                    "line1",
-                    "city",
-                    "state",
-                    "postcode",
-                    "phone",
-                )
+            qs = qs.filter(
+                search_vector=SearchQuery(search_text, config=PREQUAL_SEARCH_CONFIG)
             )
-            qs = qs.filter(text=search_text)
             self.filter_descrs.append(
                 _("Request contains “%(text)s”") % dict(text=search_text)
             )
@@ -426,16 +433,23 @@ class PreQualificationListView(CSVDownloadableTableMixin, SingleTableView):
 
         first_name = data.get("first_name")
         if first_name:
-            qs = qs.filter(first_name__search=first_name)
+            qs = qs.filter(first_name__icontains=first_name)
             self.filter_descrs.append(
-                _("First name is “%(text)s”") % dict(text=first_name)
+                _("First name contains “%(text)s”") % dict(text=first_name)
             )
 
         last_name = data.get("last_name")
         if last_name:
-            qs = qs.filter(last_name__search=last_name)
+            qs = qs.filter(last_name__icontains=last_name)
+            self.filter_descrs.append(
+                _("Last name contains “%(text)s”") % dict(text=last_name)
+            )
+
+        phone = data.get("phone")
+        if phone:
+            qs = qs.filter(phone__contains=phone)
             self.filter_descrs.append(
-                _("Last name is “%(text)s”") % dict(text=last_name)
+                _("Phone number contains “%(text)s”") % dict(text=phone)
             )
 
         status = data.get("status")
@@ -475,14 +489,19 @@ class PreQualificationDetailView(generic.DetailView):
     slug_url_kwarg = "uuid"
 
     def get_queryset(self):
-        return PreQualificationRequest.objects.all()
+        return PreQualificationRequest.objects.select_related(
+            "response__customer_order", "response__sdk_application_result"
+        )
 
 
-class SDKApplicationListView(CSVDownloadableTableMixin, SingleTableView):
+class SDKApplicationListView(
+    DashboardPaginationMixin, CSVDownloadableTableMixin, SingleTableView
+):
     template_name = "wfrs/dashboard/sdk_application_list.html"
     form_class = SDKApplicationSearchForm
     table_class = SDKApplicationTable
     context_table_name = "applications"
+    export_type = EXPORT_TYPE_SDK_APPS
     filter_descrs = []
 
     def get_context_data(self, **kwargs):
@@ -502,7 +521,9 @@ class SDKApplicationListView(CSVDownloadableTableMixin, SingleTableView):
         return table
 
     def get_queryset(self):
-        qs = PreQualificationSDKApplicationResult.objects.get_queryset()
+        qs = PreQualificationSDKApplicationResult.objects.select_related(
+            "prequal_response__request"
+        )
         # Default ordering
         if not self.request.GET.get("sort"):
             qs = qs.order_by("-created_datetime", "-id")
@@ -550,3 +571,62 @@ class SDKApplicationListView(CSVDownloadableTableMixin, SingleTableView):
 
     def get_download_filename(self, request):
         return "sdk-credit-applications.csv"
+
+
+class ExportJobListView(generic.ListView):
+    model = ExportJob
+    template_name = "wfrs/dashboard/export_list.html"
+    context_object_name = "export_jobs"
+    paginate_by = 25
+
+    def get_queryset(self):
+        return ExportJob.objects.select_related("requesting_user").order_by(
+            "-created_datetime", "-id"
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["has_unfinished_jobs"] = any(
+            not job.is_finished for job in context["export_jobs"]
+        )
+        return context
+
+
+class ExportJobCreateView(generic.FormView):
+    form_class = ExportJobForm
+    http_method_names = ["post"]
+
+    def form_valid(self, form):
+        create_export_job(
+            export_type=form.cleaned_data["export_type"],
+            query=clean_export_query(form.cleaned_data["query"]),
+            user=self.request.user,
+            compress=form.cleaned_data["compress"],
+        )
+        messages.success(
+            self.request,
+            _(
+                "Your export has been started. It will be available to download below when it is complete."
+            ),
+        )
+        return redirect("wfrs-export-list")
+
+    def form_invalid(self, form):
+        messages.error(self.request, _("Unable to start the export."))
+        return redirect("wfrs-export-list")
+
+
+class ExportJobDownloadView(generic.DetailView):
+    model = ExportJob
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        if not job.is_downloadable:
+            raise Http404(_("This export is not available for download."))
+        content_type = "application/gzip" if job.compress else "text/csv"
+        return FileResponse(
+            job.file.open("rb"),
+            as_attachment=True,
+            filename=job.filename,
+            content_type=content_type,
+        )
@@ -0,0 +1,160 @@
+"""
+Opt-in caching of the financing plans available to a basket.
+
+Working out which plans a basket may use means applying every offer to the basket, which is by far the most
+expensive part of listing plans. The result only changes when the basket's contents, its vouchers, the
+offers, or the plans change, so a store configured by ``WFRS_BASKET_PLAN_CACHE`` remembers the eligible plan
+IDs along with a fingerprint of all of those inputs. An entry is only used while its fingerprint still
+matches, and entries are also dropped eagerly by the basket and offer signal handlers in
+``wellsfargo.handlers``.
+"""
+
+from django.core.cache import cache
+from .core.loading import load_class
+from .settings import WFRS_BASKET_PLAN_CACHE
+import abc
+import hashlib
+import time
+import uuid
+
+OFFERS_VERSION_CACHE_KEY = "wfrs-basket-plans-offers-version"
+
+
+def get_offers_version():
+    version = cache.get(OFFERS_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(OFFERS_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(OFFERS_VERSION_CACHE_KEY)
+    return version
+
+
+def invalidate_offers():
+    """Make every cached basket plan list stale, because an offer (or part of one) changed"""
+    cache.set(OFFERS_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def get_basket_fingerprint(request, basket, catalog):
+    """
+    Digest of everything the offers applied to a basket (and so the plans available to it) depend on: its
+    lines, vouchers, and owner, plus the offers and plan catalog versions.
+    """
+    lines = sorted(
+        (
+            line.pk,
+            line.product_id,
+            line.stockrecord_id,
+            line.quantity,
+            str(line.price_excl_tax),
+            str(line.price_incl_tax),
+        )
+        for line in basket.all_lines()
+    )
+    vouchers = sorted(basket.vouchers.values_list("pk", flat=True))
+    user = getattr(request, "user", None)
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    parts = (
+        basket.pk,
+        user_id,
+        lines,
+        vouchers,
+        get_offers_version(),
+        catalog.version,
+    )
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+
+class BasketPlanStore(abc.ABC):
+    """Base class for stores of the financing plan IDs available to baskets"""
+
+    def __init__(self, timeout=300):
+        # Offers may start or end at any time, so entries also expire after ``timeout`` seconds.
+        self.timeout = timeout
+
+    @abc.abstractmethod
+    def get(self, request, basket_id, fingerprint):
+        """Return the stored list of plan IDs, or ``None`` if there isn't a current entry"""
+        pass
+
+    @abc.abstractmethod
+    def set(self, request, basket_id, fingerprint, plan_ids):
+        pass
+
+    @abc.abstractmethod
+    def invalidate(self, request, basket_id):
+        """
+        Drop the entry for the given basket. Either argument may be ``None`` when the signal being handled
+        doesn't provide it, in which case stores should drop whatever they can.
+        """
+        pass
+
+
+class CacheBasketPlanStore(BasketPlanStore):
+    """Store entries in the Django cache, keyed by basket ID"""
+
+    def __init__(self, key_prefix="wfrs-basket-plans", **kwargs):
+        super().__init__(**kwargs)
+        self.key_prefix = key_prefix
+
+    def _get_key(self, basket_id):
+        return "%s-%s" % (self.key_prefix, basket_id)
+
+    def get(self, request, basket_id, fingerprint):
+        entry = cache.get(self._get_key(basket_id))
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return None
+        return entry["plan_ids"]
+
+    def set(self, request, basket_id, fingerprint, plan_ids):
+        entry = {
+            "fingerprint": fingerprint,
+            "plan_ids": plan_ids,
+        }
+        cache.set(self._get_key(basket_id), entry, self.timeout)
+
+    def invalidate(self, request, basket_id):
+        # Entries can only be found by basket ID. Line changes (which carry one) are handled separately.
+        if basket_id is not None:
+            cache.delete(self._get_key(basket_id))
+
+
+class SessionBasketPlanStore(BasketPlanStore):
+    """
+    Store the entry for the session's current basket in the session. Signals which don't provide the
+    request can't drop the entry, but it will still be ignored once the basket's fingerprint changes.
+    """
+
+    session_key = "wfrs-basket-plans"
+
+    def get(self, request, basket_id, fingerprint):
+        entry = request.session.get(self.session_key)
+        if entry is None:
+            return None
+        if entry["basket_id"] != basket_id or entry["fingerprint"] != fingerprint:
+            return None
+        if entry["expires"] < time.time():
+            return None
+        return entry["plan_ids"]
+
+    def set(self, request, basket_id, fingerprint, plan_ids):
+        request.session[self.session_key] = {
+            "basket_id": basket_id,
+            "fingerprint": fingerprint,
+            "plan_ids": plan_ids,
+            "expires": time.time() + self.timeout,
+        }
+
+    def invalidate(self, request, basket_id):
+        if request is None or not hasattr(request, "session"):
+            return
+        entry = request.session.get(self.session_key)
+        if entry is not None and basket_id in (entry["basket_id"], None):
+            del request.session[self.session_key]
+
+
+def get_basket_plan_store():
+    """Return the configured ``BasketPlanStore``, or ``None`` if basket plan caching is disabled"""
+    klass = WFRS_BASKET_PLAN_CACHE["store"]
+    if not klass:
+        return None
+    kwargs = WFRS_BASKET_PLAN_CACHE.get("store_kwargs", {})
+    return load_class(klass)(**kwargs)
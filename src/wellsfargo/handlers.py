@@ -1,11 +1,30 @@
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
+from oscar.apps.basket.signals import basket_addition, voucher_addition, voucher_removal
+from oscar.core.loading import get_model
 from oscarapicheckout.signals import order_payment_authorized
 from .api.views import PREQUAL_SESSION_KEY
-from .models import PreQualificationResponse
+from .catalog import invalidate_plan_catalog
+from .eligibility import get_basket_plan_store, invalidate_offers
+from .models import (
+    CreditApplication,
+    CreditApplicationApplicant,
+    CreditApplicationAddress,
+    FinancingPlan,
+    FinancingPlanBenefit,
+    PreQualificationResponse,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
+Benefit = get_model("offer", "Benefit")
+Condition = get_model("offer", "Condition")
+ConditionalOffer = get_model("offer", "ConditionalOffer")
+Line = get_model("basket", "Line")
+Range = get_model("offer", "Range")
+
 
 @receiver(order_payment_authorized)
 def link_prequal_request_to_order(sender, request, order, **kwargs):
@@ -34,3 +53,123 @@ def link_prequal_request_to_order(sender, request, order, **kwargs):
     request.session.get(PREQUAL_SESSION_KEY)
     del request.session[PREQUAL_SESSION_KEY]
     request.session.modified = True
+
+
+@receiver(post_save, sender=CreditApplication)
+def update_credit_app_search_vector(sender, instance, raw=False, **kwargs):
+    """Keep the application's stored search vector in sync with its own data"""
+    if raw:
+        return
+    CreditApplication.update_search_vectors(
+        CreditApplication.objects.filter(pk=instance.pk)
+    )
+
+
+@receiver(post_save, sender=CreditApplicationApplicant)
+def update_applicant_credit_app_search_vectors(sender, instance, raw=False, **kwargs):
+    """When an applicant changes, rebuild the search vector of the applications they belong to"""
+    if raw:
+        return
+    CreditApplication.update_search_vectors(
+        CreditApplication.objects.filter(
+            Q(main_applicant=instance) | Q(joint_applicant=instance)
+        )
+    )
+
+
+@receiver(post_save, sender=CreditApplicationAddress)
+def update_address_credit_app_search_vectors(sender, instance, raw=False, **kwargs):
+    """When an address changes, rebuild the search vector of the applications which use it"""
+    if raw:
+        return
+    CreditApplication.update_search_vectors(
+        CreditApplication.objects.filter(
+            Q(main_applicant__address=instance) | Q(joint_applicant__address=instance)
+        )
+    )
+
+
+@receiver(post_save, sender=FinancingPlan)
+@receiver(post_delete, sender=FinancingPlan)
+@receiver(post_save, sender=FinancingPlanBenefit)
+@receiver(post_delete, sender=FinancingPlanBenefit)
+def invalidate_plan_catalog_on_change(sender, **kwargs):
+    """Make every process reload the financing plan catalog when a plan or plan group changes"""
+    invalidate_plan_catalog()
+
+
+@receiver(m2m_changed, sender=FinancingPlanBenefit.plans.through)
+def invalidate_plan_catalog_on_benefit_plans_change(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_plan_catalog()
+
+
+# Fields of ConditionalOffer which count its usage, and so don't affect which baskets it applies to
+OFFER_USAGE_FIELDS = ("num_applications", "total_discount", "num_orders")
+
+
+def _is_offer_usage_save(offer, update_fields):
+    """
+    Return whether saving the given offer only records its usage (see ``ConditionalOffer.record_usage``,
+    which saves the offer for every order placed with it)
+    """
+    if update_fields is not None:
+        return set(update_fields) <= set(OFFER_USAGE_FIELDS)
+    if offer._state.adding:
+        return False
+    fields = [field.attname for field in offer._meta.concrete_fields]
+    stored = ConditionalOffer.objects.filter(pk=offer.pk).values(*fields).first()
+    if stored is None:
+        return False
+    changed = {field for field in fields if stored[field] != getattr(offer, field)}
+    return bool(changed) and changed <= set(OFFER_USAGE_FIELDS)
+
+
+@receiver(pre_save, sender=ConditionalOffer)
+def detect_offer_usage_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Note whether an offer is being saved only to record its usage, which needn't invalidate anything"""
+    instance._wfrs_is_usage_save = not raw and _is_offer_usage_save(
+        instance, update_fields
+    )
+
+
+@receiver(post_save, sender=ConditionalOffer)
+def invalidate_basket_plans_on_offer_save(sender, instance, **kwargs):
+    if not getattr(instance, "_wfrs_is_usage_save", False):
+        invalidate_offers()
+
+
+@receiver(post_delete, sender=ConditionalOffer)
+@receiver(post_save, sender=Condition)
+@receiver(post_delete, sender=Condition)
+@receiver(post_save, sender=Benefit)
+@receiver(post_delete, sender=Benefit)
+@receiver(post_save, sender=Range)
+@receiver(post_delete, sender=Range)
+def invalidate_basket_plans_on_offer_change(sender, **kwargs):
+    """Offers decide which plans a basket may use, so stored basket plan lists are stale once one changes"""
+    invalidate_offers()
+
+
+@receiver(post_save, sender=Line)
+@receiver(post_delete, sender=Line)
+def invalidate_basket_plans_on_line_change(sender, instance, **kwargs):
+    store = get_basket_plan_store()
+    if store is not None:
+        store.invalidate(None, instance.basket_id)
+
+
+@receiver(voucher_addition)
+@receiver(voucher_removal)
+def invalidate_basket_plans_on_voucher_change(sender, basket, **kwargs):
+    store = get_basket_plan_store()
+    if store is not None:
+        store.invalidate(None, basket.pk)
+
+
+@receiver(basket_addition)
+def invalidate_basket_plans_on_basket_addition(sender, request=None, **kwargs):
+    store = get_basket_plan_store()
+    if store is not None and request is not None:
+        # The signal doesn't say which basket the product was added to
+        store.invalidate(request, None)
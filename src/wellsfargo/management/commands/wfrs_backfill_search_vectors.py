@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from ...models import CreditApplication, PreQualificationRequest
+
+SEARCHABLE_MODELS = {
+    "credit-applications": CreditApplication,
+    "prequal-requests": PreQualificationRequest,
+}
+
+
+class Command(BaseCommand):
+    help = "Build the stored full-text search vectors of existing credit applications and pre-qualification requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            choices=sorted(SEARCHABLE_MODELS.keys()),
+            action="append",
+            help="Only update the given type of record. May be given more than once. Defaults to all types.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows to update per UPDATE statement.",
+        )
+        parser.add_argument(
+            "--missing-only",
+            action="store_true",
+            help="Only update rows which don't have a search vector yet.",
+        )
+
+    def handle(self, *args, **options):
+        model_keys = options["model"] or sorted(SEARCHABLE_MODELS.keys())
+        for key in model_keys:
+            self.backfill(
+                SEARCHABLE_MODELS[key],
+                batch_size=options["batch_size"],
+                missing_only=options["missing_only"],
+            )
+
+    def backfill(self, Model, batch_size, missing_only):
+        name = Model._meta.verbose_name_plural
+        qs = Model.objects.order_by("pk")
+        if missing_only:
+            qs = qs.filter(search_vector__isnull=True)
+        # Walk the table in primary key order, so that each batch is a short, cheap transaction.
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                qs.filter(pk__gt=last_pk).values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            updated += Model.update_search_vectors(Model.objects.filter(pk__in=pks))
+            last_pk = pks[-1]
+            self.stdout.write("%s: updated %s rows..." % (name, updated))
+        self.stdout.write("%s: done. Updated %s rows." % (name, updated))
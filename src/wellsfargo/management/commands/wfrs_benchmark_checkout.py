@@ -0,0 +1,173 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from ...benchmark import CheckoutBenchmark, compare_to_baseline, find_regressions
+import json
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent checkouts with the Wells Fargo payment method, against a local gateway stand-in. "
+        "By default, this runs in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--checkouts",
+            type=int,
+            default=200,
+            help="Number of timed checkouts.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Number of threads checking out at once.",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=10,
+            help="Number of untimed checkouts to run first.",
+        )
+        parser.add_argument(
+            "--allocation-samples",
+            type=int,
+            default=20,
+            help="Number of (serial, untimed) checkouts to trace memory allocations for.",
+        )
+        parser.add_argument(
+            "--gateway-latency",
+            help="Simulated gateway latency distribution, e.g. 'lognormal:120,0.4' (milliseconds).",
+        )
+        parser.add_argument(
+            "--fraud-latency",
+            help="Simulated fraud screen latency distribution, e.g. 'constant:50' (milliseconds).",
+        )
+        parser.add_argument(
+            "--decline-rate",
+            type=float,
+            default=0,
+            help="Fraction of checkouts to use an account which the gateway declines.",
+        )
+        parser.add_argument(
+            "--gateway-host",
+            help="Use an already running stand-in (see wfrs_gateway_standin) instead of starting one.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--save",
+            metavar="PATH",
+            help="Write the results as JSON, for use as a baseline.",
+        )
+        parser.add_argument(
+            "--baseline",
+            metavar="PATH",
+            help="Compare the timings and allocations of the results to a baseline.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            help=(
+                "Fail if timings or allocations are worse than the baseline by more than this fraction of it. "
+                "Timings depend on the machine, so only use this with a baseline recorded on the same one."
+            ),
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Reuse (and keep) the benchmark's test database.",
+        )
+        parser.add_argument(
+            "--in-place",
+            action="store_true",
+            help="Run against the configured database, rather than a test database. This creates orders!",
+        )
+
+    def handle(self, *args, **options):
+        benchmark = CheckoutBenchmark(
+            checkouts=options["checkouts"],
+            concurrency=options["concurrency"],
+            warmup=options["warmup"],
+            allocation_samples=options["allocation_samples"],
+            gateway_latency=options["gateway_latency"],
+            fraud_latency=options["fraud_latency"],
+            decline_rate=options["decline_rate"],
+            gateway_host=options["gateway_host"],
+            seed=options["seed"],
+        )
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        if options["in_place"]:
+            results = benchmark.run()
+        else:
+            connection = connections[DEFAULT_DB_ALIAS]
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(
+                verbosity=0,
+                autoclobber=True,
+                serialize=False,
+                keepdb=options["keepdb"],
+            )
+            try:
+                results = benchmark.run()
+            finally:
+                connection.creation.destroy_test_db(
+                    old_name, verbosity=0, keepdb=options["keepdb"]
+                )
+
+        self._report(results)
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write("\n")
+            self.stdout.write("Saved results to %s" % options["save"])
+        if baseline is not None:
+            self.stdout.write("Compared to %s:" % options["baseline"])
+            for change in compare_to_baseline(results, baseline):
+                self.stdout.write("  %s" % change)
+        try:
+            regressions = find_regressions(results, baseline, options["tolerance"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if regressions:
+            raise CommandError(
+                "Checkout performance regressed:\n%s" % "\n".join(regressions)
+            )
+        self.stdout.write("No regressions")
+
+    def _report(self, results):
+        latency = results["latency_ms"]
+        self.stdout.write(
+            "%d checkouts, %d at a time: %.1f checkouts/s"
+            % (
+                results["config"]["checkouts"],
+                results["config"]["concurrency"],
+                results["throughput"]["checkouts_per_second"],
+            )
+        )
+        self.stdout.write(
+            "Latency: p50 %.1f ms, p95 %.1f ms, p99 %.1f ms, max %.1f ms"
+            % (latency["p50"], latency["p95"], latency["p99"], latency["max"])
+        )
+        self.stdout.write(
+            "Queries per checkout: %.1f (max %d)"
+            % (results["queries"]["mean"], results["queries"]["max"])
+        )
+        if "allocations" in results:
+            self.stdout.write(
+                "Allocations per checkout: %.1f KiB peak, %.1f KiB retained"
+                % (
+                    results["allocations"]["peak_kib"],
+                    results["allocations"]["retained_kib"],
+                )
+            )
+        self.stdout.write(
+            "Outcomes: %s"
+            % ", ".join(
+                "%s %d" % (name, count)
+                for name, count in sorted(results["outcomes"].items())
+            )
+        )
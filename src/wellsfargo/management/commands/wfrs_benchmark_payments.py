@@ -0,0 +1,62 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from ...utils import _get_amortization_factors, calculate_monthly_payments
+import random
+import timeit
+
+# A typical set of promotional and standard plans
+BENCHMARK_PLANS = (
+    (Decimal("0.00"), 12),
+    (Decimal("9.99"), 24),
+    (Decimal("17.99"), 36),
+    (Decimal("27.99"), 48),
+    (Decimal("29.99"), 60),
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark monthly payment estimation, with and without cached amortization factors."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prices",
+            type=int,
+            default=10000,
+            help="Number of random prices to estimate payments for in each round.",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=5,
+            help="Number of rounds to run. The fastest round is reported.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        cases = [
+            (Decimal(rng.randint(100, 1_000_000)) / 100,) + rng.choice(BENCHMARK_PLANS)
+            for i in range(options["prices"])
+        ]
+        cases = [
+            (price.quantize(Decimal("0.01")), apr, term) for price, apr, term in cases
+        ]
+
+        def uncached():
+            for price, apr, term_months in cases:
+                _get_amortization_factors.cache_clear()
+                calculate_monthly_payments(price, term_months, apr)
+
+        def cached():
+            for price, apr, term_months in cases:
+                calculate_monthly_payments(price, term_months, apr)
+
+        results = {}
+        for name, func in (("uncached", uncached), ("cached", cached)):
+            best = min(timeit.repeat(func, number=1, repeat=options["rounds"]))
+            results[name] = best
+            self.stdout.write(
+                "%s: %.1f µs per payment (%d payments/s)"
+                % (name, best / len(cases) * 1e6, len(cases) / best)
+            )
+        self.stdout.write("Speedup: %.1fx" % (results["uncached"] / results["cached"]))
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from ...batch import read_rows
+from ...batch.returns import RESULT_FIELDS, ReturnBatch
+import itertools
+
+
+class Command(BaseCommand):
+    help = (
+        "Return (refund) orders paid for with Wells Fargo financing. Orders are given by their order number or "
+        "by the merchant reference of their authorization, either as arguments or in a CSV or JSON-lines file "
+        "with an 'order' column and an optional 'amount' column. Without an amount, whatever hasn't been "
+        "returned yet is."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "orders",
+            nargs="*",
+            metavar="ORDER",
+            help="Order numbers or merchant references to return in full.",
+        )
+        parser.add_argument(
+            "--input",
+            metavar="PATH",
+            help="CSV or JSON-lines file of orders (and amounts) to return.",
+        )
+        parser.add_argument(
+            "--input-format",
+            choices=("csv", "jsonl"),
+            help="Format of the input file. Defaults to judging by its extension.",
+        )
+        parser.add_argument(
+            "--results",
+            metavar="PATH",
+            help="CSV or JSON-lines file to append each return's outcome to. Defaults to printing them.",
+        )
+        parser.add_argument(
+            "--results-format",
+            choices=("csv", "jsonl"),
+            help="Format of the results file. Defaults to judging by its extension.",
+        )
+        parser.add_argument(
+            "--user",
+            metavar="USERNAME",
+            help="Record the returns as made by this user.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            help="Number of requests to send at once. Defaults to WFRS_BATCH['concurrency'].",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            help="Maximum requests per second (0 for no limit). Defaults to WFRS_BATCH['rate_limit'].",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Number of orders to return and save at a time. Defaults to WFRS_BATCH['batch_size'].",
+        )
+
+    def handle(self, *args, **options):
+        if not options["orders"] and not options["input"]:
+            raise CommandError("Give some orders to return, or an --input file.")
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get_by_natural_key(options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError("No such user: %s" % options["user"])
+        # Input rows are streamed into the batch, rather than read all at once
+        items = ({"order": order} for order in options["orders"])
+        if options["input"]:
+            items = itertools.chain(
+                items, read_rows(options["input"], options["input_format"])
+            )
+        batch = ReturnBatch(
+            user=user,
+            results_path=options["results"],
+            results_format=options["results_format"],
+            concurrency=options["concurrency"],
+            rate_limit=options["rate_limit"],
+            batch_size=options["batch_size"],
+        )
+        stats = batch.run(
+            items, on_results=None if options["results"] else self.print_results
+        )
+        self.stdout.write(self.style.SUCCESS("Done. Returned %s" % stats))
+
+    def print_results(self, results):
+        for result in results:
+            self.stdout.write(
+                "%s: %s"
+                % (
+                    result["order"],
+                    ", ".join(
+                        "%s=%s" % (field, result[field])
+                        for field in RESULT_FIELDS[1:]
+                        if result[field] not in (None, "")
+                    ),
+                )
+            )
@@ -0,0 +1,142 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...standin import (
+    OPERATIONS,
+    GatewayStandInServer,
+    LatencyDistribution,
+    StandInConfig,
+    build_ssl_context,
+    generate_self_signed_cert,
+)
+
+
+def _latency(spec):
+    try:
+        return LatencyDistribution.parse(spec)
+    except ValueError as e:
+        raise CommandError(str(e))
+
+
+def _rate(value):
+    rate = float(value)
+    if not 0 <= rate <= 1:
+        raise CommandError("Rates must be between 0 and 1.")
+    return rate
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for the WFRS Gateway API, for load and latency testing. Point "
+        "WFRS_GATEWAY_API_HOST at it, and trust its certificate with REQUESTS_CA_BUNDLE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8443)
+        parser.add_argument(
+            "--latency",
+            help=(
+                "Latency of every response, e.g. constant:50, uniform:20,200, normal:100,25, "
+                "lognormal:80,0.6 (median and sigma), or exponential:100. In milliseconds."
+            ),
+        )
+        parser.add_argument(
+            "--operation-latency",
+            action="append",
+            default=[],
+            metavar="OPERATION=SPEC",
+            help="Latency of one operation (one of: %s). May be repeated."
+            % ", ".join(OPERATIONS),
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="Fraction of requests which get a 500 response.",
+        )
+        parser.add_argument(
+            "--throttle-rate",
+            type=float,
+            default=0,
+            help="Fraction of requests which get a 429 response.",
+        )
+        parser.add_argument(
+            "--timeout-rate",
+            type=float,
+            default=0,
+            help="Fraction of requests which are held for --timeout-delay seconds, then dropped unanswered.",
+        )
+        parser.add_argument("--timeout-delay", type=float, default=60)
+        parser.add_argument(
+            "--retry-after",
+            type=int,
+            default=1,
+            help="Retry-After value (in seconds) of 429 responses.",
+        )
+        parser.add_argument(
+            "--consumer-key",
+            help="Only issue tokens for this consumer key (and --consumer-secret).",
+        )
+        parser.add_argument("--consumer-secret")
+        parser.add_argument(
+            "--cert",
+            help="TLS certificate to serve. Defaults to a newly generated, self-signed, certificate.",
+        )
+        parser.add_argument("--key", help="Private key of the TLS certificate.")
+        parser.add_argument(
+            "--client-ca",
+            help="Require clients to present a certificate signed by this CA (mutual TLS).",
+        )
+        parser.add_argument("--seed", type=int, help="Seed for latency and faults.")
+
+    def handle(self, *args, **options):
+        operation_latency = {}
+        for item in options["operation_latency"]:
+            operation, _, spec = item.partition("=")
+            if operation not in OPERATIONS:
+                raise CommandError("Unknown operation: %s" % operation)
+            operation_latency[operation] = _latency(spec)
+        config = StandInConfig(
+            latency=_latency(options["latency"]) if options["latency"] else None,
+            operation_latency=operation_latency,
+            error_rate=_rate(options["error_rate"]),
+            throttle_rate=_rate(options["throttle_rate"]),
+            timeout_rate=_rate(options["timeout_rate"]),
+            timeout_delay=options["timeout_delay"],
+            retry_after=options["retry_after"],
+            consumer_key=options["consumer_key"],
+            consumer_secret=options["consumer_secret"],
+            seed=options["seed"],
+        )
+        if config.error_rate + config.throttle_rate + config.timeout_rate > 1:
+            raise CommandError("The fault rates must add up to 1 or less.")
+
+        cert, key = options["cert"], options["key"]
+        if bool(cert) != bool(key):
+            raise CommandError("--cert and --key must be given together.")
+        if not cert:
+            cert, key = generate_self_signed_cert(
+                hostnames=(options["host"], "localhost")
+            )
+            self.stdout.write("Generated a self-signed certificate: %s" % cert)
+            self.stdout.write("Trust it with: export REQUESTS_CA_BUNDLE=%s" % cert)
+        ssl_context = build_ssl_context(cert, key, options["client_ca"])
+
+        server = GatewayStandInServer(
+            (options["host"], options["port"]), config, ssl_context
+        )
+        self.stdout.write(
+            "WFRS Gateway stand-in listening on https://%s (WFRS_GATEWAY_API_HOST = %r)"
+            % (server.url, server.url)
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(
+                "Requests served: %s"
+                % ", ".join(
+                    "%s=%s" % (op, count) for op, count in server.request_counts.items()
+                )
+            )
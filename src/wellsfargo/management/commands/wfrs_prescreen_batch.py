@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from ...batch.prescreen import PrescreenBatch
+
+
+class Command(BaseCommand):
+    help = (
+        "Prescreen a list of customers for pre-qualified offers. Reads a CSV or JSON-lines file of customers "
+        "(with the same fields as the pre-qualification API), and appends each one's outcome to a results file. "
+        "Interrupted runs resume where they left off when run again. Rows whose request failed aren't retried "
+        "by resuming. Prescreen them again from a new input file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="CSV or JSON-lines file of customers.")
+        parser.add_argument(
+            "results", help="CSV or JSON-lines file to append the results to."
+        )
+        parser.add_argument(
+            "--checkpoint",
+            metavar="PATH",
+            help="File to save progress to. Defaults to the results file's path, plus '.checkpoint'.",
+        )
+        parser.add_argument(
+            "--user",
+            metavar="USERNAME",
+            help="Use the merchant number for this user's groups.",
+        )
+        parser.add_argument(
+            "--input-format",
+            choices=("csv", "jsonl"),
+            help="Format of the input file. Defaults to judging by its extension.",
+        )
+        parser.add_argument(
+            "--results-format",
+            choices=("csv", "jsonl"),
+            help="Format of the results file. Defaults to judging by its extension.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            help="Number of requests to send at once. Defaults to WFRS_BATCH['concurrency'].",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            help="Maximum requests per second (0 for no limit). Defaults to WFRS_BATCH['rate_limit'].",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Number of rows to save (and checkpoint) at a time. Defaults to WFRS_BATCH['batch_size'].",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the progress of any earlier run, and start again from the first row.",
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get_by_natural_key(options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError("No such user: %s" % options["user"])
+        batch = PrescreenBatch(
+            options["input"],
+            options["results"],
+            checkpoint_path=options["checkpoint"],
+            user=user,
+            input_format=options["input_format"],
+            results_format=options["results_format"],
+            concurrency=options["concurrency"],
+            rate_limit=options["rate_limit"],
+            batch_size=options["batch_size"],
+        )
+        if options["restart"]:
+            batch.checkpoint.delete()
+        stats = batch.run(
+            progress=lambda stats: self.stdout.write("Prescreened %s" % stats)
+        )
+        self.stdout.write(self.style.SUCCESS("Done. Prescreened %s" % stats))
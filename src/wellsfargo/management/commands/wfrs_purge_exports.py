@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from ...dashboard.exports import purge_expired_exports
+from ...settings import WFRS_EXPORT_RETENTION_DAYS
+
+
+class Command(BaseCommand):
+    help = "Delete background dashboard exports (and their files) which are older than the retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=WFRS_EXPORT_RETENTION_DAYS,
+            help="Delete exports created more than this many days ago. Defaults to WFRS_EXPORT_RETENTION_DAYS.",
+        )
+
+    def handle(self, *args, **options):
+        purged = purge_expired_exports(retention_days=options["days"])
+        self.stdout.write("Purged %s export(s)." % purged)
@@ -0,0 +1,72 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from ...batch.accounts import AccountRefreshBatch
+from ...settings import WFRS_BATCH
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the credit limit and available credit of credit application accounts, by looking up each "
+        "account whose latest inquiry is out of date again. Interrupted runs can simply be run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=float,
+            default=WFRS_BATCH["account_refresh_days"],
+            help="Refresh accounts whose latest inquiry is more than this many days old. Defaults to "
+            "WFRS_BATCH['account_refresh_days'].",
+        )
+        parser.add_argument(
+            "--results",
+            metavar="PATH",
+            help="CSV or JSON-lines file to append each account's outcome to.",
+        )
+        parser.add_argument(
+            "--results-format",
+            choices=("csv", "jsonl"),
+            help="Format of the results file. Defaults to judging by its extension.",
+        )
+        parser.add_argument(
+            "--user",
+            metavar="USERNAME",
+            help="Use the merchant number for this user's groups.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            help="Number of requests to send at once. Defaults to WFRS_BATCH['concurrency'].",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            help="Maximum requests per second (0 for no limit). Defaults to WFRS_BATCH['rate_limit'].",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Number of accounts to decrypt and save at a time. Defaults to WFRS_BATCH['batch_size'].",
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get_by_natural_key(options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError("No such user: %s" % options["user"])
+        batch = AccountRefreshBatch(
+            timedelta(days=options["days"]),
+            user=user,
+            results_path=options["results"],
+            results_format=options["results_format"],
+            concurrency=options["concurrency"],
+            rate_limit=options["rate_limit"],
+            batch_size=options["batch_size"],
+        )
+        stats = batch.run(
+            progress=lambda stats: self.stdout.write("Refreshed %s" % stats)
+        )
+        self.stdout.write(self.style.SUCCESS("Done. Refreshed %s" % stats))
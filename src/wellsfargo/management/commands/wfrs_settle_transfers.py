@@ -0,0 +1,66 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from ...batch.settlement import SettlementBatch
+from ...settings import WFRS_BATCH
+
+
+class Command(BaseCommand):
+    help = (
+        "Charge (settle) approved authorizations which are due for capture. Interrupted runs can simply be run "
+        "again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=float,
+            default=WFRS_BATCH["settle_after_hours"],
+            help="Charge authorizations which are more than this many hours old. Defaults to "
+            "WFRS_BATCH['settle_after_hours'].",
+        )
+        parser.add_argument(
+            "--results",
+            metavar="PATH",
+            help="CSV or JSON-lines file to append each authorization's outcome to.",
+        )
+        parser.add_argument(
+            "--results-format",
+            choices=("csv", "jsonl"),
+            help="Format of the results file. Defaults to judging by its extension.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the authorizations which would be charged, without charging them.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            help="Number of requests to send at once. Defaults to WFRS_BATCH['concurrency'].",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            help="Maximum requests per second (0 for no limit). Defaults to WFRS_BATCH['rate_limit'].",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Number of authorizations to charge and save at a time. Defaults to WFRS_BATCH['batch_size'].",
+        )
+
+    def handle(self, *args, **options):
+        batch = SettlementBatch(
+            timedelta(hours=options["hours"]),
+            results_path=options["results"],
+            results_format=options["results_format"],
+            dry_run=options["dry_run"],
+            concurrency=options["concurrency"],
+            rate_limit=options["rate_limit"],
+            batch_size=options["batch_size"],
+        )
+        verb = "Checked" if options["dry_run"] else "Settled"
+        stats = batch.run(
+            progress=lambda stats: self.stdout.write("%s %s" % (verb, stats))
+        )
+        self.stdout.write(self.style.SUCCESS("Done. %s %s" % (verb, stats)))
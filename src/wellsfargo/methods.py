@@ -2,11 +2,11 @@ from decimal import Decimal
 from django.core.exceptions import ValidationError
 from rest_framework import serializers
 from oscar.core.loading import get_model
-from oscarapi.basket import operations
 from oscarapicheckout.methods import PaymentMethod, PaymentMethodSerializer
 from oscarapicheckout.states import Complete, Declined
 from requests.exceptions import Timeout, ConnectionError
 from .connector import TransactionsAPIClient
+from .connector.metrics import get_gateway_metrics, get_operation
 from .core.constants import (
     TRANS_DECLINED,
     TRANS_TYPE_AUTH,
@@ -14,10 +14,17 @@ from .core.constants import (
 )
 from .core.structures import TransactionRequest
 from .core import exceptions
-from .utils import list_plans_for_basket
+from .utils import list_plans_for_request
 from .models import FraudScreenResult, FinancingPlan, TransferMetadata
 from .fraud import screen_transaction
 from .settings import WFRS_MAX_TRANSACTION_ATTEMPTS
+from .tracing import (
+    SPAN_AUTHORIZE,
+    SPAN_GET_SOURCE,
+    SPAN_RECORD_EVENTS,
+    SPAN_RECORD_PAYMENT,
+    trace_span,
+)
 import logging
 import random
 
@@ -25,6 +32,7 @@ logger = logging.getLogger(__name__)
 
 Transaction = get_model("payment", "Transaction")
 Source = get_model("payment", "Source")
+PaymentEventQuantity = get_model("order", "PaymentEventQuantity")
 
 
 class WellsFargoPaymentMethodSerializer(PaymentMethodSerializer):
@@ -46,8 +54,7 @@ class WellsFargoPaymentMethodSerializer(PaymentMethodSerializer):
         )
 
         # Limit plans by the user's basket (plan availability is driven by offer/voucher conditions)
-        basket = operations.get_basket(self.context["request"])
-        plans = list_plans_for_basket(basket)
+        plans = list_plans_for_request(request)
         self.fields["financing_plan"].queryset = FinancingPlan.objects.filter(
             id__in=[p.id for p in plans]
         )
@@ -108,6 +115,19 @@ class WellsFargo(PaymentMethod):
         account_number,
         financing_plan,
         **kwargs
+    ):
+        with trace_span(
+            SPAN_RECORD_PAYMENT,
+            **{"wfrs.order_number": order.number, "wfrs.method_key": method_key}
+        ) as span:
+            state = self._authorize_payment(
+                request, order, amount, account_number, financing_plan
+            )
+            span.set_attribute("wfrs.payment_status", state.status)
+            return state
+
+    def _authorize_payment(
+        self, request, order, amount, account_number, financing_plan
     ):
         # Build a transaction request
         trans_request = self._build_trans_request(
@@ -131,7 +151,8 @@ class WellsFargo(PaymentMethod):
         fraud_response = screen_transaction(request, order)
 
         # Using the UUID from the Fraud Screen as the Reference number, get a PaymentSource
-        source = self.get_source(order, fraud_response.reference)
+        with trace_span(SPAN_GET_SOURCE):
+            source = self.get_source(order, fraud_response.reference)
 
         # If the transaction is suspected as fraud, decline the transaction
         if fraud_response.decision == FraudScreenResult.DECISION_REJECT:
@@ -149,12 +170,13 @@ class WellsFargo(PaymentMethod):
 
         # Perform an authorization with WFRS
         try:
-            transfer = self._perform_auth_transaction(
-                trans_request=trans_request,
-                cancel_trans_request=cancel_trans_request,
-                current_user=request_user,
-                transaction_uuid=fraud_response.reference,
-            )
+            with trace_span(SPAN_AUTHORIZE):
+                transfer = self._perform_auth_transaction(
+                    trans_request=trans_request,
+                    cancel_trans_request=cancel_trans_request,
+                    current_user=request_user,
+                    transaction_uuid=fraud_response.reference,
+                )
         except (exceptions.TransactionDenied, ValidationError) as e:
             logger.info(
                 "WFRS transaction failed for Order[{}]. Reason: {}".format(
@@ -169,17 +191,22 @@ class WellsFargo(PaymentMethod):
             )
             return Declined(amount, source_id=source.pk)
 
-        # Record the allocation as a transaction
-        source.allocate(
-            amount,
-            reference=transfer.merchant_reference,
-            status=fraud_response.decision,
-        )
+        with trace_span(SPAN_RECORD_EVENTS):
+            # Record the allocation as a transaction
+            source.allocate(
+                amount,
+                reference=transfer.merchant_reference,
+                status=fraud_response.decision,
+            )
 
-        # Record the payment event
-        event = self.make_authorize_event(order, amount, transfer.merchant_reference)
-        for line in order.lines.all():
-            self.make_event_quantity(event, line, line.quantity)
+            # Record the payment event
+            event = self.make_authorize_event(
+                order, amount, transfer.merchant_reference
+            )
+            PaymentEventQuantity.objects.bulk_create(
+                PaymentEventQuantity(event=event, line=line, quantity=line.quantity)
+                for line in order.lines.all()
+            )
 
         return Complete(source.amount_allocated, source_id=source.pk)
 
@@ -219,6 +246,11 @@ class WellsFargo(PaymentMethod):
                         trans_request.ticket_number
                     )
                 )
+                if i + 1 < max_attempts:
+                    get_gateway_metrics().observe_retry(
+                        get_operation(client.get_api_path(trans_request)),
+                        e.__class__.__name__,
+                    )
 
         # We couldn't perform the transaction successfully in the allotted time, so bubble up the last exception thrown.
         raise exc
@@ -0,0 +1,126 @@
+# Generated by Django 4.2.11 on 2026-10-19 13:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("wellsfargo", "0039_auto_20200420_1719"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportJob",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "export_type",
+                    models.CharField(
+                        choices=[
+                            ("credit-applications", "Credit Applications"),
+                            ("prequal-requests", "Pre-Qualification Requests"),
+                            ("sdk-applications", "SDK Credit Applications"),
+                        ],
+                        max_length=19,
+                        verbose_name="Export Type",
+                    ),
+                ),
+                (
+                    "query",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Query string parameters (filters and sorting) of the export.",
+                        verbose_name="Search Query",
+                    ),
+                ),
+                (
+                    "compress",
+                    models.BooleanField(
+                        default=False, verbose_name="Compress with gzip?"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("RUNNING", "Running"),
+                            ("COMPLETE", "Complete"),
+                            ("FAILED", "Failed"),
+                        ],
+                        default="PENDING",
+                        max_length=8,
+                        verbose_name="Status",
+                    ),
+                ),
+                (
+                    "total_rows",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="Total Rows"
+                    ),
+                ),
+                (
+                    "rows_written",
+                    models.PositiveIntegerField(default=0, verbose_name="Rows Written"),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        blank=True,
+                        null=True,
+                        upload_to="wfrs/exports/%Y/%m/%d/",
+                        verbose_name="File",
+                    ),
+                ),
+                (
+                    "error_message",
+                    models.TextField(
+                        blank=True, default="", verbose_name="Error Message"
+                    ),
+                ),
+                (
+                    "created_datetime",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created On"),
+                ),
+                (
+                    "modified_datetime",
+                    models.DateTimeField(auto_now=True, verbose_name="Modified On"),
+                ),
+                (
+                    "completed_datetime",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Completed On"
+                    ),
+                ),
+                (
+                    "requesting_user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Requesting User",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Export Job",
+                "verbose_name_plural": "Export Jobs",
+                "ordering": ("-created_datetime", "-id"),
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.11 on 2026-10-19 13:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wellsfargo", "0040_exportjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="creditapplication",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="creditapplication",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="wfrs_creditapp_search_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.11 on 2026-10-19 13:47
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import django.db.models.functions.text
+
+SEARCH_TRIGGER_SQL = """
+CREATE TRIGGER wfrs_prequal_search_vector_update
+BEFORE INSERT OR UPDATE OF first_name, last_name, line1, city, state, postcode, phone
+ON wellsfargo_prequalificationrequest
+FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(
+    search_vector, 'pg_catalog.english', first_name, last_name, line1, city, state, postcode, phone
+);
+"""
+
+DROP_SEARCH_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS wfrs_prequal_search_vector_update ON wellsfargo_prequalificationrequest;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wellsfargo", "0041_creditapplication_search_vector"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="prequalificationrequest",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="prequalificationrequest",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="wfrs_prequal_search_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="prequalificationrequest",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("first_name"),
+                    name="gin_trgm_ops",
+                ),
+                name="wfrs_prequal_fname_trgm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="prequalificationrequest",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("last_name"),
+                    name="gin_trgm_ops",
+                ),
+                name="wfrs_prequal_lname_trgm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="prequalificationrequest",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["phone"],
+                name="wfrs_prequal_phone_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.RunSQL(SEARCH_TRIGGER_SQL, DROP_SEARCH_TRIGGER_SQL),
+    ]
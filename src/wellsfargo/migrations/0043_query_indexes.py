@@ -0,0 +1,68 @@
+# Generated by Django 4.2.11 on 2026-10-19 13:57
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking the (potentially very large) tables against writes
+    atomic = False
+
+    dependencies = [
+        ("wellsfargo", "0042_prequal_search"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="accountinquiryresult",
+            index=models.Index(
+                fields=["-created_datetime", "-id"], name="wfrs_inquiry_created_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="accountinquiryresult",
+            index=models.Index(
+                fields=["credit_app_source", "-created_datetime", "-id"],
+                name="wfrs_inquiry_app_created_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="creditapplication",
+            index=models.Index(
+                fields=["-created_datetime", "-id"], name="wfrs_creditapp_created_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="fraudscreenresult",
+            index=models.Index(
+                fields=["reference", "-created_datetime"],
+                name="wfrs_fraud_reference_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="prequalificationsdkapplicationresult",
+            index=models.Index(
+                fields=["-created_datetime", "-id"], name="wfrs_sdkapp_created_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transfermetadata",
+            index=models.Index(
+                fields=["-created_datetime", "-id"], name="wfrs_transfer_created_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transfermetadata",
+            index=models.Index(
+                fields=["merchant_reference", "type_code", "-created_datetime"],
+                name="wfrs_transfer_ref_type_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="transfermetadata",
+            index=models.Index(
+                fields=["last4_account_number", "merchant_reference"],
+                name="wfrs_transfer_last4_ref_idx",
+            ),
+        ),
+    ]
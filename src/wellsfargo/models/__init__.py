@@ -1,5 +1,6 @@
 from .accounts import *  # NOQA
 from .apps import *  # NOQA
+from .exports import *  # NOQA
 from .merchants import *  # NOQA
 from .fraud import *  # NOQA
 from .mixins import *  # NOQA
@@ -57,3 +57,13 @@ class AccountInquiryResult(AccountNumberMixin, models.Model):
         ordering = ("-created_datetime", "-id")
         verbose_name = _("Account Inquiry Result")
         verbose_name_plural = _("Account Inquiry Results")
+        indexes = [
+            models.Index(
+                fields=["-created_datetime", "-id"], name="wfrs_inquiry_created_idx"
+            ),
+            # CreditApplication.get_inquiries
+            models.Index(
+                fields=["credit_app_source", "-created_datetime", "-id"],
+                name="wfrs_inquiry_app_created_idx",
+            ),
+        ]
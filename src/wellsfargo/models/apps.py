@@ -1,6 +1,8 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
-from django.db.models import Q
+from django.db.models import OuterRef, Q, Subquery
 from django.core.validators import (
     MinLengthValidator,
     MaxLengthValidator,
@@ -21,6 +23,10 @@ from ..core.constants import (
     CREDIT_APP_TRANS_CODE_CREDIT_APPLICATION,
     LANGUAGES,
     ENGLISH,
+    SEARCH_WEIGHT_NAME,
+    SEARCH_WEIGHT_EMAIL,
+    SEARCH_WEIGHT_ADDRESS,
+    SEARCH_WEIGHT_PHONE,
 )
 from ..core.fields import (
     USSocialSecurityNumberField,
@@ -30,6 +36,53 @@ from .mixins import MaybeAccountNumberMixin
 from .transfers import TransferMetadata
 from .utils import _max_len
 
+# Fields (relative to CreditApplication) which are stored in ``CreditApplication.search_vector``, grouped
+# by weight label. The advanced search filters only match words stored under their own label.
+CREDIT_APP_SEARCH_FIELDS = (
+    (
+        SEARCH_WEIGHT_NAME,
+        (
+            "main_applicant__first_name",
+            "main_applicant__last_name",
+            "joint_applicant__first_name",
+            "joint_applicant__last_name",
+        ),
+    ),
+    (
+        SEARCH_WEIGHT_EMAIL,
+        (
+            "main_applicant__email_address",
+            "joint_applicant__email_address",
+        ),
+    ),
+    (
+        SEARCH_WEIGHT_ADDRESS,
+        (
+            "main_applicant__address__address_line_1",
+            "main_applicant__address__address_line_2",
+            "main_applicant__address__city",
+            "main_applicant__address__state_code",
+            "main_applicant__address__postal_code",
+            "joint_applicant__address__address_line_1",
+            "joint_applicant__address__address_line_2",
+            "joint_applicant__address__city",
+            "joint_applicant__address__state_code",
+            "joint_applicant__address__postal_code",
+        ),
+    ),
+    (
+        SEARCH_WEIGHT_PHONE,
+        (
+            "main_applicant__home_phone",
+            "main_applicant__mobile_phone",
+            "main_applicant__work_phone",
+            "joint_applicant__home_phone",
+            "joint_applicant__mobile_phone",
+            "joint_applicant__work_phone",
+        ),
+    ),
+)
+
 
 class CreditApplicationAddress(models.Model):
     address_line_1 = models.CharField(_("Address Line 1"), max_length=26)
@@ -183,9 +236,38 @@ class CreditApplication(MaybeAccountNumberMixin, models.Model):
     created_datetime = models.DateTimeField(_("Created Date/Time"), auto_now_add=True)
     modified_datetime = models.DateTimeField(_("Modified Date/Time"), auto_now=True)
 
+    # Denormalized full-text search data, built from the applicants and their addresses.
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         verbose_name = _("Wells Fargo Credit Application")
         verbose_name_plural = _("Wells Fargo Credit Applications")
+        indexes = [
+            models.Index(
+                fields=["-created_datetime", "-id"], name="wfrs_creditapp_created_idx"
+            ),
+            GinIndex(fields=["search_vector"], name="wfrs_creditapp_search_idx"),
+        ]
+
+    @classmethod
+    def update_search_vectors(cls, queryset=None):
+        """
+        Rebuild the stored search vector of every application in the given queryset (or of all
+        applications), using a single UPDATE statement. Returns the number of rows updated.
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        vector = None
+        for weight, fields in CREDIT_APP_SEARCH_FIELDS:
+            weighted = SearchVector(*fields, weight=weight)
+            vector = weighted if vector is None else (vector + weighted)
+        # Joined fields can't be referenced directly by an UPDATE, so compute the vector in a subquery
+        computed = (
+            cls.objects.filter(pk=OuterRef("pk"))
+            .annotate(computed_search_vector=vector)
+            .values("computed_search_vector")[:1]
+        )
+        return queryset.update(search_vector=Subquery(computed))
 
     @property
     def is_joint(self):
@@ -199,10 +281,16 @@ class CreditApplication(MaybeAccountNumberMixin, models.Model):
         return self.inquiries.order_by("-created_datetime").all()
 
     def get_credit_limit(self):
-        inquiry = self.get_inquiries().first()
-        if not inquiry:
-            return None
-        return inquiry.credit_limit
+        if not hasattr(self, "_credit_limit_cache"):
+            inquiry = self.get_inquiries().first()
+            self._credit_limit_cache = inquiry.credit_limit if inquiry else None
+        return self._credit_limit_cache
+
+    def get_emails(self):
+        emails = [self.main_applicant.email_address]
+        if self.joint_applicant:
+            emails.append(self.joint_applicant.email_address)
+        return emails
 
     def get_orders(self):
         """
@@ -221,9 +309,7 @@ class CreditApplication(MaybeAccountNumberMixin, models.Model):
                 .all()
             )
             # all orders made by app.email that contain ref above UUIDs
-            emails = [self.main_applicant.email_address]
-            if self.joint_applicant:
-                emails.append(self.joint_applicant.email_address)
+            emails = self.get_emails()
             orders = (
                 Order.objects.filter(
                     Q(guest_email__in=emails) | Q(user__email__in=emails)
@@ -242,18 +328,86 @@ class CreditApplication(MaybeAccountNumberMixin, models.Model):
         return self._first_order_cache
 
     def get_first_order_merchant_name(self):
+        if not hasattr(self, "_first_order_merchant_name_cache"):
+            order = self.get_first_order()
+            merchant_names = TransferMetadata.get_merchant_names_by_order([order])
+            self._first_order_merchant_name_cache = merchant_names.get(
+                order.pk if order else None
+            )
+        return self._first_order_merchant_name_cache
+
+    @classmethod
+    def prefetch_table_data(cls, apps):
+        """
+        Load the credit limit, first order, and first order merchant name of each of the given applications,
+        using the same few queries no matter how many applications are given. Used by the dashboard lists and
+        exports, to avoid running queries for every row.
+        """
+        Order = get_model("order", "Order")
         Transaction = get_model("payment", "Transaction")
-        order = self.get_first_order()
-        if not order:
-            return None
-        transfers = []
-        for source in order.sources.filter(source_type__name="Wells Fargo").all():
-            for transaction in source.transactions.filter(
-                txn_type=Transaction.AUTHORISE
-            ).all():
-                transfer = TransferMetadata.get_by_oscar_transaction(transaction)
-                if transfer:
-                    transfers.append(transfer)
-        if len(transfers) <= 0:
-            return None
-        return transfers[0].merchant_name
+        AccountInquiryResult = get_model("wellsfargo", "AccountInquiryResult")
+        apps = list(apps)
+        if not apps:
+            return
+        # Latest inquiry of each application (see ``get_credit_limit``)
+        latest_inquiries = AccountInquiryResult.objects.filter(
+            credit_app_source=OuterRef("pk")
+        ).order_by("-created_datetime", "-id")
+        credit_limits = dict(
+            cls.objects.filter(pk__in=[app.pk for app in apps])
+            .annotate(
+                latest_credit_limit=Subquery(
+                    latest_inquiries.values("credit_limit")[:1]
+                )
+            )
+            .values_list("pk", "latest_credit_limit")
+        )
+        for app in apps:
+            app._credit_limit_cache = credit_limits.get(app.pk)
+        # Orders paid for with a transfer made with each application's last 4 digits (see ``get_orders``)
+        apps = [app for app in apps if not hasattr(app, "_first_order_cache")]
+        references = {}
+        for last4, reference in (
+            TransferMetadata.objects.filter(
+                last4_account_number__in={app.last4_account_number for app in apps}
+            )
+            .values_list("last4_account_number", "merchant_reference")
+            .distinct()
+        ):
+            references.setdefault(last4, set()).add(reference)
+        order_references = {}
+        for order_id, reference in Transaction.objects.filter(
+            reference__in=set().union(*references.values())
+        ).values_list("source__order_id", "reference"):
+            order_references.setdefault(order_id, set()).add(reference)
+        emails = {email for app in apps for email in app.get_emails()}
+        orders = list(
+            Order.objects.filter(pk__in=order_references.keys())
+            .filter(Q(guest_email__in=emails) | Q(user__email__in=emails))
+            .select_related("user")
+            .order_by("date_placed")
+        )
+        for app in apps:
+            app_emails = app.get_emails()
+            app_references = references.get(app.last4_account_number, set())
+            app._first_order_cache = next(
+                (
+                    order
+                    for order in orders
+                    if order.date_placed >= app.created_datetime
+                    and order_references[order.pk] & app_references
+                    and (
+                        order.guest_email in app_emails
+                        or (order.user and order.user.email in app_emails)
+                    )
+                ),
+                None,
+            )
+        merchant_names = TransferMetadata.get_merchant_names_by_order(
+            app._first_order_cache for app in apps
+        )
+        for app in apps:
+            order = app._first_order_cache
+            app._first_order_merchant_name_cache = merchant_names.get(
+                order.pk if order else None
+            )
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from ..core.constants import (
+    EXPORT_TYPES,
+    EXPORT_STATUSES,
+    EXPORT_STATUS_PENDING,
+    EXPORT_STATUS_RUNNING,
+    EXPORT_STATUS_COMPLETE,
+)
+from .utils import _max_len
+import os.path
+
+
+class ExportJob(models.Model):
+    """
+    A background export of one of the dashboard list views, along with the file it produced.
+    """
+
+    export_type = models.CharField(
+        _("Export Type"), max_length=_max_len(EXPORT_TYPES), choices=EXPORT_TYPES
+    )
+    query = models.JSONField(
+        _("Search Query"),
+        default=dict,
+        blank=True,
+        help_text=_("Query string parameters (filters and sorting) of the export."),
+    )
+    compress = models.BooleanField(_("Compress with gzip?"), default=False)
+    status = models.CharField(
+        _("Status"),
+        max_length=_max_len(EXPORT_STATUSES),
+        choices=EXPORT_STATUSES,
+        default=EXPORT_STATUS_PENDING,
+    )
+    total_rows = models.PositiveIntegerField(_("Total Rows"), null=True, blank=True)
+    rows_written = models.PositiveIntegerField(_("Rows Written"), default=0)
+    file = models.FileField(
+        _("File"), upload_to="wfrs/exports/%Y/%m/%d/", null=True, blank=True
+    )
+    error_message = models.TextField(_("Error Message"), blank=True, default="")
+    requesting_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_("Requesting User"),
+        related_name="+",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    created_datetime = models.DateTimeField(_("Created On"), auto_now_add=True)
+    modified_datetime = models.DateTimeField(_("Modified On"), auto_now=True)
+    completed_datetime = models.DateTimeField(_("Completed On"), null=True, blank=True)
+
+    class Meta:
+        ordering = ("-created_datetime", "-id")
+        verbose_name = _("Export Job")
+        verbose_name_plural = _("Export Jobs")
+
+    def __str__(self):
+        return "%s (%s)" % (self.get_export_type_display(), self.created_datetime)
+
+    @property
+    def is_finished(self):
+        return self.status not in (EXPORT_STATUS_PENDING, EXPORT_STATUS_RUNNING)
+
+    @property
+    def is_downloadable(self):
+        return self.status == EXPORT_STATUS_COMPLETE and bool(self.file)
+
+    @property
+    def progress(self):
+        """Percentage (0 – 100) of rows written so far"""
+        if self.status == EXPORT_STATUS_COMPLETE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, int(self.rows_written * 100 / self.total_rows))
+
+    @property
+    def filename(self):
+        if not self.file:
+            return None
+        return os.path.basename(self.file.name)
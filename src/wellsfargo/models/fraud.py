@@ -34,6 +34,12 @@ class FraudScreenResult(models.Model):
         ordering = ("-created_datetime", "-id")
         verbose_name = _("Fraud Screen Result")
         verbose_name_plural = _("Fraud Screen Results")
+        indexes = [
+            models.Index(
+                fields=["reference", "-created_datetime"],
+                name="wfrs_fraud_reference_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.message
@@ -62,15 +62,9 @@ class FinancingPlan(models.Model):
 
     @classmethod
     def get_advertisable_plan_by_price(cls, price):
-        plan = (
-            cls.objects.exclude(term_months=0)
-            .filter(advertising_enabled=True)
-            .filter(product_price_threshold__gte="0.00")
-            .filter(product_price_threshold__lte=price)
-            .order_by("-product_price_threshold", "-apr")
-            .first()
-        )
-        return plan
+        from ..catalog import get_plan_catalog
+
+        return get_plan_catalog().get_advertisable_plan_by_price(price)
 
     def __str__(self):
         return _("%(description)s (plan number %(number)s)") % dict(
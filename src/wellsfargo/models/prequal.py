@@ -1,6 +1,9 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core import signing
 from django.db import models
-from django.db.models import Q
+from django.db.models import F, Q
+from django.db.models.functions import Upper
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django.utils.functional import cached_property
@@ -22,6 +25,10 @@ from .utils import _max_len
 import uuid
 import urllib.parse
 
+# Text search configuration used by the database trigger which maintains
+# ``PreQualificationRequest.search_vector``. Queries against the vector must use the same one.
+PREQUAL_SEARCH_CONFIG = "english"
+
 
 class PreQualificationRequest(models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
@@ -52,14 +59,44 @@ class PreQualificationRequest(models.Model):
     created_datetime = models.DateTimeField(auto_now_add=True)
     modified_datetime = models.DateTimeField(auto_now=True)
 
+    # Full-text search data. Maintained by a database trigger (see migration 0042) whenever the
+    # name, address, or phone columns are written.
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         verbose_name = _("Pre-Qualification Request")
         verbose_name_plural = _("Pre-Qualification Requests")
         ordering = ("-created_datetime", "-id")
         indexes = [
             models.Index(fields=["-created_datetime", "-id"]),
+            GinIndex(fields=["search_vector"], name="wfrs_prequal_search_idx"),
+            # Trigram indexes, for partial (case-insensitive) name and phone number matches
+            GinIndex(
+                OpClass(Upper("first_name"), name="gin_trgm_ops"),
+                name="wfrs_prequal_fname_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("last_name"), name="gin_trgm_ops"),
+                name="wfrs_prequal_lname_trgm_idx",
+            ),
+            GinIndex(
+                fields=["phone"],
+                opclasses=["gin_trgm_ops"],
+                name="wfrs_prequal_phone_trgm_idx",
+            ),
         ]
 
+    @classmethod
+    def update_search_vectors(cls, queryset=None):
+        """
+        Rebuild the stored search vector of every request in the given queryset (or of all requests).
+        Returns the number of rows updated.
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        # A no-op write to one of the searchable columns fires the trigger which builds the vector
+        return queryset.update(first_name=F("first_name"))
+
     @property
     def entry_point_name(self):
         return dict(PREQUAL_ENTRY_POINT_CHOICES).get(self.entry_point, self.entry_point)
@@ -130,21 +167,70 @@ class PreQualificationRequest(models.Model):
 
     @cached_property
     def order_merchant_name(self):
-        Transaction = get_model("payment", "Transaction")
         order = self.resulting_order
         if not order:
             return None
-        transfers = []
-        for source in order.sources.filter(source_type__name="Wells Fargo").all():
-            for transaction in source.transactions.filter(
-                txn_type=Transaction.AUTHORISE
-            ).all():
-                transfer = TransferMetadata.get_by_oscar_transaction(transaction)
-                if transfer:
-                    transfers.append(transfer)
-        if len(transfers) <= 0:
-            return None
-        return transfers[0].merchant_name
+        return TransferMetadata.get_merchant_names_by_order([order]).get(order.pk)
+
+    @classmethod
+    def prefetch_table_data(cls, prequal_requests):
+        """
+        Load the resulting order and order merchant name of each of the given requests, using the same few
+        queries no matter how many requests are given. Used by the dashboard lists and exports, to avoid running
+        queries for every row. The requests' responses should already be loaded (with ``select_related``).
+        """
+        Order = get_model("order", "Order")
+        prequal_requests = [
+            r for r in prequal_requests if "resulting_order" not in r.__dict__
+        ]
+        # Requests without a customer order need to search for one by email (see ``resulting_order``).
+        # Requests with a blank email are left to do so one at a time, since they'd match nearly every order.
+        searching = []
+        for prequal_request in prequal_requests:
+            resp = getattr(prequal_request, "response", None)
+            if resp and resp.customer_order:
+                prequal_request.resulting_order = resp.customer_order
+            elif prequal_request.email is None:
+                prequal_request.resulting_order = None
+            elif prequal_request.email:
+                searching.append(prequal_request)
+        if searching:
+            emails = {r.email for r in searching}
+            orders = (
+                Order.objects.filter(
+                    Q(guest_email__in=emails) | Q(user__email__in=emails)
+                )
+                .filter(date_placed__gt=min(r.created_datetime for r in searching))
+                .select_related("user")
+                .order_by("date_placed")
+            )
+            orders_by_email = {}
+            for order in orders:
+                for email in {
+                    order.guest_email,
+                    order.user.email if order.user else None,
+                }:
+                    orders_by_email.setdefault(email, []).append(order)
+            for prequal_request in searching:
+                prequal_request.resulting_order = next(
+                    (
+                        order
+                        for order in orders_by_email.get(prequal_request.email, [])
+                        if order.date_placed > prequal_request.created_datetime
+                    ),
+                    None,
+                )
+        prequal_requests = [
+            r for r in prequal_requests if "resulting_order" in r.__dict__
+        ]
+        merchant_names = TransferMetadata.get_merchant_names_by_order(
+            r.resulting_order for r in prequal_requests
+        )
+        for prequal_request in prequal_requests:
+            order = prequal_request.resulting_order
+            prequal_request.order_merchant_name = merchant_names.get(
+                order.pk if order else None
+            )
 
     @property
     def response_reported_datetime(self):
@@ -264,6 +350,11 @@ class PreQualificationSDKApplicationResult(models.Model):
     class Meta:
         verbose_name = _("Pre-Qualification SDK Application Result")
         verbose_name_plural = _("Pre-Qualification SDK Application Results")
+        indexes = [
+            models.Index(
+                fields=["-created_datetime", "-id"], name="wfrs_sdkapp_created_idx"
+            ),
+        ]
 
     @property
     def prequal_request_uuid(self):
@@ -51,6 +51,24 @@ class TransferMetadata(AccountNumberMixin, models.Model):
     created_datetime = models.DateTimeField(_("Created"), auto_now_add=True)
     modified_datetime = models.DateTimeField(_("Modified"), auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Dashboard list (default ordering)
+            models.Index(
+                fields=["-created_datetime", "-id"], name="wfrs_transfer_created_idx"
+            ),
+            # get_by_oscar_transaction
+            models.Index(
+                fields=["merchant_reference", "type_code", "-created_datetime"],
+                name="wfrs_transfer_ref_type_idx",
+            ),
+            # CreditApplication.get_orders (covers the merchant_reference lookup, too)
+            models.Index(
+                fields=["last4_account_number", "merchant_reference"],
+                name="wfrs_transfer_last4_ref_idx",
+            ),
+        ]
+
     @classmethod
     def get_by_oscar_transaction(cls, transaction, type_code=TRANS_TYPE_AUTH):
         return (
@@ -60,6 +78,61 @@ class TransferMetadata(AccountNumberMixin, models.Model):
             .first()
         )
 
+    @classmethod
+    def get_merchant_names_by_order(cls, orders, type_code=TRANS_TYPE_AUTH):
+        """
+        Find the merchant name of each of the given orders: the merchant name of the transfer for the first of
+        the order's Wells Fargo authorizations which has one. Returns a dict of order IDs to merchant names,
+        which omits orders without any such transfer. Runs two queries, no matter how many orders are given.
+        """
+        Transaction = get_model("payment", "Transaction")
+        order_ids = {order.pk for order in orders if order}
+        if not order_ids:
+            return {}
+        # Same order as iterating through each order's sources, and then each source's transactions
+        transactions = list(
+            Transaction.objects.filter(
+                source__order_id__in=order_ids,
+                source__source_type__name="Wells Fargo",
+                txn_type=Transaction.AUTHORISE,
+            )
+            .order_by("source_id", "-date_created")
+            .values_list("source__order_id", "reference")
+        )
+        transfers = {}
+        references = {reference for _, reference in transactions}
+        for transfer in (
+            cls.objects.filter(merchant_reference__in=references)
+            .filter(type_code=type_code)
+            .order_by("-created_datetime")
+        ):
+            transfers.setdefault(transfer.merchant_reference, transfer)
+        merchant_names = {}
+        for order_id, reference in transactions:
+            if order_id not in merchant_names and reference in transfers:
+                merchant_names[order_id] = transfers[reference].merchant_name
+        return merchant_names
+
+    @classmethod
+    def prefetch_orders(cls, transfers):
+        """
+        Load the ``order`` of each of the given transfers using a single query.
+        """
+        Transaction = get_model("payment", "Transaction")
+        transfers = [t for t in transfers if "order" not in t.__dict__]
+        if not transfers:
+            return
+        transactions = {}
+        for transaction in Transaction.objects.filter(
+            reference__in={t.merchant_reference for t in transfers}
+        ).select_related("source__order"):
+            transactions.setdefault(transaction.reference, []).append(transaction)
+        for transfer in transfers:
+            matches = transactions.get(transfer.merchant_reference, [])
+            # Leave ambiguous references to ``get_order``, so that they behave the same as before
+            if len(matches) <= 1:
+                transfer.order = matches[0].source.order if matches else None
+
     @property
     def type_name(self):
         return dict(TRANS_TYPES).get(self.type_code)
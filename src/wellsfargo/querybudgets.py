@@ -0,0 +1,66 @@
+"""
+Query budgets for the package's views, API endpoints, CSV exports, and payment method.
+
+Each budget is the exact number of queries one request (or call) runs. Budgets must not depend on how
+many rows are in the database, so ``assertQueryBudget`` checks each one twice: once with a few rows of
+every kind seeded, and again after seeding more. A query which runs once per row (an N+1 query) fails the
+second check.
+
+Budgets are checked by ``wellsfargo.tests.test_query_budgets``, and the payment method's budget also limits
+the queries of each checkout run by ``wfrs_benchmark_checkout``. If a change legitimately alters a query
+count, update its budget here. Lowering a budget is always fine.
+"""
+
+# Number of rows of each kind to seed before each of the two checks of a budget
+BUDGET_SEED_COUNTS = (2, 3)
+
+QUERY_BUDGETS = {
+    # wellsfargo.api.views
+    "wfrs-api-apply:get": 2,
+    "wfrs-api-apply:post": 20,
+    "wfrs-api-update-inquiry:post": 12,
+    "wfrs-api-plan-list:get": 12,
+    "wfrs-api-estimated-payment:get": 4,
+    "wfrs-api-estimated-payments:get": 6,
+    "wfrs-api-acct-inquiry:post": 10,
+    "wfrs-api-prequal:get": 4,
+    "wfrs-api-prequal:post": 9,
+    "wfrs-api-prequal-resume:get": 5,
+    "wfrs-api-prequal-sdk-merchant-num:get": 1,
+    "wfrs-api-prequal-sdk-response:post": 7,
+    "wfrs-api-prequal-sdk-app-result:get": 3,
+    "wfrs-api-prequal-sdk-app-result:post": 9,
+    "wfrs-api-prequal-customer-response:post": 5,
+    # wellsfargo.dashboard.views
+    "wfrs-plan-list:get": 4,
+    "wfrs-plan-create:get": 3,
+    "wfrs-plan-edit:get": 4,
+    "wfrs-plan-delete:get": 4,
+    "wfrs-benefit-list:get": 5,
+    "wfrs-benefit-create:get": 4,
+    "wfrs-benefit-edit:get": 6,
+    "wfrs-benefit-delete:get": 5,
+    "wfrs-application-list:get": 12,
+    "wfrs-application-detail:get": 6,
+    "wfrs-transfer-list:get": 7,
+    "wfrs-transfer-detail:get": 7,
+    "wfrs-prequal-list:get": 9,
+    "wfrs-prequal-detail:get": 5,
+    "wfrs-sdk-application-list:get": 6,
+    "wfrs-export-list:get": 5,
+    "wfrs-export-create:post": 3,
+    "wfrs-export-download:get": 3,
+    "wfrs-bulk-return:get": 3,
+    "wfrs-bulk-return:post": 11,
+    "wfrs-bulk-return-results:get": 3,
+    # CSV downloads of the dashboard lists, and background exports of them
+    "wfrs-application-list:csv": 17,
+    "wfrs-prequal-list:csv": 11,
+    "wfrs-sdk-application-list:csv": 5,
+    "export:credit-applications": 14,
+    "export:prequal-requests": 11,
+    "export:sdk-applications": 8,
+    # wellsfargo.methods
+    "payment-method:serializer": 3,
+    "payment-method:record-payment": 21,
+}
@@ -1,20 +1,33 @@
-from django.core.exceptions import ImproperlyConfigured
+from ..core.loading import load_class
 from ..settings import WFRS_SECURITY
-import importlib
+from ..tracing import SPAN_DECRYPT, SPAN_ENCRYPT, traced
 import pickle
 import base64
 
 
+@traced(SPAN_ENCRYPT)
 def encrypt_account_number(account_number):
     """Accepts account number as a string and returns cipher-text bytes"""
     return _get_configured_encryptor().encrypt(account_number)
 
 
+@traced(SPAN_DECRYPT)
 def decrypt_account_number(encrypted):
     """Accepts cipher-text bytes and return account number as a string"""
     return _get_configured_encryptor().decrypt(encrypted)
 
 
+@traced(SPAN_DECRYPT)
+def decrypt_account_numbers(encrypted_values):
+    """
+    Accepts a list of cipher-text bytes and returns a list of account numbers, using one encryptor for all
+    of them (building an encryptor, like a KMS client, can cost more than using it)
+    """
+    encryptor = _get_configured_encryptor()
+    return [encryptor.decrypt(encrypted) for encrypted in encrypted_values]
+
+
+@traced(SPAN_ENCRYPT)
 def encrypt_pickle(obj):
     """Accepts object, pickles it, encrypts it, and returns the cipher-text bytes"""
     pickled_bytes = pickle.dumps(obj)
@@ -22,6 +35,7 @@ def encrypt_pickle(obj):
     return _get_configured_encryptor().encrypt(encoded_str)
 
 
+@traced(SPAN_DECRYPT)
 def decrypt_pickle(encrypted):
     """Accepts cipher-text bytes, decrypts it, unpickles it, and returns the object"""
     encoded_str = _get_configured_encryptor().decrypt(encrypted)
@@ -36,15 +50,6 @@ def _get_configured_encryptor():
 
 
 def _get_encryptor(klass, kwargs):
-    Encryptor = _load_cls_from_abs_path(klass)
+    Encryptor = load_class(klass)
     encryptor = Encryptor(**kwargs)
     return encryptor
-
-
-def _load_cls_from_abs_path(path):
-    pkgname, fnname = path.rsplit(".", 1)
-    try:
-        pkg = importlib.import_module(pkgname)
-        return getattr(pkg, fnname)
-    except (ImportError, AttributeError):
-        raise ImproperlyConfigured("Could not import class at path {}".format(path))
@@ -35,6 +35,52 @@ WFRS_GATEWAY_CLIENT_CERT_PATH = overridable("WFRS_GATEWAY_CLIENT_CERT_PATH", Non
 # File path to the private key for the TLS client cert (corresponding to WFRS_GATEWAY_CLIENT_CERT_PATH)
 WFRS_GATEWAY_PRIV_KEY_PATH = overridable("WFRS_GATEWAY_PRIV_KEY_PATH", None)
 
+# Connection pool shared by the asyncio gateway clients in ``wellsfargo.connector.aio`` (which require httpx).
+# Each event loop gets its own pool, of up to ``max_connections`` connections, keeping up to
+# ``max_keepalive_connections`` of them open for ``keepalive_expiry`` seconds between requests. ``timeout`` is
+# the number of seconds to wait for the gateway to connect or respond.
+WFRS_GATEWAY_ASYNC_CLIENT = {
+    "max_connections": 200,
+    "max_keepalive_connections": 50,
+    "keepalive_expiry": 30,
+    "timeout": 30,
+}
+WFRS_GATEWAY_ASYNC_CLIENT.update(overridable("WFRS_GATEWAY_ASYNC_CLIENT", {}))
+
+# Metrics about WFRS Gateway API requests: latency, status codes, retries, and payload sizes, per operation. See
+# ``wellsfargo.connector.metrics`` for the Prometheus and StatsD adapters. Metrics are discarded by default.
+WFRS_GATEWAY_METRICS = {
+    "metrics": "wellsfargo.connector.metrics.NoOpGatewayMetrics",
+    "metrics_kwargs": {},
+}
+WFRS_GATEWAY_METRICS.update(overridable("WFRS_GATEWAY_METRICS", {}))
+
+# Opt-in recording of WFRS Gateway API traffic (scrubbed of personal information and account numbers). See
+# ``wellsfargo.connector.traffic`` for the JSON-lines recorder. Nothing is recorded by default.
+WFRS_GATEWAY_RECORDER = {
+    "recorder": "wellsfargo.connector.traffic.NoOpGatewayRecorder",
+    "recorder_kwargs": {},
+}
+WFRS_GATEWAY_RECORDER.update(overridable("WFRS_GATEWAY_RECORDER", {}))
+
+# Answer WFRS Gateway API requests with the responses in a recorded traffic ``archive``, instead of calling
+# the gateway. With ``latency`` enabled, responses are delayed by their recorded duration, multiplied by
+# ``latency_scale``. Replay is disabled by default.
+WFRS_GATEWAY_REPLAY = {
+    "archive": None,
+    "latency": False,
+    "latency_scale": 1.0,
+}
+WFRS_GATEWAY_REPLAY.update(overridable("WFRS_GATEWAY_REPLAY", {}))
+
+# Tracing of checkouts, fraud screens, encryption, and gateway requests. See ``wellsfargo.tracing`` for the
+# OpenTelemetry and in-memory tracers. Spans are discarded by default.
+WFRS_TRACING = {
+    "tracer": "wellsfargo.tracing.NoOpTracer",
+    "tracer_kwargs": {},
+}
+WFRS_TRACING.update(overridable("WFRS_TRACING", {}))
+
 # Encryption settings (used to protect account numbers stored in the database)
 WFRS_SECURITY = {
     "encryptor": "wellsfargo.security.fernet.FernetEncryption",
@@ -60,3 +106,102 @@ WFRS_FRAUD_PROTECTION = {
 WFRS_FRAUD_PROTECTION.update(overridable("WFRS_FRAUD_PROTECTION", {}))
 
 WFRS_MAX_TRANSACTION_ATTEMPTS = overridable("WFRS_MAX_TRANSACTION_ATTEMPTS", 2)
+
+# Background task execution. Used to run work (such as dashboard exports) outside of the web request.
+WFRS_TASK_RUNNER = {
+    "task_runner": "wellsfargo.tasks.runners.ThreadPoolTaskRunner",
+    "task_runner_kwargs": {},
+}
+WFRS_TASK_RUNNER.update(overridable("WFRS_TASK_RUNNER", {}))
+
+# Number of table rows rendered and written at a time by background dashboard exports
+WFRS_EXPORT_CHUNK_SIZE = overridable("WFRS_EXPORT_CHUNK_SIZE", 2000)
+
+# Number of days to keep background dashboard export files before they are purged
+WFRS_EXPORT_RETENTION_DAYS = overridable("WFRS_EXPORT_RETENTION_DAYS", 7)
+
+# Pagination of the dashboard's credit application, pre-qualification, SDK application, and transfer lists.
+# ``mode`` is either ``offset`` (numbered pages) or ``keyset`` (newer / older links, which are as fast on the
+# last page of a huge table as on the first). ``count`` controls how offset mode finds the total number of
+# rows: ``exact`` (COUNT(*)), ``cached`` (COUNT(*), cached for ``count_cache_timeout`` seconds), or
+# ``estimated`` (the query planner's estimate, used for results larger than ``estimated_count_threshold``).
+WFRS_DASHBOARD_PAGINATION = {
+    "mode": "offset",
+    "count": "exact",
+    "count_cache_timeout": 300,
+    "estimated_count_threshold": 10000,
+}
+WFRS_DASHBOARD_PAGINATION.update(overridable("WFRS_DASHBOARD_PAGINATION", {}))
+
+# Maximum number of prices plus products which may be estimated by one batch estimated payment request
+WFRS_ESTIMATED_PAYMENT_BATCH_LIMIT = overridable(
+    "WFRS_ESTIMATED_PAYMENT_BATCH_LIMIT", 100
+)
+
+# HTTP caching of the estimated payment API endpoints. Responses carry a strong ETag derived from the plan
+# catalog version and the query, and conditional requests are answered with ``304 Not Modified``.
+# ``cache_control`` and ``vary`` are applied to price lookups, which only depend on the plan catalog.
+# Lookups by product depend on the request's pricing strategy (which may depend on the user), so they use
+# ``product_cache_control`` and also vary by ``product_vary``. Set any of these to ``None`` to omit them.
+WFRS_ESTIMATED_PAYMENT_HTTP_CACHE = {
+    "cache_control": {"public": True, "max_age": 300},
+    "product_cache_control": {"private": True, "max_age": 60},
+    "vary": ["Accept"],
+    "product_vary": ["Cookie"],
+}
+WFRS_ESTIMATED_PAYMENT_HTTP_CACHE.update(
+    overridable("WFRS_ESTIMATED_PAYMENT_HTTP_CACHE", {})
+)
+
+# Opt-in caching of the financing plans available to each basket, so that repeated plan list requests (and
+# the checkout payment method serializer) don't need to apply every offer to the basket. Set ``store`` to
+# ``wellsfargo.eligibility.CacheBasketPlanStore`` (Django cache) or ``wellsfargo.eligibility.SessionBasketPlanStore``
+# (session) to enable it. Both accept a ``timeout`` (seconds) in ``store_kwargs``.
+WFRS_BASKET_PLAN_CACHE = {
+    "store": None,
+    "store_kwargs": {},
+}
+WFRS_BASKET_PLAN_CACHE.update(overridable("WFRS_BASKET_PLAN_CACHE", {}))
+
+# Make slow Wells Fargo API calls triggered by the REST API in the background (with ``WFRS_TASK_RUNNER``),
+# instead of blocking a web worker for the whole round trip. Enabled endpoints respond with ``202 Accepted``
+# and a URL to poll for the outcome. ``prequal`` enables this for pre-qualification requests, and
+# ``credit_app`` for credit applications. Credit application submissions which fail to reach the gateway
+# (failures to connect, and 502 or 503 responses) are tried up to ``credit_app_max_attempts`` times, with
+# the same ``client-request-id``, waiting ``credit_app_retry_delay`` seconds (times the attempt number)
+# between them. Clients are asked to wait ``poll_interval`` seconds between polls, and task statuses are
+# kept in the Django cache (which must be shared by web and task worker processes) for ``status_timeout``
+# seconds.
+WFRS_API_ASYNC = {
+    "prequal": False,
+    "credit_app": False,
+    "credit_app_max_attempts": 3,
+    "credit_app_retry_delay": 2,
+    "poll_interval": 1,
+    "status_timeout": 3600,
+}
+WFRS_API_ASYNC.update(overridable("WFRS_API_ASYNC", {}))
+
+# Serve the API endpoints which call Wells Fargo (pre-qualification, credit applications, and account
+# inquiries) with asyncio views, which await the gateway instead of holding a thread for the whole round
+# trip. Only useful when running under ASGI. Requires httpx.
+WFRS_API_ASYNCIO_VIEWS = overridable("WFRS_API_ASYNCIO_VIEWS", False)
+
+# Bulk jobs which call Wells Fargo for many rows at once (see ``wellsfargo.batch``). Rows are validated, sent,
+# and saved ``batch_size`` at a time. Each batch's requests are sent by up to ``concurrency`` threads at once,
+# at no more than ``rate_limit`` requests per second (``None`` for no limit). Account refreshes look up
+# accounts whose latest inquiry is more than ``account_refresh_days`` days old. Settlements charge
+# authorizations which are more than ``settle_after_hours`` hours old. The dashboard's bulk return page
+# accepts up to ``dashboard_return_limit`` orders at a time (use the ``wfrs_bulk_return`` command for more),
+# returns them with ``WFRS_TASK_RUNNER``, and keeps their results in the Django cache for
+# ``dashboard_results_timeout`` seconds.
+WFRS_BATCH = {
+    "concurrency": 8,
+    "rate_limit": 20,
+    "batch_size": 500,
+    "account_refresh_days": 7,
+    "settle_after_hours": 24,
+    "dashboard_return_limit": 50,
+    "dashboard_results_timeout": 86400,
+}
+WFRS_BATCH.update(overridable("WFRS_BATCH", {}))
@@ -0,0 +1,559 @@
+"""
+A local stand-in for the WFRS Gateway API, for load and latency testing without calling Wells Fargo.
+
+It serves the endpoints used by ``wellsfargo.connector``, with responses shaped like the real gateway's, and
+can add latency and inject failures. Run it with the ``wfrs_gateway_standin`` management command, and point
+``WFRS_GATEWAY_API_HOST`` at it.
+
+Outcomes are chosen by the request data:
+
+- Pre-qualifications are declined if the applicant's last name is ``DENIED``.
+- Credit applications are denied or pending if the main applicant's last name is ``DENIED`` or ``PENDING``.
+- Transactions are declined for account numbers ending in ``0000``.
+- Account inquiries are pending for account numbers ending in ``9999``.
+"""
+
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import base64
+import ipaddress
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import ssl
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/credit-cards/private-label/new-accounts/v2"
+
+TRANSACTION_ACTIONS = {
+    "authorization": "AUTHORIZATION",
+    "charge": "CHARGE",
+    "authorization-charge": "AUTHORIZATION_CHARGE",
+    "return": "RETURN",
+    "cancel-authorization": "CANCEL_AUTHORIZATION",
+    "void-return": "VOID_RETURN",
+    "void-sale": "VOID_SALE",
+    "timeout-authorization-charge": "TIMEOUT_AUTHORIZATION_CHARGE",
+    "timeout-return": "TIMEOUT_RETURN",
+}
+
+# Operation names, used to configure latency per operation
+OP_TOKEN = "token"
+OP_HEALTH = "health"
+OP_PREQUAL = "prequal"
+OP_APPLICATION = "application"
+OP_ACCOUNT_DETAILS = "account-details"
+OP_TRANSACTION = "transaction"
+OPERATIONS = (
+    OP_TOKEN,
+    OP_HEALTH,
+    OP_PREQUAL,
+    OP_APPLICATION,
+    OP_ACCOUNT_DETAILS,
+    OP_TRANSACTION,
+)
+
+
+class LatencyDistribution:
+    """
+    Response delays, in milliseconds. Built from a spec of the form ``<kind>:<params>``:
+
+    - ``constant:MS``
+    - ``uniform:LOW_MS,HIGH_MS``
+    - ``normal:MEAN_MS,STDDEV_MS``
+    - ``lognormal:MEDIAN_MS,SIGMA`` (the long tail typical of real services)
+    - ``exponential:MEAN_MS``
+    """
+
+    def __init__(self, kind, params):
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec):
+        kind, _, params = spec.partition(":")
+        arity = {
+            "constant": 1,
+            "uniform": 2,
+            "normal": 2,
+            "lognormal": 2,
+            "exponential": 1,
+        }
+        if kind not in arity:
+            raise ValueError("Unknown latency distribution: %s" % kind)
+        try:
+            params = [float(p) for p in params.split(",")]
+        except ValueError:
+            raise ValueError("Invalid latency parameters: %s" % spec)
+        if len(params) != arity[kind]:
+            raise ValueError(
+                "The %s distribution takes %s parameter(s)" % (kind, arity[kind])
+            )
+        return cls(kind, params)
+
+    def sample(self, rng):
+        """Return a delay in seconds"""
+        if self.kind == "constant":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            ms = rng.normalvariate(*self.params)
+        elif self.kind == "lognormal":
+            median, sigma = self.params
+            ms = median * rng.lognormvariate(0, sigma)
+        else:
+            ms = rng.expovariate(1 / self.params[0])
+        return max(ms, 0) / 1000
+
+    def __str__(self):
+        return "%s:%s" % (self.kind, ",".join("%g" % p for p in self.params))
+
+
+class StandInConfig:
+    """How the stand-in behaves. Rates are probabilities, from 0 to 1, applied to every API request."""
+
+    def __init__(
+        self,
+        latency=None,
+        operation_latency=None,
+        error_rate=0,
+        throttle_rate=0,
+        timeout_rate=0,
+        timeout_delay=60,
+        retry_after=1,
+        consumer_key=None,
+        consumer_secret=None,
+        token_ttl=79900,
+        seed=None,
+    ):
+        self.latency = latency
+        self.operation_latency = operation_latency or {}
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.retry_after = retry_after
+        # When set, the token endpoint only accepts these credentials
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.token_ttl = token_ttl
+        self.rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def get_latency(self, operation):
+        return self.operation_latency.get(operation, self.latency)
+
+    def random(self):
+        with self._rng_lock:
+            return self.rng.random()
+
+    def sample_latency(self, operation):
+        distribution = self.get_latency(operation)
+        if distribution is None:
+            return 0
+        with self._rng_lock:
+            return distribution.sample(self.rng)
+
+
+class GatewayStandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "WFRSGatewayStandIn/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        path = self.path.split("?", 1)[0]
+        route = self._route(path)
+        if route is None:
+            return self._send_json(404, {"errors": [{"description": "Not found"}]})
+        method, operation, handler = route
+        if self.command != method:
+            return self._send_json(
+                405, {"errors": [{"description": "Method not allowed"}]}
+            )
+        # Inject latency and faults before doing anything else
+        time.sleep(self.config.sample_latency(operation))
+        if self._inject_fault():
+            return
+        if operation != OP_TOKEN and not self._is_authorized():
+            return self._send_json(
+                401, {"errors": [{"description": "Invalid access token"}]}
+            )
+        self.server.record_request(operation)
+        return handler()
+
+    def _route(self, path):
+        if path == "/oauth2/v1/token":
+            return "POST", OP_TOKEN, self.handle_token
+        if path == "/utilities/v1/hello-wellsfargo":
+            return "GET", OP_HEALTH, self.handle_health
+        if path == API_PREFIX + "/prequalifications":
+            return "POST", OP_PREQUAL, self.handle_prequal
+        if path == API_PREFIX + "/applications":
+            return "POST", OP_APPLICATION, self.handle_application
+        if path == API_PREFIX + "/details":
+            return "POST", OP_ACCOUNT_DETAILS, self.handle_account_details
+        match = re.fullmatch(API_PREFIX + r"/payment/transactions/([a-z-]+)", path)
+        if match and match.group(1) in TRANSACTION_ACTIONS:
+            action = match.group(1)
+            return "POST", OP_TRANSACTION, lambda: self.handle_transaction(action)
+        return None
+
+    def _inject_fault(self):
+        config = self.config
+        roll = config.random()
+        if roll < config.timeout_rate:
+            # Hold the connection without responding, then drop it
+            time.sleep(config.timeout_delay)
+            self.close_connection = True
+            return True
+        roll -= config.timeout_rate
+        if roll < config.throttle_rate:
+            self._send_json(
+                429,
+                {"errors": [{"description": "Too many requests"}]},
+                headers={"Retry-After": str(config.retry_after)},
+            )
+            return True
+        roll -= config.throttle_rate
+        if roll < config.error_rate:
+            self._send_json(500, {"errors": [{"description": "Internal server error"}]})
+            return True
+        return False
+
+    def _is_authorized(self):
+        auth = self.headers.get("Authorization", "")
+        if not auth.startswith("Bearer "):
+            return False
+        return self.server.is_valid_token(auth[len("Bearer ") :])
+
+    def _read_json(self):
+        try:
+            return json.loads(self.body or b"{}")
+        except ValueError:
+            return {}
+
+    def _read_form(self):
+        data = parse_qs(self.body.decode("utf-8"))
+        return {key: values[0] for key, values in data.items()}
+
+    def _send_json(self, status_code, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        client_request_id = self.headers.get("client-request-id")
+        if client_request_id:
+            self.send_header("client-request-id", client_request_id)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_validation_error(self, description, field_name=None):
+        error = {
+            "error_code": "400-001",
+            "description": description,
+        }
+        if field_name:
+            error["field_name"] = field_name
+        return self._send_json(400, {"errors": [error]})
+
+    def handle_token(self):
+        auth = self.headers.get("Authorization", "")
+        try:
+            key, _, secret = (
+                base64.b64decode(auth[len("Basic ") :]).decode("utf-8").partition(":")
+            )
+        except ValueError:
+            key = secret = None
+        if not auth.startswith("Basic ") or (
+            self.config.consumer_key is not None
+            and (key, secret) != (self.config.consumer_key, self.config.consumer_secret)
+        ):
+            return self._send_json(401, {"error": "invalid_client"})
+        data = self._read_form()
+        if data.get("grant_type") != "client_credentials":
+            return self._send_json(400, {"error": "unsupported_grant_type"})
+        token = self.server.issue_token(self.config.token_ttl)
+        return self._send_json(
+            200,
+            {
+                "access_token": token,
+                "scope": data.get("scope", ""),
+                "token_type": "Bearer",
+                "expires_in": self.config.token_ttl,
+            },
+        )
+
+    def handle_health(self):
+        return self._send_json(
+            200,
+            {
+                "response": "Congratulations! Your environment is set up correctly. Thank you for your business.",
+            },
+        )
+
+    def handle_prequal(self):
+        data = self._read_json()
+        applicant = data.get("main_applicant", {})
+        if not applicant.get("last_name"):
+            return self._send_validation_error(
+                "'last_name' is required.", "main_applicant.last_name"
+            )
+        resp = {
+            "client-request-id": self.headers.get("client-request-id", ""),
+            "merchant_number": data.get("merchant_number", ""),
+            "transaction_code": data.get("transaction_code", "P1"),
+        }
+        if applicant["last_name"].upper() == "DENIED":
+            resp.update(decision_status="D", decision_message="DENIED")
+        else:
+            resp.update(
+                decision_status="A",
+                decision_message="APPROVED",
+                application_id=secrets.token_hex(4).upper(),
+                max_credit_limit="8500",
+                URL="",
+            )
+        return self._send_json(200, resp)
+
+    def handle_application(self):
+        data = self._read_json()
+        applicant = data.get("main_applicant", {})
+        if not applicant.get("ssn"):
+            return self._send_validation_error("'ssn' is invalid.", "ssn")
+        last_name = applicant.get("last_name", "").upper()
+        resp = {
+            "client-request-id": self.headers.get("client-request-id", ""),
+        }
+        if last_name == "DENIED":
+            resp["application_status"] = "DENIED"
+            return self._send_json(200, resp)
+        account_number = self.server.new_account_number()
+        resp.update(
+            transaction_code=data.get("transaction_code", "A6"),
+            application_status="PENDING" if last_name == "PENDING" else "APPROVED",
+            merchant_number=data.get("merchant_number", ""),
+            credit_card_number=account_number,
+            credit_card_last_four=account_number[-4:],
+            credit_line="7500.0",
+        )
+        return self._send_json(200, resp)
+
+    def handle_account_details(self):
+        data = self._read_json()
+        account_number = data.get("account_number") or self.server.new_account_number()
+        if len(account_number) < 15:
+            return self._send_validation_error(
+                "'account_number' cannot have fewer than 15 character(s).",
+                "account_number",
+            )
+        resp = {
+            "merchant_number": data.get("merchant_number", ""),
+            "transaction_code": data.get("transaction_code", "C4"),
+        }
+        if account_number.endswith("9999"):
+            resp.update(message="Pending", transaction_status="H7")
+            return self._send_json(200, resp)
+        resp.update(
+            account_number=account_number,
+            transaction_status="H1",
+            available_credit="14455.00",
+            credit_limit="18000.00",
+            individual_joint_indicator="I",
+            applicant={
+                "name": "%s, %s"
+                % (data.get("last_name", "SCHMOE"), data.get("first_name", "JOE")),
+                "address": {
+                    "address_1": "123 FIRST STREET",
+                    "city": "DES MOINES",
+                    "state": "IA",
+                    "postal_code": data.get("postal_code", "50322"),
+                },
+            },
+        )
+        return self._send_json(200, resp)
+
+    def handle_transaction(self, action):
+        data = self._read_json()
+        account_number = data.get("account_number", "")
+        if not account_number or not data.get("amount"):
+            return self._send_validation_error(
+                "'account_number' and 'amount' are required."
+            )
+        resp = {
+            "client-request-id": self.headers.get("client-request-id", ""),
+            "transaction_type": TRANSACTION_ACTIONS[action],
+            "account_number": account_number,
+            "amount": data["amount"],
+            "plan_number": data.get("plan_number", ""),
+            "ticket_number": data.get("ticket_number", ""),
+        }
+        if account_number.endswith("0000"):
+            resp.update(transaction_status="A0", status_message="DECLINED")
+        else:
+            authorization_number = data.get("authorization_number") or "%06d" % (
+                self.server.next_sequence() % 1000000
+            )
+            resp.update(
+                transaction_status="A1",
+                status_message="APPROVED: %s" % authorization_number,
+                authorization_number=authorization_number,
+                disclosure="REGULAR TERMS WITH REGULAR PAYMENTS. THE REGULAR RATE IS 28.99%.",
+            )
+        return self._send_json(200, resp)
+
+
+class GatewayStandInServer(ThreadingHTTPServer):
+    """A threaded HTTPS server for the stand-in, which tracks issued tokens and request counts"""
+
+    daemon_threads = True
+    # Accept bursts of connections from load tests
+    request_queue_size = 1024
+
+    def __init__(self, server_address, config, ssl_context=None):
+        super().__init__(server_address, GatewayStandInHandler)
+        self.config = config
+        self.ssl_context = ssl_context
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._sequence = 0
+        self.request_counts = {operation: 0 for operation in OPERATIONS}
+
+    def get_request(self):
+        sock, addr = super().get_request()
+        if self.ssl_context is not None:
+            # Do the TLS handshake in the request thread, so a slow client doesn't block the others
+            sock = self.ssl_context.wrap_socket(
+                sock, server_side=True, do_handshake_on_connect=False
+            )
+        return sock, addr
+
+    def finish_request(self, request, client_address):
+        if self.ssl_context is not None:
+            try:
+                request.do_handshake()
+            except (ssl.SSLError, OSError) as e:
+                logger.info("TLS handshake with %s failed: %s", client_address, e)
+                return
+        super().finish_request(request, client_address)
+
+    def issue_token(self, ttl):
+        token = secrets.token_hex(16)
+        with self._lock:
+            self._tokens[token] = time.monotonic() + ttl
+        return token
+
+    def is_valid_token(self, token):
+        with self._lock:
+            expires = self._tokens.get(token)
+        return expires is not None and expires > time.monotonic()
+
+    def next_sequence(self):
+        with self._lock:
+            self._sequence += 1
+            return self._sequence
+
+    def new_account_number(self):
+        return "9%015d" % self.next_sequence()
+
+    def record_request(self, operation):
+        with self._lock:
+            self.request_counts[operation] += 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return "%s:%s" % (host, port)
+
+
+def generate_self_signed_cert(directory=None, hostnames=("localhost", "127.0.0.1")):
+    """
+    Write a self-signed certificate and key for the given hostnames, and return their paths. Trust the
+    certificate in clients with ``REQUESTS_CA_BUNDLE`` (or ``SSL_CERT_FILE``).
+    """
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    directory = directory or tempfile.mkdtemp(prefix="wfrs-standin-")
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, hostnames[0])])
+    alt_names = []
+    for hostname in hostnames:
+        try:
+            alt_names.append(x509.IPAddress(ipaddress.ip_address(hostname)))
+        except ValueError:
+            alt_names.append(x509.DNSName(hostname))
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(minutes=5))
+        .not_valid_after(now + timedelta(days=30))
+        .add_extension(x509.SubjectAlternativeName(alt_names), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "standin-cert.pem")
+    key_path = os.path.join(directory, "standin-key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+        )
+    return cert_path, key_path
+
+
+def build_ssl_context(cert_path, key_path, client_ca_path=None):
+    """Build the server's TLS context. With ``client_ca_path``, clients must present a certificate (mTLS)."""
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_path, key_path)
+    if client_ca_path:
+        context.verify_mode = ssl.CERT_REQUIRED
+        context.load_verify_locations(client_ca_path)
+    return context
+
+
+def start_standin(host="127.0.0.1", port=0, config=None, ssl_context=None):
+    """
+    Start a stand-in server in a background thread, and return it. Stop it with ``server.shutdown()`` and
+    ``server.server_close()``.
+    """
+    server = GatewayStandInServer((host, port), config or StandInConfig(), ssl_context)
+    thread = threading.Thread(target=server.serve_forever, name="wfrs-gateway-standin")
+    thread.daemon = True
+    thread.start()
+    return server
@@ -0,0 +1,31 @@
+from django.db import transaction
+from ..core.loading import load_class
+from ..settings import WFRS_TASK_RUNNER
+
+
+def enqueue_task(task_path, *args, **kwargs):
+    """
+    Schedule the function at the given dotted path to be run by the configured task runner. If
+    called inside a database transaction, the task isn't handed to the runner until the transaction
+    commits, so that the task can always see the rows it was given the IDs of.
+    """
+    runner = _get_configured_task_runner()
+    transaction.on_commit(lambda: runner.enqueue(task_path, *args, **kwargs))
+
+
+def run_task(task_path, *args, **kwargs):
+    """Import the function at the given dotted path and call it with the given arguments"""
+    fn = load_class(task_path)
+    return fn(*args, **kwargs)
+
+
+def _get_configured_task_runner():
+    klass = WFRS_TASK_RUNNER["task_runner"]
+    kwargs = WFRS_TASK_RUNNER.get("task_runner_kwargs", {})
+    return _get_task_runner(klass, kwargs)
+
+
+def _get_task_runner(klass, kwargs):
+    TaskRunner = load_class(klass)
+    runner = TaskRunner(**kwargs)
+    return runner
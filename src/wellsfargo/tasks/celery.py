@@ -0,0 +1,43 @@
+from django.core.exceptions import ImproperlyConfigured
+from . import run_task
+
+try:
+    from celery import shared_task
+except ImportError:
+    raise ImproperlyConfigured(
+        "wellsfargo.tasks.celery.CeleryTaskRunner requires Celery. Install it (for example, with the "
+        "celery dependency group) to use it as the WFRS_TASK_RUNNER."
+    )
+
+
+@shared_task(name="wellsfargo.tasks.celery.run_wfrs_task")
+def run_wfrs_task(task_path, *args, **kwargs):
+    return run_task(task_path, *args, **kwargs)
+
+
+class CeleryTaskRunner(object):
+    """
+    Run tasks using a `Celery <https://docs.celeryq.dev/>`_ worker pool.
+
+    Usage:
+
+    WFRS_TASK_RUNNER = {
+        'task_runner': 'wellsfargo.tasks.celery.CeleryTaskRunner',
+        'task_runner_kwargs': {
+            'queue': 'wfrs',
+        },
+    }
+
+    Your Celery app must be configured to autodiscover tasks from the ``wellsfargo.tasks.celery`` module.
+    """
+
+    def __init__(self, queue=None):
+        self.queue = queue
+
+    def enqueue(self, task_path, *args, **kwargs):
+        options = {}
+        if self.queue:
+            options["queue"] = self.queue
+        return run_wfrs_task.apply_async(
+            args=(task_path,) + args, kwargs=kwargs, **options
+        )
@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connections
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class SynchronousTaskRunner(object):
+    """
+    Run tasks immediately, in the calling thread. Useful for tests and local development.
+
+    Usage:
+
+    WFRS_TASK_RUNNER = {
+        'task_runner': 'wellsfargo.tasks.runners.SynchronousTaskRunner',
+    }
+    """
+
+    def enqueue(self, task_path, *args, **kwargs):
+        from . import run_task
+
+        run_task(task_path, *args, **kwargs)
+
+
+class ThreadPoolTaskRunner(object):
+    """
+    Run tasks in a pool of background threads inside the current process. Tasks do not survive a
+    process restart, so use a real task queue (see ``wellsfargo.tasks.celery.CeleryTaskRunner``) for
+    anything which must not be lost.
+
+    Usage:
+
+    WFRS_TASK_RUNNER = {
+        'task_runner': 'wellsfargo.tasks.runners.ThreadPoolTaskRunner',
+        'task_runner_kwargs': {
+            'max_workers': 4,
+        },
+    }
+    """
+
+    _executors = {}
+    _executors_lock = threading.Lock()
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+
+    @property
+    def executor(self):
+        with self._executors_lock:
+            executor = self._executors.get(self.max_workers)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="wfrs-task"
+                )
+                self._executors[self.max_workers] = executor
+        return executor
+
+    def enqueue(self, task_path, *args, **kwargs):
+        return self.executor.submit(self._run, task_path, args, kwargs)
+
+    @staticmethod
+    def _run(task_path, args, kwargs):
+        from . import run_task
+
+        try:
+            return run_task(task_path, *args, **kwargs)
+        except Exception:
+            logger.exception("Background task %s failed.", task_path)
+        finally:
+            # Database connections are thread-local, so make sure this thread doesn't leak one.
+            connections.close_all()
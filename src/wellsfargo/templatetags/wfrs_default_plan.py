@@ -1,33 +1,58 @@
 from django import template
-from ..models import FinancingPlan
+from ..catalog import get_plan_catalog
+from ..utils import get_product_price
 
 register = template.Library()
 
 
 @register.simple_tag
 def get_default_plan():
-    return FinancingPlan.objects.filter(
-        advertising_enabled=True, is_default_plan=True
-    ).first()
+    return get_plan_catalog().default_plan
+
+
+# Request attribute holding the plans found by ``get_plans_for_products``, keyed by product ID
+PRODUCT_PLANS_REQUEST_ATTR = "_wfrs_product_plans"
 
 
 @register.simple_tag
 def get_plan_for_product(request, product):
-    if product.is_parent:
-        purchase_info = request.strategy.fetch_for_parent(product)
-    else:
-        purchase_info = request.strategy.fetch_for_product(product)
-    if purchase_info.price.is_tax_known:
-        price = purchase_info.price.incl_tax
-    else:
-        price = purchase_info.price.excl_tax
-    return (
-        FinancingPlan.objects.filter(advertising_enabled=True)
-        .filter(product_price_threshold__gte="0.00")
-        .filter(product_price_threshold__lte=price)
-        .order_by("-product_price_threshold")
-        .first()
-    )
+    product_plans = getattr(request, PRODUCT_PLANS_REQUEST_ATTR, {})
+    if product.pk in product_plans:
+        return product_plans[product.pk]
+    price = get_product_price(request.strategy, product)
+    if price is None:
+        return None
+    return get_plan_catalog().get_plan_for_price(price)
+
+
+@register.simple_tag
+def get_plans_for_products(request, products):
+    """
+    Find the plan to advertise for every product on a page (such as a category or search results page)
+    in one pass. Returns a dictionary mapping product IDs to plans (or ``None``), which can be read with
+    the ``plan_for_product`` filter. The plans are also remembered for the rest of the request, so that
+    ``get_plan_for_product`` tags in the page's product tiles don't need to look them up again.
+    """
+    catalog = get_plan_catalog()
+    product_plans = {}
+    for product in products:
+        if product.pk in product_plans:
+            continue
+        price = get_product_price(request.strategy, product)
+        product_plans[product.pk] = (
+            catalog.get_plan_for_price(price) if price is not None else None
+        )
+    remembered = getattr(request, PRODUCT_PLANS_REQUEST_ATTR, None)
+    if remembered is None:
+        remembered = {}
+        setattr(request, PRODUCT_PLANS_REQUEST_ATTR, remembered)
+    remembered.update(product_plans)
+    return product_plans
+
+
+@register.filter
+def plan_for_product(product_plans, product):
+    return product_plans.get(product.pk)
 
 
 @register.simple_tag
@@ -0,0 +1,64 @@
+"""
+Test helpers for the asyncio gateway clients, which require httpx.
+"""
+
+from unittest import mock
+import httpx
+
+
+class HTTPXMocker:
+    """
+    Mock the requests made by the asyncio gateway clients (in ``wellsfargo.connector.aio``). Responses are
+    registered the same way as with ``requests_mock``, so the ``BaseTest.mock_*`` methods accept either.
+    """
+
+    def __init__(self):
+        self.matchers = []
+        self.request_history = []
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        self._patcher = mock.patch(
+            "wellsfargo.connector.aio.get_http_client",
+            side_effect=lambda cert=None: self.client,
+        )
+
+    def __enter__(self):
+        self._patcher.start()
+        return self
+
+    def __exit__(self, *args):
+        self._patcher.stop()
+
+    def register_uri(
+        self,
+        method,
+        url,
+        json=None,
+        status_code=200,
+        exc=None,
+        additional_matcher=None,
+    ):
+        # Later registrations take precedence, as with requests_mock
+        self.matchers.insert(
+            0, (method.upper(), url, json, status_code, exc, additional_matcher)
+        )
+
+    def get(self, url, **kwargs):
+        self.register_uri("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        self.register_uri("POST", url, **kwargs)
+
+    def handle(self, request):
+        self.request_history.append(request)
+        url = str(request.url.copy_with(query=None))
+        for method, match_url, json, status_code, exc, matcher in self.matchers:
+            if method != request.method or match_url != url:
+                continue
+            if matcher is not None and not matcher(request):
+                continue
+            if exc is not None:
+                raise exc("Mocked error", request=request)
+            return httpx.Response(status_code, json=json)
+        raise httpx.ConnectError(
+            "No mock address: %s %s" % (request.method, url), request=request
+        )
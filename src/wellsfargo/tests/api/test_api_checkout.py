@@ -5,8 +5,12 @@ from rest_framework import status
 from rest_framework.reverse import reverse
 from oscar.core.loading import get_model
 from oscar.test import factories
+from oscarapi.basket import operations
+from unittest import mock
+from wellsfargo import utils
 from wellsfargo.core.constants import TRANS_APPROVED
 from wellsfargo.models import FinancingPlan, FinancingPlanBenefit, FraudScreenResult
+from wellsfargo.settings import WFRS_BASKET_PLAN_CACHE
 from wellsfargo.tests.base import BaseTest
 from wellsfargo.tests.test_fraud import patch_fraud_protection
 from requests.exceptions import Timeout
@@ -273,6 +277,84 @@ class CheckoutTest(BaseTest):
         resp = self._checkout(basket_id, "9999999999999999", plan_id=self.plan.id + 1)
         self.assertEqual(resp.status_code, status.HTTP_406_NOT_ACCEPTABLE)
 
+    @requests_mock.Mocker()
+    def test_checkout_lists_plans_once(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_transaction_request(rmock)
+        self.client.login(username="joe", password="schmoe")
+        basket_id = self._prepare_basket()
+        with mock.patch(
+            "wellsfargo.utils.operations.get_basket", wraps=operations.get_basket
+        ) as get_basket, mock.patch(
+            "wellsfargo.utils._list_plans_for_benefits",
+            wraps=utils._list_plans_for_benefits,
+        ) as list_plans:
+            resp = self._checkout(basket_id, "9999999999999999")
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_basket.call_count, 1)
+        self.assertEqual(list_plans.call_count, 1)
+
+    @requests_mock.Mocker()
+    def test_checkout_with_cached_basket_plans(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_transaction_request(rmock)
+        self.client.login(username="joe", password="schmoe")
+        for store in (
+            "wellsfargo.eligibility.CacheBasketPlanStore",
+            "wellsfargo.eligibility.SessionBasketPlanStore",
+        ):
+            with self.subTest(store=store), mock.patch.dict(
+                WFRS_BASKET_PLAN_CACHE, {"store": store}
+            ), mock.patch(
+                "oscarapi.basket.operations.apply_offers",
+                wraps=operations.apply_offers,
+            ) as apply_offers:
+                basket_id = self._prepare_basket()
+                apply_offers.reset_mock()
+                # The first plan list applies offers, repeat polls don't
+                self._check_available_plans()
+                self.assertEqual(apply_offers.call_count, 1)
+                self._check_available_plans()
+                self._check_available_plans()
+                self.assertEqual(apply_offers.call_count, 1)
+                # Changing the basket invalidates the cached plans
+                self._add_to_basket(self._create_product().id)
+                apply_offers.reset_mock()
+                self._check_available_plans()
+                self.assertEqual(apply_offers.call_count, 1)
+                # So does changing an offer
+                ConditionalOffer.objects.first().save()
+                self._check_available_plans()
+                self.assertEqual(apply_offers.call_count, 2)
+                # But recording an offer's usage (which happens for every order placed with it) doesn't
+                ConditionalOffer.objects.first().record_usage(
+                    {"freq": 1, "discount": D("1.00")}
+                )
+                self._check_available_plans()
+                self.assertEqual(apply_offers.call_count, 2)
+                # Check out, using the cached plans to validate the chosen plan
+                resp = self._checkout(basket_id, "9999999999999999")
+                self.assertEqual(resp.status_code, status.HTTP_200_OK)
+                resp = self._fetch_payment_states()
+                self.assertEqual(resp.data["order_status"], "Authorized")
+
+    @requests_mock.Mocker()
+    def test_cached_basket_plans_rejects_ineligible_plan(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_transaction_request(rmock)
+        self.client.login(username="joe", password="schmoe")
+        other_plan = FinancingPlan.objects.create(
+            plan_number=8888, apr="0.00", term_months=6
+        )
+        with mock.patch.dict(
+            WFRS_BASKET_PLAN_CACHE,
+            {"store": "wellsfargo.eligibility.CacheBasketPlanStore"},
+        ):
+            basket_id = self._prepare_basket()
+            self._check_available_plans()
+            resp = self._checkout(basket_id, "9999999999999999", other_plan.pk)
+            self.assertEqual(resp.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
     def _create_product(self, price=D("10.00")):
         product = factories.create_product(
             title="My Product", product_class="My Product Class"
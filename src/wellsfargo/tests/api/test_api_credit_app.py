@@ -1,7 +1,12 @@
+from unittest import mock
 from rest_framework import status
 from rest_framework.reverse import reverse
-from wellsfargo.models import CreditApplication
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from wellsfargo.api.views import CREDIT_APP_SESSION_KEY, INQUIRY_SESSION_KEY
+from wellsfargo.models import AccountInquiryResult, CreditApplication
+from wellsfargo.settings import WFRS_API_ASYNC
 from wellsfargo.tests.base import BaseTest
+import requests
 import requests_mock
 
 
@@ -222,3 +227,148 @@ class CreditApplicationTest(BaseTest):
         self.assertEqual(
             response.data["detail"], "Credit Application approval is pending"
         )
+
+
+def refused_error():
+    # What requests raises when the gateway refuses the connection
+    return requests.exceptions.ConnectionError(
+        MaxRetryError(None, "/", NewConnectionError(None, "Connection refused"))
+    )
+
+
+@mock.patch.dict(WFRS_API_ASYNC, {"credit_app": True, "credit_app_retry_delay": 0})
+class AsyncCreditApplicationTest(BaseTest):
+    view_name = "wfrs-api-apply"
+    applications_url = "https://api-sandbox.wellsfargo.com/credit-cards/private-label/new-accounts/v2/applications"
+
+    def _submit(self):
+        url = reverse(self.view_name)
+        data = CreditApplicationTest.build_valid_request(self)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "pending")
+        self.assertEqual(response["Location"], response.data["poll_url"])
+        # The application is saved straight away, but not submitted yet
+        app = CreditApplication.objects.get()
+        self.assertEqual(app.status, "")
+        self.assertEqual(self.client.session[CREDIT_APP_SESSION_KEY], app.pk)
+        return callbacks
+
+    def _run_tasks(self, callbacks):
+        for callback in callbacks:
+            callback()
+
+    def _poll(self):
+        return self.client.get(reverse(self.view_name))
+
+    def test_poll_without_application(self):
+        response = self._poll()
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    @requests_mock.Mocker()
+    def test_submit_successful(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_credit_app_request(rmock)
+        callbacks = self._submit()
+        self.assertFalse(any("applications" in r.url for r in rmock.request_history))
+        self.assertEqual(self._poll().status_code, status.HTTP_202_ACCEPTED)
+        self._run_tasks(callbacks)
+        response = self._poll()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["account_number"], "9999999999999999")
+        self.assertEqual(response.data["credit_limit"], "7500.00")
+        inquiry = AccountInquiryResult.objects.get()
+        self.assertEqual(self.client.session[INQUIRY_SESSION_KEY], inquiry.pk)
+
+    @requests_mock.Mocker()
+    def test_submit_denied(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_denied_credit_app_request(rmock)
+        self._run_tasks(self._submit())
+        response = self._poll()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            response.data["detail"], "Credit Application was denied by Wells Fargo"
+        )
+
+    @requests_mock.Mocker()
+    def test_submit_pending(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_pending_credit_app_request(rmock)
+        self._run_tasks(self._submit())
+        response = self._poll()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            response.data["detail"], "Credit Application approval is pending"
+        )
+        inquiry = AccountInquiryResult.objects.get()
+        self.assertEqual(self.client.session[INQUIRY_SESSION_KEY], inquiry.pk)
+
+    @requests_mock.Mocker()
+    def test_retries_connection_errors(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        # Fail to connect, then get a gateway error, before succeeding
+        rmock.post(
+            self.applications_url,
+            [
+                {"exc": requests.exceptions.ConnectTimeout},
+                {"exc": refused_error()},
+                {"status_code": 503},
+                {
+                    "json": {
+                        "client-request-id": "13391af9-0d04-4162-b84d-ab8080ec93fc",
+                        "transaction_code": "A6",
+                        "application_status": "APPROVED",
+                        "merchant_number": "1111111111111111",
+                        "credit_card_number": "9999999999999999",
+                        "credit_card_last_four": "9999",
+                        "credit_line": "7500.0",
+                    }
+                },
+            ],
+        )
+        with mock.patch.dict(WFRS_API_ASYNC, {"credit_app_max_attempts": 4}):
+            self._run_tasks(self._submit())
+        attempts = [r for r in rmock.request_history if "applications" in r.url]
+        self.assertEqual(len(attempts), 4)
+        # Every attempt is the same submission
+        self.assertEqual(
+            len({r.headers["client-request-id"] for r in attempts}),
+            1,
+        )
+        response = self._poll()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["account_number"], "9999999999999999")
+
+    @requests_mock.Mocker()
+    def test_does_not_retry_after_sending(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        # The gateway may have processed the application in both of these cases
+        for failure in (
+            {"exc": requests.exceptions.ConnectionError("Connection aborted.")},
+            {"status_code": 504},
+        ):
+            with self.subTest(failure=failure):
+                CreditApplication.objects.all().delete()
+                rmock.reset_mock()
+                rmock.post(self.applications_url, [failure])
+                self._run_tasks(self._submit())
+                attempts = [r for r in rmock.request_history if "applications" in r.url]
+                self.assertEqual(len(attempts), 1)
+                response = self._poll()
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @requests_mock.Mocker()
+    def test_gives_up_after_max_attempts(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        rmock.post(self.applications_url, exc=requests.exceptions.ConnectTimeout)
+        self._run_tasks(self._submit())
+        attempts = [r for r in rmock.request_history if "applications" in r.url]
+        self.assertEqual(len(attempts), WFRS_API_ASYNC["credit_app_max_attempts"])
+        response = self._poll()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["non_field_errors"],
+            ["Unable to submit credit application. Please try again."],
+        )
@@ -0,0 +1,170 @@
+from unittest import mock
+from django.apps import apps
+from django.conf.urls import include
+from django.core.handlers.base import BaseHandler
+from django.db import connection
+from django.test import override_settings
+from django.urls import re_path
+from rest_framework import status
+from rest_framework.reverse import reverse
+from wellsfargo.api.views import (
+    INQUIRY_SESSION_KEY,
+    PREQUAL_SESSION_KEY,
+    AsyncCreditApplicationView,
+    AsyncPreQualificationRequestView,
+)
+from wellsfargo.models import AccountInquiryResult, PreQualificationRequest
+from wellsfargo.tests.aio import HTTPXMocker
+from wellsfargo.tests.base import BaseTest
+
+
+def _get_api_urls():
+    with mock.patch("wellsfargo.settings.WFRS_API_ASYNCIO_VIEWS", True):
+        return apps.get_app_config("wellsfargo_api").urls[0]
+
+
+urlpatterns = [
+    re_path(r"^api/wfrs/", include(_get_api_urls())),
+]
+
+
+def _build_credit_app_data():
+    # Imported here so the test runner doesn't find (and run) the test case in this module too
+    from .test_api_credit_app import CreditApplicationTest
+
+    return CreditApplicationTest.build_valid_request(None)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncioViewsTest(BaseTest):
+    prequal_data = {
+        "first_name": "Joe",
+        "last_name": "Schmoe",
+        "line1": "123 Evergreen Terrace",
+        "city": "Springfield",
+        "state": "NY",
+        "postcode": "10001",
+        "phone": "+1 (212) 209-1333",
+    }
+
+    def test_urls_use_asyncio_views(self):
+        for name, view_class in (
+            ("wfrs-api-apply", AsyncCreditApplicationView),
+            ("wfrs-api-prequal", AsyncPreQualificationRequestView),
+        ):
+            match = self.client.get(reverse(name)).resolver_match
+            self.assertIs(match.func.cls, view_class)
+
+    def test_views_are_not_atomic(self):
+        # Django refuses to wrap async views in a transaction, so they must opt out of ATOMIC_REQUESTS
+        with mock.patch.dict(connection.settings_dict, {"ATOMIC_REQUESTS": True}):
+            for view_class in (
+                AsyncCreditApplicationView,
+                AsyncPreQualificationRequestView,
+            ):
+                view = view_class.as_view()
+                self.assertIs(BaseHandler().make_view_atomic(view), view)
+
+    def test_prequal_successful(self):
+        with HTTPXMocker() as rmock:
+            self.mock_get_api_token_request(rmock)
+            self.mock_successful_prescreen_request(rmock)
+            response = self.client.post(
+                reverse("wfrs-api-prequal"), self.prequal_data, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "A")
+        self.assertEqual(response.data["credit_limit"], "8500.00")
+        prequal_request = PreQualificationRequest.objects.get()
+        self.assertEqual(self.client.session[PREQUAL_SESSION_KEY], prequal_request.pk)
+        # Polling is handled by the synchronous view
+        response = self.client.get(reverse("wfrs-api-prequal"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "A")
+
+    def test_prequal_invalid(self):
+        with HTTPXMocker() as rmock:
+            self.mock_get_api_token_request(rmock)
+            self.mock_invalid_prescreen_request(rmock)
+            response = self.client.post(
+                reverse("wfrs-api-prequal"), self.prequal_data, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["non_field_errors"], ["Return URL is missing or invalid."]
+        )
+
+    def test_prequal_validation_errors(self):
+        response = self.client.post(reverse("wfrs-api-prequal"), {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("first_name", response.data)
+
+    def test_credit_app_successful(self):
+        self.client.login(username="joe", password="schmoe")
+        with HTTPXMocker() as rmock:
+            self.mock_get_api_token_request(rmock)
+            self.mock_successful_credit_app_request(rmock)
+            response = self.client.post(
+                reverse("wfrs-api-apply"),
+                _build_credit_app_data(),
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["account_number"], "9999999999999999")
+        self.assertEqual(response.data["credit_limit"], "7500.00")
+        inquiry = AccountInquiryResult.objects.get()
+        self.assertEqual(inquiry.credit_app_source.user, self.joe)
+        self.assertEqual(self.client.session[INQUIRY_SESSION_KEY], inquiry.pk)
+
+    def test_credit_app_pending(self):
+        with HTTPXMocker() as rmock:
+            self.mock_get_api_token_request(rmock)
+            self.mock_pending_credit_app_request(rmock)
+            response = self.client.post(
+                reverse("wfrs-api-apply"),
+                _build_credit_app_data(),
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            response.data["detail"], "Credit Application approval is pending"
+        )
+        inquiry = AccountInquiryResult.objects.get()
+        self.assertEqual(self.client.session[INQUIRY_SESSION_KEY], inquiry.pk)
+
+    def test_account_inquiry_and_update(self):
+        with HTTPXMocker() as rmock:
+            self.mock_get_api_token_request(rmock)
+            self.mock_successful_individual_account_inquiry(rmock)
+            response = self.client.post(
+                reverse("wfrs-api-acct-inquiry"),
+                {"account_number": "9999999999999991"},
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["credit_limit"], "18000.00")
+            response = self.client.post(reverse("wfrs-api-update-inquiry"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["available_credit"], "14455.00")
+        inquiry = AccountInquiryResult.objects.order_by("-id").first()
+        self.assertEqual(self.client.session[INQUIRY_SESSION_KEY], inquiry.pk)
+        self.assertEqual(AccountInquiryResult.objects.count(), 2)
+
+    def test_account_inquiry_invalid(self):
+        with HTTPXMocker() as rmock:
+            self.mock_get_api_token_request(rmock)
+            self.mock_failed_individual_account_inquiry(rmock)
+            response = self.client.post(
+                reverse("wfrs-api-acct-inquiry"),
+                {"account_number": "9999999999999991"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["account_number"],
+            ["'account_number' cannot have fewer than 15 character(s)."],
+        )
+
+    def test_method_not_allowed(self):
+        response = self.client.put(reverse("wfrs-api-acct-inquiry"))
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -1,7 +1,12 @@
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from oscar.test.factories import create_product
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 from wellsfargo.models import FinancingPlan
+from wellsfargo.settings import WFRS_ESTIMATED_PAYMENT_HTTP_CACHE
 
 
 class EstimatedPaymentsTest(APITestCase):
@@ -88,3 +93,193 @@ class EstimatedPaymentsTest(APITestCase):
                 "loan_cost": "268.88",
             },
         )
+
+
+class BatchEstimatedPaymentsTest(APITestCase):
+    def setUp(self):
+        self.maxDiff = None
+        self.plan1 = FinancingPlan.objects.create(
+            plan_number=1001,
+            description="Plan 1",
+            apr="0.00",
+            term_months=12,
+            product_price_threshold="1000.00",
+            advertising_enabled=True,
+        )
+        self.plan2 = FinancingPlan.objects.create(
+            plan_number=1002,
+            description="Plan 2",
+            apr="10.00",
+            term_months=24,
+            product_price_threshold="2000.00",
+            advertising_enabled=True,
+        )
+        self.url = reverse("wfrs-api-estimated-payments")
+
+    def test_no_input(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("non_field_errors", resp.data)
+
+    def test_invalid_input(self):
+        resp = self.client.get(self.url, {"price": ["1500.00", "foo"]})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("price", resp.data)
+        resp = self.client.get(self.url, {"product": "foo"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("product", resp.data)
+
+    @mock.patch("wellsfargo.api.views.WFRS_ESTIMATED_PAYMENT_BATCH_LIMIT", 2)
+    def test_too_many_items(self):
+        resp = self.client.get(self.url, {"price": "1500.00,2500.00,3000.00"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("non_field_errors", resp.data)
+
+    def test_prices(self):
+        resp = self.client.get(
+            self.url, {"price": ["2500.00", "500.00,1500.00", "2500"]}
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["products"], [])
+        prices = resp.data["prices"]
+        self.assertEqual(
+            [p["price"] for p in prices], ["2500.00", "500.00", "1500.00", "2500.00"]
+        )
+        self.assertIsNone(prices[1]["estimate"])
+        self.assertEqual(prices[2]["estimate"]["plan"]["id"], self.plan1.pk)
+        self.assertEqual(prices[2]["estimate"]["monthly_payment"], "125.00")
+        self.assertEqual(prices[2]["estimate"]["loan_cost"], "0.00")
+        self.assertEqual(prices[3], prices[0])
+        # Matches the single price endpoint
+        single = self.client.get(
+            reverse("wfrs-api-estimated-payment"), {"price": "2500.00"}
+        )
+        self.assertEqual(prices[0]["estimate"], single.data)
+
+    def test_products(self):
+        product1 = create_product(price=Decimal("1500.00"), num_in_stock=5)
+        product2 = create_product(price=Decimal("2500.00"), num_in_stock=5)
+        product3 = create_product(price=Decimal("10.00"), num_in_stock=5)
+        product4 = create_product()  # No stock record, so no price
+        resp = self.client.get(
+            self.url,
+            {
+                "product": [product1.pk, product2.pk, product3.pk, product4.pk, 0],
+                "price": "2500.00",
+            },
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        products = resp.data["products"]
+        self.assertEqual(
+            [(p["product"], p["price"]) for p in products],
+            [
+                (product1.pk, "1500.00"),
+                (product2.pk, "2500.00"),
+                (product3.pk, "10.00"),
+                (product4.pk, None),
+                (0, None),
+            ],
+        )
+        self.assertEqual(products[0]["estimate"]["plan"]["id"], self.plan1.pk)
+        self.assertEqual(products[1]["estimate"]["plan"]["id"], self.plan2.pk)
+        self.assertEqual(products[1]["estimate"]["monthly_payment"], "115.37")
+        self.assertEqual(products[1]["estimate"], resp.data["prices"][0]["estimate"])
+        self.assertIsNone(products[2]["estimate"])
+        self.assertIsNone(products[3]["estimate"])
+        self.assertIsNone(products[4]["estimate"])
+
+
+class EstimatedPaymentsHTTPCachingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.plan = FinancingPlan.objects.create(
+            plan_number=1001,
+            description="Plan 1",
+            apr="10.00",
+            term_months=24,
+            product_price_threshold="1000.00",
+            advertising_enabled=True,
+        )
+        self.url = reverse("wfrs-api-estimated-payment")
+        self.batch_url = reverse("wfrs-api-estimated-payments")
+
+    def test_etag_and_not_modified(self):
+        resp = self.client.get(self.url, {"price": "1500"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        etag = resp["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn("public", resp["Cache-Control"])
+        self.assertIn("max-age=300", resp["Cache-Control"])
+        self.assertIn("Accept", resp["Vary"])
+        # The same query (even when formatted differently) gets the same ETag
+        resp = self.client.get(self.url, {"price": "1500.00"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp["ETag"], etag)
+        self.assertEqual(resp.content, b"")
+        self.assertIn("max-age=300", resp["Cache-Control"])
+        # A different query doesn't match
+        resp = self.client.get(self.url, {"price": "1600"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_etag_changes_with_catalog(self):
+        resp = self.client.get(self.url, {"price": "1500"})
+        etag = resp["ETag"]
+        self.plan.apr = "5.00"
+        self.plan.save()
+        resp = self.client.get(self.url, {"price": "1500"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(resp["ETag"], etag)
+        self.assertEqual(resp.data["plan"]["apr"], "5.00")
+
+    def test_no_plan_and_errors(self):
+        resp = self.client.get(self.url, {"price": "10"})
+        self.assertEqual(resp.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(resp.has_header("ETag"))
+        resp = self.client.get(self.url, {"price": "foo"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(resp.has_header("ETag"))
+
+    @mock.patch.dict(
+        WFRS_ESTIMATED_PAYMENT_HTTP_CACHE, {"cache_control": None, "vary": None}
+    )
+    def test_headers_disabled(self):
+        resp = self.client.get(self.url, {"price": "1500"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.has_header("ETag"))
+        self.assertFalse(resp.has_header("Cache-Control"))
+
+    def test_batch(self):
+        resp = self.client.get(self.batch_url, {"price": "1500,2500"})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        etag = resp["ETag"]
+        self.assertIn("public", resp["Cache-Control"])
+        resp = self.client.get(
+            self.batch_url, {"price": "1500.00,2500"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        resp = self.client.get(
+            self.batch_url, {"price": "2500,1500"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_batch_products(self):
+        product = create_product(price=Decimal("1500.00"), num_in_stock=5)
+        resp = self.client.get(self.batch_url, {"product": product.pk})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        etag = resp["ETag"]
+        self.assertIn("private", resp["Cache-Control"])
+        self.assertIn("Cookie", resp["Vary"])
+        resp = self.client.get(
+            self.batch_url, {"product": product.pk}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        # Changing the product's price changes the ETag
+        stockrecord = product.stockrecords.get()
+        stockrecord.price = Decimal("1600.00")
+        stockrecord.save()
+        resp = self.client.get(
+            self.batch_url, {"product": product.pk}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data["products"][0]["price"], "1600.00")
@@ -1,7 +1,10 @@
+from unittest import mock
+from requests.exceptions import ConnectionError
 from rest_framework import status
 from rest_framework.reverse import reverse
 from wellsfargo.tests.base import BaseTest
 from wellsfargo.models import PreQualificationRequest
+from wellsfargo.settings import WFRS_API_ASYNC
 import requests_mock
 
 
@@ -300,3 +303,81 @@ class PreQualificationRequestTest(BaseTest):
         self.assertEqual(response.data["offer_indicator"], "")
         self.assertEqual(response.data["response_id"], "ABC123")
         self.assertEqual(response.data["sdk_application_result"], None)
+
+
+@mock.patch.dict(WFRS_API_ASYNC, {"prequal": True})
+class AsyncPreQualificationRequestTest(BaseTest):
+    data = {
+        "first_name": "Joe",
+        "last_name": "Schmoe",
+        "line1": "123 Evergreen Terrace",
+        "city": "Springfield",
+        "state": "NY",
+        "postcode": "10001",
+        "phone": "+1 (212) 209-1333",
+    }
+
+    def _submit(self):
+        url = reverse("wfrs-api-prequal")
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(url, self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "pending")
+        self.assertEqual(response["Location"], response.data["poll_url"])
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertTrue(response.data["poll_url"].endswith(url))
+        return callbacks
+
+    def _run_tasks(self, callbacks):
+        for callback in callbacks:
+            callback()
+
+    @requests_mock.Mocker()
+    def test_prequal_successful(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_prescreen_request(rmock)
+        callbacks = self._submit()
+        # The gateway hasn't been called yet, and polling says so
+        self.assertFalse(
+            any("prequalifications" in r.url for r in rmock.request_history)
+        )
+        response = self.client.get(reverse("wfrs-api-prequal"))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        # Once the task runs, polling returns the response
+        self._run_tasks(callbacks)
+        response = self.client.get(reverse("wfrs-api-prequal"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "A")
+        self.assertEqual(response.data["credit_limit"], "8500.00")
+        self.assertEqual(PreQualificationRequest.objects.count(), 1)
+
+    @requests_mock.Mocker()
+    def test_prequal_failed_prescreen(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_invalid_prescreen_request(rmock)
+        self._run_tasks(self._submit())
+        response = self.client.get(reverse("wfrs-api-prequal"))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["non_field_errors"], ["Return URL is missing or invalid."]
+        )
+
+    @requests_mock.Mocker()
+    def test_prequal_connection_error(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        rmock.post(
+            "https://api-sandbox.wellsfargo.com/credit-cards/private-label/new-accounts/v2/prequalifications",
+            exc=ConnectionError,
+        )
+        with self.assertLogs("wellsfargo.api.tasks", level="ERROR"):
+            self._run_tasks(self._submit())
+        response = self.client.get(reverse("wfrs-api-prequal"))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data["non_field_errors"]), 1)
+
+    def test_invalid_request(self):
+        response = self.client.post(
+            reverse("wfrs-api-prequal"), {"first_name": "Joe"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(PreQualificationRequest.objects.count(), 0)
@@ -1,10 +1,15 @@
-from datetime import date
+from datetime import date, timedelta
+from decimal import Decimal
 from django.contrib.auth.models import User
 from django.core.cache import cache
+from django.utils import timezone
+from oscar.core.loading import get_model
+from oscar.test import factories
 from rest_framework.test import APITestCase
 from wellsfargo.core.constants import (
     TRANS_DECLINED,
     TRANS_APPROVED,
+    TRANS_TYPE_AUTH,
 )
 from wellsfargo.models import (
     CreditApplicationAddress,
@@ -12,6 +17,7 @@ from wellsfargo.models import (
     CreditApplication,
     APIMerchantNum,
     SDKMerchantNum,
+    TransferMetadata,
 )
 
 
@@ -305,3 +311,54 @@ class BaseTest(APITestCase):
             address=joint_applicant_address,
         )
         return app
+
+    def _build_authorization(
+        self,
+        account_number,
+        amount,
+        plan,
+        merchant_num="1111111111111111",
+        allocated=None,
+        age=48,
+    ):
+        """
+        Build an order paid for with an approved Wells Fargo authorization (which is ``age`` hours old), and
+        return the authorization's transfer
+        """
+        Source = get_model("payment", "Source")
+        SourceType = get_model("payment", "SourceType")
+        Transaction = get_model("payment", "Transaction")
+        amount = Decimal(amount)
+        order = factories.create_order(user=self.joe)
+        reference = "reference-%s" % account_number
+        source_type, _ = SourceType.objects.get_or_create(name="Wells Fargo")
+        source = Source.objects.create(
+            order=order,
+            source_type=source_type,
+            amount_allocated=Decimal(allocated) if allocated else amount,
+        )
+        source.transactions.create(
+            txn_type=Transaction.AUTHORISE,
+            amount=amount,
+            reference=reference,
+            status="Accept",
+        )
+        transfer = TransferMetadata(
+            user=self.joe,
+            merchant_name="Merchant %s" % merchant_num[:1],
+            merchant_num=merchant_num,
+            merchant_reference=reference,
+            amount=amount,
+            type_code=TRANS_TYPE_AUTH,
+            ticket_number=account_number[-6:],
+            financing_plan=plan,
+            auth_number="123456",
+            status=TRANS_APPROVED,
+        )
+        transfer.account_number = account_number
+        transfer.save()
+        TransferMetadata.objects.filter(pk=transfer.pk).update(
+            created_datetime=timezone.now() - timedelta(hours=age)
+        )
+        transfer.order = order
+        return transfer
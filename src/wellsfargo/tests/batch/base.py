@@ -0,0 +1,142 @@
+from django.core.management import call_command
+from io import StringIO
+from oscar.core.loading import get_model
+from wellsfargo.core.constants import (
+    TRANS_APPROVED,
+    TRANS_DECLINED,
+    TRANS_TYPE_RETURN_CREDIT,
+)
+from wellsfargo.models import FinancingPlan, TransferMetadata
+import csv
+import json
+import os.path
+import shutil
+import tempfile
+
+Source = get_model("payment", "Source")
+
+TRANSACTIONS_URL = "https://api-sandbox.wellsfargo.com/credit-cards/private-label/new-accounts/v2/payment/transactions/"
+
+# Accounts which the mocked gateway declines, and fails, transactions of
+DECLINED_ACCOUNT = "9999999999990005"
+FAILING_ACCOUNT = "9999999999990007"
+
+
+def account_number_is(account_number):
+    return lambda request: request.json()["account_number"] == account_number
+
+
+def last_name_is(last_name):
+    return lambda request: request.json()["main_applicant"]["last_name"] == last_name
+
+
+class BatchTestMixin(object):
+    """Helpers for testing batch jobs, and their management commands"""
+
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir, ignore_errors=True)
+
+    def mock_transaction_requests(self, rmock, action):
+        """
+        Mock the gateway's ``action`` transaction endpoint, which approves every transaction, except for
+        ``DECLINED_ACCOUNT``'s (which are declined) and ``FAILING_ACCOUNT``'s (which fail)
+        """
+
+        def approve(request, context):
+            data = request.json()
+            return dict(
+                {
+                    key: data[key]
+                    for key in (
+                        "account_number",
+                        "amount",
+                        "plan_number",
+                        "authorization_number",
+                        "ticket_number",
+                    )
+                    if key in data
+                },
+                transaction_status=TRANS_APPROVED,
+                status_message="APPROVED: 123434",
+            )
+
+        url = TRANSACTIONS_URL + action
+        self.mock_get_api_token_request(rmock)
+        rmock.post(url, json=approve)
+        rmock.post(
+            url,
+            json={"transaction_status": TRANS_DECLINED},
+            additional_matcher=account_number_is(DECLINED_ACCOUNT),
+        )
+        rmock.post(
+            url,
+            status_code=400,
+            json={"errors": []},
+            additional_matcher=account_number_is(FAILING_ACCOUNT),
+        )
+
+    def requests_to(self, rmock, path_suffix):
+        return [r for r in rmock.request_history if r.path.endswith(path_suffix)]
+
+    def write_csv(self, filename, fields, rows):
+        path = os.path.join(self.tempdir, filename)
+        with open(path, "w", newline="") as infile:
+            writer = csv.DictWriter(infile, fields)
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def read_results(self, path):
+        with open(path, newline="") as results:
+            if path.endswith(".csv"):
+                return list(csv.DictReader(results))
+            return [json.loads(line) for line in results]
+
+    def call_batch_command(self, name, *args):
+        """Run a batch job's management command, without a rate limit, and return its output"""
+        out = StringIO()
+        call_command(name, *args, "--rate-limit=0", stdout=out)
+        return out.getvalue()
+
+
+class ReturnTestMixin(BatchTestMixin):
+    """Orders to return, paid for with authorizations of each kind the mocked gateway handles"""
+
+    def setUp(self):
+        super().setUp()
+        self.plan = FinancingPlan.objects.create(plan_number=1001)
+        self.full = self._build_authorization("9999999999990001", "100.00", self.plan)
+        self.partial = self._build_authorization(
+            "9999999999990002", "200.00", self.plan, merchant_num="2222222222222222"
+        )
+        self.returned = self._build_authorization(
+            "9999999999990003", "300.00", self.plan
+        )
+        TransferMetadata.objects.create(
+            merchant_reference=self.returned.merchant_reference,
+            amount=self.returned.amount,
+            type_code=TRANS_TYPE_RETURN_CREDIT,
+            status=TRANS_APPROVED,
+        )
+        self.declined = self._build_authorization(DECLINED_ACCOUNT, "500.00", self.plan)
+        self.failing = self._build_authorization(FAILING_ACCOUNT, "700.00", self.plan)
+        for auth in (
+            self.full,
+            self.partial,
+            self.returned,
+            self.declined,
+            self.failing,
+        ):
+            # Order numbers are saved as strings
+            auth.order.refresh_from_db()
+
+    def _mock_gateway(self, rmock):
+        self.mock_transaction_requests(rmock, "return")
+
+    def _returns(self, rmock):
+        return self.requests_to(rmock, "return")
+
+    def _source_of(self, auth):
+        return Source.objects.get(order=auth.order)
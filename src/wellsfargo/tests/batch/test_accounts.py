@@ -0,0 +1,124 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.utils import timezone
+from wellsfargo.batch.accounts import AccountRefreshBatch
+from wellsfargo.models import AccountInquiryResult, CreditApplication
+from wellsfargo.tests.base import BaseTest
+from wellsfargo.tests.batch.base import BatchTestMixin, account_number_is
+import os.path
+import requests_mock
+
+
+class AccountRefreshBatchTest(BatchTestMixin, BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.stale = self._build_app("9999999999990001", ages=[30, 10])
+        self.fresh = self._build_app("9999999999990002", ages=[30, 1])
+        self.pending = self._build_app("9999999999990003", ages=[10])
+        self.failing = self._build_app("9999999999990004", ages=[10])
+        self.unreadable = self._build_app("9999999999990005", ages=[10])
+        AccountInquiryResult.objects.filter(credit_app_source=self.unreadable).update(
+            encrypted_account_number=b"garbage"
+        )
+
+    def _build_app(self, account_number, ages):
+        app = self._build_single_credit_app("999%s" % account_number[-6:])
+        app.save()
+        for days in ages:
+            inquiry = AccountInquiryResult(
+                credit_app_source=app,
+                credit_limit=Decimal("5000.00"),
+                available_credit=Decimal("5000.00"),
+            )
+            inquiry.account_number = account_number
+            inquiry.save()
+            AccountInquiryResult.objects.filter(pk=inquiry.pk).update(
+                created_datetime=timezone.now() - timedelta(days=days)
+            )
+        return app
+
+    def _mock_gateway(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_joint_account_inquiry(
+            rmock, additional_matcher=account_number_is("9999999999990001")
+        )
+        self.mock_pending_individual_account_inquiry(
+            rmock, additional_matcher=account_number_is("9999999999990003")
+        )
+        self.mock_failed_individual_account_inquiry(
+            rmock, additional_matcher=account_number_is("9999999999990004")
+        )
+
+    def _lookups(self, rmock):
+        return self.requests_to(rmock, "details")
+
+    def _credit_limit(self, app):
+        return CreditApplication.objects.get(pk=app.pk).get_credit_limit()
+
+    @requests_mock.Mocker()
+    def test_run(self, rmock):
+        self._mock_gateway(rmock)
+        batch = AccountRefreshBatch(timedelta(days=7), batch_size=2)
+        self.assertEqual(
+            sorted(i.credit_app_source_id for i in batch.get_queryset()),
+            sorted(
+                app.pk
+                for app in (self.stale, self.pending, self.failing, self.unreadable)
+            ),
+        )
+        results = []
+        stats = batch.run(on_results=results.extend)
+        self.assertEqual(
+            stats.counts,
+            {"refreshed": 1, "not_found": 1, "error": 1, "unreadable": 1},
+        )
+        self.assertEqual(
+            {r["credit_app_id"]: r["result"] for r in results},
+            {
+                self.stale.pk: "refreshed",
+                self.pending.pk: "not_found",
+                self.failing.pk: "error",
+                self.unreadable.pk: "unreadable",
+            },
+        )
+        self.assertEqual(len(self._lookups(rmock)), 3)
+        for request in self._lookups(rmock):
+            self.assertEqual(request.json()["transaction_code"], "C4")
+            self.assertEqual(request.json()["merchant_number"], "1111111111111111")
+
+        # The refreshed account's new inquiry is now its latest
+        self.assertEqual(self._credit_limit(self.stale), Decimal("18000.00"))
+        inquiry = self.stale.get_inquiries().first()
+        self.assertEqual(inquiry.account_number, "2222222222222222")
+        self.assertEqual(inquiry.available_credit, Decimal("14455.00"))
+        self.assertEqual(inquiry.main_applicant_full_name, "Schmoe, Joe")
+        self.assertEqual(inquiry.main_applicant_address.city, "DES MOINES")
+        self.assertEqual(inquiry.joint_applicant_address.city, "BALTIMORE")
+        self.assertEqual(self.stale.get_inquiries().count(), 3)
+        # Nothing else changed
+        for app in (self.fresh, self.pending, self.failing, self.unreadable):
+            self.assertEqual(self._credit_limit(app), Decimal("5000.00"))
+        self.assertEqual(self.fresh.get_inquiries().count(), 2)
+
+        # Accounts which weren't refreshed are tried again by the next run
+        stats = AccountRefreshBatch(timedelta(days=7)).run()
+        self.assertEqual(stats.counts, {"not_found": 1, "error": 1, "unreadable": 1})
+        self.assertEqual(len(self._lookups(rmock)), 5)
+
+    @requests_mock.Mocker()
+    def test_command(self, rmock):
+        self._mock_gateway(rmock)
+        out = self.call_batch_command(
+            "wfrs_refresh_accounts", "--days=20", "--user=joe"
+        )
+        self.assertIn("Done. Refreshed 0 row(s)", out)
+        self.assertEqual(len(self._lookups(rmock)), 0)
+
+        results_path = os.path.join(self.tempdir, "accounts.jsonl")
+        out = self.call_batch_command(
+            "wfrs_refresh_accounts", "--days=5", "--results=%s" % results_path
+        )
+        self.assertIn("Done. Refreshed 4 row(s)", out)
+        self.assertEqual(self._credit_limit(self.stale), Decimal("18000.00"))
+        results = {r["credit_app_id"]: r for r in self.read_results(results_path)}
+        self.assertEqual(results[self.stale.pk]["result"], "refreshed")
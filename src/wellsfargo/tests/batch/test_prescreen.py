@@ -0,0 +1,204 @@
+from django.test import SimpleTestCase
+from unittest import mock
+from wellsfargo.batch import Checkpoint, RateLimiter, read_rows
+from wellsfargo.batch.prescreen import PrescreenBatch
+from wellsfargo.models import PreQualificationRequest, PreQualificationResponse
+from wellsfargo.tests.base import BaseTest
+from wellsfargo.tests.batch.base import BatchTestMixin, last_name_is
+import json
+import os.path
+import requests_mock
+
+
+class RateLimiterTest(SimpleTestCase):
+    @mock.patch("wellsfargo.batch.time.sleep")
+    @mock.patch("wellsfargo.batch.time.monotonic", return_value=100.0)
+    def test_acquire(self, monotonic, sleep):
+        limiter = RateLimiter(4)
+        for i in range(3):
+            limiter.acquire()
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.25, 0.5])
+
+    @mock.patch("wellsfargo.batch.time.sleep")
+    def test_unlimited(self, sleep):
+        limiter = RateLimiter(None)
+        for i in range(3):
+            limiter.acquire()
+        sleep.assert_not_called()
+
+
+class PrescreenBatchTest(BatchTestMixin, BaseTest):
+    customers = [
+        {"first_name": "Joe", "last_name": "Schmoe", "postcode": "10001"},
+        {"first_name": "Jane", "last_name": "Doe", "postcode": "10002"},
+        {"first_name": "Nobody", "last_name": "", "postcode": "10003"},
+        {"first_name": "Ed", "last_name": "Denied", "postcode": "10004"},
+        {"first_name": "Al", "last_name": "Error", "postcode": "10005"},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.input_path = self.write_csv(
+            "customers.csv",
+            (
+                "first_name",
+                "last_name",
+                "line1",
+                "city",
+                "state",
+                "postcode",
+                "phone",
+            ),
+            [
+                dict(
+                    customer,
+                    line1="123 Evergreen Terrace",
+                    city="Springfield",
+                    state="NY",
+                    phone="+1 (212) 209-1333",
+                )
+                for customer in self.customers
+            ],
+        )
+        self.results_path = os.path.join(self.tempdir, "results.csv")
+
+    def _mock_gateway(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_prescreen_request(rmock)
+        self.mock_denied_prescreen_request(
+            rmock, additional_matcher=last_name_is("Denied")
+        )
+        self.mock_invalid_prescreen_request(
+            rmock, additional_matcher=last_name_is("Error")
+        )
+
+    def _read_results(self):
+        return self.read_results(self.results_path)
+
+    def _prescreen_calls(self, rmock):
+        return self.requests_to(rmock, "prequalifications")
+
+    @requests_mock.Mocker()
+    def test_run(self, rmock):
+        self._mock_gateway(rmock)
+        stats = PrescreenBatch(self.input_path, self.results_path, batch_size=2).run()
+        self.assertEqual(stats.counts, {"A": 2, "D": 1, "invalid": 1, "error": 1})
+
+        results = self._read_results()
+        self.assertEqual([r["row"] for r in results], ["1", "2", "3", "4", "5"])
+        self.assertEqual(
+            [r["result"] for r in results],
+            ["prescreened", "prescreened", "invalid", "prescreened", "error"],
+        )
+        self.assertEqual(results[0]["status"], "A")
+        self.assertEqual(results[0]["credit_limit"], "8500.00")
+        self.assertEqual(results[0]["response_id"], "000005EP")
+        self.assertIn("last_name", json.loads(results[2]["message"]))
+        self.assertEqual(results[3]["status"], "D")
+        self.assertEqual(results[4]["message"], "Return URL is missing or invalid.")
+
+        # Invalid rows aren't saved, and failed requests are saved without a response
+        self.assertEqual(PreQualificationRequest.objects.count(), 4)
+        self.assertEqual(PreQualificationResponse.objects.count(), 3)
+        prequal_request = PreQualificationRequest.objects.get(uuid=results[0]["uuid"])
+        self.assertEqual(prequal_request.last_name, "Schmoe")
+        self.assertEqual(prequal_request.merchant_num, "1111111111111111")
+        self.assertEqual(prequal_request.response.credit_limit, 8500)
+        self.assertFalse(prequal_request.customer_initiated)
+        # Each request's UUID is sent as its client request ID
+        for request in self._prescreen_calls(rmock):
+            self.assertTrue(
+                PreQualificationRequest.objects.filter(
+                    uuid=request.headers["client-request-id"]
+                ).exists()
+            )
+
+    @requests_mock.Mocker()
+    def test_resume_first_batch(self, rmock):
+        """A run interrupted after sending its first batch, but before saving it, sends it with the same IDs"""
+        self._mock_gateway(rmock)
+        batch = PrescreenBatch(self.input_path, self.results_path, batch_size=2)
+        with mock.patch.object(
+            PreQualificationRequest.objects,
+            "bulk_create",
+            side_effect=KeyboardInterrupt(),
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                batch.run()
+        sent = {r.headers["client-request-id"] for r in self._prescreen_calls(rmock)}
+        self.assertEqual(len(sent), 2)
+        self.assertEqual(
+            Checkpoint(self.results_path + ".checkpoint").load()["rows_done"], 0
+        )
+
+        PrescreenBatch(self.input_path, self.results_path, batch_size=2).run()
+        resent = {
+            r.headers["client-request-id"] for r in self._prescreen_calls(rmock)[2:]
+        }
+        self.assertEqual(len(resent), 4)
+        self.assertLess(sent, resent)
+
+    @requests_mock.Mocker()
+    def test_resume(self, rmock):
+        self._mock_gateway(rmock)
+        batch = PrescreenBatch(self.input_path, self.results_path, batch_size=2)
+        process_chunk = batch.process_chunk
+
+        def interrupt_second_chunk(chunk):
+            if chunk[0][0] > 2:
+                raise KeyboardInterrupt()
+            return process_chunk(chunk)
+
+        with mock.patch.object(batch, "process_chunk", interrupt_second_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                batch.run()
+        self.assertEqual(len(self._prescreen_calls(rmock)), 2)
+        self.assertEqual(
+            Checkpoint(self.results_path + ".checkpoint").load()["rows_done"], 2
+        )
+
+        stats = PrescreenBatch(self.input_path, self.results_path, batch_size=2).run()
+        self.assertEqual(stats.rows, 3)
+        self.assertEqual(len(self._prescreen_calls(rmock)), 4)
+        self.assertEqual(
+            [r["row"] for r in self._read_results()], ["1", "2", "3", "4", "5"]
+        )
+        self.assertEqual(PreQualificationRequest.objects.count(), 4)
+
+    @requests_mock.Mocker()
+    def test_resume_after_saving(self, rmock):
+        """Rows saved by a run which was interrupted before it checkpointed them aren't sent again"""
+        self._mock_gateway(rmock)
+        PrescreenBatch(self.input_path, self.results_path).run()
+        checkpoint = Checkpoint(self.results_path + ".checkpoint")
+        checkpoint.save(dict(checkpoint.load(), rows_done=0))
+        os.remove(self.results_path)
+
+        stats = PrescreenBatch(self.input_path, self.results_path).run()
+        self.assertEqual(stats.counts, {"A": 2, "D": 1, "invalid": 1, "error": 1})
+        self.assertEqual(len(self._prescreen_calls(rmock)), 4)
+        self.assertEqual(PreQualificationRequest.objects.count(), 4)
+        self.assertEqual(PreQualificationResponse.objects.count(), 3)
+        self.assertEqual(
+            [r["status"] for r in self._read_results()], ["A", "A", "", "D", ""]
+        )
+
+    @requests_mock.Mocker()
+    def test_command(self, rmock):
+        self._mock_gateway(rmock)
+        input_path = os.path.join(self.tempdir, "customers.jsonl")
+        with open(input_path, "w") as infile:
+            for row in read_rows(self.input_path):
+                infile.write(json.dumps(row) + "\n")
+        results_path = os.path.join(self.tempdir, "results.jsonl")
+        out = self.call_batch_command(
+            "wfrs_prescreen_batch",
+            input_path,
+            results_path,
+            "--user=joe",
+            "--concurrency=2",
+        )
+        self.assertIn("Done. Prescreened 5 row(s)", out)
+        results = self.read_results(results_path)
+        self.assertEqual([r["row"] for r in results], [1, 2, 3, 4, 5])
+        self.assertEqual(results[0]["status"], "A")
@@ -0,0 +1,241 @@
+from decimal import Decimal
+from oscar.core.loading import get_model
+from unittest import mock
+from wellsfargo.batch.returns import ReturnBatch
+from wellsfargo.core.constants import TRANS_DECLINED, TRANS_TYPE_RETURN_CREDIT
+from wellsfargo.models import TransferMetadata
+from wellsfargo.tests.base import BaseTest
+from wellsfargo.tests.batch.base import FAILING_ACCOUNT, ReturnTestMixin
+import os.path
+import requests_mock
+
+Transaction = get_model("payment", "Transaction")
+
+
+class ReturnBatchTest(ReturnTestMixin, BaseTest):
+    @requests_mock.Mocker()
+    def test_run(self, rmock):
+        self._mock_gateway(rmock)
+        results = []
+        stats = ReturnBatch(batch_size=3).run(
+            [
+                {"order": self.full.order.number},
+                {"order": self.partial.merchant_reference, "amount": "50"},
+                {"order": self.partial.merchant_reference},
+                {"order": self.returned.order.number},
+                {"order": "nope"},
+                {"order": self.full.order.number, "amount": "abc"},
+                {"order": self.declined.order.number},
+                {"order": self.failing.merchant_reference},
+            ],
+            on_results=results.extend,
+        )
+        self.assertEqual(
+            [(r["order"], r["result"], r["amount"]) for r in results],
+            [
+                (self.full.order.number, "returned", "100.00"),
+                (self.partial.merchant_reference, "returned", "50.00"),
+                (self.partial.merchant_reference, "returned", "150.00"),
+                (self.returned.order.number, "nothing_to_return", None),
+                ("nope", "not_found", None),
+                (self.full.order.number, "invalid", None),
+                (self.declined.order.number, "declined", "500.00"),
+                (self.failing.merchant_reference, "error", "700.00"),
+            ],
+        )
+        self.assertEqual(
+            stats.counts,
+            {
+                "returned": 3,
+                "nothing_to_return": 1,
+                "not_found": 1,
+                "invalid": 1,
+                "declined": 1,
+                "error": 1,
+            },
+        )
+        self.assertEqual(results[0]["order_number"], self.full.order.number)
+        self.assertEqual(results[0]["merchant_reference"], self.full.merchant_reference)
+        self.assertEqual(results[1]["order_number"], self.partial.order.number)
+        self.assertEqual(results[6]["status"], TRANS_DECLINED)
+
+        # Each return is sent with its authorization's merchant number, and its own ID
+        requests = self._returns(rmock)
+        self.assertEqual(len(requests), 5)
+        partial_requests = [
+            r for r in requests if r.json()["account_number"] == "9999999999990002"
+        ]
+        self.assertEqual(
+            [r.json()["amount"] for r in partial_requests], ["50.00", "150.00"]
+        )
+        self.assertEqual(
+            {r.json()["merchant_number"] for r in partial_requests},
+            {"2222222222222222"},
+        )
+        self.assertEqual(
+            [r.headers["client-request-id"] for r in partial_requests],
+            [results[1]["client_request_id"], results[2]["client_request_id"]],
+        )
+        self.assertNotEqual(
+            results[1]["client_request_id"], results[2]["client_request_id"]
+        )
+
+        # Returns are saved with their authorization's reference, and approved ones are refunded
+        returns = TransferMetadata.objects.filter(
+            merchant_reference=self.partial.merchant_reference,
+            type_code=TRANS_TYPE_RETURN_CREDIT,
+        ).order_by("amount")
+        self.assertEqual(
+            [r.amount for r in returns], [Decimal("50.00"), Decimal("150.00")]
+        )
+        self.assertEqual(returns[0].account_number, "9999999999990002")
+        self.assertEqual(returns[0].financing_plan, self.plan)
+        self.assertEqual(returns[0].user, self.joe)
+        self.assertEqual(
+            self._source_of(self.partial).amount_refunded, Decimal("200.00")
+        )
+        refund = self._source_of(self.full).transactions.get(
+            txn_type=Transaction.REFUND
+        )
+        self.assertEqual(refund.amount, Decimal("100.00"))
+        self.assertEqual(refund.reference, self.full.merchant_reference)
+        self.assertEqual(
+            self._source_of(self.declined).amount_refunded, Decimal("0.00")
+        )
+        self.assertEqual(
+            TransferMetadata.objects.get(
+                merchant_reference=self.declined.merchant_reference,
+                type_code=TRANS_TYPE_RETURN_CREDIT,
+            ).status,
+            TRANS_DECLINED,
+        )
+        self.assertFalse(
+            TransferMetadata.objects.filter(
+                merchant_reference=self.failing.merchant_reference,
+                type_code=TRANS_TYPE_RETURN_CREDIT,
+            ).exists()
+        )
+
+        # A failed return is sent again with the same ID, and completed returns aren't repeated
+        results = []
+        ReturnBatch().run(
+            [
+                {"order": self.failing.order.number},
+                {"order": self.full.order.number},
+            ],
+            on_results=results.extend,
+        )
+        self.assertEqual([r["result"] for r in results], ["error", "nothing_to_return"])
+        requests = self._returns(rmock)
+        self.assertEqual(len(requests), 6)
+        self.assertEqual(
+            requests[-1].headers["client-request-id"],
+            [
+                r.headers["client-request-id"]
+                for r in requests[:-1]
+                if r.json()["account_number"] == FAILING_ACCOUNT
+            ][0],
+        )
+
+    @requests_mock.Mocker()
+    def test_run_non_finite_amounts(self, rmock):
+        self._mock_gateway(rmock)
+        results = []
+        stats = ReturnBatch().run(
+            [
+                {"order": self.full.order.number, "amount": "NaN"},
+                {"order": self.full.order.number, "amount": "Infinity"},
+                {"order": self.partial.order.number, "amount": "10"},
+            ],
+            on_results=results.extend,
+        )
+        # Bad amounts are reported, without stopping the rest of the job
+        self.assertEqual(
+            [(r["result"], r["message"]) for r in results],
+            [
+                ("invalid", "Invalid amount: NaN"),
+                ("invalid", "Invalid amount: Infinity"),
+                ("returned", "APPROVED: 123434"),
+            ],
+        )
+        self.assertEqual(stats.counts, {"invalid": 2, "returned": 1})
+        self.assertEqual(len(self._returns(rmock)), 1)
+
+    @requests_mock.Mocker()
+    def test_run_streams_items(self, rmock):
+        self._mock_gateway(rmock)
+        read = []
+
+        def read_items():
+            for order in ("a", "b", "c"):
+                read.append(order)
+                yield {"order": order}
+
+        batch = ReturnBatch(batch_size=2)
+        read_before_chunk = []
+        with mock.patch.object(
+            batch,
+            "process_chunk",
+            side_effect=lambda chunk: read_before_chunk.append(list(read)) or [],
+        ):
+            batch.run(read_items())
+        # Only a batch of items is read at a time
+        self.assertEqual(read_before_chunk, [["a", "b"], ["a", "b", "c"]])
+
+    def test_get_authorizations(self):
+        with self.assertNumQueries(1):
+            auths = list(
+                ReturnBatch().get_authorizations(
+                    [self.full.order.number, self.returned.merchant_reference, "nope"]
+                )
+            )
+        self.assertEqual([a.pk for a in auths], [self.full.pk, self.returned.pk])
+        self.assertEqual(auths[0].order_number, self.full.order.number)
+        self.assertEqual(auths[0].amount_returned, Decimal("0.00"))
+        self.assertEqual(auths[0].returns_saved, 0)
+        self.assertEqual(auths[1].amount_returned, Decimal("300.00"))
+        self.assertEqual(auths[1].returns_saved, 1)
+
+    @requests_mock.Mocker()
+    def test_command(self, rmock):
+        self._mock_gateway(rmock)
+        input_path = self.write_csv(
+            "returns.csv",
+            ["order", "amount"],
+            [
+                {"order": self.partial.order.number, "amount": "25.00"},
+                {"order": self.declined.order.number},
+            ],
+        )
+        results_path = os.path.join(self.tempdir, "results.csv")
+        out = self.call_batch_command(
+            "wfrs_bulk_return",
+            self.full.order.number,
+            "--input=%s" % input_path,
+            "--results=%s" % results_path,
+            "--user=bill",
+        )
+        self.assertIn("Done. Returned 3 row(s)", out)
+        # The returns are recorded as made by the given user
+        self.assertEqual(
+            TransferMetadata.objects.get(
+                merchant_reference=self.full.merchant_reference,
+                type_code=TRANS_TYPE_RETURN_CREDIT,
+            ).user,
+            self.bill,
+        )
+        self.assertEqual(
+            [
+                (r["order"], r["result"], r["amount"])
+                for r in self.read_results(results_path)
+            ],
+            [
+                (self.full.order.number, "returned", "100.00"),
+                (self.partial.order.number, "returned", "25.00"),
+                (self.declined.order.number, "declined", "500.00"),
+            ],
+        )
+
+        # Without a results file, the results are printed
+        out = self.call_batch_command("wfrs_bulk_return", "nope")
+        self.assertIn("nope: result=not_found", out)
@@ -0,0 +1,166 @@
+from datetime import timedelta
+from decimal import Decimal
+from oscar.core.loading import get_model
+from wellsfargo.batch.settlement import SettlementBatch
+from wellsfargo.core.constants import (
+    TRANS_APPROVED,
+    TRANS_DECLINED,
+    TRANS_TYPE_CHARGE,
+)
+from wellsfargo.models import FinancingPlan, TransferMetadata
+from wellsfargo.tests.base import BaseTest
+from wellsfargo.tests.batch.base import (
+    DECLINED_ACCOUNT,
+    FAILING_ACCOUNT,
+    BatchTestMixin,
+)
+import os.path
+import requests_mock
+
+Source = get_model("payment", "Source")
+Transaction = get_model("payment", "Transaction")
+
+
+class SettlementBatchTest(BatchTestMixin, BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.plan = FinancingPlan.objects.create(plan_number=1001)
+        self.charged = self._authorize("9999999999990001", "100.00")
+        self.other_merchant = self._authorize(
+            "9999999999990002", "200.00", merchant_num="2222222222222222"
+        )
+        self.voided = self._authorize("9999999999990003", "300.00", allocated="0.00")
+        self.recent = self._authorize("9999999999990004", "400.00", age=1)
+        self.declined = self._authorize(DECLINED_ACCOUNT, "500.00")
+        self.settled = self._authorize("9999999999990006", "600.00")
+        TransferMetadata.objects.create(
+            merchant_reference=self.settled.merchant_reference,
+            amount=self.settled.amount,
+            type_code=TRANS_TYPE_CHARGE,
+            status=TRANS_APPROVED,
+        )
+        self.failing = self._authorize(FAILING_ACCOUNT, "700.00")
+
+    def _authorize(self, account_number, amount, **kwargs):
+        return self._build_authorization(account_number, amount, self.plan, **kwargs)
+
+    def _mock_gateway(self, rmock):
+        self.mock_transaction_requests(rmock, "charge")
+
+    def _charges(self, rmock):
+        return self.requests_to(rmock, "charge")
+
+    def _charge_of(self, auth):
+        return TransferMetadata.objects.get(
+            merchant_reference=auth.merchant_reference, type_code=TRANS_TYPE_CHARGE
+        )
+
+    def _source_of(self, auth):
+        return (
+            Source.objects.filter(transactions__reference=auth.merchant_reference)
+            .distinct()
+            .get()
+        )
+
+    @requests_mock.Mocker()
+    def test_run(self, rmock):
+        self._mock_gateway(rmock)
+        batch = SettlementBatch(timedelta(hours=24), batch_size=2)
+        stats = batch.run()
+        self.assertEqual(
+            stats.counts, {"charged": 2, "declined": 1, "skipped": 1, "error": 1}
+        )
+        requests = {r.json()["account_number"]: r for r in self._charges(rmock)}
+        self.assertEqual(
+            sorted(requests),
+            [
+                "9999999999990001",
+                "9999999999990002",
+                DECLINED_ACCOUNT,
+                FAILING_ACCOUNT,
+            ],
+        )
+        # Each authorization is charged with its own merchant number, plan, and authorization
+        request = requests["9999999999990002"]
+        self.assertEqual(
+            request.json(),
+            {
+                "locale": "en_US",
+                "authorization_number": "123456",
+                "account_number": "9999999999990002",
+                "plan_number": "1001",
+                "amount": "200.00",
+                "ticket_number": "990002",
+                "merchant_number": "2222222222222222",
+            },
+        )
+        self.assertEqual(
+            request.headers["client-request-id"],
+            str(batch.get_client_request_id(self.other_merchant)),
+        )
+
+        charge = self._charge_of(self.charged)
+        self.assertEqual(charge.status, TRANS_APPROVED)
+        self.assertEqual(charge.amount, Decimal("100.00"))
+        self.assertEqual(charge.account_number, "9999999999990001")
+        self.assertEqual(charge.financing_plan, self.plan)
+        self.assertEqual(charge.user, self.joe)
+        self.assertEqual(charge.merchant_num, "1111111111111111")
+        self.assertEqual(
+            self._charge_of(self.other_merchant).merchant_name, "Merchant 2"
+        )
+        self.assertEqual(self._charge_of(self.declined).status, TRANS_DECLINED)
+        self.assertFalse(
+            TransferMetadata.objects.filter(
+                merchant_reference__in=[
+                    self.voided.merchant_reference,
+                    self.recent.merchant_reference,
+                    self.failing.merchant_reference,
+                ],
+                type_code=TRANS_TYPE_CHARGE,
+            ).exists()
+        )
+
+        # Approved charges are debited from the order's payment source
+        source = self._source_of(self.charged)
+        self.assertEqual(source.amount_debited, Decimal("100.00"))
+        debit = source.transactions.get(txn_type=Transaction.DEBIT)
+        self.assertEqual(debit.reference, self.charged.merchant_reference)
+        self.assertEqual(debit.amount, Decimal("100.00"))
+        self.assertEqual(self._source_of(self.declined).amount_debited, Decimal("0.00"))
+
+        # Only the authorizations which weren't charged or declined are tried again, with the same IDs
+        stats = SettlementBatch(timedelta(hours=24)).run()
+        self.assertEqual(stats.counts, {"skipped": 1, "error": 1})
+        charges = self._charges(rmock)
+        self.assertEqual(len(charges), 5)
+        self.assertEqual(
+            charges[-1].headers["client-request-id"],
+            requests[FAILING_ACCOUNT].headers["client-request-id"],
+        )
+
+    @requests_mock.Mocker()
+    def test_dry_run(self, rmock):
+        self._mock_gateway(rmock)
+        stats = SettlementBatch(timedelta(hours=24), dry_run=True).run()
+        self.assertEqual(stats.counts, {"would_charge": 4, "skipped": 1})
+        self.assertEqual(rmock.call_count, 0)
+        self.assertFalse(
+            TransferMetadata.objects.filter(type_code=TRANS_TYPE_CHARGE)
+            .exclude(merchant_reference=self.settled.merchant_reference)
+            .exists()
+        )
+
+    @requests_mock.Mocker()
+    def test_command(self, rmock):
+        self._mock_gateway(rmock)
+        results_path = os.path.join(self.tempdir, "settlement.csv")
+        out = self.call_batch_command(
+            "wfrs_settle_transfers", "--hours=0", "--results=%s" % results_path
+        )
+        self.assertIn("Done. Settled 6 row(s)", out)
+        results = {r["transfer_id"]: r for r in self.read_results(results_path)}
+        self.assertEqual(results[str(self.recent.pk)]["result"], "charged")
+        self.assertEqual(results[str(self.declined.pk)]["status"], TRANS_DECLINED)
+        self.assertEqual(results[str(self.voided.pk)]["result"], "skipped")
+        self.assertNotIn(str(self.settled.pk), results)
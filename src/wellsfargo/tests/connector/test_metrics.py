@@ -0,0 +1,256 @@
+from decimal import Decimal
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase
+from unittest import mock
+from wellsfargo.connector import HealthCheckAPIClient
+from wellsfargo.connector.aio import AsyncHealthCheckAPIClient
+from wellsfargo.connector.metrics import (
+    PrometheusGatewayMetrics,
+    StatsDGatewayMetrics,
+    get_gateway_metrics,
+    get_operation,
+    prometheus_metrics_view,
+)
+from wellsfargo.core.constants import (
+    TRANS_APPROVED,
+    TRANS_TYPE_AUTH,
+    TRANS_TYPE_AUTH_AND_CHARGE_TIMEOUT_REVERSAL,
+)
+from wellsfargo.core.structures import TransactionRequest
+from wellsfargo.methods import WellsFargo
+from wellsfargo.settings import WFRS_GATEWAY_METRICS
+from wellsfargo.tests.aio import HTTPXMocker
+from wellsfargo.tests.base import BaseTest
+from requests.exceptions import Timeout
+import requests_mock
+import socket
+
+TRANSACTIONS_URL = "https://api-sandbox.wellsfargo.com/credit-cards/private-label/new-accounts/v2/payment/transactions/"
+
+
+def patch_prometheus_metrics():
+    return mock.patch.dict(
+        WFRS_GATEWAY_METRICS,
+        {
+            "metrics": "wellsfargo.connector.metrics.PrometheusGatewayMetrics",
+            "metrics_kwargs": {},
+        },
+    )
+
+
+class GetOperationTest(SimpleTestCase):
+    def test_get_operation(self):
+        self.assertEqual(get_operation("/oauth2/v1/token"), "token")
+        self.assertEqual(
+            get_operation("/credit-cards/private-label/new-accounts/v2/details"),
+            "account-details",
+        )
+        self.assertEqual(
+            get_operation(
+                "/credit-cards/private-label/new-accounts/v2/payment/transactions/authorization"
+            ),
+            "authorization",
+        )
+        self.assertEqual(get_operation("/something/else"), "/something/else")
+
+
+class GatewayMetricsTest(BaseTest):
+    def setUp(self):
+        super().setUp()
+        patcher = patch_prometheus_metrics()
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.metrics = get_gateway_metrics()
+        self.metrics.reset()
+
+    def test_default_is_noop(self):
+        with mock.patch.dict(
+            WFRS_GATEWAY_METRICS,
+            {"metrics": "wellsfargo.connector.metrics.NoOpGatewayMetrics"},
+        ):
+            self.assertNotIsInstance(get_gateway_metrics(), PrometheusGatewayMetrics)
+            with self.assertRaises(Http404):
+                prometheus_metrics_view(RequestFactory().get("/metrics/"))
+
+    def test_backend_is_reused(self):
+        self.assertIsInstance(self.metrics, PrometheusGatewayMetrics)
+        self.assertIs(get_gateway_metrics(), self.metrics)
+
+    @requests_mock.Mocker()
+    def test_observe_requests(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        rmock.get(
+            "https://api-sandbox.wellsfargo.com/utilities/v1/hello-wellsfargo",
+            json={"response": "Hello, Wells Fargo."},
+        )
+        client = HealthCheckAPIClient()
+        client.check_credentials()
+        client.check_credentials()
+        text = self.metrics.render()
+        self.assertIn(
+            'wfrs_gateway_requests_total{operation="token",status="200"} 1\n', text
+        )
+        self.assertIn(
+            'wfrs_gateway_requests_total{operation="health",status="200"} 2\n', text
+        )
+        self.assertIn(
+            'wfrs_gateway_request_duration_seconds_bucket{operation="health",le="+Inf"} 2\n',
+            text,
+        )
+        self.assertIn(
+            'wfrs_gateway_request_duration_seconds_count{operation="token"} 1\n', text
+        )
+        self.assertIn("# TYPE wfrs_gateway_request_duration_seconds histogram\n", text)
+        # The token request has a form encoded body, and both responses have JSON bodies
+        self.assertGreater(self.metrics.request_sizes["token"].sum, 0)
+        self.assertEqual(self.metrics.request_sizes["health"].sum, 0)
+        self.assertEqual(
+            self.metrics.response_sizes["health"].sum,
+            2 * len(b'{"response": "Hello, Wells Fargo."}'),
+        )
+
+        response = prometheus_metrics_view(RequestFactory().get("/metrics/"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertEqual(response.content.decode(), self.metrics.render())
+
+    @requests_mock.Mocker()
+    def test_observe_errors_and_retries(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        rmock.post(
+            TRANSACTIONS_URL + "authorization",
+            [
+                {"exc": Timeout},
+                {
+                    "json": {
+                        "transaction_status": TRANS_APPROVED,
+                        "status_message": "APPROVED: 123434",
+                        "authorization_number": "123434",
+                        "account_number": "9999999999999991",
+                        "amount": "2159.99",
+                        "plan_number": "9999",
+                        "ticket_number": "123444",
+                    }
+                },
+            ],
+        )
+        rmock.post(
+            TRANSACTIONS_URL + "timeout-authorization-charge",
+            json={"transaction_status": TRANS_APPROVED},
+        )
+
+        def build_request(type_code):
+            request = TransactionRequest()
+            request.type_code = type_code
+            request.user = self.joe
+            request.account_number = "9999999999999991"
+            request.plan_number = 9999
+            request.amount = Decimal("2159.99")
+            request.ticket_number = "123444"
+            return request
+
+        WellsFargo()._perform_auth_transaction(
+            trans_request=build_request(TRANS_TYPE_AUTH),
+            cancel_trans_request=build_request(
+                TRANS_TYPE_AUTH_AND_CHARGE_TIMEOUT_REVERSAL
+            ),
+            current_user=None,
+            transaction_uuid="c17381a3-22fa-4463-8b0a-a3c18f6c4a44",
+        )
+        self.assertEqual(
+            self.metrics.requests,
+            {
+                ("token", "200"): 1,
+                ("authorization", "Timeout"): 1,
+                ("authorization", "200"): 1,
+                ("timeout-authorization-charge", "200"): 1,
+            },
+        )
+        self.assertEqual(self.metrics.retries, {("authorization", "Timeout"): 1})
+        self.assertIn(
+            'wfrs_gateway_retries_total{operation="authorization",reason="Timeout"} 1\n',
+            self.metrics.render(),
+        )
+
+    async def test_observe_async_requests(self):
+        with HTTPXMocker() as rmock:
+            self.mock_get_api_token_request(rmock)
+            rmock.get(
+                "https://api-sandbox.wellsfargo.com/utilities/v1/hello-wellsfargo",
+                json={"response": "Hello, Wells Fargo."},
+            )
+            await AsyncHealthCheckAPIClient().check_credentials()
+        self.assertEqual(
+            self.metrics.requests, {("token", "200"): 1, ("health", "200"): 1}
+        )
+        self.assertGreater(self.metrics.request_sizes["token"].sum, 0)
+        self.assertGreater(self.metrics.response_sizes["health"].sum, 0)
+
+
+class PrometheusGatewayMetricsTest(SimpleTestCase):
+    def test_render(self):
+        metrics = PrometheusGatewayMetrics(
+            duration_buckets=(0.1, 1), size_buckets=(100,)
+        )
+        metrics.observe_request("prequal", 200, 0.05, 90, 120)
+        metrics.observe_request("prequal", "ConnectionError", 2.5, 90, 0)
+        self.assertEqual(
+            metrics.render().splitlines()[:7],
+            [
+                "# HELP wfrs_gateway_request_duration_seconds Duration of WFRS Gateway API requests.",
+                "# TYPE wfrs_gateway_request_duration_seconds histogram",
+                'wfrs_gateway_request_duration_seconds_bucket{operation="prequal",le="0.1"} 1',
+                'wfrs_gateway_request_duration_seconds_bucket{operation="prequal",le="1.0"} 1',
+                'wfrs_gateway_request_duration_seconds_bucket{operation="prequal",le="+Inf"} 2',
+                'wfrs_gateway_request_duration_seconds_sum{operation="prequal"} 2.55',
+                'wfrs_gateway_request_duration_seconds_count{operation="prequal"} 2',
+            ],
+        )
+        self.assertIn(
+            'wfrs_gateway_requests_total{operation="prequal",status="ConnectionError"} 1',
+            metrics.render(),
+        )
+
+
+class StatsDGatewayMetricsTest(SimpleTestCase):
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.settimeout(5)
+        self.addCleanup(self.server.close)
+        self.port = self.server.getsockname()[1]
+
+    def receive(self):
+        return self.server.recv(4096).decode("utf-8").split("\n")
+
+    def test_send_metrics(self):
+        metrics = StatsDGatewayMetrics(host="127.0.0.1", port=self.port)
+        metrics.observe_request("authorization", 200, 0.1234, 300, 450)
+        self.assertEqual(
+            self.receive(),
+            [
+                "wfrs.gateway.authorization.duration:123.400|ms",
+                "wfrs.gateway.authorization.request_size:300|h",
+                "wfrs.gateway.authorization.response_size:450|h",
+                "wfrs.gateway.authorization.requests.status.200:1|c",
+            ],
+        )
+        metrics.observe_retry("authorization", "Timeout")
+        self.assertEqual(
+            self.receive(), ["wfrs.gateway.authorization.retries.reason.Timeout:1|c"]
+        )
+
+    def test_send_tagged_metrics(self):
+        metrics = StatsDGatewayMetrics(
+            host="127.0.0.1", port=self.port, prefix="shop.wfrs", tags=True
+        )
+        metrics.observe_request("prequal", 503, 0.5, 300, 0)
+        self.assertEqual(
+            self.receive(),
+            [
+                "shop.wfrs.duration:500.000|ms|#operation:prequal",
+                "shop.wfrs.request_size:300|h|#operation:prequal",
+                "shop.wfrs.response_size:0|h|#operation:prequal",
+                "shop.wfrs.requests:1|c|#operation:prequal,status:503",
+            ],
+        )
@@ -0,0 +1,207 @@
+from asgiref.sync import sync_to_async
+from decimal import Decimal
+from django.test import SimpleTestCase
+from unittest import mock
+from wellsfargo.connector import HealthCheckAPIClient
+from wellsfargo.connector.accounts import AccountsAPIClient
+from wellsfargo.connector.aio import AsyncAccountsAPIClient
+from wellsfargo.connector.traffic import (
+    ReplayMissError,
+    get_gateway_recorder,
+    read_archive,
+    scrub,
+)
+from wellsfargo.settings import WFRS_GATEWAY_RECORDER, WFRS_GATEWAY_REPLAY
+from wellsfargo.tests.aio import HTTPXMocker
+from wellsfargo.tests.base import BaseTest
+import json
+import os.path
+import requests_mock
+import shutil
+import tempfile
+import threading
+
+
+class ScrubTest(SimpleTestCase):
+    def test_scrub(self):
+        data = {
+            "first_name": "Joe",
+            "annual_income": 150000,
+            "account_number": "2222222222223456",
+            "credit_limit": "18000.00",
+            "main_applicant": {
+                "ssn": "999-99-9990",
+                "address": {"address_line_1": "123 Evergreen Terrace", "state": "IA"},
+            },
+            "errors": [{"field_name": "last_name", "field_value": None}],
+            "middle_initial": None,
+        }
+        self.assertEqual(
+            scrub(data),
+            {
+                "first_name": "XXX",
+                "annual_income": 0,
+                "account_number": "9999999999993456",
+                "credit_limit": "18000.00",
+                "main_applicant": {
+                    "ssn": "XXXXXXXXXXX",
+                    "address": {
+                        "address_line_1": "XXXXXXXXXXXXXXXXXXXXX",
+                        "state": "IA",
+                    },
+                },
+                "errors": [{"field_name": "last_name", "field_value": None}],
+                "middle_initial": None,
+            },
+        )
+        self.assertIsNone(scrub(None))
+
+
+class GatewayTrafficTest(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir, ignore_errors=True)
+
+    def _record(self, filename):
+        path = os.path.join(self.tempdir, filename)
+        patcher = mock.patch.dict(
+            WFRS_GATEWAY_RECORDER,
+            {
+                "recorder": "wellsfargo.connector.traffic.JSONLinesGatewayRecorder",
+                "recorder_kwargs": {"path": path},
+            },
+        )
+        with patcher, requests_mock.Mocker() as rmock:
+            self.mock_get_api_token_request(rmock)
+            self.mock_successful_individual_account_inquiry(rmock)
+            AccountsAPIClient().lookup_account_by_prequal_offer_id(
+                first_name="Joe", last_name="Schmoe", unique_id="00001DGh"
+            )
+            AccountsAPIClient().lookup_account_by_prequal_offer_id(
+                first_name="Joe", last_name="Schmoe", unique_id="00001DGh"
+            )
+            get_gateway_recorder().close()
+        return path
+
+    def _replay(self, path, **kwargs):
+        return mock.patch.dict(WFRS_GATEWAY_REPLAY, dict(archive=path, **kwargs))
+
+    def test_record(self):
+        path = self._record("traffic.jsonl")
+        entries = list(read_archive(path))
+        # API token requests aren't recorded
+        self.assertEqual(len(entries), 2)
+        entry = entries[0]
+        self.assertEqual(entry["operation"], "account-details")
+        self.assertEqual(entry["method"], "POST")
+        self.assertEqual(
+            entry["path"], "/credit-cards/private-label/new-accounts/v2/details"
+        )
+        self.assertEqual(entry["status"], 200)
+        self.assertGreater(entry["duration"], 0)
+        self.assertEqual(entry["request"]["first_name"], "XXX")
+        self.assertEqual(entry["request"]["last_name"], "XXXXXX")
+        self.assertEqual(entry["request"]["merchant_number"], "1111111111111111")
+        self.assertEqual(entry["response"]["account_number"], "9999999999992222")
+        self.assertEqual(entry["response"]["credit_limit"], "18000.00")
+        self.assertEqual(entry["response"]["applicant"]["name"], "XXXXXXXXXXX")
+        self.assertEqual(
+            entry["response"]["applicant"]["address"]["address_1"], "X" * 16
+        )
+        # Nothing personal made it into the archive
+        with open(path) as archive:
+            contents = archive.read()
+        for value in ("Joe", "Schmoe", "FIRST STREET", "2222222222222222"):
+            self.assertNotIn(value, contents)
+
+    def test_record_gzipped(self):
+        path = self._record("traffic.jsonl.gz")
+        self.assertEqual(len(list(read_archive(path))), 2)
+        with self.assertRaises(UnicodeDecodeError):
+            with open(path, encoding="utf-8") as archive:
+                json.loads(archive.readline())
+
+    @requests_mock.Mocker()
+    def test_replay(self, rmock):
+        path = self._record("traffic.jsonl")
+        with self._replay(path):
+            inquiry = AccountsAPIClient().lookup_account_by_prequal_offer_id(
+                first_name="Joe", last_name="Schmoe", unique_id="00001DGh"
+            )
+        # Nothing was sent to the gateway
+        self.assertEqual(rmock.call_count, 0)
+        self.assertEqual(inquiry.last4_account_number, "2222")
+        self.assertEqual(inquiry.main_applicant_full_name, "XXXXXXXXXXX")
+        self.assertEqual(inquiry.credit_limit, Decimal("18000.00"))
+
+    @mock.patch("wellsfargo.connector.traffic.time.sleep")
+    def test_replay_latency(self, sleep):
+        path = self._record("traffic.jsonl")
+        durations = [entry["duration"] for entry in read_archive(path)]
+        with self._replay(path):
+            for i in range(3):
+                AccountsAPIClient().lookup_account_by_prequal_offer_id(
+                    first_name="Joe", last_name="Schmoe", unique_id="00001DGh"
+                )
+        # Latency is only replayed when asked for
+        self.assertEqual([c.args[0] for c in sleep.call_args_list if c.args[0]], [])
+        sleep.reset_mock()
+        with self._replay(path, latency=True, latency_scale=2):
+            for i in range(3):
+                AccountsAPIClient().lookup_account_by_prequal_offer_id(
+                    first_name="Joe", last_name="Schmoe", unique_id="00001DGh"
+                )
+        # Responses are replayed in order, cycling back to the first
+        self.assertEqual(
+            [c.args[0] for c in sleep.call_args_list if c.args[0]],
+            [durations[0] * 2, durations[1] * 2, durations[0] * 2],
+        )
+
+    def test_replay_miss(self):
+        path = self._record("traffic.jsonl")
+        with self._replay(path):
+            with self.assertRaises(ReplayMissError):
+                HealthCheckAPIClient().check_credentials()
+
+    async def test_record_async(self):
+        path = os.path.join(self.tempdir, "traffic.jsonl.gz")
+        patcher = mock.patch.dict(
+            WFRS_GATEWAY_RECORDER,
+            {
+                "recorder": "wellsfargo.connector.traffic.JSONLinesGatewayRecorder",
+                "recorder_kwargs": {"path": path},
+            },
+        )
+        recorder_threads = []
+        with patcher, HTTPXMocker() as rmock:
+            self.mock_get_api_token_request(rmock)
+            self.mock_successful_individual_account_inquiry(rmock)
+            recorder = get_gateway_recorder()
+            record = recorder.record
+
+            def record_in_thread(*args):
+                recorder_threads.append(threading.get_ident())
+                return record(*args)
+
+            with mock.patch.object(recorder, "record", side_effect=record_in_thread):
+                await AsyncAccountsAPIClient().lookup_account_by_prequal_offer_id(
+                    first_name="Joe", last_name="Schmoe", unique_id="00001DGh"
+                )
+            recorder.close()
+        # The archive was written outside of the event loop's thread
+        self.assertEqual(len(recorder_threads), 1)
+        self.assertNotEqual(recorder_threads[0], threading.get_ident())
+        entries = list(read_archive(path))
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]["response"]["account_number"], "9999999999992222")
+
+    async def test_replay_async(self):
+        path = await sync_to_async(self._record)("traffic.jsonl")
+        with HTTPXMocker() as rmock, self._replay(path):
+            inquiry = await AsyncAccountsAPIClient().lookup_account_by_prequal_offer_id(
+                first_name="Joe", last_name="Schmoe", unique_id="00001DGh"
+            )
+        self.assertEqual(rmock.request_history, [])
+        self.assertEqual(inquiry.last4_account_number, "2222")
+        self.assertEqual(inquiry.credit_limit, Decimal("18000.00"))
@@ -0,0 +1,145 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from wellsfargo.core.constants import (
+    EXPORT_TYPE_CREDIT_APPS,
+    EXPORT_STATUS_COMPLETE,
+    EXPORT_STATUS_FAILED,
+    EXPORT_STATUS_RUNNING,
+)
+from wellsfargo.dashboard.exports import create_export_job, run_export_job
+from wellsfargo.models import ExportJob
+from ..base import BaseTest
+import gzip
+import shutil
+import tempfile
+
+
+class ExportJobTest(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        for i in range(5):
+            app = self._build_single_credit_app("999999990")
+            app.main_applicant.first_name = "Applicant%s" % i
+            app.main_applicant.save()
+            app.save()
+
+    def _read_job_file(self, job):
+        with job.file.open("rb") as f:
+            content = f.read()
+        if job.compress:
+            content = gzip.decompress(content)
+        return content.decode("utf-8").splitlines()
+
+    def test_create_from_dashboard(self):
+        self.client.login(username="bill", password="schmoe")
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(
+                reverse("wfrs-export-create"),
+                {
+                    "export_type": EXPORT_TYPE_CREDIT_APPS,
+                    "query": "search_text=Applicant1&page=2",
+                },
+            )
+        self.assertRedirects(resp, reverse("wfrs-export-list"))
+
+        job = ExportJob.objects.get()
+        self.assertEqual(job.status, EXPORT_STATUS_COMPLETE)
+        self.assertEqual(job.requesting_user, self.bill)
+        self.assertEqual(job.query, {"search_text": ["Applicant1"]})
+        self.assertEqual(job.total_rows, 1)
+        self.assertEqual(job.rows_written, 1)
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.filename, "applications.csv")
+        rows = self._read_job_file(job)
+        self.assertEqual(len(rows), 2)
+        self.assertIn("Applicant1", rows[1])
+
+        resp = self.client.get(reverse("wfrs-export-list"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, reverse("wfrs-export-download", args=[job.pk]))
+
+    def test_chunked_compressed_export(self):
+        with self.captureOnCommitCallbacks():
+            job = create_export_job(EXPORT_TYPE_CREDIT_APPS, {}, compress=True)
+        run_export_job(job.pk, chunk_size=2)
+        job.refresh_from_db()
+        self.assertEqual(job.status, EXPORT_STATUS_COMPLETE)
+        self.assertEqual(job.total_rows, 5)
+        self.assertEqual(job.rows_written, 5)
+        self.assertEqual(job.filename, "applications.csv.gz")
+        rows = self._read_job_file(job)
+        self.assertEqual(len(rows), 6)
+        # Header row matches the synchronous CSV download
+        self.client.login(username="bill", password="schmoe")
+        resp = self.client.get(
+            reverse("wfrs-application-list"), {"response_format": "csv"}
+        )
+        self.assertEqual(rows, resp.content.decode("utf-8").splitlines())
+
+    def test_job_only_runs_once(self):
+        with self.captureOnCommitCallbacks():
+            job = create_export_job(EXPORT_TYPE_CREDIT_APPS, {})
+        ExportJob.objects.filter(pk=job.pk).update(status=EXPORT_STATUS_RUNNING)
+        run_export_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, EXPORT_STATUS_RUNNING)
+        self.assertFalse(job.file)
+
+    def test_failed_export(self):
+        with self.captureOnCommitCallbacks():
+            job = create_export_job(EXPORT_TYPE_CREDIT_APPS, {"sort": ["not_a_field"]})
+        ExportJob.objects.filter(pk=job.pk).update(export_type="unknown")
+        run_export_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, EXPORT_STATUS_FAILED)
+        self.assertNotEqual(job.error_message, "")
+        self.assertFalse(job.is_downloadable)
+
+        self.client.login(username="bill", password="schmoe")
+        resp = self.client.get(reverse("wfrs-export-download", args=[job.pk]))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_download(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = create_export_job(EXPORT_TYPE_CREDIT_APPS, {})
+        job.refresh_from_db()
+
+        resp = self.client.get(reverse("wfrs-export-download", args=[job.pk]))
+        self.assertEqual(resp.status_code, 302)
+
+        self.client.login(username="bill", password="schmoe")
+        resp = self.client.get(reverse("wfrs-export-download", args=[job.pk]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "text/csv")
+        self.assertIn(
+            'attachment; filename="applications.csv"',
+            resp["Content-Disposition"],
+        )
+        self.assertEqual(len(b"".join(resp.streaming_content).splitlines()), 6)
+
+    def test_purge_command(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            old_job = create_export_job(EXPORT_TYPE_CREDIT_APPS, {})
+            new_job = create_export_job(EXPORT_TYPE_CREDIT_APPS, {})
+        ExportJob.objects.filter(pk=old_job.pk).update(
+            created_datetime=timezone.now() - timedelta(days=8)
+        )
+        old_job.refresh_from_db()
+        storage = old_job.file.storage
+        old_file_name = old_job.file.name
+        self.assertTrue(storage.exists(old_file_name))
+
+        out = StringIO()
+        call_command("wfrs_purge_exports", stdout=out)
+        self.assertIn("Purged 1 export(s).", out.getvalue())
+        self.assertFalse(storage.exists(old_file_name))
+        self.assertEqual(list(ExportJob.objects.all()), [new_job])
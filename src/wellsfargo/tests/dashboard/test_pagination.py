@@ -0,0 +1,121 @@
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from wellsfargo.dashboard.pagination import encode_cursor
+from wellsfargo.models import PreQualificationRequest
+from wellsfargo.settings import WFRS_DASHBOARD_PAGINATION
+from ..base import BaseTest
+
+
+class DashboardPaginationTest(BaseTest):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.requests = []
+        for i in range(8):
+            req = PreQualificationRequest.objects.create(
+                first_name="Joe%s" % i,
+                last_name="Schmoe",
+                line1="123 Evergreen Terrace",
+                city="Springfield",
+                state="NY",
+                postcode="10001",
+                phone="+12122091333",
+            )
+            # Pairs of requests share a timestamp, so that the ID tie-breaker matters
+            PreQualificationRequest.objects.filter(pk=req.pk).update(
+                created_datetime=now - timedelta(minutes=(10 - (i // 2)))
+            )
+            self.requests.append(req)
+        # Newest first
+        self.expected_pks = [req.pk for req in reversed(self.requests)]
+        self.client.login(username="bill", password="schmoe")
+
+    def _get_page(self, **params):
+        params.setdefault("per_page", 3)
+        resp = self.client.get(reverse("wfrs-prequal-list"), params)
+        self.assertEqual(resp.status_code, 200)
+        table = resp.context["prequal_requests"]
+        return table, [row.record.pk for row in table.paginated_rows]
+
+    @mock.patch.dict(WFRS_DASHBOARD_PAGINATION, {"mode": "keyset"})
+    def test_keyset_pagination(self):
+        # Walk forwards through the list
+        table, pks = self._get_page()
+        self.assertEqual(pks, self.expected_pks[0:3])
+        self.assertIsNone(table.paginator.previous_cursor)
+        table, pks = self._get_page(after=table.paginator.next_cursor)
+        self.assertEqual(pks, self.expected_pks[3:6])
+        table, pks = self._get_page(after=table.paginator.next_cursor)
+        self.assertEqual(pks, self.expected_pks[6:8])
+        self.assertIsNone(table.paginator.next_cursor)
+        # Then backwards
+        table, pks = self._get_page(before=table.paginator.previous_cursor)
+        self.assertEqual(pks, self.expected_pks[3:6])
+        table, pks = self._get_page(before=table.paginator.previous_cursor)
+        self.assertEqual(pks, self.expected_pks[0:3])
+        self.assertIsNone(table.paginator.previous_cursor)
+
+    @mock.patch.dict(WFRS_DASHBOARD_PAGINATION, {"mode": "keyset"})
+    def test_keyset_pagination_doesnt_count(self):
+        cursor = encode_cursor(
+            PreQualificationRequest.objects.get(pk=self.requests[5].pk)
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            table, pks = self._get_page(after=cursor)
+        self.assertEqual(pks, self.expected_pks[3:6])
+        counts = [
+            q["sql"]
+            for q in ctx.captured_queries
+            if "COUNT(" in q["sql"] and "wellsfargo_prequalificationrequest" in q["sql"]
+        ]
+        self.assertEqual(counts, [])
+
+    @mock.patch.dict(WFRS_DASHBOARD_PAGINATION, {"mode": "keyset"})
+    def test_keyset_pagination_with_filters_and_sorting(self):
+        table, pks = self._get_page(search_text="schmoe", per_page=5)
+        self.assertEqual(pks, self.expected_pks[0:5])
+        table, pks = self._get_page(
+            search_text="schmoe", per_page=5, after=table.paginator.next_cursor
+        )
+        self.assertEqual(pks, self.expected_pks[5:8])
+        # Sorting by a column falls back to numbered pages
+        table, pks = self._get_page(sort="created_datetime", page=2)
+        self.assertFalse(getattr(table.paginator, "is_keyset", False))
+        self.assertEqual(pks, list(reversed(self.expected_pks))[3:6])
+
+    @mock.patch.dict(WFRS_DASHBOARD_PAGINATION, {"mode": "keyset"})
+    def test_keyset_pagination_invalid_cursor(self):
+        table, pks = self._get_page(after="foo")
+        self.assertEqual(pks, self.expected_pks[0:3])
+
+    @mock.patch.dict(WFRS_DASHBOARD_PAGINATION, {"count": "cached"})
+    def test_cached_count(self):
+        table, pks = self._get_page()
+        self.assertEqual(table.paginator.count, 8)
+        PreQualificationRequest.objects.filter(pk=self.requests[0].pk).delete()
+        table, pks = self._get_page(page=2)
+        self.assertEqual(table.paginator.count, 8)
+        self.assertEqual(pks, self.expected_pks[3:6])
+        table, pks = self._get_page(search_text="joe1")
+        self.assertEqual(table.paginator.count, 1)
+
+    @mock.patch.dict(
+        WFRS_DASHBOARD_PAGINATION,
+        {"count": "estimated", "estimated_count_threshold": 0},
+    )
+    def test_estimated_count(self):
+        table, pks = self._get_page()
+        self.assertIsInstance(table.paginator.count, int)
+        self.assertGreater(table.paginator.count, 0)
+        self.assertEqual(pks, self.expected_pks[0:3])
+
+    @mock.patch.dict(WFRS_DASHBOARD_PAGINATION, {"count": "estimated"})
+    def test_estimated_count_of_small_results_is_exact(self):
+        table, pks = self._get_page(page=3)
+        self.assertEqual(table.paginator.count, 8)
+        self.assertEqual(table.paginator.num_pages, 3)
+        self.assertEqual(pks, self.expected_pks[6:8])
@@ -0,0 +1,139 @@
+from decimal import Decimal
+from django.urls import reverse
+from unittest import mock
+from wellsfargo.core.constants import TRANS_TYPE_RETURN_CREDIT
+from wellsfargo.dashboard.forms import BulkReturnForm
+from wellsfargo.models import TransferMetadata
+from wellsfargo.settings import WFRS_BATCH
+from wellsfargo.tests.base import BaseTest
+from wellsfargo.tests.batch.base import ReturnTestMixin
+import requests_mock
+import uuid
+
+
+class BulkReturnViewTest(ReturnTestMixin, BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="bill", password="schmoe")
+        self.url = reverse("wfrs-bulk-return")
+
+    def _post(self, orders, token=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                self.url, {"orders": orders, "token": token or uuid.uuid4()}
+            )
+
+    def test_form(self):
+        form = BulkReturnForm(
+            data={"orders": "100001\n\n 100002 , 12.50 \n", "token": uuid.uuid4()}
+        )
+        self.assertTrue(form.is_valid())
+        self.assertEqual(
+            form.cleaned_data["orders"],
+            [{"order": "100001", "amount": ""}, {"order": "100002", "amount": "12.50"}],
+        )
+        for amount in ("NaN", "Infinity", "-5", "abc"):
+            form = BulkReturnForm(
+                data={"orders": "100001, %s" % amount, "token": uuid.uuid4()}
+            )
+            self.assertFalse(form.is_valid())
+            self.assertEqual(
+                form.errors["orders"],
+                ["Invalid amount for order 100001: %s" % amount],
+            )
+        with mock.patch.dict(WFRS_BATCH, {"dashboard_return_limit": 1}):
+            form = BulkReturnForm(
+                data={"orders": "100001\n100002", "token": uuid.uuid4()}
+            )
+            self.assertFalse(form.is_valid())
+
+    def test_get(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotContains(resp, "<caption>")
+        # Each form has its own token
+        self.assertNotEqual(
+            resp.context["form"]["token"].value(),
+            self.client.get(self.url).context["form"]["token"].value(),
+        )
+
+    @requests_mock.Mocker()
+    def test_post(self, rmock):
+        self._mock_gateway(rmock)
+        token = uuid.uuid4()
+        orders = "%s\n%s, 20\nnope" % (
+            self.full.order.number,
+            self.partial.merchant_reference,
+        )
+        resp = self._post(orders, token)
+        results_url = reverse("wfrs-bulk-return-results", kwargs={"token": token})
+        self.assertRedirects(resp, results_url)
+        resp = self.client.get(results_url)
+        self.assertEqual(
+            [(r["order"], r["result"]) for r in resp.context["results"]],
+            [
+                (self.full.order.number, "returned"),
+                (self.partial.merchant_reference, "returned"),
+                ("nope", "not_found"),
+            ],
+        )
+        self.assertContains(resp, self.full.merchant_reference)
+        self.assertContains(
+            resp, "Processed 3 returns: not_found=1, returned=2", html=False
+        )
+        self.assertEqual(
+            self._source_of(self.partial).amount_refunded, Decimal("20.00")
+        )
+        # Returns are recorded as made by the staff user, but are made with the merchant number of the
+        # authorization, not the staff user's
+        self.assertEqual(
+            set(
+                TransferMetadata.objects.filter(
+                    merchant_reference__in=[
+                        self.full.merchant_reference,
+                        self.partial.merchant_reference,
+                    ],
+                    type_code=TRANS_TYPE_RETURN_CREDIT,
+                ).values_list("user", flat=True)
+            ),
+            {self.bill.pk},
+        )
+        self.assertEqual(
+            {r.json()["merchant_number"] for r in self._returns(rmock)},
+            {"1111111111111111", "2222222222222222"},
+        )
+
+        # Submitting the same form again shows its results, rather than returning the orders again
+        resp = self._post(orders, token)
+        self.assertRedirects(resp, results_url)
+        self.assertEqual(len(self._returns(rmock)), 2)
+        self.assertEqual(
+            self._source_of(self.partial).amount_refunded, Decimal("20.00")
+        )
+
+    def test_pending(self):
+        token = uuid.uuid4()
+        # Returns aren't started until the form's transaction commits
+        resp = self.client.post(
+            self.url, {"orders": self.full.order.number, "token": token}
+        )
+        resp = self.client.get(resp.url)
+        self.assertContains(resp, "The returns are in progress")
+        self.assertContains(resp, 'http-equiv="refresh"')
+
+    @requests_mock.Mocker()
+    def test_failed(self, rmock):
+        self._mock_gateway(rmock)
+        with mock.patch(
+            "wellsfargo.batch.returns.ReturnBatch.process_chunk",
+            side_effect=RuntimeError(),
+        ):
+            resp = self._post(self.full.order.number)
+        resp = self.client.get(resp.url)
+        self.assertContains(resp, "The returns failed part way through")
+
+    def test_unknown_token(self):
+        resp = self.client.get(
+            reverse("wfrs-bulk-return-results", kwargs={"token": uuid.uuid4()})
+        )
+        self.assertEqual(resp.status_code, 404)
@@ -0,0 +1,177 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.urls import reverse
+from wellsfargo.dashboard.views import PreQualificationListView
+from wellsfargo.models import CreditApplication, PreQualificationRequest
+from ..base import BaseTest
+
+
+class CreditApplicationSearchTest(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.app1 = self._build_single_credit_app("999999990")
+        self.app1.save()
+        self.app2 = self._build_joint_credit_app("999999991", "999999992")
+        self.app2.joint_applicant.first_name = "Evergreen"
+        self.app2.joint_applicant.email_address = "evergreen@example.com"
+        self.app2.joint_applicant.save()
+        self.app2.save()
+        self.client.login(username="bill", password="schmoe")
+
+    def _search(self, **params):
+        resp = self.client.get(reverse("wfrs-application-list"), params)
+        self.assertEqual(resp.status_code, 200)
+        return set(row.record.pk for row in resp.context["applications"].rows)
+
+    def test_search_vector_is_stored(self):
+        self.app1.refresh_from_db()
+        self.assertIn("'schmoe':2A", self.app1.search_vector)
+        self.assertIn("'evergreen'", self.app1.search_vector)
+
+    def test_search_vector_follows_applicant_changes(self):
+        self.app1.main_applicant.last_name = "Simpson"
+        self.app1.main_applicant.save()
+        self.app1.main_applicant.address.city = "Shelbyville"
+        self.app1.main_applicant.address.save()
+        self.assertEqual(self._search(search_text="simpson"), {self.app1.pk})
+        self.assertEqual(self._search(search_text="shelbyville"), {self.app1.pk})
+        self.assertEqual(self._search(search_text="springfield"), {self.app2.pk})
+
+    def test_basic_search(self):
+        self.assertEqual(
+            self._search(search_text="Evergreen"), {self.app1.pk, self.app2.pk}
+        )
+        self.assertEqual(
+            self._search(search_text="Joe Schmoe"), {self.app1.pk, self.app2.pk}
+        )
+        self.assertEqual(self._search(search_text="Nobody"), set())
+
+    def test_advanced_search_is_restricted_to_field(self):
+        # Evergreen is the street name of both apps, but the name of only one applicant.
+        self.assertEqual(self._search(name="Evergreen"), {self.app2.pk})
+        self.assertEqual(self._search(name="joe schmoe"), {self.app1.pk, self.app2.pk})
+        self.assertEqual(self._search(email="evergreen@example.com"), {self.app2.pk})
+        self.assertEqual(
+            self._search(address="123 Evergreen Terrace"), {self.app1.pk, self.app2.pk}
+        )
+        self.assertEqual(self._search(address="Schmoe"), set())
+        self.assertEqual(
+            self._search(phone="+12122091333"), {self.app1.pk, self.app2.pk}
+        )
+        self.assertEqual(self._search(phone="Schmoe"), set())
+        self.assertEqual(self._search(name="it's"), set())
+
+    def test_backfill_command(self):
+        CreditApplication.objects.update(search_vector=None)
+        self.assertEqual(self._search(search_text="schmoe"), set())
+        out = StringIO()
+        call_command(
+            "wfrs_backfill_search_vectors",
+            "--model=credit-applications",
+            "--batch-size=1",
+            "--missing-only",
+            stdout=out,
+        )
+        self.assertIn(
+            "Wells Fargo Credit Applications: done. Updated 2 rows.", out.getvalue()
+        )
+        self.assertEqual(
+            self._search(search_text="schmoe"), {self.app1.pk, self.app2.pk}
+        )
+
+
+class PreQualificationSearchTest(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.req1 = PreQualificationRequest.objects.create(
+            first_name="Joseph",
+            last_name="Schmoe",
+            line1="123 Evergreen Terrace",
+            city="Springfield",
+            state="NY",
+            postcode="10001",
+            phone="+12122091333",
+        )
+        self.req2 = PreQualificationRequest.objects.create(
+            first_name="Bill",
+            last_name="Evergreen",
+            line1="742 Main St",
+            city="Shelbyville",
+            state="NY",
+            postcode="10002",
+            phone="+15559998888",
+        )
+        self.client.login(username="bill", password="schmoe")
+
+    def _search(self, **params):
+        resp = self.client.get(reverse("wfrs-prequal-list"), params)
+        self.assertEqual(resp.status_code, 200)
+        return set(row.record.pk for row in resp.context["prequal_requests"].rows)
+
+    def _explain_search(self, **params):
+        request = RequestFactory().get(reverse("wfrs-prequal-list"), params)
+        request.user = self.bill
+        view = PreQualificationListView()
+        view.setup(request)
+        # Only the search filters are of interest, not the joins which load each row's response
+        qs = view.get_queryset().order_by().select_related(None)
+        # The test tables are tiny, so disable sequential scans to see whether an index *can* be used.
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            return qs.explain()
+
+    def test_search_vector_maintained_by_trigger(self):
+        self.req1.refresh_from_db()
+        self.assertIn("'springfield'", self.req1.search_vector)
+        self.req1.city = "Capital City"
+        self.req1.save()
+        self.assertEqual(self._search(search_text="capital"), {self.req1.pk})
+        self.assertEqual(self._search(search_text="springfield"), set())
+
+    def test_basic_search(self):
+        self.assertEqual(
+            self._search(search_text="evergreen"), {self.req1.pk, self.req2.pk}
+        )
+        self.assertEqual(self._search(search_text="joseph schmoe"), {self.req1.pk})
+        self.assertEqual(self._search(search_text="nobody"), set())
+
+    def test_partial_name_search(self):
+        self.assertEqual(self._search(first_name="jos"), {self.req1.pk})
+        self.assertEqual(self._search(last_name="GREEN"), {self.req2.pk})
+        self.assertEqual(self._search(first_name="b", last_name="schm"), set())
+
+    def test_partial_phone_search(self):
+        self.assertEqual(self._search(phone="(212) 209-1333"), {self.req1.pk})
+        self.assertEqual(self._search(phone="9998"), {self.req2.pk})
+        self.assertEqual(self._search(phone="1"), {self.req1.pk, self.req2.pk})
+
+    def test_search_uses_indexes(self):
+        plan = self._explain_search(search_text="evergreen")
+        self.assertIn("wfrs_prequal_search_idx", plan)
+        plan = self._explain_search(first_name="jos")
+        self.assertIn("wfrs_prequal_fname_trgm_idx", plan)
+        plan = self._explain_search(last_name="green")
+        self.assertIn("wfrs_prequal_lname_trgm_idx", plan)
+        plan = self._explain_search(phone="2091333")
+        self.assertIn("wfrs_prequal_phone_trgm_idx", plan)
+        self.assertNotIn("Seq Scan", plan)
+
+    def test_backfill_command(self):
+        PreQualificationRequest.objects.update(search_vector=None)
+        self.assertEqual(self._search(search_text="evergreen"), set())
+        out = StringIO()
+        call_command(
+            "wfrs_backfill_search_vectors",
+            "--model=prequal-requests",
+            "--missing-only",
+            stdout=out,
+        )
+        self.assertIn(
+            "Pre-Qualification Requests: done. Updated 2 rows.", out.getvalue()
+        )
+        self.assertEqual(
+            self._search(search_text="evergreen"), {self.req1.pk, self.req2.pk}
+        )
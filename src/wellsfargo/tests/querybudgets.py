@@ -0,0 +1,37 @@
+"""
+Test case mixin for checking the query budgets in ``wellsfargo.querybudgets``.
+"""
+
+from django.core.cache import cache
+from ..querybudgets import BUDGET_SEED_COUNTS, QUERY_BUDGETS
+import abc
+
+
+class QueryBudgetAssertionsMixin(abc.ABC):
+    """
+    Test case mixin for checking query budgets. Test cases must implement ``seed_budget_rows(count)``,
+    which adds ``count`` more rows of every kind to the database. Test cases which don't can't be
+    instantiated, so the test runner reports them before running any of their tests.
+    """
+
+    @abc.abstractmethod
+    def seed_budget_rows(self, count):
+        pass
+
+    def assertQueryBudget(self, name, fn, setup=None):
+        """
+        Assert that ``fn`` runs exactly the budgeted number of queries, no matter how many rows are seeded.
+        If given, ``setup`` is called (outside of the budget) before each call of ``fn``, and its return value
+        is passed to ``fn``.
+        """
+        budget = QUERY_BUDGETS[name]
+        for i, count in enumerate(BUDGET_SEED_COUNTS):
+            self.seed_budget_rows(count)
+            if i == 0:
+                # Warm up, so that one-off work (like creating the session's basket) isn't counted
+                fn(*((setup(),) if setup else ()))
+            args = (setup(),) if setup else ()
+            cache.clear()
+            with self.subTest(budget=name, seeded=count):
+                with self.assertNumQueries(budget):
+                    fn(*args)
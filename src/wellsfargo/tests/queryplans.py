@@ -0,0 +1,121 @@
+"""
+Helpers for asserting that database queries are able to use indexes.
+
+Query plans depend on table statistics, so tests using these helpers should seed their tables with
+a realistic number of rows (see ``seed_rows``) before capturing plans. Tiny tables are always cheaper to
+read sequentially, so a plan for an (almost) empty table says nothing about production.
+"""
+
+from contextlib import contextmanager
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.test.utils import CaptureQueriesContext
+import json
+
+# Number of rows to seed into each table under test
+SEED_ROW_COUNT = 10000
+
+
+class QueryPlan(object):
+    def __init__(self, sql, plan, text):
+        self.sql = sql
+        self.plan = plan
+        self.text = text
+
+    def __str__(self):
+        return "%s\n\n%s" % (self.sql, self.text)
+
+    def iter_nodes(self, node=None):
+        node = node or self.plan["Plan"]
+        yield node
+        for child in node.get("Plans", []):
+            yield from self.iter_nodes(child)
+
+    @property
+    def seq_scanned_tables(self):
+        return set(
+            node["Relation Name"]
+            for node in self.iter_nodes()
+            if node["Node Type"] == "Seq Scan"
+        )
+
+    @property
+    def index_names(self):
+        return set(
+            node["Index Name"] for node in self.iter_nodes() if "Index Name" in node
+        )
+
+
+def explain(sql, params=None, using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) %s" % sql, params)
+        plan = cursor.fetchone()[0]
+        cursor.execute("EXPLAIN %s" % sql, params)
+        text = "\n".join(row[0] for row in cursor.fetchall())
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return QueryPlan(sql, plan[0], text)
+
+
+def explain_queryset(qs):
+    sql, params = qs.query.sql_with_params()
+    return explain(sql, params, using=qs.db)
+
+
+def seed_rows(model, build_obj, count=SEED_ROW_COUNT, batch_size=1000):
+    """
+    Bulk insert ``count`` instances of ``model`` (built by calling ``build_obj(i)``), spread their
+    ``created_datetime`` values out over time (one minute apart), and update the table's statistics.
+    """
+    model.objects.bulk_create(
+        (build_obj(i) for i in range(count)), batch_size=batch_size
+    )
+    connection = connections[model.objects.db]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if any(f.name == "created_datetime" for f in model._meta.fields):
+            cursor.execute(
+                "UPDATE %s SET created_datetime = NOW() - (id * INTERVAL '1 minute')"
+                % table
+            )
+        cursor.execute("ANALYZE %s" % table)
+
+
+class QueryPlanAssertionsMixin(object):
+    def _get_plan(self, plan_or_qs):
+        if isinstance(plan_or_qs, QueryPlan):
+            return plan_or_qs
+        return explain_queryset(plan_or_qs)
+
+    def assertNoSeqScan(self, plan_or_qs, tables=None):
+        """Assert that none of the given tables (or, by default, any table) is read sequentially"""
+        plan = self._get_plan(plan_or_qs)
+        scanned = plan.seq_scanned_tables
+        if tables is not None:
+            scanned = scanned & set(tables)
+        if scanned:
+            self.fail(
+                "Query sequentially scans %s:\n%s" % (", ".join(sorted(scanned)), plan)
+            )
+
+    def assertIndexUsed(self, plan_or_qs, index_name):
+        plan = self._get_plan(plan_or_qs)
+        if index_name not in plan.index_names:
+            self.fail("Query doesn't use index %s:\n%s" % (index_name, plan))
+
+    @contextmanager
+    def captureQueryPlans(self, tables, using=DEFAULT_DB_ALIAS):
+        """
+        Capture the plan of every SELECT query run inside the context which reads any of the given
+        tables. The plans are appended to the yielded list when the context exits.
+        """
+        plans = []
+        connection = connections[using]
+        with CaptureQueriesContext(connection) as ctx:
+            yield plans
+        for query in ctx.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT"):
+                continue
+            if not any(connection.ops.quote_name(table) in sql for table in tables):
+                continue
+            plans.append(explain(sql, using=using))
@@ -0,0 +1,155 @@
+from copy import deepcopy
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TransactionTestCase
+from io import StringIO
+from unittest import mock
+from wellsfargo.benchmark import (
+    BenchmarkFraudProtection,
+    CheckoutBenchmark,
+    compare_to_baseline,
+    find_regressions,
+    get_query_budget,
+)
+from wellsfargo.models import FraudScreenResult, TransferMetadata
+import json
+import os
+import random
+import tempfile
+
+
+class CheckoutBenchmarkTest(TransactionTestCase):
+    def test_run(self):
+        benchmark = CheckoutBenchmark(
+            checkouts=8,
+            concurrency=2,
+            warmup=1,
+            allocation_samples=2,
+            decline_rate=0.5,
+        )
+        results = benchmark.run()
+        self.assertEqual(sum(results["outcomes"].values()), 8)
+        self.assertGreater(results["outcomes"]["Complete"], 0)
+        self.assertGreater(results["outcomes"]["Declined"], 0)
+        self.assertGreater(results["queries"]["mean"], 0)
+        self.assertGreater(results["allocations"]["peak_kib"], 0)
+        latency = results["latency_ms"]
+        self.assertTrue(latency["p50"] <= latency["p95"] <= latency["p99"])
+        # Every checkout (warmup, timed, and allocation traced) went through the fraud screen and the gateway
+        self.assertEqual(FraudScreenResult.objects.count(), 11)
+        self.assertEqual(TransferMetadata.objects.count(), 11)
+
+    def test_command_baseline(self):
+        tmpdir = tempfile.mkdtemp()
+        path = os.path.join(tmpdir, "baseline.json")
+        options = {
+            "checkouts": 4,
+            "concurrency": 2,
+            "warmup": 1,
+            "allocation_samples": 1,
+            "in_place": True,
+        }
+        out = StringIO()
+        call_command("wfrs_benchmark_checkout", save=path, stdout=out, **options)
+        self.assertIn("Queries per checkout:", out.getvalue())
+        with open(path) as f:
+            baseline = json.load(f)
+        self.assertEqual(baseline["config"]["checkouts"], 4)
+
+        out = StringIO()
+        call_command(
+            "wfrs_benchmark_checkout",
+            baseline=path,
+            tolerance=100,
+            stdout=out,
+            **options,
+        )
+        self.assertIn("latency_ms.p50: ", out.getvalue())
+        self.assertIn("No regressions", out.getvalue())
+
+        options["checkouts"] = 5
+        with self.assertRaises(CommandError):
+            call_command(
+                "wfrs_benchmark_checkout",
+                baseline=path,
+                tolerance=100,
+                stdout=StringIO(),
+                **options,
+            )
+        os.remove(path)
+        os.rmdir(tmpdir)
+
+
+class BenchmarkFraudProtectionTest(SimpleTestCase):
+    def test_latencies_are_drawn_from_one_rng(self):
+        rng = random.Random(0)
+        expected = random.Random(0)
+        with mock.patch("wellsfargo.benchmark.time.sleep") as sleep, mock.patch(
+            "wellsfargo.fraud.dummy.DummyFraudProtection.screen_transaction"
+        ):
+            # A screener is built for every checkout
+            for i in range(3):
+                BenchmarkFraudProtection(
+                    latency="uniform:10,50", rng=rng
+                ).screen_transaction(None, None)
+        self.assertEqual(
+            [call.args[0] for call in sleep.call_args_list],
+            [expected.uniform(10, 50) / 1000 for i in range(3)],
+        )
+
+
+class FindRegressionsTest(SimpleTestCase):
+    baseline = {
+        "config": {"checkouts": 200},
+        "throughput": {"checkouts_per_second": 100.0},
+        "latency_ms": {"p50": 10.0, "p95": 20.0, "p99": 40.0},
+        "queries": {"mean": 19.0, "max": 19},
+        "allocations": {"peak_kib": 64.0},
+    }
+
+    def test_no_regressions(self):
+        results = deepcopy(self.baseline)
+        results["latency_ms"]["p95"] = 24.0
+        results["throughput"]["checkouts_per_second"] = 80.0
+        self.assertEqual(find_regressions(results, self.baseline, 0.25), [])
+
+    def test_query_budget(self):
+        results = deepcopy(self.baseline)
+        results["queries"]["max"] = get_query_budget()
+        self.assertEqual(find_regressions(results), [])
+        results["queries"]["max"] += 1
+        self.assertEqual(
+            find_regressions(results),
+            [
+                "queries.max of %s exceeds the budget of %s"
+                % (get_query_budget() + 1, get_query_budget())
+            ],
+        )
+
+    def test_timings_are_only_compared_with_a_tolerance(self):
+        results = deepcopy(self.baseline)
+        results["latency_ms"]["p99"] = 60.0
+        results["throughput"]["checkouts_per_second"] = 50.0
+        self.assertEqual(find_regressions(results, self.baseline), [])
+        self.assertEqual(
+            find_regressions(results, self.baseline, 0.25),
+            [
+                "latency_ms.p99 rose from 40.0 to 60.0",
+                "throughput.checkouts_per_second fell from 100.0 to 50.0",
+            ],
+        )
+
+    def test_compare_to_baseline(self):
+        results = deepcopy(self.baseline)
+        results["latency_ms"]["p99"] = 60.0
+        self.assertIn(
+            "latency_ms.p99: 40.0 -> 60.0 (+50.0%)",
+            compare_to_baseline(results, self.baseline),
+        )
+
+    def test_different_config(self):
+        results = deepcopy(self.baseline)
+        results["config"]["checkouts"] = 10
+        self.assertEqual(find_regressions(results, self.baseline), [])
+        with self.assertRaises(ValueError):
+            find_regressions(results, self.baseline, 0.25)
@@ -0,0 +1,148 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase
+from wellsfargo import catalog
+from wellsfargo.catalog import CATALOG_VERSION_CACHE_KEY, get_plan_catalog
+from wellsfargo.models import FinancingPlan, FinancingPlanBenefit
+
+
+class FinancingPlanCatalogTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.plans = [
+            FinancingPlan.objects.create(
+                plan_number=1001,
+                apr="27.99",
+                term_months=0,
+                product_price_threshold="0.00",
+                advertising_enabled=True,
+            ),
+            FinancingPlan.objects.create(
+                plan_number=1002,
+                apr="0.00",
+                term_months=12,
+                product_price_threshold="500.00",
+                advertising_enabled=True,
+            ),
+            FinancingPlan.objects.create(
+                plan_number=1003,
+                apr="9.99",
+                term_months=24,
+                product_price_threshold="500.00",
+                advertising_enabled=True,
+                is_default_plan=True,
+            ),
+            FinancingPlan.objects.create(
+                plan_number=1004,
+                apr="5.99",
+                term_months=48,
+                product_price_threshold="2000.00",
+                advertising_enabled=False,
+            ),
+            FinancingPlan.objects.create(
+                plan_number=1005,
+                apr="0.00",
+                term_months=60,
+                product_price_threshold="5000.00",
+                advertising_enabled=True,
+            ),
+        ]
+
+    def _query_advertisable_plan(self, price):
+        # The database query which the catalog replaces
+        return (
+            FinancingPlan.objects.exclude(term_months=0)
+            .filter(advertising_enabled=True)
+            .filter(product_price_threshold__gte="0.00")
+            .filter(product_price_threshold__lte=price)
+            .order_by("-product_price_threshold", "-apr")
+            .first()
+        )
+
+    def test_advertisable_plan_by_price(self):
+        get_plan_catalog()
+        for price in (
+            "0.01",
+            "499.99",
+            "500.00",
+            "500.01",
+            "1999.99",
+            "2000.00",
+            "4999.99",
+            "5000.00",
+            "99999.99",
+        ):
+            price = Decimal(price)
+            expected = self._query_advertisable_plan(price)
+            with self.assertNumQueries(0):
+                plan = FinancingPlan.get_advertisable_plan_by_price(price)
+            self.assertEqual(plan, expected, price)
+
+    def test_plan_for_price_includes_zero_term_plans(self):
+        catalog = get_plan_catalog()
+        self.assertEqual(catalog.get_plan_for_price(Decimal("100.00")), self.plans[0])
+        self.assertEqual(catalog.get_plan_for_price(Decimal("600.00")), self.plans[2])
+        self.assertIsNone(catalog.get_advertisable_plan_by_price(Decimal("100.00")))
+
+    def test_default_plan(self):
+        self.assertEqual(get_plan_catalog().default_plan, self.plans[2])
+        self.plans[1].is_default_plan = True
+        self.plans[1].save()
+        self.assertEqual(get_plan_catalog().default_plan, self.plans[1])
+
+    def test_invalidated_by_plan_changes(self):
+        version = get_plan_catalog().version
+        self.plans[4].advertising_enabled = False
+        self.plans[4].save()
+        catalog = get_plan_catalog()
+        self.assertNotEqual(catalog.version, version)
+        self.assertEqual(
+            catalog.get_advertisable_plan_by_price(Decimal("6000.00")), self.plans[2]
+        )
+        self.plans[2].delete()
+        self.plans[1].delete()
+        self.assertIsNone(
+            get_plan_catalog().get_advertisable_plan_by_price(Decimal("6000.00"))
+        )
+
+    def test_invalidated_by_benefit_changes(self):
+        benefit = FinancingPlanBenefit.objects.create(group_name="Default Group")
+        self.assertEqual(get_plan_catalog().get_plans_for_benefit(benefit.pk), None)
+        benefit.plans.add(self.plans[2], self.plans[1])
+        self.assertEqual(
+            get_plan_catalog().get_plans_for_benefit(benefit.pk),
+            [self.plans[1], self.plans[2]],
+        )
+        benefit.plans.remove(self.plans[1])
+        self.assertEqual(
+            get_plan_catalog().get_plans_for_benefit(benefit.pk), [self.plans[2]]
+        )
+        benefit.delete()
+        self.assertEqual(get_plan_catalog().get_plans_for_benefit(benefit.pk), None)
+
+    def test_reloads_when_another_process_publishes_a_version(self):
+        catalog = get_plan_catalog()
+        # Simulate a change made by another process, which this process didn't see the signal for.
+        FinancingPlan.objects.filter(pk=self.plans[4].pk).update(
+            product_price_threshold="100.00"
+        )
+        with self.assertNumQueries(0):
+            self.assertIs(get_plan_catalog(), catalog)
+        cache.set(CATALOG_VERSION_CACHE_KEY, "another-version")
+        reloaded = get_plan_catalog()
+        self.assertEqual(reloaded.version, "another-version")
+        self.assertEqual(
+            reloaded.get_advertisable_plan_by_price(Decimal("200.00")), self.plans[4]
+        )
+
+    def test_reloads_when_cache_is_flushed(self):
+        catalog = get_plan_catalog()
+        cache.clear()
+        self.assertIsNot(get_plan_catalog(), catalog)
+        self.assertIsNotNone(cache.get(CATALOG_VERSION_CACHE_KEY))
+
+    def test_commit_publishes_another_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plans[0].save()
+            version = catalog.get_catalog_version()
+        self.assertNotEqual(catalog.get_catalog_version(), version)
@@ -0,0 +1,29 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from unittest import mock
+from wellsfargo.core.loading import get_configured_instance, load_class
+from wellsfargo.tracing import InMemoryTracer
+import sys
+
+
+class LoadingTest(SimpleTestCase):
+    def test_load_class(self):
+        self.assertIs(load_class("wellsfargo.tracing.InMemoryTracer"), InMemoryTracer)
+        for path in ("wellsfargo.tracing.Missing", "wellsfargo.missing.Tracer"):
+            with self.assertRaises(ImproperlyConfigured):
+                load_class(path)
+
+    def test_load_class_missing_dependency(self):
+        with mock.patch.dict(sys.modules, {"celery": None}):
+            sys.modules.pop("wellsfargo.tasks.celery", None)
+            with self.assertRaisesRegex(ImproperlyConfigured, "requires Celery"):
+                load_class("wellsfargo.tasks.celery.CeleryTaskRunner")
+
+    def test_get_configured_instance(self):
+        settings = {"tracer": "wellsfargo.tracing.InMemoryTracer"}
+        tracer = get_configured_instance(settings, "tracer", "tracer_kwargs")
+        self.assertIsInstance(tracer, InMemoryTracer)
+        # Instances are kept, so that they can keep state
+        self.assertIs(
+            get_configured_instance(settings, "tracer", "tracer_kwargs"), tracer
+        )
@@ -0,0 +1,616 @@
+from decimal import Decimal
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from oscar.core.loading import get_model
+from oscar.test import factories
+from unittest import mock
+from wellsfargo.api.views import (
+    INQUIRY_SESSION_KEY,
+    PREQUAL_SESSION_KEY,
+    SDK_APP_RESULT_SESSION_KEY,
+)
+from wellsfargo.core.constants import (
+    CREDIT_APP_APPROVED,
+    EXPORT_TYPE_CREDIT_APPS,
+    EXPORT_TYPE_PREQUAL_REQUESTS,
+    EXPORT_TYPE_SDK_APPS,
+    PREQUAL_TRANS_STATUS_APPROVED,
+    TRANS_APPROVED,
+    TRANS_TYPE_AUTH,
+)
+from wellsfargo.dashboard.exports import run_export_job
+from wellsfargo.dashboard.returns import get_bulk_return
+from wellsfargo.methods import WellsFargo, WellsFargoPaymentMethodSerializer
+from wellsfargo.models import (
+    AccountInquiryResult,
+    CreditApplication,
+    ExportJob,
+    FinancingPlan,
+    FinancingPlanBenefit,
+    FraudScreenResult,
+    PreQualificationRequest,
+    PreQualificationResponse,
+    PreQualificationSDKApplicationResult,
+    TransferMetadata,
+)
+from wellsfargo.querybudgets import QUERY_BUDGETS
+from wellsfargo.settings import WFRS_FRAUD_PROTECTION
+from .base import BaseTest
+from .querybudgets import QueryBudgetAssertionsMixin
+import requests_mock
+import shutil
+import tempfile
+import uuid
+
+Source = get_model("payment", "Source")
+SourceType = get_model("payment", "SourceType")
+Transaction = get_model("payment", "Transaction")
+
+
+class QueryBudgetTest(QueryBudgetAssertionsMixin, BaseTest):
+    """
+    Budgets for every API endpoint, dashboard view, CSV export, and the payment method. See
+    ``wellsfargo.querybudgets``.
+    """
+
+    prequal_data = {
+        "first_name": "Joe",
+        "last_name": "Schmoe",
+        "line1": "123 Evergreen Terrace",
+        "city": "Springfield",
+        "state": "NY",
+        "postcode": "10001",
+        "phone": "+1 (212) 209-1333",
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.seeded = 0
+        self.source_type, _ = SourceType.objects.get_or_create(name="Wells Fargo")
+        patcher = mock.patch.dict(
+            WFRS_FRAUD_PROTECTION,
+            {
+                "fraud_protection": "wellsfargo.fraud.dummy.DummyFraudProtection",
+                "fraud_protection_kwargs": {},
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def seed_budget_rows(self, count):
+        for i in range(self.seeded, self.seeded + count):
+            self._seed_customer(i)
+        self.seeded += count
+
+    def _seed_customer(self, i):
+        """
+        Seed a customer who was pre-qualified, applied for credit (jointly, for every other customer), and
+        placed an order, along with everything recorded about them along the way.
+        """
+        user = User.objects.create_user(
+            username="customer%s" % i,
+            email="customer%s@example.com" % i,
+            first_name="Customer",
+            last_name=str(i),
+        )
+        plan = FinancingPlan.objects.create(
+            plan_number=2000 + i, apr="9.99", advertising_enabled=True
+        )
+        benefit = FinancingPlanBenefit.objects.create(group_name="Group %s" % i)
+        benefit.plans.add(plan)
+
+        prequal_request = PreQualificationRequest.objects.create(
+            email=user.email,
+            first_name="Customer",
+            last_name=str(i),
+            line1="%s Evergreen Terrace" % i,
+            city="Springfield",
+            state="NY",
+            postcode="10001",
+            phone="+1212209%04d" % i,
+            merchant_name="Default",
+            merchant_num="1111111111111111",
+        )
+        prequal_response = PreQualificationResponse.objects.create(
+            request=prequal_request,
+            status=PREQUAL_TRANS_STATUS_APPROVED,
+            credit_limit=Decimal("8500.00"),
+            response_id="%08d" % i,
+        )
+        PreQualificationSDKApplicationResult.objects.create(
+            prequal_response=prequal_response,
+            application_id="%08d" % i,
+            first_name="Customer",
+            last_name=str(i),
+            application_status="APPROVED",
+        )
+        # A request which never got a response
+        PreQualificationRequest.objects.create(
+            email="unknown%s@example.com" % i,
+            first_name="Unknown",
+            last_name=str(i),
+            line1="%s Evergreen Terrace" % i,
+            city="Springfield",
+            state="NY",
+            postcode="10001",
+            phone="+1212209%04d" % i,
+        )
+
+        if i % 2:
+            app = self._build_joint_credit_app("9999%05d" % i, "9998%05d" % i)
+        else:
+            app = self._build_single_credit_app("9999%05d" % i)
+        app.main_applicant.email_address = user.email
+        app.main_applicant.save()
+        app.user = user
+        app.submitting_user = self.bill
+        app.status = CREDIT_APP_APPROVED
+        app.account_number = "999999999999%04d" % i
+        app.merchant_name = "Default"
+        app.merchant_num = "1111111111111111"
+        app.save()
+        for credit_limit in ("5000.00", "7500.00"):
+            inquiry = AccountInquiryResult(
+                credit_app_source=app,
+                prequal_response_source=prequal_response,
+                credit_limit=Decimal(credit_limit),
+                available_credit=Decimal(credit_limit),
+            )
+            inquiry.account_number = app.account_number
+            inquiry.save()
+
+        order = factories.create_order(user=user)
+        reference = "reference-%s" % i
+        source = Source.objects.create(
+            order=order,
+            source_type=self.source_type,
+            amount_allocated=order.total_incl_tax,
+        )
+        source.transactions.create(
+            txn_type=Transaction.AUTHORISE,
+            amount=order.total_incl_tax,
+            reference=reference,
+            status="Complete",
+        )
+        transfer = TransferMetadata(
+            user=user,
+            merchant_name="Merchant %s" % i,
+            merchant_num="1111111111111111",
+            merchant_reference=reference,
+            amount=order.total_incl_tax,
+            type_code=TRANS_TYPE_AUTH,
+            financing_plan=plan,
+            status=TRANS_APPROVED,
+        )
+        transfer.account_number = app.account_number
+        transfer.save()
+        FraudScreenResult.objects.create(
+            screen_type="Dummy",
+            order=order,
+            reference=reference,
+            decision=FraudScreenResult.DECISION_ACCEPT,
+        )
+        # Every other pre-qualification is linked to its order. The rest are found by email address.
+        if i % 2:
+            prequal_response.customer_order = order
+            prequal_response.save()
+
+        ExportJob.objects.create(
+            export_type=EXPORT_TYPE_CREDIT_APPS, requesting_user=self.bill
+        )
+
+    def _assertResponseBudget(self, name, fn, status_code=200, setup=None):
+        def request(*args):
+            resp = fn(*args)
+            self.assertEqual(resp.status_code, status_code, getattr(resp, "data", ""))
+
+        self.assertQueryBudget(name, request, setup=setup)
+
+    def test_budgets_cover_every_endpoint(self):
+        budgeted = {name.split(":")[0] for name in QUERY_BUDGETS}
+        for app_label in ("wellsfargo_api", "wellsfargo_dashboard"):
+            for pattern in apps.get_app_config(app_label).get_urls():
+                with self.subTest(url_name=pattern.name):
+                    self.assertIn(pattern.name, budgeted)
+
+    def test_seed_budget_rows_is_required(self):
+        class UnseededTest(QueryBudgetAssertionsMixin, BaseTest):
+            def test_nothing(self):
+                pass
+
+        with self.assertRaises(TypeError):
+            UnseededTest("test_nothing")
+
+    # API endpoints
+
+    @requests_mock.Mocker()
+    def test_api_credit_app(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_credit_app_request(rmock)
+        self.client.login(username="joe", password="schmoe")
+        # Imported here so the test runner doesn't find (and run) the test case in this module too
+        from .api.test_api_credit_app import CreditApplicationTest
+
+        url = reverse("wfrs-api-apply")
+        data = CreditApplicationTest.build_valid_request(None)
+        self._assertResponseBudget(
+            "wfrs-api-apply:post",
+            lambda: self.client.post(url, data, format="json"),
+        )
+        self._assertResponseBudget(
+            "wfrs-api-apply:get", lambda: self.client.get(url), status_code=204
+        )
+
+    @requests_mock.Mocker()
+    def test_api_account_inquiry(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_individual_account_inquiry(rmock)
+        self.client.login(username="joe", password="schmoe")
+        self._assertResponseBudget(
+            "wfrs-api-acct-inquiry:post",
+            lambda: self.client.post(
+                reverse("wfrs-api-acct-inquiry"),
+                {"account_number": "9999999999999991"},
+                format="json",
+            ),
+        )
+        self.assertIn(INQUIRY_SESSION_KEY, self.client.session)
+        self._assertResponseBudget(
+            "wfrs-api-update-inquiry:post",
+            lambda: self.client.post(reverse("wfrs-api-update-inquiry")),
+        )
+
+    def test_api_plans(self):
+        self.client.login(username="joe", password="schmoe")
+        self._assertResponseBudget(
+            "wfrs-api-plan-list:get",
+            lambda: self.client.get(reverse("wfrs-api-plan-list")),
+        )
+        self._assertResponseBudget(
+            "wfrs-api-estimated-payment:get",
+            lambda: self.client.get(
+                reverse("wfrs-api-estimated-payment"), {"price": "1000.00"}
+            ),
+        )
+
+        def get_estimated_payments():
+            products = [
+                factories.create_product(price=Decimal("%s.00" % (100 + i)))
+                for i in range(self.seeded)
+            ]
+            return {
+                "price": "1000.00,2000.00",
+                "product": ",".join(str(product.pk) for product in products),
+            }
+
+        self._assertResponseBudget(
+            "wfrs-api-estimated-payments:get",
+            lambda params: self.client.get(
+                reverse("wfrs-api-estimated-payments"), params
+            ),
+            setup=get_estimated_payments,
+        )
+
+    @requests_mock.Mocker()
+    def test_api_prequal(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_prescreen_request(rmock)
+        url = reverse("wfrs-api-prequal")
+        self._assertResponseBudget(
+            "wfrs-api-prequal:post",
+            lambda: self.client.post(url, self.prequal_data, format="json"),
+        )
+        self._assertResponseBudget("wfrs-api-prequal:get", lambda: self.client.get(url))
+        self._assertResponseBudget(
+            "wfrs-api-prequal-customer-response:post",
+            lambda: self.client.post(
+                reverse("wfrs-api-prequal-customer-response"),
+                {"customer_response": "SDKPRESENTED"},
+                format="json",
+            ),
+        )
+        prequal_request = PreQualificationRequest.objects.get(
+            pk=self.client.session[PREQUAL_SESSION_KEY]
+        )
+        self._assertResponseBudget(
+            "wfrs-api-prequal-resume:get",
+            lambda: self.client.get(prequal_request.get_resume_offer_url()),
+            status_code=302,
+        )
+
+    def test_api_prequal_sdk(self):
+        self._assertResponseBudget(
+            "wfrs-api-prequal-sdk-merchant-num:get",
+            lambda: self.client.get(reverse("wfrs-api-prequal-sdk-merchant-num")),
+        )
+        self._assertResponseBudget(
+            "wfrs-api-prequal-sdk-response:post",
+            lambda: self.client.post(
+                reverse("wfrs-api-prequal-sdk-response"),
+                {
+                    "first_name": "Joe",
+                    "last_name": "Schmoe",
+                    "line1": "123 Evergreen Terrace",
+                    "city": "Springfield",
+                    "state": "NY",
+                    "postcode": "10001",
+                    "status": "A",
+                    "credit_limit": "7500.00",
+                    "merchant_name": "Default SDK",
+                    "merchant_num": "000000000001234",
+                    "response_id": "ABC123",
+                },
+                format="json",
+            ),
+        )
+        url = reverse("wfrs-api-prequal-sdk-app-result")
+        self._assertResponseBudget(
+            "wfrs-api-prequal-sdk-app-result:post",
+            lambda: self.client.post(
+                url,
+                {
+                    "application_id": "ABC123",
+                    "first_name": "Joe",
+                    "last_name": "Schmoe",
+                    "application_status": "APPROVED",
+                },
+                format="json",
+            ),
+        )
+        self.assertIn(SDK_APP_RESULT_SESSION_KEY, self.client.session)
+        self._assertResponseBudget(
+            "wfrs-api-prequal-sdk-app-result:get", lambda: self.client.get(url)
+        )
+
+    # Dashboard views
+
+    def test_dashboard_plans(self):
+        self.client.login(username="bill", password="schmoe")
+        self.seed_budget_rows(1)
+        plan = FinancingPlan.objects.first()
+        benefit = FinancingPlanBenefit.objects.first()
+        for name, url in (
+            ("wfrs-plan-list:get", reverse("wfrs-plan-list")),
+            ("wfrs-plan-create:get", reverse("wfrs-plan-create")),
+            ("wfrs-plan-edit:get", reverse("wfrs-plan-edit", args=[plan.pk])),
+            ("wfrs-plan-delete:get", reverse("wfrs-plan-delete", args=[plan.pk])),
+            ("wfrs-benefit-list:get", reverse("wfrs-benefit-list")),
+            ("wfrs-benefit-create:get", reverse("wfrs-benefit-create")),
+            ("wfrs-benefit-edit:get", reverse("wfrs-benefit-edit", args=[benefit.pk])),
+            (
+                "wfrs-benefit-delete:get",
+                reverse("wfrs-benefit-delete", args=[benefit.pk]),
+            ),
+        ):
+            self._assertResponseBudget(name, lambda: self.client.get(url))
+
+    def test_dashboard_lists(self):
+        self.client.login(username="bill", password="schmoe")
+        for url_name in (
+            "wfrs-application-list",
+            "wfrs-transfer-list",
+            "wfrs-prequal-list",
+            "wfrs-sdk-application-list",
+            "wfrs-export-list",
+        ):
+            url = reverse(url_name)
+            self._assertResponseBudget(
+                "%s:get" % url_name, lambda: self.client.get(url)
+            )
+
+    def test_dashboard_details(self):
+        self.client.login(username="bill", password="schmoe")
+        self.seed_budget_rows(1)
+        app = AccountInquiryResult.objects.first().credit_app_source
+        transfer = TransferMetadata.objects.first()
+        prequal_request = PreQualificationResponse.objects.first().request
+        for name, url in (
+            (
+                "wfrs-application-detail:get",
+                reverse("wfrs-application-detail", args=[app.pk]),
+            ),
+            (
+                "wfrs-transfer-detail:get",
+                reverse("wfrs-transfer-detail", args=[transfer.merchant_reference]),
+            ),
+            (
+                "wfrs-prequal-detail:get",
+                reverse("wfrs-prequal-detail", args=[prequal_request.uuid]),
+            ),
+        ):
+            self._assertResponseBudget(name, lambda: self.client.get(url))
+
+    def test_dashboard_exports(self):
+        self.client.login(username="bill", password="schmoe")
+        with self.captureOnCommitCallbacks():
+            self._assertResponseBudget(
+                "wfrs-export-create:post",
+                lambda: self.client.post(
+                    reverse("wfrs-export-create"),
+                    {"export_type": EXPORT_TYPE_CREDIT_APPS, "query": ""},
+                ),
+                status_code=302,
+            )
+        job = ExportJob.objects.order_by("-id").first()
+        run_export_job(job.pk)
+        self._assertResponseBudget(
+            "wfrs-export-download:get",
+            lambda: self.client.get(reverse("wfrs-export-download", args=[job.pk])),
+        )
+
+    @requests_mock.Mocker()
+    def test_dashboard_bulk_return(self, rmock):
+        def approve(request, context):
+            data = request.json()
+            return {
+                "transaction_status": TRANS_APPROVED,
+                "account_number": data["account_number"],
+                "amount": data["amount"],
+                "plan_number": data["plan_number"],
+                "ticket_number": data["ticket_number"],
+            }
+
+        self.mock_get_api_token_request(rmock)
+        rmock.post(
+            "https://api-sandbox.wellsfargo.com/credit-cards/private-label/new-accounts/v2/payment/transactions/return",
+            json=approve,
+        )
+        self.client.login(username="bill", password="schmoe")
+        url = reverse("wfrs-bulk-return")
+        self._assertResponseBudget("wfrs-bulk-return:get", lambda: self.client.get(url))
+
+        def get_orders():
+            # A partial return of every seeded customer's order
+            return "\n".join(
+                "%s, 1.00" % number
+                for number in Source.objects.filter(
+                    source_type=self.source_type
+                ).values_list("order__number", flat=True)
+            )
+
+        def post(orders, token=None):
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(
+                    url, {"orders": orders, "token": token or uuid.uuid4()}
+                )
+
+        # Includes making the returns, which happens after the response is sent
+        self._assertResponseBudget(
+            "wfrs-bulk-return:post", post, status_code=302, setup=get_orders
+        )
+
+        # Results are kept in the cache, which is cleared before each check of a budget
+        token = uuid.uuid4()
+        post(get_orders(), token)
+        results_url = reverse("wfrs-bulk-return-results", kwargs={"token": token})
+        with mock.patch(
+            "wellsfargo.dashboard.views.get_bulk_return",
+            return_value=get_bulk_return(token),
+        ):
+            self._assertResponseBudget(
+                "wfrs-bulk-return-results:get", lambda: self.client.get(results_url)
+            )
+
+    # CSV exports
+
+    def test_csv_downloads(self):
+        self.client.login(username="bill", password="schmoe")
+        for url_name in (
+            "wfrs-application-list",
+            "wfrs-prequal-list",
+            "wfrs-sdk-application-list",
+        ):
+            url = reverse(url_name)
+            self._assertResponseBudget(
+                "%s:csv" % url_name,
+                lambda: self.client.get(url, {"response_format": "csv"}),
+            )
+
+    def test_prefetched_table_data(self):
+        """
+        Data loaded in bulk for the dashboard tables should match what each row would load for itself
+        """
+        self.seed_budget_rows(3)
+        apps = list(CreditApplication.objects.all())
+        CreditApplication.prefetch_table_data(apps)
+        for app in apps:
+            fresh = CreditApplication.objects.get(pk=app.pk)
+            self.assertEqual(app.get_credit_limit(), Decimal("7500.00"))
+            self.assertEqual(app.get_first_order(), fresh.get_orders().first())
+            self.assertIsNotNone(app.get_first_order())
+            self.assertEqual(
+                app.get_first_order_merchant_name(),
+                fresh.get_first_order_merchant_name(),
+            )
+        prequal_requests = list(
+            PreQualificationRequest.objects.select_related("response__customer_order")
+        )
+        PreQualificationRequest.prefetch_table_data(prequal_requests)
+        for prequal_request in prequal_requests:
+            fresh = PreQualificationRequest.objects.get(pk=prequal_request.pk)
+            self.assertEqual(prequal_request.resulting_order, fresh.resulting_order)
+            self.assertEqual(
+                prequal_request.order_merchant_name, fresh.order_merchant_name
+            )
+        self.assertEqual(sum(1 for r in prequal_requests if r.order_merchant_name), 3)
+        transfers = list(TransferMetadata.objects.all())
+        TransferMetadata.prefetch_orders(transfers)
+        for transfer in transfers:
+            self.assertIsNotNone(transfer.order)
+            self.assertEqual(transfer.order, transfer.get_order())
+
+    def test_background_exports(self):
+        for export_type in (
+            EXPORT_TYPE_CREDIT_APPS,
+            EXPORT_TYPE_PREQUAL_REQUESTS,
+            EXPORT_TYPE_SDK_APPS,
+        ):
+
+            def create_job():
+                return ExportJob.objects.create(
+                    export_type=export_type, requesting_user=self.bill
+                )
+
+            self.assertQueryBudget(
+                "export:%s" % export_type,
+                lambda job: run_export_job(job.pk),
+                setup=create_job,
+            )
+
+    # Payment method
+
+    def test_payment_method_serializer(self):
+        request = RequestFactory().post("/api/checkout/")
+        request.user = self.joe
+        request.session = self.client.session
+
+        def validate():
+            plan = FinancingPlan.objects.order_by("-id").first()
+            ser = WellsFargoPaymentMethodSerializer(
+                data={
+                    "method_type": WellsFargo.code,
+                    "enabled": True,
+                    "account_number": "9999999999999991",
+                    "financing_plan": plan.pk,
+                },
+                context={"request": request},
+            )
+            ser.is_valid()
+
+        self.assertQueryBudget("payment-method:serializer", validate)
+
+    @requests_mock.Mocker()
+    def test_payment_method_record_payment(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_transaction_request(rmock)
+        request = RequestFactory().post("/api/checkout/")
+        request.user = self.joe
+
+        def create_order():
+            # One line per seeded customer
+            basket = factories.create_basket(empty=True)
+            for i in range(self.seeded):
+                basket.add_product(factories.create_product(price=Decimal("10.00")))
+            return factories.create_order(user=self.joe, basket=basket)
+
+        def record_payment(order):
+            state = WellsFargo().record_payment(
+                request,
+                order,
+                WellsFargo.code,
+                amount=order.total_incl_tax,
+                account_number="9999999999999991",
+                financing_plan=FinancingPlan.objects.order_by("-id").first(),
+            )
+            self.assertEqual(state.status, "Complete")
+
+        self.assertQueryBudget(
+            "payment-method:record-payment", record_payment, setup=create_order
+        )
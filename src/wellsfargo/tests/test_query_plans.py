@@ -0,0 +1,179 @@
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+from django.urls import reverse
+from oscar.test.factories import create_order
+from wellsfargo.core.constants import TRANS_APPROVED, TRANS_TYPE_AUTH
+from wellsfargo.dashboard.pagination import encode_cursor
+from wellsfargo.models import (
+    AccountInquiryResult,
+    CreditApplication,
+    CreditApplicationAddress,
+    CreditApplicationApplicant,
+    FraudScreenResult,
+    PreQualificationRequest,
+    PreQualificationSDKApplicationResult,
+    TransferMetadata,
+)
+from wellsfargo.settings import WFRS_DASHBOARD_PAGINATION
+from .base import BaseTest
+from .queryplans import QueryPlanAssertionsMixin, SEED_ROW_COUNT, seed_rows
+
+SEEDED_TABLES = (
+    AccountInquiryResult._meta.db_table,
+    CreditApplication._meta.db_table,
+    CreditApplicationAddress._meta.db_table,
+    CreditApplicationApplicant._meta.db_table,
+    FraudScreenResult._meta.db_table,
+    PreQualificationRequest._meta.db_table,
+    PreQualificationSDKApplicationResult._meta.db_table,
+    TransferMetadata._meta.db_table,
+)
+
+
+class QueryPlanTest(QueryPlanAssertionsMixin, BaseTest):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        seed_rows(
+            CreditApplicationAddress,
+            lambda i: CreditApplicationAddress(
+                address_line_1="%s Evergreen Terrace" % i,
+                city="Springfield",
+                state_code="NY",
+                postal_code="10001",
+            ),
+        )
+        addresses = list(CreditApplicationAddress.objects.order_by("pk"))
+        seed_rows(
+            CreditApplicationApplicant,
+            lambda i: CreditApplicationApplicant(
+                first_name="Joe",
+                last_name="Schmoe%s" % i,
+                date_of_birth=date(1991, 1, 1),
+                ssn="999-99-%04d" % i,
+                annual_income=150_000,
+                email_address="joe%s@example.com" % i,
+                home_phone="+12122091333",
+                address=addresses[i],
+            ),
+        )
+        applicants = list(CreditApplicationApplicant.objects.order_by("pk"))
+        seed_rows(
+            CreditApplication,
+            lambda i: CreditApplication(
+                requested_credit_limit=2_000,
+                main_applicant=applicants[i],
+                last4_account_number="%04d" % i,
+            ),
+        )
+        CreditApplication.update_search_vectors()
+        cls.apps = list(CreditApplication.objects.order_by("pk")[:10])
+        seed_rows(
+            AccountInquiryResult,
+            lambda i: AccountInquiryResult(
+                credit_app_source=cls.apps[i % len(cls.apps)],
+                last4_account_number="%04d" % i,
+                credit_limit=Decimal("7500.00"),
+                available_credit=Decimal("7500.00"),
+            ),
+        )
+        seed_rows(
+            TransferMetadata,
+            lambda i: TransferMetadata(
+                merchant_reference="reference-%s" % i,
+                last4_account_number="%04d" % (i % 5000),
+                amount=Decimal("100.00"),
+                type_code=TRANS_TYPE_AUTH,
+                status=TRANS_APPROVED,
+            ),
+        )
+        order = create_order()
+        seed_rows(
+            FraudScreenResult,
+            lambda i: FraudScreenResult(
+                screen_type="Dummy",
+                order=order,
+                reference="reference-%s" % i,
+                decision=FraudScreenResult.DECISION_ACCEPT,
+            ),
+        )
+        seed_rows(
+            PreQualificationRequest,
+            lambda i: PreQualificationRequest(
+                first_name="Joe",
+                last_name="Schmoe%s" % i,
+                line1="%s Evergreen Terrace" % i,
+                city="Springfield",
+                state="NY",
+                postcode="10001",
+                phone="+1212209%04d" % i,
+            ),
+        )
+        seed_rows(
+            PreQualificationSDKApplicationResult,
+            lambda i: PreQualificationSDKApplicationResult(
+                application_id="%08d" % i,
+                first_name="Joe",
+                last_name="Schmoe%s" % i,
+                application_status="APPROVED",
+            ),
+        )
+
+    def test_transfer_by_oscar_transaction(self):
+        transaction = SimpleNamespace(reference="reference-42")
+        with self.captureQueryPlans(SEEDED_TABLES) as plans:
+            transfer = TransferMetadata.get_by_oscar_transaction(transaction)
+        self.assertEqual(transfer.merchant_reference, "reference-42")
+        self.assertEqual(len(plans), 1)
+        self.assertIndexUsed(plans[0], "wfrs_transfer_ref_type_idx")
+        self.assertNoSeqScan(plans[0])
+
+    def test_credit_app_orders(self):
+        app = self.apps[0]
+        with self.captureQueryPlans([TransferMetadata._meta.db_table]) as plans:
+            list(app.get_orders())
+        self.assertIndexUsed(plans[0], "wfrs_transfer_last4_ref_idx")
+        for plan in plans:
+            self.assertNoSeqScan(plan, SEEDED_TABLES)
+
+    def test_credit_app_inquiries(self):
+        app = self.apps[0]
+        with self.captureQueryPlans(SEEDED_TABLES) as plans:
+            self.assertEqual(app.get_credit_limit(), Decimal("7500.00"))
+        self.assertEqual(len(plans), 1)
+        self.assertIndexUsed(plans[0], "wfrs_inquiry_app_created_idx")
+        self.assertNoSeqScan(plans[0])
+
+    def test_fraud_screen_result_by_reference(self):
+        qs = FraudScreenResult.objects.filter(reference="reference-42")
+        self.assertIndexUsed(qs, "wfrs_fraud_reference_idx")
+        self.assertNoSeqScan(qs)
+
+    def test_credit_app_search(self):
+        qs = CreditApplication.objects.filter(search_vector="schmoe42")
+        self.assertIndexUsed(qs, "wfrs_creditapp_search_idx")
+        self.assertNoSeqScan(qs)
+
+    @mock.patch.dict(WFRS_DASHBOARD_PAGINATION, {"mode": "keyset"})
+    def test_dashboard_lists(self):
+        self.client.login(username="bill", password="schmoe")
+        for url_name, Model in (
+            ("wfrs-application-list", CreditApplication),
+            ("wfrs-prequal-list", PreQualificationRequest),
+            ("wfrs-sdk-application-list", PreQualificationSDKApplicationResult),
+            ("wfrs-transfer-list", TransferMetadata),
+        ):
+            # First page, and a page deep in the list
+            middle = Model.objects.order_by("-created_datetime", "-id")[
+                SEED_ROW_COUNT // 2
+            ]
+            for params in ({}, {"after": encode_cursor(middle)}):
+                with self.subTest(url_name=url_name, params=params):
+                    with self.captureQueryPlans(SEEDED_TABLES) as plans:
+                        resp = self.client.get(reverse(url_name), params)
+                    self.assertEqual(resp.status_code, 200)
+                    self.assertTrue(plans)
+                    for plan in plans:
+                        self.assertNoSeqScan(plan, SEEDED_TABLES)
@@ -0,0 +1,189 @@
+from decimal import Decimal
+from unittest import mock
+from wellsfargo.connector import (
+    AccountsAPIClient,
+    HealthCheckAPIClient,
+    PrequalAPIClient,
+    TransactionsAPIClient,
+)
+from wellsfargo.connector.client import WFRSGatewayAPIClient
+from wellsfargo.core.constants import TRANS_APPROVED, TRANS_TYPE_AUTH
+from wellsfargo.core.exceptions import TransactionDenied
+from wellsfargo.core.structures import TransactionRequest
+from wellsfargo.models import PreQualificationRequest
+from wellsfargo.standin import (
+    LatencyDistribution,
+    StandInConfig,
+    build_ssl_context,
+    generate_self_signed_cert,
+    start_standin,
+)
+from wellsfargo.tests.base import BaseTest
+import os
+import random
+import requests
+import shutil
+import tempfile
+import time
+
+
+class LatencyDistributionTest(BaseTest):
+    def test_parse(self):
+        self.assertEqual(
+            str(LatencyDistribution.parse("uniform:20,200")), "uniform:20,200"
+        )
+        for spec in ("gamma:1", "uniform:20", "normal:a,b"):
+            with self.assertRaises(ValueError):
+                LatencyDistribution.parse(spec)
+
+    def test_sample(self):
+        rng = random.Random(0)
+        self.assertEqual(LatencyDistribution.parse("constant:50").sample(rng), 0.05)
+        samples = [
+            LatencyDistribution.parse("lognormal:100,0.5").sample(rng)
+            for i in range(1000)
+        ]
+        samples.sort()
+        self.assertAlmostEqual(samples[500], 0.1, delta=0.01)
+        self.assertTrue(all(s >= 0 for s in samples))
+
+
+class GatewayStandInTest(BaseTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cert_dir = tempfile.mkdtemp()
+        cls.cert_path, cls.key_path = generate_self_signed_cert(cls.cert_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.cert_dir)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.config = StandInConfig(seed=0)
+        self.server = start_standin(
+            config=self.config,
+            ssl_context=build_ssl_context(self.cert_path, self.key_path),
+        )
+        # Trust the stand-in's certificate, and point the clients at it
+        patchers = [
+            mock.patch.dict(os.environ, {"REQUESTS_CA_BUNDLE": self.cert_path}),
+            mock.patch.object(WFRSGatewayAPIClient, "api_host", self.server.url),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def _build_trans_request(self, account_number):
+        request = TransactionRequest()
+        request.user = self.joe
+        request.type_code = TRANS_TYPE_AUTH
+        request.source_account = None
+        request.account_number = account_number
+        request.plan_number = 1001
+        request.amount = Decimal("2159.99")
+        request.ticket_number = "123444"
+        return request
+
+    def test_health_check(self):
+        self.assertTrue(
+            HealthCheckAPIClient().check_credentials().startswith("Congratulations")
+        )
+        self.assertEqual(self.server.request_counts["token"], 1)
+        self.assertEqual(self.server.request_counts["health"], 1)
+
+    def test_prequal(self):
+        prequal_request = PreQualificationRequest.objects.create(
+            first_name="Joe",
+            last_name="Schmoe",
+            line1="123 Evergreen Terrace",
+            city="Springfield",
+            state="NY",
+            postcode="10001",
+            phone="+1 (212) 209-1333",
+        )
+        response = PrequalAPIClient().check_prescreen_status(prequal_request)
+        self.assertEqual(response.status, "A")
+        self.assertEqual(response.credit_limit, Decimal("8500.00"))
+
+    def test_account_inquiry(self):
+        result = AccountsAPIClient().lookup_account_by_account_number(
+            "9999999999991234"
+        )
+        self.assertEqual(result.account_number, "9999999999991234")
+        self.assertEqual(result.credit_limit, Decimal("18000.00"))
+
+    def test_transactions(self):
+        transfer = TransactionsAPIClient().submit_transaction(
+            self._build_trans_request("9999999999991234")
+        )
+        self.assertEqual(transfer.status, TRANS_APPROVED)
+        self.assertEqual(transfer.amount, Decimal("2159.99"))
+        with self.assertRaises(TransactionDenied):
+            TransactionsAPIClient().submit_transaction(
+                self._build_trans_request("9999999999990000")
+            )
+
+    def test_rejects_unknown_tokens(self):
+        resp = requests.post(
+            "https://%s/credit-cards/private-label/new-accounts/v2/details"
+            % self.server.url,
+            headers={"Authorization": "Bearer nope"},
+            json={},
+        )
+        self.assertEqual(resp.status_code, 401)
+
+    def test_inject_throttling(self):
+        self.config.throttle_rate = 1
+        self.config.retry_after = 7
+        resp = requests.post("https://%s/oauth2/v1/token" % self.server.url)
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.headers["Retry-After"], "7")
+
+    def test_inject_errors_and_latency(self):
+        self.config.error_rate = 1
+        self.config.latency = LatencyDistribution.parse("constant:200")
+        start = time.monotonic()
+        resp = requests.post("https://%s/oauth2/v1/token" % self.server.url)
+        self.assertEqual(resp.status_code, 500)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_inject_timeouts(self):
+        self.config.timeout_rate = 1
+        self.config.timeout_delay = 5
+        with self.assertRaises(requests.exceptions.Timeout):
+            requests.post("https://%s/oauth2/v1/token" % self.server.url, timeout=0.2)
+
+
+class MutualTLSStandInTest(BaseTest):
+    def test_requires_client_certificate(self):
+        cert_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cert_dir)
+        cert_path, key_path = generate_self_signed_cert(cert_dir)
+        client_dir = os.path.join(cert_dir, "client")
+        os.mkdir(client_dir)
+        client_cert, client_key = generate_self_signed_cert(client_dir)
+        server = start_standin(
+            ssl_context=build_ssl_context(cert_path, key_path, client_cert)
+        )
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = "https://%s/oauth2/v1/token" % server.url
+        with self.assertRaises(requests.exceptions.SSLError):
+            requests.post(url, verify=cert_path)
+        resp = requests.post(
+            url,
+            verify=cert_path,
+            cert=(client_cert, client_key),
+            auth=("key", "secret"),
+            data={"grant_type": "client_credentials"},
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["token_type"], "Bearer")
@@ -1,6 +1,17 @@
-from django.test import TestCase
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.template import Context, Template
+from oscar.apps.partner.strategy import Default
+from oscar.test.factories import create_product
+from wellsfargo.catalog import get_plan_catalog
 from wellsfargo.models import FinancingPlan
+from wellsfargo.templatetags.wfrs_default_plan import (
+    get_plan_for_product,
+    get_plans_for_products,
+)
 
 
 class TestDefaultPlanTag(TestCase):
@@ -25,3 +36,61 @@ class TestDefaultPlanTag(TestCase):
             "{{ default_plan }}"
         )
         self.assertIn("2", rendered)
+
+
+class TestPlansForProductsTag(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.plan1 = FinancingPlan.objects.create(
+            plan_number=1,
+            term_months=12,
+            product_price_threshold="100.00",
+            advertising_enabled=True,
+        )
+        self.plan2 = FinancingPlan.objects.create(
+            plan_number=2,
+            term_months=24,
+            product_price_threshold="1000.00",
+            advertising_enabled=True,
+        )
+        self.products = [
+            create_product(price=Decimal(price), num_in_stock=5)
+            for price in ("50.00", "500.00", "1500.00", "5000.00")
+        ]
+        self.products.append(create_product())  # No stock record, so no price
+        self.request = RequestFactory().get("/")
+        self.request.strategy = Default()
+
+    def test_plans_for_products(self):
+        get_plan_catalog()
+        plan_table = FinancingPlan._meta.db_table
+        with CaptureQueriesContext(connection) as ctx:
+            rendered = Template(
+                "{% load wfrs_default_plan %}"
+                "{% get_plans_for_products request products as plans %}"
+                "{% for product in products %}"
+                "{% with plan=plans|plan_for_product:product %}"
+                "{{ product.pk }}={{ plan.plan_number|default:'-' }};"
+                "{% endwith %}"
+                "{% endfor %}"
+            ).render(Context({"request": self.request, "products": self.products}))
+        self.assertFalse([q for q in ctx.captured_queries if plan_table in q["sql"]])
+        self.assertEqual(
+            rendered,
+            "%s=-;%s=1;%s=2;%s=2;%s=-;" % tuple(p.pk for p in self.products),
+        )
+
+    def test_tiles_reuse_batch_plans(self):
+        product_plans = get_plans_for_products(self.request, self.products)
+        self.assertEqual(product_plans[self.products[1].pk], self.plan1)
+        with self.assertNumQueries(0):
+            for product in self.products:
+                self.assertEqual(
+                    get_plan_for_product(self.request, product),
+                    product_plans[product.pk],
+                )
+        # Without the batch tag, tiles still find their own plan
+        request = RequestFactory().get("/")
+        request.strategy = Default()
+        self.assertEqual(get_plan_for_product(request, self.products[3]), self.plan2)
+        self.assertIsNone(get_plan_for_product(request, self.products[4]))
@@ -0,0 +1,203 @@
+from django.test import RequestFactory
+from oscar.test import factories
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from unittest import mock
+from wellsfargo.connector import HealthCheckAPIClient
+from wellsfargo.connector.aio import AsyncHealthCheckAPIClient
+from wellsfargo.core.exceptions import TransactionDenied
+from wellsfargo.methods import WellsFargo
+from wellsfargo.models import FinancingPlan
+from wellsfargo.settings import WFRS_FRAUD_PROTECTION, WFRS_TRACING
+from wellsfargo.tests.aio import HTTPXMocker
+from wellsfargo.tests.base import BaseTest
+from wellsfargo.tracing import InMemoryTracer, get_tracer
+import requests_mock
+
+
+class TracingTest(BaseTest):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(
+            WFRS_TRACING, {"tracer": "wellsfargo.tracing.InMemoryTracer"}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(
+            WFRS_FRAUD_PROTECTION,
+            {
+                "fraud_protection": "wellsfargo.fraud.dummy.DummyFraudProtection",
+                "fraud_protection_kwargs": {},
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tracer = get_tracer()
+        self.assertIsInstance(self.tracer, InMemoryTracer)
+        self.tracer.clear()
+
+    def _record_payment(self):
+        plan = FinancingPlan.objects.create(plan_number=9999, apr="9.99")
+        order = factories.create_order(user=self.joe)
+        request = RequestFactory().post("/api/checkout/")
+        request.user = self.joe
+        return WellsFargo().record_payment(
+            request,
+            order,
+            WellsFargo.code,
+            amount=order.total_incl_tax,
+            account_number="9999999999999991",
+            financing_plan=plan,
+        )
+
+    @requests_mock.Mocker()
+    def test_record_payment_spans(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_successful_transaction_request(rmock)
+        state = self._record_payment()
+        self.assertEqual(state.status, "Complete")
+        self.assertEqual(
+            self.tracer.get_tree(),
+            [
+                (
+                    "wfrs.record_payment",
+                    [
+                        ("wfrs.fraud.screen_transaction", []),
+                        ("wfrs.payment.get_source", []),
+                        (
+                            "wfrs.payment.authorize",
+                            [
+                                (
+                                    "wfrs.gateway.request",
+                                    [
+                                        (
+                                            "wfrs.gateway.get_api_key",
+                                            [
+                                                ("wfrs.gateway.generate_api_key", []),
+                                                ("wfrs.security.encrypt", []),
+                                            ],
+                                        ),
+                                    ],
+                                ),
+                                (
+                                    "wfrs.transaction.record",
+                                    [("wfrs.security.encrypt", [])],
+                                ),
+                            ],
+                        ),
+                        ("wfrs.payment.record_events", []),
+                    ],
+                ),
+            ],
+        )
+        [payment_span] = self.tracer.get_spans("wfrs.record_payment")
+        self.assertEqual(payment_span.attributes["wfrs.payment_status"], "Complete")
+        self.assertEqual(payment_span.attributes["wfrs.method_key"], "wells-fargo")
+        [fraud_span] = self.tracer.get_spans("wfrs.fraud.screen_transaction")
+        self.assertEqual(fraud_span.attributes["wfrs.fraud.decision"], "ACCEPT")
+        [request_span] = self.tracer.get_spans("wfrs.gateway.request")
+        self.assertEqual(
+            request_span.attributes,
+            {
+                "http.request.method": "POST",
+                "wfrs.operation": "authorization",
+                "http.response.status_code": 200,
+            },
+        )
+        for span in self.tracer.spans:
+            self.assertGreaterEqual(payment_span.duration, span.duration)
+
+    @requests_mock.Mocker()
+    def test_declined_payment_spans(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        self.mock_declined_transaction_request(rmock)
+        state = self._record_payment()
+        self.assertEqual(state.status, "Declined")
+        [authorize_span] = self.tracer.get_spans("wfrs.payment.authorize")
+        self.assertIsInstance(authorize_span.error, TransactionDenied)
+        self.assertEqual(self.tracer.get_spans("wfrs.payment.record_events"), [])
+
+    async def test_async_client_spans(self):
+        with HTTPXMocker() as rmock:
+            self.mock_get_api_token_request(rmock)
+            rmock.get(
+                "https://api-sandbox.wellsfargo.com/utilities/v1/hello-wellsfargo",
+                json={"response": "Hello, Wells Fargo."},
+            )
+            await AsyncHealthCheckAPIClient().check_credentials()
+            await AsyncHealthCheckAPIClient().check_credentials()
+        self.assertEqual(
+            self.tracer.get_tree(),
+            [
+                (
+                    "wfrs.gateway.request",
+                    [
+                        (
+                            "wfrs.gateway.get_api_key",
+                            [
+                                ("wfrs.gateway.generate_api_key", []),
+                                ("wfrs.security.encrypt", []),
+                            ],
+                        )
+                    ],
+                ),
+                (
+                    "wfrs.gateway.request",
+                    [("wfrs.gateway.get_api_key", [("wfrs.security.decrypt", [])])],
+                ),
+            ],
+        )
+        self.assertEqual(
+            [
+                s.attributes["wfrs.cached"]
+                for s in self.tracer.get_spans("wfrs.gateway.get_api_key")
+            ],
+            [False, True],
+        )
+
+
+class OpenTelemetryTracerTest(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(self.exporter))
+        patcher = mock.patch.dict(
+            WFRS_TRACING,
+            {
+                "tracer": "wellsfargo.tracing.OpenTelemetryTracer",
+                "tracer_kwargs": {"tracer_provider": provider},
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @requests_mock.Mocker()
+    def test_export_spans(self, rmock):
+        self.mock_get_api_token_request(rmock)
+        rmock.get(
+            "https://api-sandbox.wellsfargo.com/utilities/v1/hello-wellsfargo",
+            json={"response": "Hello, Wells Fargo."},
+        )
+        HealthCheckAPIClient().check_credentials()
+        spans = {span.name: span for span in self.exporter.get_finished_spans()}
+        self.assertEqual(
+            set(spans),
+            {
+                "wfrs.gateway.request",
+                "wfrs.gateway.get_api_key",
+                "wfrs.gateway.generate_api_key",
+                "wfrs.security.encrypt",
+            },
+        )
+        request_span = spans["wfrs.gateway.request"]
+        self.assertIsNone(request_span.parent)
+        self.assertEqual(
+            spans["wfrs.gateway.get_api_key"].parent.span_id,
+            request_span.context.span_id,
+        )
+        self.assertEqual(request_span.attributes["wfrs.operation"], "health")
+        self.assertEqual(request_span.attributes["http.response.status_code"], 200)
@@ -0,0 +1,147 @@
+from decimal import Decimal, ROUND_UP, localcontext
+from types import SimpleNamespace
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from io import StringIO
+from rest_framework.request import Request
+from wellsfargo import utils
+from wellsfargo.models import FinancingPlan, FinancingPlanBenefit
+from wellsfargo.utils import (
+    calculate_monthly_payments,
+    get_amortization_factors,
+    list_plans_for_request,
+)
+import random
+
+
+def reference_monthly_payments(principal, term_months, apr):
+    # The original, uncached, implementation of calculate_monthly_payments
+    if term_months == 0:
+        return principal
+    if apr == 0:
+        return principal / term_months
+    interest = apr / 100 / 12
+    payment = (
+        principal
+        * (interest * (1 + interest) ** term_months)
+        / ((1 + interest) ** term_months - 1)
+    )
+    return payment.quantize(principal, rounding=ROUND_UP)
+
+
+class CalculateMonthlyPaymentsTest(SimpleTestCase):
+    # Number of random cases generated by the property test
+    CASES = 20000
+
+    def assertMatchesReference(self, principal, term_months, apr):
+        expected = reference_monthly_payments(principal, term_months, apr)
+        actual = calculate_monthly_payments(principal, term_months, apr)
+        # Compare the representation too, so that the exponent must match as well as the value
+        self.assertEqual(
+            (actual, str(actual)),
+            (expected, str(expected)),
+            "principal=%s term_months=%s apr=%s" % (principal, term_months, apr),
+        )
+
+    def test_known_values(self):
+        self.assertEqual(
+            calculate_monthly_payments(Decimal("2500.00"), 24, Decimal("10.00")),
+            Decimal("115.37"),
+        )
+        self.assertEqual(
+            calculate_monthly_payments(Decimal("1500.00"), 12, Decimal("0.00")),
+            Decimal("125.00"),
+        )
+        self.assertEqual(
+            calculate_monthly_payments(Decimal("1500.00"), 0, Decimal("27.99")),
+            Decimal("1500.00"),
+        )
+
+    def test_matches_reference_implementation(self):
+        rng = random.Random(20261019)
+        aprs = [Decimal("0.00"), Decimal("0.01"), Decimal("99.99")] + [
+            Decimal(rng.randint(1, 9999)) / 100 for i in range(200)
+        ]
+        terms = [0, 1, 6, 12, 18, 24, 36, 48, 60, 72, 120]
+        for i in range(self.CASES):
+            principal = Decimal(rng.randint(1, 10_000_000)) / 100
+            self.assertMatchesReference(
+                principal.quantize(Decimal("0.01")),
+                rng.choice(terms + [rng.randint(1, 360)]),
+                rng.choice(aprs),
+            )
+
+    def test_equal_aprs_with_different_exponents(self):
+        for apr in (Decimal("12"), Decimal("12.0"), Decimal("12.00")):
+            self.assertMatchesReference(Decimal("1200.00"), 12, apr)
+
+    def test_factors_are_cached_per_context(self):
+        first = get_amortization_factors(Decimal("9.99"), 24)
+        self.assertIs(get_amortization_factors(Decimal("9.99"), 24), first)
+        with localcontext() as ctx:
+            ctx.prec = 50
+            precise = get_amortization_factors(Decimal("9.99"), 24)
+            self.assertNotEqual(precise, first)
+            self.assertMatchesReference(Decimal("1234.56"), 24, Decimal("9.99"))
+        self.assertIs(get_amortization_factors(Decimal("9.99"), 24), first)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("wfrs_benchmark_payments", prices=100, rounds=1, stdout=out)
+        self.assertIn("cached:", out.getvalue())
+        self.assertIn("Speedup:", out.getvalue())
+
+
+class ListPlansForRequestTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.plan1 = FinancingPlan.objects.create(
+            plan_number=1001, apr="0.00", term_months=12
+        )
+        self.plan2 = FinancingPlan.objects.create(
+            plan_number=1002, apr="9.99", term_months=24
+        )
+        self.benefit1 = FinancingPlanBenefit.objects.create(group_name="Group 1")
+        self.benefit1.plans.add(self.plan1)
+        self.benefit2 = FinancingPlanBenefit.objects.create(group_name="Group 2")
+        self.benefit2.plans.add(self.plan2)
+
+    def _build_basket(self, *benefits):
+        applications = [
+            {"offer": SimpleNamespace(benefit_id=benefit.pk)} for benefit in benefits
+        ]
+        return SimpleNamespace(
+            pk=42,
+            offer_applications=SimpleNamespace(post_order_actions=applications),
+        )
+
+    def test_memoized_per_request(self):
+        basket = self._build_basket(self.benefit1)
+        request = Request(RequestFactory().get("/"))
+        with mock.patch(
+            "wellsfargo.utils.operations.get_basket", return_value=basket
+        ) as get_basket, mock.patch(
+            "wellsfargo.utils._list_plans_for_benefits",
+            wraps=utils._list_plans_for_benefits,
+        ) as list_plans:
+            self.assertEqual(list_plans_for_request(request), [self.plan1])
+            # DRF and Django views / serializers handling the same request share the result
+            with self.assertNumQueries(0):
+                self.assertEqual(list_plans_for_request(request._request), [self.plan1])
+            self.assertEqual(get_basket.call_count, 1)
+            self.assertEqual(list_plans.call_count, 1)
+            # Changing the basket's offers invalidates the memoized plans
+            basket.offer_applications.post_order_actions.append(
+                {"offer": SimpleNamespace(benefit_id=self.benefit2.pk)}
+            )
+            self.assertEqual(list_plans_for_request(request), [self.plan1, self.plan2])
+            self.assertEqual(list_plans.call_count, 2)
+            # So does changing the plans
+            self.benefit2.plans.remove(self.plan2)
+            self.assertEqual(list_plans_for_request(request), [self.plan1])
+            self.assertEqual(get_basket.call_count, 1)
+            # Another request does its own lookup
+            list_plans_for_request(RequestFactory().get("/"))
+            self.assertEqual(get_basket.call_count, 2)
@@ -0,0 +1,173 @@
+"""
+Tracing hooks, for finding where the time goes in a Wells Fargo checkout.
+
+Checkouts, fraud screens, encryption, API key retrieval, and gateway requests are each wrapped in a span, which
+nest like so::
+
+    wfrs.record_payment
+        wfrs.fraud.screen_transaction
+        wfrs.payment.get_source
+        wfrs.payment.authorize
+            wfrs.gateway.request
+                wfrs.gateway.get_api_key
+                    wfrs.security.decrypt
+            wfrs.transaction.record
+                wfrs.security.encrypt
+        wfrs.payment.record_events
+
+Spans are discarded by default. To send them to OpenTelemetry (which requires ``opentelemetry-api``), use::
+
+    WFRS_TRACING = {
+        'tracer': 'wellsfargo.tracing.OpenTelemetryTracer',
+        'tracer_kwargs': {},
+    }
+
+In tests, use ``InMemoryTracer`` and inspect its ``spans``.
+"""
+
+from .core.loading import get_configured_instance
+from .settings import WFRS_TRACING
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+
+SPAN_RECORD_PAYMENT = "wfrs.record_payment"
+SPAN_FRAUD_SCREEN = "wfrs.fraud.screen_transaction"
+SPAN_GET_SOURCE = "wfrs.payment.get_source"
+SPAN_AUTHORIZE = "wfrs.payment.authorize"
+SPAN_RECORD_EVENTS = "wfrs.payment.record_events"
+SPAN_API_REQUEST = "wfrs.gateway.request"
+SPAN_GET_API_KEY = "wfrs.gateway.get_api_key"
+SPAN_GENERATE_API_KEY = "wfrs.gateway.generate_api_key"
+SPAN_RECORD_TRANSACTION = "wfrs.transaction.record"
+SPAN_ENCRYPT = "wfrs.security.encrypt"
+SPAN_DECRYPT = "wfrs.security.decrypt"
+
+
+class NoOpSpan(object):
+    def set_attribute(self, key, value):
+        pass
+
+
+class NoOpTracer(object):
+    """
+    Discards all spans. This is the default, and the interface for other tracers.
+    """
+
+    @contextlib.contextmanager
+    def start_span(self, name, attributes=None):
+        """Start a span, as a child of the current span, and make it the current span until it ends"""
+        yield NoOpSpan()
+
+
+class InMemorySpan(object):
+    def __init__(self, name, attributes, parent):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.parent = parent
+        self.error = None
+        self.start_time = time.perf_counter()
+        self.end_time = None
+
+    @property
+    def duration(self):
+        if self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __repr__(self):
+        return "<InMemorySpan %s>" % self.name
+
+
+class InMemoryTracer(NoOpTracer):
+    """
+    Keeps finished spans in memory (in the order they finish), for use in tests.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._current_span = contextvars.ContextVar("wfrs_current_span", default=None)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def start_span(self, name, attributes=None):
+        span = InMemorySpan(name, attributes, self._current_span.get())
+        token = self._current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = e
+            raise
+        finally:
+            span.end_time = time.perf_counter()
+            self._current_span.reset(token)
+            with self._lock:
+                self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+    def get_spans(self, name):
+        return [span for span in self.spans if span.name == name]
+
+    def get_children(self, span):
+        return [child for child in self.spans if child.parent is span]
+
+    def get_tree(self, span=None):
+        """Return the names of the spans under the given span (or of the root spans), as nested tuples"""
+        if span is None:
+            roots = [s for s in self.spans if s.parent is None]
+        else:
+            roots = self.get_children(span)
+        roots.sort(key=lambda s: s.start_time)
+        return [(s.name, self.get_tree(s)) for s in roots]
+
+
+class OpenTelemetryTracer(NoOpTracer):
+    """
+    Sends spans to OpenTelemetry, using the global tracer provider (unless another is given).
+    """
+
+    def __init__(self, tracer_name="wellsfargo", tracer_provider=None):
+        from opentelemetry import trace
+
+        self.tracer = trace.get_tracer(tracer_name, tracer_provider=tracer_provider)
+
+    @contextlib.contextmanager
+    def start_span(self, name, attributes=None):
+        # Exceptions are recorded on the span, and mark it as an error
+        with self.tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield span
+
+
+def get_tracer():
+    """Return the configured tracer. It's built once, so that it can keep state (like recorded spans)."""
+    return get_configured_instance(WFRS_TRACING, "tracer", "tracer_kwargs")
+
+
+def trace_span(name, **attributes):
+    """
+    Return a context manager which wraps its block in a span (with the given attributes), and provides the span,
+    so that more attributes can be set on it.
+    """
+    return get_tracer().start_span(name, attributes)
+
+
+def traced(name):
+    """Decorate a function, to wrap each call of it in a span"""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with trace_span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
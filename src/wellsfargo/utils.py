@@ -1,19 +1,131 @@
 from decimal import Decimal, ROUND_UP, InvalidOperation
-from .models import FinancingPlanBenefit
+from django.contrib.postgres.search import SearchQuery
+from oscarapi.basket import operations
+from .catalog import get_plan_catalog
+from .eligibility import get_basket_fingerprint, get_basket_plan_store
+import decimal
+import functools
 import re
 
 
+# Attributes of the (Django) request used to memoize its basket and the basket's financing plans
+BASKET_REQUEST_ATTR = "_wfrs_basket"
+BASKET_PLANS_REQUEST_ATTR = "_wfrs_basket_plans"
+
+
+def _get_benefit_ids(basket):
+    # FinancingPlanBenefit shares its primary key with the Benefit it extends
+    return tuple(
+        application["offer"].benefit_id
+        for application in basket.offer_applications.post_order_actions
+    )
+
+
 def list_plans_for_basket(basket):
+    catalog = get_plan_catalog()
+    return _list_plans_for_benefits(catalog, _get_benefit_ids(basket))
+
+
+def _list_plans_for_benefits(catalog, benefit_ids):
     plans = []
-    for application in basket.offer_applications.post_order_actions:
-        benefit = application["offer"].benefit.proxy()
-        if isinstance(benefit, FinancingPlanBenefit):
-            plans += benefit.plans.all()
+    for benefit_id in benefit_ids:
+        benefit_plans = catalog.get_plans_for_benefit(benefit_id)
+        if benefit_plans:
+            plans += benefit_plans
     plans = {p.pk: p for p in plans}.values()
     plans = sorted(plans, key=lambda plan: "%s-%s" % (plan.apr, plan.term_months))
     return plans
 
 
+def _get_http_request(request):
+    # Unwrap DRF requests, so that views and serializers handling the same request share the memoized data
+    return getattr(request, "_request", request)
+
+
+def get_request_basket(request):
+    """
+    Return the request's basket (with offers applied), fetching and preparing it at most once per request.
+    """
+    http_request = _get_http_request(request)
+    basket = getattr(http_request, BASKET_REQUEST_ATTR, None)
+    if basket is None:
+        basket = operations.get_basket(request)
+        setattr(http_request, BASKET_REQUEST_ATTR, basket)
+    return basket
+
+
+def list_plans_for_request(request, basket=None):
+    """
+    Return the financing plans available to the request's basket (see ``list_plans_for_basket``). The
+    result is memoized for the rest of the request, keyed by the basket's ID, its offer applications, and
+    the plan catalog version, so that it's only worked out again if one of those changes. If a basket plan
+    store is configured (see ``WFRS_BASKET_PLAN_CACHE``), it's also remembered between requests.
+    """
+    catalog = get_plan_catalog()
+    if basket is None:
+        store = get_basket_plan_store()
+        if store is not None:
+            return _list_stored_plans_for_request(request, store, catalog)
+        basket = get_request_basket(request)
+    benefit_ids = _get_benefit_ids(basket)
+    key = (basket.pk, benefit_ids, catalog.version)
+    memo = _get_request_memo(request)
+    if key not in memo:
+        memo[key] = _list_plans_for_benefits(catalog, benefit_ids)
+    return memo[key]
+
+
+def _get_request_memo(request):
+    http_request = _get_http_request(request)
+    memo = getattr(http_request, BASKET_PLANS_REQUEST_ATTR, None)
+    if memo is None:
+        memo = {}
+        setattr(http_request, BASKET_PLANS_REQUEST_ATTR, memo)
+    return memo
+
+
+def _list_stored_plans_for_request(request, store, catalog):
+    http_request = _get_http_request(request)
+    memo = _get_request_memo(request)
+    key = ("stored", catalog.version)
+    if key in memo:
+        return memo[key]
+    # Fingerprint the basket without applying offers to it, since that's what the store lets us skip.
+    basket = getattr(http_request, BASKET_REQUEST_ATTR, None)
+    if basket is None:
+        basket = operations.get_basket(request, prepare=False)
+    fingerprint = get_basket_fingerprint(request, basket, catalog)
+    plan_ids = store.get(http_request, basket.pk, fingerprint)
+    if plan_ids is not None:
+        plans = [catalog.plans[pk] for pk in plan_ids if pk in catalog.plans]
+    else:
+        if getattr(http_request, BASKET_REQUEST_ATTR, None) is None:
+            basket = operations.prepare_basket(basket, request)
+            setattr(http_request, BASKET_REQUEST_ATTR, basket)
+        plans = list_plans_for_request(request, basket=basket)
+        store.set(http_request, basket.pk, fingerprint, [plan.pk for plan in plans])
+    memo[key] = plans
+    return plans
+
+
+@functools.lru_cache(maxsize=1024)
+def _get_amortization_factors(apr, term_months, precision, rounding):
+    # Convert the APR into a per-month interest rate decimal
+    interest = apr / 100 / 12
+    growth = (1 + interest) ** term_months
+    return (interest * growth, growth - 1)
+
+
+def get_amortization_factors(apr, term_months):
+    """
+    Return the ``(numerator, denominator)`` amortization factors of a loan, such that the monthly payment
+    is ``principal * numerator / denominator``. The factors only depend on the plan, so they're computed
+    once per APR and term (and Decimal context, since that changes how they round) and then cached.
+    """
+    context = decimal.getcontext()
+    return _get_amortization_factors(apr, term_months, context.prec, context.rounding)
+
+
 def calculate_monthly_payments(principal, term_months, apr):
     # If the loan term is 0, the payment is the full principal
     if term_months == 0:
@@ -23,19 +135,61 @@ def calculate_monthly_payments(principal, term_months, apr):
     if apr == 0:
         return principal / term_months
 
-    # Convert the APR into a per-month interest rate decimal
-    interest = apr / 100 / 12
-
-    # Calculate the amortized monthly payment for the loan
-    payment = (
-        principal
-        * (interest * (1 + interest) ** term_months)
-        / ((1 + interest) ** term_months - 1)
-    )
+    # Calculate the amortized monthly payment for the loan. This performs exactly the same Decimal
+    # operations, in the same order, as ``principal * (i * (1 + i) ** n) / ((1 + i) ** n - 1)``, so
+    # it rounds identically.
+    numerator, denominator = get_amortization_factors(apr, term_months)
+    payment = principal * numerator / denominator
 
     return payment.quantize(principal, rounding=ROUND_UP)
 
 
+def estimate_payment(principal, plan):
+    """
+    Estimate the monthly payment and total loan cost of financing ``principal`` with ``plan``. Returns a
+    dictionary suitable for ``EstimatedPaymentSerializer``.
+    """
+    monthly_payment = calculate_monthly_payments(principal, plan.term_months, plan.apr)
+    loan_cost = (monthly_payment * plan.term_months) - principal
+    loan_cost = max(Decimal("0.00"), loan_cost)
+    loan_cost = loan_cost.quantize(principal, rounding=ROUND_UP)
+    return {
+        "plan": plan,
+        "principal": principal,
+        "monthly_payment": monthly_payment,
+        "loan_cost": loan_cost,
+    }
+
+
+def estimate_payments(prices, catalog=None):
+    """
+    Estimate payments for many prices at once. Returns a dictionary mapping each distinct price to its
+    estimate, or to ``None`` if no plan is advertised for the price.
+    """
+    catalog = catalog or get_plan_catalog()
+    estimates = {}
+    for price in prices:
+        if price in estimates:
+            continue
+        plan = catalog.get_advertisable_plan_by_price(price)
+        estimates[price] = estimate_payment(price, plan) if plan else None
+    return estimates
+
+
+def get_product_price(strategy, product):
+    """Price of the given product (including tax, if known) according to the given strategy"""
+    if product.is_parent:
+        purchase_info = strategy.fetch_for_parent(product)
+    else:
+        purchase_info = strategy.fetch_for_product(product)
+    price = purchase_info.price
+    if not price.exists:
+        return None
+    if price.is_tax_known:
+        return price.incl_tax
+    return price.excl_tax
+
+
 def as_decimal(string):
     try:
         return Decimal(string).quantize(Decimal(".01"))
@@ -65,3 +219,16 @@ def remove_null_dict_keys(value):
         elif value[key] is None or value[key] == "":
             value.pop(key, None)
     return value
+
+
+def build_weighted_search_query(text, weight):
+    """
+    Build a full-text query which requires every word in ``text`` to be found under the given weight
+    label of a stored search vector. This lets one (indexed) vector hold several kinds of data which
+    can still be searched individually.
+    """
+    terms = []
+    for word in text.split():
+        word = word.replace("\\", "\\\\").replace("'", "''")
+        terms.append("'%s':%s" % (word, weight))
+    return SearchQuery(" & ".join(terms), search_type="raw")